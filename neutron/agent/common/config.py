@@ -29,6 +29,12 @@ LOG = logging.getLogger(__name__)
 ROOT_HELPER_OPTS = [
     cfg.StrOpt('root_helper', default='sudo',
                help=_('Root helper application.')),
+    cfg.StrOpt('root_helper_daemon',
+               help=_('Command starting a root helper daemon, e.g. '
+                      '"sudo neutron-rootwrap-daemon '
+                      '/etc/neutron/rootwrap.conf". When set, the commands '
+                      'needing root privileges are run through the daemon '
+                      'instead of root_helper.')),
 ]
 
 AGENT_STATE_OPTS = [
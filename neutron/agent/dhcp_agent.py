@@ -29,6 +29,7 @@ from neutron.agent import rpc as agent_rpc
 from neutron.common import constants
 from neutron.common import exceptions
 from neutron.common import legacy
+from neutron.common import rpc as n_rpc
 from neutron.common import topics
 from neutron.common import utils
 from neutron import context
@@ -37,7 +38,6 @@ from neutron.openstack.common import importutils
 from neutron.openstack.common import log as logging
 from neutron.openstack.common import loopingcall
 from neutron.openstack.common.rpc import common
-from neutron.openstack.common.rpc import proxy
 from neutron.openstack.common import service
 from neutron import service as neutron_service
 
@@ -61,6 +61,11 @@ class DhcpAgent(manager.Manager):
                            "enable_isolated_metadata = True")),
         cfg.IntOpt('num_sync_threads', default=4,
                    help=_('Number of threads to use during sync process.')),
+        cfg.FloatOpt('port_notification_batch_interval', default=0,
+                     help=_('Number of seconds during which the port '
+                            'notifications of a network are batched before '
+                            'reloading its DHCP server once. 0 reloads it '
+                            'on each notification.')),
         cfg.StrOpt('metadata_proxy_socket',
                    default='$state_path/metadata_proxy',
                    help=_('Location of Metadata Proxy UNIX domain '
@@ -72,6 +77,8 @@ class DhcpAgent(manager.Manager):
         self.needs_resync = False
         self.conf = cfg.CONF
         self.cache = NetworkCache()
+        # network id -> leases to release once its allocations are reloaded
+        self.pending_reloads = {}
         self.root_helper = config.get_root_helper(self.conf)
         self.dhcp_driver_cls = importutils.import_class(self.conf.dhcp_driver)
         ctx = context.get_admin_context_without_session()
@@ -254,8 +261,8 @@ class DhcpAgent(manager.Manager):
         else:
             self.disable_dhcp_helper(network.id)
 
-    def release_lease_for_removed_ips(self, prev_port, updated_port, network):
-        """Releases the dhcp lease for ips removed from a port."""
+    def get_release_for_removed_ips(self, prev_port, updated_port):
+        """Return the release_lease arguments for ips removed from a port."""
         if prev_port:
             previous_ips = set(fixed_ip.ip_address
                                for fixed_ip in prev_port.fixed_ips)
@@ -264,10 +271,41 @@ class DhcpAgent(manager.Manager):
             # pass in port with removed ips on it
             removed_ips = previous_ips - current_ips
             if removed_ips:
-                self.call_driver('release_lease',
-                                 network,
-                                 mac_address=updated_port.mac_address,
-                                 removed_ips=removed_ips)
+                return {'mac_address': updated_port.mac_address,
+                        'removed_ips': removed_ips}
+
+    def reload_allocations(self, network, release=None):
+        """Reload the allocations of a network after a port change.
+
+        release holds the arguments of the release_lease call of the DHCP
+        driver for the IPs removed by the change, released once the
+        allocations are reloaded. The changes notified during
+        port_notification_batch_interval are applied by a single reload.
+        """
+        interval = self.conf.port_notification_batch_interval
+        if interval <= 0:
+            self.call_driver('reload_allocations', network)
+            if release:
+                self.call_driver('release_lease', network, **release)
+            return
+
+        if network.id not in self.pending_reloads:
+            self.pending_reloads[network.id] = []
+            eventlet.spawn_after(interval, self._reload_pending_allocations,
+                                 network.id)
+        if release:
+            self.pending_reloads[network.id].append(release)
+
+    @utils.synchronized('dhcp-agent')
+    def _reload_pending_allocations(self, network_id):
+        releases = self.pending_reloads.pop(network_id, [])
+        # The network may have been refreshed or disabled in the meantime
+        network = self.cache.get_network_by_id(network_id)
+        if not network:
+            return
+        self.call_driver('reload_allocations', network)
+        for release in releases:
+            self.call_driver('release_lease', network, **release)
 
     @utils.synchronized('dhcp-agent')
     def network_create_end(self, context, payload):
@@ -314,9 +352,9 @@ class DhcpAgent(manager.Manager):
         if network:
             prev_port = self.cache.get_port_by_id(updated_port.id)
             self.cache.put_port(updated_port)
-            self.call_driver('reload_allocations', network)
-            self.release_lease_for_removed_ips(prev_port, updated_port,
-                                               network)
+            self.reload_allocations(
+                network, self.get_release_for_removed_ips(prev_port,
+                                                          updated_port))
 
     # Use the update handler for the port create event.
     port_create_end = port_update_end
@@ -328,13 +366,11 @@ class DhcpAgent(manager.Manager):
         if port:
             network = self.cache.get_network_by_id(port.network_id)
             self.cache.remove_port(port)
-            self.call_driver('reload_allocations', network)
             removed_ips = [fixed_ip.ip_address
                            for fixed_ip in port.fixed_ips]
-            self.call_driver('release_lease',
-                             network,
-                             mac_address=port.mac_address,
-                             removed_ips=removed_ips)
+            self.reload_allocations(network,
+                                    {'mac_address': port.mac_address,
+                                     'removed_ips': removed_ips})
 
     def enable_isolated_metadata_proxy(self, network):
 
@@ -390,7 +426,7 @@ class DhcpAgent(manager.Manager):
         pm.disable()
 
 
-class DhcpPluginApi(proxy.RpcProxy):
+class DhcpPluginApi(n_rpc.RpcProxy):
     """Agent side of the dhcp rpc API.
 
     API version history:
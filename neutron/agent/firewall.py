@@ -53,8 +53,14 @@ class FirewallDriver(object):
       if direction is egress:
         remote_group_id will be a list of dest_ip_prefix
       remote_group_id will also remaining membership update management
+
+    Drivers setting handles_remote_groups match remote group rules against
+    the members they are given through update_security_group_members, so
+    the rules of their ports keep remote_group_id rules unexpanded.
     """
 
+    handles_remote_groups = False
+
     def prepare_port_filter(self, port):
         """Prepare filters for the port.
 
@@ -85,6 +91,14 @@ class FirewallDriver(object):
         """Stop filtering port."""
         raise NotImplementedError()
 
+    def update_security_group_members(self, sg_id, member_ips):
+        """Update the member IPs of a remote security group.
+
+        member_ips maps each ethertype to the list of member IPs.
+        Only called on drivers which handle remote groups.
+        """
+        raise NotImplementedError()
+
     def filter_defer_apply_on(self):
         """Defer application of filtering rule."""
         pass
@@ -17,7 +17,10 @@
 # @author: Dan Wendlandt, Nicira, Inc
 #
 
+import itertools
+
 import eventlet
+import eventlet.queue
 import netaddr
 from oslo.config import cfg
 
@@ -30,18 +33,18 @@ from neutron.agent.linux import utils
 from neutron.agent import rpc as agent_rpc
 from neutron.common import constants as l3_constants
 from neutron.common import legacy
+from neutron.common import rpc as n_rpc
 from neutron.common import topics
 from neutron.common import utils as common_utils
 from neutron import context
 from neutron import manager
 from neutron.openstack.common import importutils
-from neutron.openstack.common import lockutils
 from neutron.openstack.common import log as logging
 from neutron.openstack.common import loopingcall
 from neutron.openstack.common import periodic_task
 from neutron.openstack.common.rpc import common as rpc_common
-from neutron.openstack.common.rpc import proxy
 from neutron.openstack.common import service
+from neutron.openstack.common import timeutils
 from neutron import service as neutron_service
 from neutron.services.firewall.agents.l3reference import firewall_l3_agent
 
@@ -49,11 +52,16 @@ LOG = logging.getLogger(__name__)
 NS_PREFIX = 'qrouter-'
 INTERNAL_DEV_PREFIX = 'qr-'
 EXTERNAL_DEV_PREFIX = 'qg-'
-RPC_LOOP_INTERVAL = 1
 FLOATING_IP_CIDR_SUFFIX = '/32'
+# Priorities of the router updates, lower values being processed first
+PRIORITY_RPC = 0
+PRIORITY_SYNC_ROUTERS_TASK = 1
+# Actions of the router updates
+UPDATE_ROUTER = 0
+DELETE_ROUTER = 1
 
 
-class L3PluginApi(proxy.RpcProxy):
+class L3PluginApi(n_rpc.RpcProxy):
     """Agent side of the l3 agent RPC API.
 
     API version history:
@@ -75,6 +83,20 @@ class L3PluginApi(proxy.RpcProxy):
                                        router_ids=router_ids),
                          topic=self.topic)
 
+    def get_router_ids(self, context):
+        """Make a remote process call to retrieve the ids of the routers.
+
+        Returns None when the server does not support this call.
+        """
+        try:
+            return self.call(context,
+                             self.make_msg('get_router_ids', host=self.host),
+                             topic=self.topic)
+        except rpc_common.RemoteError as e:
+            if e.exc_type != 'AttributeError':
+                raise
+            LOG.debug(_("The server does not support get_router_ids"))
+
     def get_external_network_id(self, context):
         """Make a remote process call to retrieve the external network id.
 
@@ -88,6 +110,91 @@ class L3PluginApi(proxy.RpcProxy):
                          topic=self.topic)
 
 
+class RouterUpdate(object):
+    """A change of a router to apply.
+
+    timestamp is the time the change was notified, or the time the router
+    data was fetched when router is given.
+    """
+
+    def __init__(self, router_id, priority, action=UPDATE_ROUTER,
+                 router=None, timestamp=None):
+        self.router_id = router_id
+        self.priority = priority
+        self.action = action
+        self.router = router
+        self.timestamp = timestamp or timeutils.utcnow()
+        # Sequence number of the queue entry of the update
+        self.seq = None
+
+
+class RouterProcessingQueue(object):
+    """Queue of the router updates waiting to be processed.
+
+    The updates are returned by priority, then in the order they were
+    queued. A router has at most one pending update: a new update replaces
+    it, with the highest priority of both and the place in the queue this
+    priority gives. The updates of a router being processed are held until
+    done is called for it, so that a router is never processed twice at
+    the same time.
+    """
+
+    def __init__(self):
+        self._queue = eventlet.queue.PriorityQueue()
+        self._counter = itertools.count()
+        # router id -> update waiting in the queue
+        self._pending = {}
+        # router id -> update received while the router is processed
+        self._held = {}
+        self._processing = set()
+
+    def __len__(self):
+        return len(self._pending) + len(self._held)
+
+    def add(self, update):
+        router_id = update.router_id
+        if router_id in self._processing:
+            held = self._held.get(router_id)
+            if held:
+                update.priority = min(update.priority, held.priority)
+            self._held[router_id] = update
+            return
+
+        pending = self._pending.get(router_id)
+        if pending and pending.priority <= update.priority:
+            # Take the place of the pending update
+            update.priority = pending.priority
+            update.seq = pending.seq
+        else:
+            update.seq = next(self._counter)
+            self._queue.put((update.priority, update.seq, router_id))
+        self._pending[router_id] = update
+
+    def get(self, block=True):
+        """Wait for the next update and mark its router as processed.
+
+        None is returned if block is False and no update is waiting.
+        """
+        while True:
+            try:
+                priority, seq, router_id = self._queue.get(block=block)
+            except eventlet.queue.Empty:
+                return None
+            update = self._pending.get(router_id)
+            # Skip the entries of the updates which were replaced
+            if update and update.seq == seq:
+                del self._pending[router_id]
+                self._processing.add(router_id)
+                return update
+
+    def done(self, router_id):
+        """Queue the update received while the router was processed."""
+        self._processing.discard(router_id)
+        held = self._held.pop(router_id, None)
+        if held:
+            self.add(held)
+
+
 class RouterInfo(object):
 
     def __init__(self, router_id, root_helper, use_namespaces, router):
@@ -186,6 +293,11 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager):
                    default='$state_path/metadata_proxy',
                    help=_('Location of Metadata Proxy UNIX domain '
                           'socket')),
+        cfg.IntOpt('router_processing_workers', default=8,
+                   help=_("Number of routers processed in parallel.")),
+        cfg.IntOpt('sync_routers_chunk_size', default=64,
+                   help=_("Number of routers fetched by each call to the "
+                          "server during a full resync.")),
     ]
 
     def __init__(self, host, conf=None):
@@ -212,15 +324,14 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager):
         self.context = context.get_admin_context_without_session()
         self.plugin_rpc = L3PluginApi(topics.L3PLUGIN, host)
         self.fullsync = True
-        self.updated_routers = set()
-        self.removed_routers = set()
+        self.target_ex_net_id = None
         self.sync_progress = False
+        self._queue = RouterProcessingQueue()
+        # router id -> time of the router data last processed
+        self.router_timestamps = {}
         if self.conf.use_namespaces:
             self._destroy_router_namespaces(self.conf.router_id)
 
-        self.rpc_loop = loopingcall.FixedIntervalLoopingCall(
-            self._rpc_loop)
-        self.rpc_loop.start(interval=RPC_LOOP_INTERVAL)
         super(L3NATAgent, self).__init__(conf=self.conf)
 
     def _check_config_params(self):
@@ -287,12 +398,20 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager):
             ip_wrapper = ip_wrapper_root.ensure_namespace(ri.ns_name())
             ip_wrapper.netns.execute(['sysctl', '-w', 'net.ipv4.ip_forward=1'])
 
-    def _fetch_external_net_id(self):
+    def _fetch_external_net_id(self, force=False):
         """Find UUID of single external network for this agent."""
         if self.conf.gateway_external_network_id:
             return self.conf.gateway_external_network_id
+
+        # The external network is only looked up again by a full sync,
+        # not for each processed router
+        if self.target_ex_net_id and not force:
+            return self.target_ex_net_id
+
         try:
-            return self.plugin_rpc.get_external_network_id(self.context)
+            self.target_ex_net_id = self.plugin_rpc.get_external_network_id(
+                self.context)
+            return self.target_ex_net_id
         except rpc_common.RemoteError as e:
             if e.exc_type == 'TooManyExternalNetworks':
                 msg = _(
@@ -635,7 +754,8 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager):
     def router_deleted(self, context, router_id):
         """Deal with router deletion RPC message."""
         LOG.debug(_('Got router deleted notification for %s'), router_id)
-        self.removed_routers.add(router_id)
+        self._queue.add(RouterUpdate(router_id, PRIORITY_RPC,
+                                     action=DELETE_ROUTER))
 
     def routers_updated(self, context, routers):
         """Deal with routers modification and creation RPC message."""
@@ -644,11 +764,13 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager):
             # This is needed for backward compatibility
             if isinstance(routers[0], dict):
                 routers = [router['id'] for router in routers]
-            self.updated_routers.update(routers)
+            for router_id in routers:
+                self._queue.add(RouterUpdate(router_id, PRIORITY_RPC))
 
     def router_removed_from_agent(self, context, payload):
         LOG.debug(_('Got router removed from agent :%r'), payload)
-        self.removed_routers.add(payload['router_id'])
+        self._queue.add(RouterUpdate(payload['router_id'], PRIORITY_RPC,
+                                     action=DELETE_ROUTER))
 
     def router_added_to_agent(self, context, payload):
         LOG.debug(_('Got router added to agent :%r'), payload)
@@ -699,39 +821,92 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager):
             pool.spawn_n(self._router_removed, router_id)
         pool.waitall()
 
-    @lockutils.synchronized('l3-agent', 'neutron-')
-    def _rpc_loop(self):
-        # _rpc_loop and _sync_routers_task will not be
-        # executed in the same time because of lock.
-        # so we can clear the value of updated_routers
-        # and removed_routers
+    def _process_router_update(self, update, processed=None):
+        """Apply an update taken from the queue to its router.
+
+        The router data is appended to processed, if given, once applied.
+        """
+        router_id = update.router_id
         try:
-            LOG.debug(_("Starting RPC loop for %d updated routers"),
-                      len(self.updated_routers))
-            if self.updated_routers:
-                router_ids = list(self.updated_routers)
-                self.updated_routers.clear()
-                routers = self.plugin_rpc.get_routers(
-                    self.context, router_ids)
-                self._process_routers(routers)
-            self._process_router_delete()
-            LOG.debug(_("RPC loop successfully completed"))
+            last_timestamp = self.router_timestamps.get(router_id)
+            if last_timestamp and update.timestamp < last_timestamp:
+                # The router data processed since then includes the update
+                LOG.debug(_("Dropping stale update of router %s"), router_id)
+                return
+
+            if update.action == DELETE_ROUTER:
+                self.router_timestamps[router_id] = update.timestamp
+                self._router_removed(router_id)
+                return
+
+            router = update.router
+            timestamp = update.timestamp
+            if not router:
+                timestamp = timeutils.utcnow()
+                routers = self.plugin_rpc.get_routers(self.context,
+                                                      [router_id])
+                if not routers:
+                    LOG.debug(_("Router %s is not hosted by this agent"),
+                              router_id)
+                    return
+                router = routers[0]
+            self.router_timestamps[router_id] = timestamp
+            self._process_routers([router])
+            if processed is not None:
+                processed.append(router)
         except Exception:
-            LOG.exception(_("Failed synchronizing routers"))
+            LOG.exception(_("Failed processing router %s"), router_id)
             self.fullsync = True
+        finally:
+            self._queue.done(router_id)
+
+    def _routers_processed(self, routers):
+        """Called once the updates of a batch have been processed.
+
+        :param routers: the data of the routers updated by the batch
+        """
+        pass
+
+    def _process_routers_loop(self):
+        """Process the queued router updates by batches with a bounded pool.
 
-    def _process_router_delete(self):
-        current_removed_routers = list(self.removed_routers)
-        for router_id in current_removed_routers:
-            self._router_removed(router_id)
-            self.removed_routers.remove(router_id)
+        A batch takes the updates waiting in the queue, and the updates
+        queued meanwhile are processed by the next batch.
+        """
+        pool = eventlet.GreenPool(size=self.conf.router_processing_workers)
+        while True:
+            update = self._queue.get()
+            routers = []
+            while update:
+                # Waits for a free worker
+                pool.spawn_n(self._process_router_update, update, routers)
+                update = self._queue.get(block=False)
+            pool.waitall()
+            try:
+                self._routers_processed(routers)
+            except Exception:
+                LOG.exception(_("Failed processing the updated routers"))
+                self.fullsync = True
 
     def _router_ids(self):
         if not self.conf.use_namespaces:
             return [self.conf.router_id]
 
+    def _fetch_routers_chunks(self, context, router_ids):
+        """Yield the fetch time, ids and data of the routers by chunks."""
+        chunk_size = max(self.conf.sync_routers_chunk_size, 1)
+        for i in range(0, len(router_ids), chunk_size):
+            chunk = router_ids[i:i + chunk_size]
+            timestamp = timeutils.utcnow()
+            yield timestamp, chunk, self.plugin_rpc.get_routers(context,
+                                                                chunk)
+
+    def _queue_router_removal(self, router_id, timestamp=None):
+        self._queue.add(RouterUpdate(router_id, PRIORITY_SYNC_ROUTERS_TASK,
+                                     action=DELETE_ROUTER,
+                                     timestamp=timestamp))
+
     @periodic_task.periodic_task
-    @lockutils.synchronized('l3-agent', 'neutron-')
     def _sync_routers_task(self, context):
         if self.services_sync:
             super(L3NATAgent, self).process_services_sync(context)
@@ -739,22 +914,42 @@ class L3NATAgent(firewall_l3_agent.FWaaSL3AgentRpcCallback, manager.Manager):
                   self.fullsync)
         if not self.fullsync:
             return
+        # Processing errors met from now on trigger another full sync
+        self.fullsync = False
         try:
+            self._fetch_external_net_id(force=True)
             router_ids = self._router_ids()
-            self.updated_routers.clear()
-            self.removed_routers.clear()
-            routers = self.plugin_rpc.get_routers(
-                context, router_ids)
-
-            LOG.debug(_('Processing :%r'), routers)
-            self._process_routers(routers, all_routers=True)
-            self.fullsync = False
+            if router_ids is None:
+                router_ids = self.plugin_rpc.get_router_ids(context)
+            if router_ids is None:
+                # Fetch all the routers at once from older servers
+                timestamp = timeutils.utcnow()
+                routers = self.plugin_rpc.get_routers(context, None)
+                router_ids = [router['id'] for router in routers]
+                chunks = [(timestamp, router_ids, routers)]
+            else:
+                chunks = self._fetch_routers_chunks(context, router_ids)
+
+            for router_id in set(self.router_info) - set(router_ids):
+                self._queue_router_removal(router_id)
+            for timestamp, chunk, routers in chunks:
+                LOG.debug(_('Processing :%r'), routers)
+                for router in routers:
+                    self._queue.add(RouterUpdate(router['id'],
+                                                 PRIORITY_SYNC_ROUTERS_TASK,
+                                                 router=router,
+                                                 timestamp=timestamp))
+                # Inactive routers are not returned
+                for router_id in (set(chunk) & set(self.router_info) -
+                                  set(router['id'] for router in routers)):
+                    self._queue_router_removal(router_id, timestamp)
             LOG.debug(_("_sync_routers_task successfully completed"))
         except Exception:
             LOG.exception(_("Failed synchronizing routers"))
             self.fullsync = True
 
     def after_start(self):
+        eventlet.spawn_n(self._process_routers_loop)
         LOG.info(_("L3 agent started"))
 
     def _update_routing_table(self, ri, operation, route):
@@ -157,6 +157,8 @@ class DhcpBase(object):
 
 class DhcpLocalProcess(DhcpBase):
     PORTS = []
+    # Whether _replace_conf_file changed a config file
+    conf_changed = False
 
     def _enable_dhcp(self):
         """check if there is a subnet within the network with dhcp enabled."""
@@ -235,6 +237,14 @@ class DhcpLocalProcess(DhcpBase):
         LOG.debug(msg % file_name)
         return None
 
+    def _replace_conf_file(self, kind, data):
+        """Replace a config file unless it already holds data."""
+        file_name = self.get_conf_file_name(kind)
+        if self._get_value_from_conf_file(kind) != data:
+            utils.replace_file(file_name, data)
+            self.conf_changed = True
+        return file_name
+
     @property
     def pid(self):
         """Last known pid for the DHCP process spawned for this network."""
@@ -400,14 +410,20 @@ class Dnsmasq(DhcpLocalProcess):
                         'turned off DHCP: %s'), self.network.id)
             return
 
+        self.conf_changed = False
         self._output_hosts_file()
         self._output_opts_file()
-        if self.active:
+        if not self.conf_changed:
+            # dnsmasq already serves these allocations
+            LOG.debug(_('Allocations of network %s did not change'),
+                      self.network.id)
+        elif self.active:
             cmd = ['kill', '-HUP', self.pid]
             utils.execute(cmd, self.root_helper)
+            LOG.debug(_('Reloading allocations for network: %s'),
+                      self.network.id)
         else:
             LOG.debug(_('Pid %d is stale, relaunching dnsmasq'), self.pid)
-        LOG.debug(_('Reloading allocations for network: %s'), self.network.id)
         self.device_manager.update(self.network)
 
     def _output_hosts_file(self):
@@ -431,9 +447,7 @@ class Dnsmasq(DhcpLocalProcess):
                     buf.write('%s,%s,%s\n' %
                               (port.mac_address, name, alloc.ip_address))
 
-        name = self.get_conf_file_name('host')
-        utils.replace_file(name, buf.getvalue())
-        return name
+        return self._replace_conf_file('host', buf.getvalue())
 
     def _output_opts_file(self):
         """Write a dnsmasq compatible options file."""
@@ -486,9 +500,7 @@ class Dnsmasq(DhcpLocalProcess):
                     self._format_option(port.id, opt.opt_name, opt.opt_value)
                     for opt in port.extra_dhcp_opts)
 
-        name = self.get_conf_file_name('opts')
-        utils.replace_file(name, '\n'.join(options))
-        return name
+        return self._replace_conf_file('opts', '\n'.join(options))
 
     def _make_subnet_interface_ip_map(self):
         ip_dev = ip_lib.IPDevice(
@@ -0,0 +1,106 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Implements IP sets of security group members using ipset."""
+
+from neutron.agent.linux import utils as linux_utils
+from neutron.common import constants
+from neutron.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+# ipset names are limited to 31 characters
+MAX_SET_NAME_LEN = 31
+SET_NAME_PREFIX = 'N'
+SET_FAMILY = {constants.IPv4: 'inet',
+              constants.IPv6: 'inet6'}
+
+
+def get_set_name(sg_id, ethertype):
+    """Return the name of the set holding the members of a security group.
+
+    The name is built from the ethertype and as much of the security group
+    id as fits, without its dashes.
+    """
+    name = '%s%s%s' % (SET_NAME_PREFIX, ethertype, sg_id.replace('-', ''))
+    return name[:MAX_SET_NAME_LEN]
+
+
+class IpsetManager(object):
+    """Wrapper for ipset.
+
+    The members of the sets created through the manager are kept in memory,
+    so updating a set only adds and deletes the changed members, in a
+    single 'ipset restore' call.
+
+    The sets are of type hash:net so that allowed address pair CIDRs can be
+    members along with host addresses.
+    """
+
+    def __init__(self, _execute=None, root_helper=None, namespace=None):
+        if _execute:
+            self.execute = _execute
+        else:
+            self.execute = linux_utils.execute
+        self.root_helper = root_helper
+        self.namespace = namespace
+        # set name -> set of members
+        self.sets = {}
+
+    def _ipset(self, args, process_input=None):
+        args = ['ipset'] + args
+        if self.namespace:
+            args = ['ip', 'netns', 'exec', self.namespace] + args
+        return self.execute(args, process_input=process_input,
+                            root_helper=self.root_helper)
+
+    def set_members(self, name, ethertype, members):
+        """Create the named set if needed and update its members.
+
+        Returns the number of ipset commands issued, which is 0 when the
+        members did not change.
+        """
+        members = set(members)
+        lines = []
+        if name in self.sets:
+            old_members = self.sets[name]
+        else:
+            # The set may be left over from a previous run of the agent
+            lines += ['create %s hash:net family %s' % (name,
+                                                       SET_FAMILY[ethertype]),
+                      'flush %s' % name]
+            old_members = set()
+        lines += ['add %s %s' % (name, member)
+                  for member in sorted(members - old_members)]
+        lines += ['del %s %s' % (name, member)
+                  for member in sorted(old_members - members)]
+        if lines:
+            self._ipset(['restore', '-exist'],
+                        process_input='\n'.join(lines) + '\n')
+        self.sets[name] = members
+        return len(lines)
+
+    def destroy(self, name):
+        """Destroy the named set, which no rule may refer to anymore."""
+        if name not in self.sets:
+            return
+        try:
+            self._ipset(['destroy', name])
+        except RuntimeError:
+            LOG.exception(_('Failed to destroy ipset %s'), name)
+            return
+        del self.sets[name]
@@ -19,6 +19,7 @@ import netaddr
 from oslo.config import cfg
 
 from neutron.agent import firewall
+from neutron.agent.linux import ipset_manager
 from neutron.agent.linux import iptables_manager
 from neutron.common import constants
 from neutron.openstack.common import log as logging
@@ -33,6 +34,11 @@ CHAIN_NAME_PREFIX = {INGRESS_DIRECTION: 'i',
                      EGRESS_DIRECTION: 'o',
                      SPOOF_FILTER: 's'}
 LINUX_DEV_LEN = 14
+IPSET_DIRECTION = {INGRESS_DIRECTION: 'src',
+                   EGRESS_DIRECTION: 'dst'}
+
+cfg.CONF.import_opt('enable_ipset', 'neutron.agent.securitygroups_rpc',
+                    group='SECURITYGROUP')
 
 
 class IptablesFirewallDriver(firewall.FirewallDriver):
@@ -49,11 +55,34 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
         self._add_fallback_chain_v4v6()
         self._defer_apply = False
         self._pre_defer_filtered_ports = None
+        self.enable_ipset = cfg.CONF.SECURITYGROUP.enable_ipset
+        if self.enable_ipset:
+            self.ipset = ipset_manager.IpsetManager(
+                root_helper=cfg.CONF.AGENT.root_helper)
+        # member IPs of remote security groups matched through ipsets
+        self.sg_members = {}
 
     @property
     def ports(self):
         return self.filtered_ports
 
+    @property
+    def handles_remote_groups(self):
+        return self.enable_ipset
+
+    def update_security_group_members(self, sg_id, member_ips):
+        """Update the ipsets of a remote security group.
+
+        Rules matching the group refer to its sets, so the iptables rules
+        are left untouched.
+        """
+        LOG.debug(_("Updating members of security group %s"), sg_id)
+        self.sg_members[sg_id] = member_ips
+        for ethertype in (constants.IPv4, constants.IPv6):
+            self.ipset.set_members(
+                ipset_manager.get_set_name(sg_id, ethertype), ethertype,
+                member_ips.get(ethertype, []))
+
     def prepare_port_filter(self, port):
         LOG.debug(_("Preparing device (%s) filter"), port['device'])
         self._remove_chains()
@@ -61,6 +90,7 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
         # each security group has it own chains
         self._setup_chains()
         self.iptables.apply()
+        self._remove_unused_sets()
 
     def update_port_filter(self, port):
         LOG.debug(_("Updating device (%s) filter"), port['device'])
@@ -72,6 +102,7 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
         self.filtered_ports[port['device']] = port
         self._setup_chains()
         self.iptables.apply()
+        self._remove_unused_sets()
 
     def remove_port_filter(self, port):
         LOG.debug(_("Removing device (%s) filter"), port['device'])
@@ -83,6 +114,7 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
         self.filtered_ports.pop(port['device'], None)
         self._setup_chains()
         self.iptables.apply()
+        self._remove_unused_sets()
 
     def _setup_chains(self):
         """Setup ingress and egress chain for a port."""
@@ -297,6 +329,8 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
                                    rule.get('protocol'),
                                    rule.get('port_range_min'),
                                    rule.get('port_range_max'))
+            if self._is_member_set_rule(rule):
+                args += self._member_set_arg(rule)
             args += ['-j RETURN']
             iptables_rules += [' '.join(args)]
 
@@ -304,6 +338,34 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
 
         return iptables_rules
 
+    def _is_member_set_rule(self, rule):
+        return (self.enable_ipset and rule.get('remote_group_id') and
+                not rule.get('source_ip_prefix') and
+                not rule.get('dest_ip_prefix'))
+
+    def _member_set_arg(self, rule):
+        sg_id = rule['remote_group_id']
+        if sg_id not in self.sg_members:
+            # The rule must not refer to a set that does not exist
+            self.update_security_group_members(sg_id, {})
+        set_name = ipset_manager.get_set_name(sg_id, rule['ethertype'])
+        return ['-m set --match-set', set_name,
+                IPSET_DIRECTION[rule['direction']]]
+
+    def _remove_unused_sets(self):
+        """Destroy the sets of groups no filtered port refers to anymore."""
+        if not self.enable_ipset or self._defer_apply:
+            return
+        used = set(rule['remote_group_id']
+                   for port in self.filtered_ports.values()
+                   for rule in port.get('security_group_rules', [])
+                   if self._is_member_set_rule(rule))
+        for sg_id in set(self.sg_members) - used:
+            for ethertype in (constants.IPv4, constants.IPv6):
+                self.ipset.destroy(
+                    ipset_manager.get_set_name(sg_id, ethertype))
+            del self.sg_members[sg_id]
+
     def _drop_invalid_packets(self, iptables_rules):
         # Always drop invalid packets
         iptables_rules += ['-m state --state ' 'INVALID -j DROP']
@@ -359,6 +421,7 @@ class IptablesFirewallDriver(firewall.FirewallDriver):
             self._pre_defer_filtered_ports = None
             self._setup_chains_apply(self.filtered_ports)
             self.iptables.defer_apply_off()
+            self._remove_unused_sets()
 
 
 class OVSHybridIptablesFirewallDriver(IptablesFirewallDriver):
@@ -23,6 +23,9 @@
 
 import inspect
 import os
+import time
+
+from oslo.config import cfg
 
 from neutron.agent.linux import utils as linux_utils
 from neutron.common import utils
@@ -30,6 +33,15 @@ from neutron.openstack.common import log as logging
 
 LOG = logging.getLogger(__name__)
 
+OPTS = [
+    cfg.BoolOpt('iptables_incremental_apply', default=False,
+                help=_("Apply only the chains changed since the last apply "
+                       "with 'iptables-restore --noflush' instead of saving "
+                       "and restoring the whole ruleset every time")),
+]
+
+cfg.CONF.register_opts(OPTS, 'AGENT')
+
 
 # NOTE(vish): Iptables supports chain names of up to 28 characters,  and we
 #             add up to 12 characters to binary_name which is used as a prefix,
@@ -262,11 +274,17 @@ class IptablesManager(object):
     wrapped in the same was as the built-in filter chains. Additionally,
     there's a snat chain that is applied after the POSTROUTING chain.
 
+    When incremental apply is enabled, the chains and rules written by the
+    last apply are kept in memory and later applies only send the changed
+    chains to 'iptables-restore --noflush'. A full save/modify/restore is
+    still done for the first apply and whenever the incremental restore
+    fails, i.e. when the cached state no longer matches the kernel.
+
     """
 
     def __init__(self, _execute=None, state_less=False,
                  root_helper=None, use_ipv6=False, namespace=None,
-                 binary_name=binary_name):
+                 binary_name=binary_name, incremental=None):
         if _execute:
             self.execute = _execute
         else:
@@ -278,6 +296,18 @@ class IptablesManager(object):
         self.iptables_apply_deferred = False
         self.wrap_name = binary_name[:16]
 
+        if incremental is None:
+            incremental = cfg.CONF.AGENT.iptables_incremental_apply
+        self.incremental = incremental
+        # Chains and rules applied by the last successful apply, per command
+        self._applied = {}
+        self.apply_stats = {'applies': 0,
+                            'full_resyncs': 0,
+                            'stale_resyncs': 0,
+                            'last_mode': None,
+                            'last_duration': 0.0,
+                            'last_lines': 0}
+
         self.ipv4 = {'filter': IptablesTable(binary_name=self.wrap_name)}
         self.ipv6 = {'filter': IptablesTable(binary_name=self.wrap_name)}
 
@@ -355,32 +385,171 @@ class IptablesManager(object):
     def _apply(self):
         """Apply the current in-memory set of iptables rules.
 
-        This will blow away any rules left over from previous runs of the
-        same component of Nova, and replace them with our current set of
-        rules. This happens atomically, thanks to iptables-restore.
+        Incremental applies only touch the chains that changed since the
+        last apply. Otherwise, or when the cached state turns out to be
+        stale, fall back to a full resync of our chains and rules.
 
         """
+        start = time.time()
         s = [('iptables', self.ipv4)]
         if self.use_ipv6:
             s += [('ip6tables', self.ipv6)]
 
+        mode = 'incremental'
+        lines = 0
         for cmd, tables in s:
-            args = ['%s-save' % (cmd,), '-c']
-            if self.namespace:
-                args = ['ip', 'netns', 'exec', self.namespace] + args
-            all_tables = self.execute(args, root_helper=self.root_helper)
-            all_lines = all_tables.split('\n')
-            for table_name, table in tables.iteritems():
-                start, end = self._find_table(all_lines, table_name)
-                all_lines[start:end] = self._modify_rules(
-                    all_lines[start:end], table, table_name)
-
-            args = ['%s-restore' % (cmd,), '-c']
+            model = self._get_model(tables) if self.incremental else None
+            if self.incremental and cmd in self._applied:
+                try:
+                    lines += self._apply_incremental(cmd, tables, model)
+                    self._applied[cmd] = model
+                    continue
+                except RuntimeError:
+                    LOG.warn(_('Incremental %s apply failed, the cached '
+                               'state is stale; doing a full resync'), cmd)
+                    self.apply_stats['stale_resyncs'] += 1
+                    del self._applied[cmd]
+
+            mode = 'full'
+            lines += self._apply_full(cmd, tables)
+            if self.incremental:
+                self._applied[cmd] = model
+
+        duration = time.time() - start
+        self.apply_stats['applies'] += 1
+        if mode == 'full':
+            self.apply_stats['full_resyncs'] += 1
+        self.apply_stats.update({'last_mode': mode,
+                                 'last_duration': duration,
+                                 'last_lines': lines})
+        LOG.debug(_("IPTablesManager.apply completed with success: "
+                    "%(mode)s apply of %(lines)d lines in %(duration).3fs"),
+                  {'mode': mode, 'lines': lines, 'duration': duration})
+
+    def _apply_full(self, cmd, tables):
+        """Rewrite our chains and rules with a full save/modify/restore.
+
+        This will blow away any rules left over from previous runs of the
+        same component of Nova, and replace them with our current set of
+        rules. This happens atomically, thanks to iptables-restore.
+
+        """
+        args = ['%s-save' % (cmd,), '-c']
+        if self.namespace:
+            args = ['ip', 'netns', 'exec', self.namespace] + args
+        all_tables = self.execute(args, root_helper=self.root_helper)
+        all_lines = all_tables.split('\n')
+        for table_name, table in tables.iteritems():
+            start, end = self._find_table(all_lines, table_name)
+            all_lines[start:end] = self._modify_rules(
+                all_lines[start:end], table, table_name)
+
+        args = ['%s-restore' % (cmd,), '-c']
+        if self.namespace:
+            args = ['ip', 'netns', 'exec', self.namespace] + args
+        self.execute(args, process_input='\n'.join(all_lines),
+                     root_helper=self.root_helper)
+        return len(all_lines)
+
+    def _apply_incremental(self, cmd, tables, model):
+        """Send only the changes since the last apply to iptables-restore.
+
+        Returns the number of lines sent, which is 0 when nothing changed.
+        A RuntimeError is raised if iptables-restore rejects the changes.
+
+        """
+        applied = self._applied[cmd]
+        all_lines = []
+        for table_name in sorted(model):
+            lines = self._diff_table(applied.get(table_name, ({}, {})),
+                                     model[table_name])
+            if lines:
+                all_lines += ['*%s' % table_name] + lines + ['COMMIT']
+
+        if all_lines:
+            args = ['%s-restore' % (cmd,), '--noflush']
             if self.namespace:
                 args = ['ip', 'netns', 'exec', self.namespace] + args
-            self.execute(args, process_input='\n'.join(all_lines),
+            self.execute(args, process_input='\n'.join(all_lines) + '\n',
                          root_helper=self.root_helper)
-        LOG.debug(_("IPTablesManager.apply completed with success"))
+
+        # The cached model already accounts for the removals
+        for table in tables.values():
+            table.remove_chains.clear()
+            del table.remove_rules[:]
+        return len(all_lines)
+
+    def _get_model(self, tables):
+        """Return the chains and rules of each table, by full chain name.
+
+        For each table this is a tuple of a dict mapping the chains we
+        declare to whether they are wrapped (i.e. owned by us alone), and a
+        dict mapping chain names to the ordered list of our rules in them.
+
+        """
+        model = {}
+        for table_name, table in tables.iteritems():
+            chains = dict((name, False) for name in table.unwrapped_chains)
+            chains.update(('%s-%s' % (self.wrap_name, name), True)
+                          for name in table.chains)
+            rules = {}
+            for rule in ([r for r in table.rules if r.top] +
+                         [r for r in table.rules if not r.top]):
+                if rule.wrap:
+                    chain = '%s-%s' % (rule.wrap_name, rule.chain)
+                else:
+                    chain = rule.chain
+                chain_rules = rules.setdefault(chain, [])
+                if (rule.rule, rule.top) not in chain_rules:
+                    chain_rules.append((rule.rule, rule.top))
+            model[table_name] = (chains, rules)
+        return model
+
+    def _diff_table(self, old, new):
+        """Return the iptables-restore --noflush lines turning old into new.
+
+        Wrapped chains are ours alone, so a changed one is flushed by
+        redeclaring it and its rules are written again. Other chains may hold
+        rules of other components, so only our added and removed rules are
+        inserted or deleted there.
+
+        """
+        old_chains, old_rules = old
+        new_chains, new_rules = new
+        declares, creates, deletes, adds, removes = [], [], [], [], []
+
+        for chain in sorted(set(old_chains) | set(new_chains) |
+                            set(old_rules) | set(new_rules)):
+            before = old_rules.get(chain, [])
+            after = new_rules.get(chain, [])
+            wrapped = new_chains.get(chain, old_chains.get(chain))
+            if chain in new_chains and chain not in old_chains:
+                if wrapped:
+                    declares.append(':%s - [0:0]' % chain)
+                else:
+                    creates.append('-N %s' % chain)
+            elif chain in old_chains and chain not in new_chains:
+                removes.append('-X %s' % chain)
+
+            if wrapped:
+                if before != after and chain in old_chains:
+                    # Redeclaring an existing chain flushes it
+                    declares.append(':%s - [0:0]' % chain)
+                if before != after or chain not in old_chains:
+                    adds += ['-A %s %s' % (chain, rule)
+                             for rule, _top in after]
+            else:
+                deletes += ['-D %s %s' % (chain, rule)
+                            for rule, top in before
+                            if (rule, top) not in after]
+                added = [(rule, top) for rule, top in after
+                         if (rule, top) not in before]
+                adds += ['-I %s 1 %s' % (chain, rule)
+                         for rule, top in reversed(added) if top]
+                adds += ['-A %s %s' % (chain, rule)
+                         for rule, top in added if not top]
+
+        return declares + creates + deletes + adds + removes
 
     def _find_table(self, lines, table_name):
         if len(lines) < 3:
@@ -31,6 +31,23 @@ from neutron.plugins.openvswitch.common import constants
 LOG = logging.getLogger(__name__)
 
 
+def ovsdb_value_from_json(value):
+    """Convert a value of the ovsdb JSON format to a python value.
+
+    Maps become dicts, sets become lists and an empty set, used for
+    missing optional values, becomes None.
+    """
+    if isinstance(value, list):
+        kind, items = value
+        if kind == 'map':
+            return dict(items)
+        if kind == 'set':
+            return [ovsdb_value_from_json(item) for item in items] or None
+        # 'uuid' or 'named-uuid'
+        return items
+    return value
+
+
 class VifPort:
     def __init__(self, port_name, ofport, vif_id, vif_mac, switch):
         self.port_name = port_name
@@ -92,23 +109,9 @@ class OVSBridge(BaseOVS):
     def __init__(self, br_name, root_helper):
         super(OVSBridge, self).__init__(root_helper)
         self.br_name = br_name
-        self.re_id = self.re_compile_id()
         self.defer_apply_flows = False
         self.deferred_flows = {'add': '', 'mod': '', 'del': ''}
 
-    def re_compile_id(self):
-        external = 'external_ids\s*'
-        mac = 'attached-mac="(?P<vif_mac>([a-fA-F\d]{2}:){5}([a-fA-F\d]{2}))"'
-        iface = 'iface-id="(?P<vif_id>[^"]+)"'
-        name = 'name\s*:\s"(?P<port_name>[^"]*)"'
-        port = 'ofport\s*:\s(?P<ofport>-?\d+)'
-        _re = ('%(external)s:\s{ ( %(mac)s,? | %(iface)s,? | . )* }'
-               ' \s+ %(name)s \s+ %(port)s' % {'external': external,
-                                               'mac': mac,
-                                               'iface': iface, 'name': name,
-                                               'port': port})
-        return re.compile(_re, re.M | re.X)
-
     def create(self):
         self.add_bridge(self.br_name)
 
@@ -310,68 +313,78 @@ class OVSBridge(BaseOVS):
             LOG.error(_("Unable to execute %(cmd)s. Exception: %(exception)s"),
                       {'cmd': args, 'exception': e})
 
+    def _db_rows(self, args):
+        result = self.run_vsctl(['--format=json', '--'] + args)
+        if not result:
+            return []
+        result = jsonutils.loads(result)
+        headings = result['headings']
+        return [dict((heading, ovsdb_value_from_json(value))
+                     for heading, value in zip(headings, row))
+                for row in result['data']]
+
+    def db_list(self, table, columns):
+        """Return the given columns of all the rows of a table as dicts."""
+        return self._db_rows(['--columns=%s' % ','.join(columns),
+                              'list', table])
+
+    def db_find(self, table, columns, *conditions):
+        """Return the given columns of the rows matching the conditions."""
+        return self._db_rows(['--columns=%s' % ','.join(columns),
+                              'find', table] + list(conditions))
+
+    def _vif_port_from_row(self, row):
+        external_ids = row['external_ids'] or {}
+        if "attached-mac" not in external_ids:
+            return
+        if "iface-id" in external_ids:
+            vif_id = external_ids["iface-id"]
+        elif "xs-vif-uuid" in external_ids:
+            # if this is a xenserver and iface-id is not automatically
+            # synced to OVS from XAPI, we grab it from XAPI directly
+            vif_id = self.get_xapi_iface_id(external_ids["xs-vif-uuid"])
+        else:
+            return
+        # ofport is not set until the interface is created
+        ofport = row['ofport']
+        if ofport is None:
+            ofport = -1
+        return VifPort(row['name'], ofport, vif_id,
+                       external_ids["attached-mac"], self)
+
     # returns a VIF object for each VIF port
     def get_vif_ports(self):
-        edge_ports = []
-        port_names = self.get_port_name_list()
-        for name in port_names:
-            external_ids = self.db_get_map("Interface", name, "external_ids")
-            ofport = self.db_get_val("Interface", name, "ofport")
-            if "iface-id" in external_ids and "attached-mac" in external_ids:
-                p = VifPort(name, ofport, external_ids["iface-id"],
-                            external_ids["attached-mac"], self)
-                edge_ports.append(p)
-            elif ("xs-vif-uuid" in external_ids and
-                  "attached-mac" in external_ids):
-                # if this is a xenserver and iface-id is not automatically
-                # synced to OVS from XAPI, we grab it from XAPI directly
-                iface_id = self.get_xapi_iface_id(external_ids["xs-vif-uuid"])
-                p = VifPort(name, ofport, iface_id,
-                            external_ids["attached-mac"], self)
-                edge_ports.append(p)
+        """Return the VIF ports of the bridge.
 
+        The interfaces of the bridge are read at once rather than one
+        ovs-vsctl call per column and interface.
+        """
+        port_names = set(self.get_port_name_list())
+        edge_ports = []
+        for row in self.db_list('Interface',
+                                ['name', 'external_ids', 'ofport']):
+            if row['name'] not in port_names:
+                continue
+            port = self._vif_port_from_row(row)
+            if port:
+                edge_ports.append(port)
         return edge_ports
 
     def get_vif_port_set(self):
-        port_names = self.get_port_name_list()
-        edge_ports = set()
-        args = ['--format=json', '--', '--columns=name,external_ids',
-                'list', 'Interface']
-        result = self.run_vsctl(args)
-        if not result:
-            return edge_ports
-        for row in jsonutils.loads(result)['data']:
-            name = row[0]
-            if name not in port_names:
-                continue
-            external_ids = dict(row[1][1])
-            if "iface-id" in external_ids and "attached-mac" in external_ids:
-                edge_ports.add(external_ids['iface-id'])
-            elif ("xs-vif-uuid" in external_ids and
-                  "attached-mac" in external_ids):
-                # if this is a xenserver and iface-id is not automatically
-                # synced to OVS from XAPI, we grab it from XAPI directly
-                iface_id = self.get_xapi_iface_id(external_ids["xs-vif-uuid"])
-                edge_ports.add(iface_id)
-        return edge_ports
+        return set(port.vif_id for port in self.get_vif_ports())
+
+    def get_vif_ports_by_ids(self, port_ids):
+        """Return a dict of the VIF ports of the bridge with the given ids."""
+        port_ids = set(port_ids)
+        return dict((port.vif_id, port) for port in self.get_vif_ports()
+                    if port.vif_id in port_ids)
 
     def get_vif_port_by_id(self, port_id):
-        args = ['--', '--columns=external_ids,name,ofport',
-                'find', 'Interface',
-                'external_ids:iface-id="%s"' % port_id]
-        result = self.run_vsctl(args)
-        if not result:
-            return
-        match = self.re_id.search(result)
-        try:
-            vif_mac = match.group('vif_mac')
-            vif_id = match.group('vif_id')
-            port_name = match.group('port_name')
-            ofport = int(match.group('ofport'))
-            return VifPort(port_name, ofport, vif_id, vif_mac, self)
-        except Exception as e:
-            LOG.info(_("Unable to parse regex results. Exception: %s"), e)
-            return
+        rows = self.db_find('Interface', ['name', 'external_ids', 'ofport'],
+                            'external_ids:iface-id="%s"' % port_id)
+        for row in rows:
+            if row['ofport'] is not None:
+                return self._vif_port_from_row(row)
 
     def delete_ports(self, all_ports=False):
         if all_ports:
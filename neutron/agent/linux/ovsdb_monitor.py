@@ -17,11 +17,19 @@
 import eventlet
 
 from neutron.agent.linux import async_process
+from neutron.agent.linux import ovs_lib
+from neutron.openstack.common import jsonutils
 from neutron.openstack.common import log as logging
 
 
 LOG = logging.getLogger(__name__)
 
+# Row actions reported by 'ovsdb-client monitor'
+OVSDB_ACTION_INITIAL = 'initial'
+OVSDB_ACTION_INSERT = 'insert'
+OVSDB_ACTION_DELETE = 'delete'
+OVSDB_ACTION_NEW = 'new'
+
 
 class OvsdbMonitor(async_process.AsyncProcess):
     """Manages an invocation of 'ovsdb-client monitor'."""
@@ -61,23 +69,35 @@ class OvsdbMonitor(async_process.AsyncProcess):
             # stop the monitor.
 
 
+def _new_events():
+    return {'added': [], 'removed': [], 'modified': []}
+
+
 class SimpleInterfaceMonitor(OvsdbMonitor):
     """Monitors the Interface table of the local host's ovsdb for changes.
 
     The has_updates() method indicates whether changes to the ovsdb
     Interface table have been detected since the monitor started or
     since the previous access.
+
+    The changes themselves are returned by get_events(), as dicts of the
+    name, ofport and external_ids of the added, removed and modified
+    interfaces.
     """
 
     def __init__(self, root_helper=None, respawn_interval=None):
         super(SimpleInterfaceMonitor, self).__init__(
             'Interface',
-            columns=['name'],
+            columns=['name', 'ofport', 'external_ids'],
             format='json',
             root_helper=root_helper,
             respawn_interval=respawn_interval,
         )
         self.data_received = False
+        self.new_events = _new_events()
+        # Whether changes may have been missed since the last call to
+        # get_events(), e.g. because the monitor was restarted.
+        self.events_lost = True
 
     @property
     def is_active(self):
@@ -94,7 +114,61 @@ class SimpleInterfaceMonitor(OvsdbMonitor):
         the absence of updates at the expense of potential false
         positives.
         """
-        return bool(list(self.iter_stdout())) or not self.is_active
+        output_read = self.process_events()
+        return (output_read or any(self.new_events.values()) or
+                not self.is_active)
+
+    def process_events(self):
+        """Parse the output of the monitor into pending events.
+
+        Returns whether any output was read.
+        """
+        output_read = False
+        for line in self.iter_stdout():
+            output_read = True
+            try:
+                update = jsonutils.loads(line)
+                headings = update['headings']
+                rows = [dict(zip(headings, row)) for row in update['data']]
+            except (ValueError, KeyError, TypeError):
+                LOG.warn(_('Unable to parse ovsdb monitor output: %s'), line)
+                self.events_lost = True
+                continue
+            for row in rows:
+                action = row.get('action')
+                if action in (OVSDB_ACTION_INITIAL, OVSDB_ACTION_INSERT):
+                    event_type = 'added'
+                elif action == OVSDB_ACTION_DELETE:
+                    event_type = 'removed'
+                elif action == OVSDB_ACTION_NEW:
+                    event_type = 'modified'
+                else:
+                    # 'old' rows only hold the previous value of the
+                    # modified columns
+                    continue
+                decode = ovs_lib.ovsdb_value_from_json
+                self.new_events[event_type].append(
+                    {'name': row.get('name'),
+                     'ofport': decode(row.get('ofport')),
+                     'external_ids': decode(row.get('external_ids')) or {}})
+        return output_read
+
+    def get_events(self):
+        """Return and clear the interface changes seen so far.
+
+        None is returned instead when changes may have been missed, which
+        happens until the monitor has reported the initial content of the
+        Interface table and after a restart of the monitor. The caller then
+        has to list the interfaces itself.
+        """
+        self.process_events()
+        events, self.new_events = self.new_events, _new_events()
+        if self.events_lost or not self.is_active:
+            # The initial content reported by the (re)started monitor
+            # reflects a state at least as old as the caller's listing.
+            self.events_lost = not self.is_active
+            return
+        return events
 
     def start(self, block=False, timeout=5):
         super(SimpleInterfaceMonitor, self).start()
@@ -105,6 +179,7 @@ class SimpleInterfaceMonitor(OvsdbMonitor):
 
     def _kill(self, *args, **kwargs):
         self.data_received = False
+        self.events_lost = True
         super(SimpleInterfaceMonitor, self)._kill(*args, **kwargs)
 
     def _read_stdout(self):
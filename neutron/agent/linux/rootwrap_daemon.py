@@ -0,0 +1,367 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Long-lived root wrapper running the commands of an agent.
+
+neutron-rootwrap forks a python interpreter and loads the filters for each
+command. The daemon started by RootwrapDaemonClient loads them once, checks
+the commands received on a UNIX socket against the same filters and runs
+the matching ones.
+
+To use it, let the agent user run the daemon as root in sudoers:
+neutron ALL = (root) NOPASSWD: /usr/bin/neutron-rootwrap-daemon
+                                /etc/neutron/rootwrap.conf
+
+and set in the [AGENT] section of the agent configuration:
+root_helper_daemon = sudo neutron-rootwrap-daemon /etc/neutron/rootwrap.conf
+
+The daemon prints the address of its socket and the key that clients have
+to send first, then serves until its standard input is closed, i.e. until
+the agent which started it exits. The socket is only accessible to the
+user running sudo.
+
+This module only depends on the standard library and on the rootwrap
+filters, to keep the code running as root to a minimum.
+"""
+
+from __future__ import print_function
+
+import ConfigParser
+import json
+import logging
+import os
+import pwd
+import shlex
+import shutil
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+
+from neutron.openstack.common.rootwrap import cmd as rootwrap_cmd
+from neutron.openstack.common.rootwrap import wrapper
+
+
+HEADER = struct.Struct('!I')
+
+
+def _subprocess_setup():
+    # Python installs a SIGPIPE handler by default. This is usually not what
+    # non-Python subprocesses expect.
+    signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+
+
+def _encode(data):
+    # Arguments and outputs are byte strings, carried through JSON as
+    # latin-1 to keep every byte.
+    if data is None:
+        return
+    if isinstance(data, list):
+        return [_encode(item) for item in data]
+    return str(data).decode('latin-1')
+
+
+def _decode(data):
+    if data is None:
+        return
+    if isinstance(data, list):
+        return [_decode(item) for item in data]
+    return data.encode('latin-1')
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            return
+        chunks.append(chunk)
+        size -= len(chunk)
+    return ''.join(chunks)
+
+
+def send_message(sock, message):
+    payload = json.dumps(message)
+    sock.sendall(HEADER.pack(len(payload)) + payload)
+
+
+def recv_message(sock):
+    """Return the next message, or None when the connection is closed."""
+    header = _recv_exactly(sock, HEADER.size)
+    if header is None:
+        return
+    payload = _recv_exactly(sock, HEADER.unpack(header)[0])
+    if payload is None:
+        return
+    return json.loads(payload)
+
+
+def _same_key(key, expected):
+    # Constant time comparison of the keys
+    if not isinstance(key, basestring) or len(key) != len(expected):
+        return False
+    result = 0
+    for a, b in zip(key, expected):
+        result |= ord(a) ^ ord(b)
+    return result == 0
+
+
+class RootwrapDaemon(object):
+    """Run the commands received on a UNIX socket through the filters."""
+
+    def __init__(self, execname, config, filters):
+        self.execname = execname
+        self.config = config
+        self.filters = filters
+        self.authkey = os.urandom(32).encode('hex')
+        self.sock = None
+        # connection -> thread serving it
+        self.connections = {}
+        self.lock = threading.Lock()
+
+    def execute(self, userargs, process_input=None):
+        """Run a command if it matches a filter.
+
+        Returns the exit code, stdout and stderr of the command, or the
+        exit code and message of neutron-rootwrap when it is refused.
+        """
+        try:
+            filtermatch = wrapper.match_filter(
+                self.filters, userargs, exec_dirs=self.config.exec_dirs)
+            command = filtermatch.get_command(
+                userargs, exec_dirs=self.config.exec_dirs)
+            if self.config.use_syslog:
+                logging.info("(%s > %s) Executing %s (filter match = %s)" % (
+                    rootwrap_cmd._getlogin(), pwd.getpwuid(os.getuid())[0],
+                    command, filtermatch.name))
+            obj = subprocess.Popen(command,
+                                   stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE,
+                                   close_fds=True,
+                                   preexec_fn=_subprocess_setup,
+                                   env=filtermatch.get_environment(userargs))
+            stdout, stderr = obj.communicate(process_input)
+            return obj.returncode, stdout, stderr
+        except wrapper.FilterMatchNotExecutable as exc:
+            msg = ("Executable not found: %s (filter match = %s)"
+                   % (exc.match.exec_path, exc.match.name))
+            return self._error(msg, rootwrap_cmd.RC_NOEXECFOUND)
+        except wrapper.NoFilterMatched:
+            msg = ("Unauthorized command: %s (no filter matched)"
+                   % ' '.join(userargs))
+            return self._error(msg, rootwrap_cmd.RC_UNAUTHORIZED)
+        except OSError as exc:
+            msg = "Unable to run %s: %s" % (' '.join(userargs), exc)
+            return self._error(msg, rootwrap_cmd.RC_NOEXECFOUND)
+
+    def _error(self, message, returncode):
+        if self.config.use_syslog:
+            logging.error(message)
+        return returncode, '', '%s: %s\n' % (self.execname, message)
+
+    def _serve_connection(self, conn):
+        try:
+            request = recv_message(conn)
+            if not request or not _same_key(request.get('authkey'),
+                                            self.authkey):
+                return
+            while True:
+                request = recv_message(conn)
+                if request is None:
+                    return
+                returncode, stdout, stderr = self.execute(
+                    _decode(request['cmd']), _decode(request.get('stdin')))
+                send_message(conn, {'returncode': returncode,
+                                    'stdout': _encode(stdout),
+                                    'stderr': _encode(stderr)})
+        except (socket.error, ValueError, KeyError, TypeError):
+            pass
+        finally:
+            with self.lock:
+                self.connections.pop(conn, None)
+            conn.close()
+
+    def _close_connections(self):
+        # Let the threads serving the clients finish before exiting
+        with self.lock:
+            connections = self.connections.items()
+        for conn, thread in connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+            thread.join()
+
+    def _wait_for_parent(self):
+        # The standard input is closed when the client exits
+        while sys.stdin.read(4096):
+            pass
+        self.sock.shutdown(socket.SHUT_RDWR)
+        self.sock.close()
+
+    def run(self):
+        sock_dir = tempfile.mkdtemp(prefix='neutron-rootwrap-')
+        try:
+            address = os.path.join(sock_dir, 'rootwrap.sock')
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.bind(address)
+            # Only the user running sudo may connect
+            uid = int(os.environ.get('SUDO_UID', os.getuid()))
+            gid = int(os.environ.get('SUDO_GID', os.getgid()))
+            os.chown(sock_dir, uid, gid)
+            os.chmod(sock_dir, 0o700)
+            self.sock.listen(16)
+
+            print(json.dumps({'address': address, 'authkey': self.authkey}))
+            sys.stdout.flush()
+
+            watcher = threading.Thread(target=self._wait_for_parent)
+            watcher.daemon = True
+            watcher.start()
+            while True:
+                try:
+                    conn, _addr = self.sock.accept()
+                except socket.error:
+                    # The socket was closed by _wait_for_parent
+                    return
+                thread = threading.Thread(target=self._serve_connection,
+                                          args=(conn,))
+                thread.daemon = True
+                with self.lock:
+                    self.connections[conn] = thread
+                thread.start()
+        finally:
+            self._close_connections()
+            shutil.rmtree(sock_dir, ignore_errors=True)
+
+
+def main():
+    execname = sys.argv.pop(0)
+    if len(sys.argv) != 1:
+        rootwrap_cmd._exit_error(execname, "No configuration file specified",
+                                 rootwrap_cmd.RC_BADCONFIG, log=False)
+    configfile = sys.argv[0]
+
+    try:
+        rawconfig = ConfigParser.RawConfigParser()
+        rawconfig.read(configfile)
+        config = wrapper.RootwrapConfig(rawconfig)
+    except ValueError as exc:
+        msg = "Incorrect value in %s: %s" % (configfile, exc.message)
+        rootwrap_cmd._exit_error(execname, msg, rootwrap_cmd.RC_BADCONFIG,
+                                 log=False)
+    except ConfigParser.Error:
+        rootwrap_cmd._exit_error(
+            execname, "Incorrect configuration file: %s" % configfile,
+            rootwrap_cmd.RC_BADCONFIG, log=False)
+
+    if config.use_syslog:
+        wrapper.setup_syslog(execname,
+                             config.syslog_log_facility,
+                             config.syslog_log_level)
+
+    filters = wrapper.load_filters(config.filters_path)
+    RootwrapDaemon(os.path.basename(execname), config, filters).run()
+
+
+class RootwrapDaemonClient(object):
+    """Run commands through a rootwrap daemon started on first use.
+
+    The connections to the daemon are kept open and reused by the
+    following commands. A daemon which died is started again.
+    """
+
+    def __init__(self, daemon_cmd):
+        self.daemon_cmd = daemon_cmd
+        self._process = None
+        self._address = None
+        self._authkey = None
+        self._idle_conns = []
+        self._lock = threading.Lock()
+
+    def _start_daemon(self):
+        for conn in self._idle_conns:
+            conn.close()
+        self._idle_conns = []
+        self._process = subprocess.Popen(shlex.split(self.daemon_cmd),
+                                         stdin=subprocess.PIPE,
+                                         stdout=subprocess.PIPE,
+                                         close_fds=True)
+        line = self._process.stdout.readline()
+        try:
+            info = json.loads(line)
+            self._address = info['address']
+            self._authkey = info['authkey']
+        except (ValueError, KeyError, TypeError):
+            self._process = None
+            raise RuntimeError(_("Unable to start rootwrap daemon with %s") %
+                               self.daemon_cmd)
+
+    def _stop_daemon(self):
+        with self._lock:
+            if self._process and self._process.poll() is None:
+                # The daemon runs as root, it exits once its stdin is closed
+                self._process.stdin.close()
+            self._process = None
+
+    def _get_connection(self):
+        with self._lock:
+            if self._process is None or self._process.poll() is not None:
+                self._start_daemon()
+            if self._idle_conns:
+                return self._idle_conns.pop()
+            address, authkey = self._address, self._authkey
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            conn.connect(address)
+            send_message(conn, {'authkey': authkey})
+        except socket.error:
+            conn.close()
+            raise
+        return conn
+
+    def execute(self, cmd, process_input=None):
+        """Run a command, returning its exit code, stdout and stderr."""
+        request = {'cmd': _encode(cmd), 'stdin': _encode(process_input)}
+        conn = None
+        try:
+            conn = self._get_connection()
+            send_message(conn, request)
+        except socket.error:
+            # The command was not sent: the daemon may have exited since
+            # the connection was opened, try again with a new daemon.
+            if conn:
+                conn.close()
+            self._stop_daemon()
+            conn = self._get_connection()
+            send_message(conn, request)
+        try:
+            result = recv_message(conn)
+        except socket.error:
+            result = None
+        if result is None:
+            conn.close()
+            raise RuntimeError(_("Connection to rootwrap daemon lost while "
+                                 "running %s") % cmd)
+        with self._lock:
+            self._idle_conns.append(conn)
+        return (result['returncode'], _decode(result['stdout']),
+                _decode(result['stderr']))
@@ -26,13 +26,32 @@ import tempfile
 
 from eventlet.green import subprocess
 from eventlet import greenthread
+from oslo.config import cfg
 
+from neutron.agent.linux import rootwrap_daemon
 from neutron.common import utils
 from neutron.openstack.common import log as logging
 
 
 LOG = logging.getLogger(__name__)
 
+# Root helper daemon clients, by daemon command
+_rootwrap_clients = {}
+
+
+def get_rootwrap_client():
+    """Return the client of the configured root helper daemon, if any."""
+    try:
+        daemon_cmd = cfg.CONF.AGENT.root_helper_daemon
+    except (cfg.NoSuchOptError, cfg.NoSuchGroupError):
+        return
+    if not daemon_cmd:
+        return
+    if daemon_cmd not in _rootwrap_clients:
+        _rootwrap_clients[daemon_cmd] = (
+            rootwrap_daemon.RootwrapDaemonClient(daemon_cmd))
+    return _rootwrap_clients[daemon_cmd]
+
 
 def create_process(cmd, root_helper=None, addl_env=None):
     """Create a process object for the given command.
@@ -61,17 +80,28 @@ def create_process(cmd, root_helper=None, addl_env=None):
 def execute(cmd, root_helper=None, process_input=None, addl_env=None,
             check_exit_code=True, return_stderr=False):
     try:
-        obj, cmd = create_process(cmd, root_helper=root_helper,
-                                  addl_env=addl_env)
-        _stdout, _stderr = (process_input and
-                            obj.communicate(process_input) or
-                            obj.communicate())
-        obj.stdin.close()
+        # The environment of the command can not be passed to the daemon
+        rootwrap_client = (root_helper and not addl_env and
+                           get_rootwrap_client())
+        if rootwrap_client:
+            cmd = map(str, cmd)
+            LOG.debug(_("Running command through root helper daemon: %s"),
+                      cmd)
+            returncode, _stdout, _stderr = rootwrap_client.execute(
+                cmd, process_input)
+        else:
+            obj, cmd = create_process(cmd, root_helper=root_helper,
+                                      addl_env=addl_env)
+            _stdout, _stderr = (process_input and
+                                obj.communicate(process_input) or
+                                obj.communicate())
+            obj.stdin.close()
+            returncode = obj.returncode
         m = _("\nCommand: %(cmd)s\nExit code: %(code)s\nStdout: %(stdout)r\n"
-              "Stderr: %(stderr)r") % {'cmd': cmd, 'code': obj.returncode,
+              "Stderr: %(stderr)r") % {'cmd': cmd, 'code': returncode,
                                        'stdout': _stdout, 'stderr': _stderr}
         LOG.debug(m)
-        if obj.returncode and check_exit_code:
+        if returncode and check_exit_code:
             raise RuntimeError(m)
     finally:
         # NOTE(termie): this appears to be necessary to let the subprocess
@@ -16,13 +16,16 @@
 #
 # @author: Mark McClain, DreamHost
 
+import collections
 import hashlib
 import hmac
 import os
 import socket
+import time
 import urlparse
 
 import eventlet
+import eventlet.pools
 import httplib2
 from neutronclient.v2_0 import client
 from oslo.config import cfg
@@ -37,6 +40,7 @@ from neutron.common import utils
 from neutron import context
 from neutron.openstack.common import log as logging
 from neutron.openstack.common import loopingcall
+from neutron.openstack.common.rpc import dispatcher
 from neutron import wsgi
 
 LOG = logging.getLogger(__name__)
@@ -44,7 +48,55 @@ LOG = logging.getLogger(__name__)
 DEVICE_OWNER_ROUTER_INTF = "network:router_interface"
 
 
+class InstanceLookupCache(object):
+    """LRU cache of the ports found for the metadata requests.
+
+    Entries are keyed by the network or router id and the source IP of the
+    requests, and expire ttl seconds after they were looked up. The least
+    recently used entries are dropped beyond size entries.
+    """
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self._entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the port cached for key, None if missing or expired."""
+        entry = self._entries.pop(key, None)
+        if entry and entry[0] > time.time():
+            self._entries[key] = entry
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+
+    def set(self, key, port):
+        self._entries.pop(key, None)
+        self._entries[key] = (time.time() + self.ttl, port)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, port_id, ip_addresses=(), resource_ids=()):
+        """Drop the entries of a port.
+
+        The entries of its addresses and of its network or router are
+        dropped too, as the addresses of the port may have changed.
+        """
+        for key, (_expiry, port) in self._entries.items():
+            if (port['id'] == port_id or key[1] in ip_addresses or
+                    key[0] in resource_ids):
+                del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
+
+
 class MetadataProxyHandler(object):
+    # Consumes the port notifications sent to the L2 agents
+    RPC_API_VERSION = '1.1'
+
     OPTS = [
         cfg.StrOpt('admin_user',
                    help=_("Admin user")),
@@ -71,12 +123,31 @@ class MetadataProxyHandler(object):
         cfg.StrOpt('metadata_proxy_shared_secret',
                    default='',
                    help=_('Shared secret to sign instance-id request'),
-                   secret=True)
+                   secret=True),
+        cfg.IntOpt('metadata_cache_ttl', default=5,
+                   help=_("Seconds during which the instance found for the "
+                          "address of a request is cached; 0 disables the "
+                          "cache.")),
+        cfg.IntOpt('metadata_cache_size', default=1000,
+                   help=_("Maximum number of instances cached.")),
+        cfg.IntOpt('nova_metadata_pool_size', default=16,
+                   help=_("Maximum number of keep-alive connections to the "
+                          "Nova metadata server."))
     ]
 
     def __init__(self, conf):
         self.conf = conf
         self.auth_info = {}
+        if conf.metadata_cache_ttl > 0 and conf.metadata_cache_size > 0:
+            self.cache = InstanceLookupCache(conf.metadata_cache_size,
+                                             conf.metadata_cache_ttl)
+        else:
+            self.cache = None
+        self._http_pool = eventlet.pools.Pool(
+            max_size=conf.nova_metadata_pool_size, create=self._create_http)
+
+    def _create_http(self):
+        return httplib2.Http()
 
     def _get_neutron_client(self):
         qclient = client.Client(
@@ -110,12 +181,17 @@ class MetadataProxyHandler(object):
             return webob.exc.HTTPInternalServerError(explanation=unicode(msg))
 
     def _get_instance_and_tenant_id(self, req):
-        qclient = self._get_neutron_client()
-
         remote_address = req.headers.get('X-Forwarded-For')
         network_id = req.headers.get('X-Neutron-Network-ID')
         router_id = req.headers.get('X-Neutron-Router-ID')
 
+        key = (network_id or router_id, remote_address)
+        if self.cache:
+            port = self.cache.get(key)
+            if port:
+                return port['device_id'], port['tenant_id']
+
+        qclient = self._get_neutron_client()
         if network_id:
             networks = [network_id]
         else:
@@ -131,9 +207,25 @@ class MetadataProxyHandler(object):
 
         self.auth_info = qclient.get_auth_info()
         if len(ports) == 1:
+            if self.cache:
+                self.cache.set(key, {'id': ports[0].get('id'),
+                                     'device_id': ports[0]['device_id'],
+                                     'tenant_id': ports[0]['tenant_id']})
             return ports[0]['device_id'], ports[0]['tenant_id']
         return None, None
 
+    def port_update(self, context, **kwargs):
+        port = kwargs['port']
+        if self.cache:
+            ip_addresses = [fixed_ip['ip_address']
+                            for fixed_ip in port.get('fixed_ips', [])]
+            self.cache.invalidate(port['id'], ip_addresses,
+                                  [port['network_id'], port['device_id']])
+
+    def port_delete(self, context, **kwargs):
+        if self.cache:
+            self.cache.invalidate(kwargs['port_id'])
+
     def _proxy_request(self, instance_id, tenant_id, req):
         headers = {
             'X-Forwarded-For': req.headers.get('X-Forwarded-For'),
@@ -150,9 +242,9 @@ class MetadataProxyHandler(object):
             req.query_string,
             ''))
 
-        h = httplib2.Http()
-        resp, content = h.request(url, method=req.method, headers=headers,
-                                  body=req.body)
+        with self._http_pool.item() as h:
+            resp, content = h.request(url, method=req.method,
+                                      headers=headers, body=req.body)
 
         if resp.status == 200:
             LOG.debug(str(resp))
@@ -268,10 +360,18 @@ class UnixDomainMetadataProxy(object):
             return
         self.agent_state.pop('start_flag', None)
 
+    def _init_port_notifications(self, handler):
+        # The cached entries of the ports updated or deleted are dropped
+        self.connection = agent_rpc.create_consumers(
+            dispatcher.RpcDispatcher([handler]), topics.AGENT,
+            [[topics.PORT, topics.UPDATE], [topics.PORT, topics.DELETE]])
+
     def run(self):
+        handler = MetadataProxyHandler(self.conf)
+        if handler.cache:
+            self._init_port_notifications(handler)
         server = UnixDomainWSGIServer('neutron-metadata-agent')
-        server.start(MetadataProxyHandler(self.conf),
-                     self.conf.metadata_proxy_socket)
+        server.start(handler, self.conf.metadata_proxy_socket)
         server.wait()
 
 
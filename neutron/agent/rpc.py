@@ -17,11 +17,12 @@
 
 import itertools
 
+from neutron.common import rpc as n_rpc
 from neutron.common import topics
 
 from neutron.openstack.common import log as logging
 from neutron.openstack.common import rpc
-from neutron.openstack.common.rpc import proxy
+from neutron.openstack.common.rpc import common as rpc_common
 from neutron.openstack.common import timeutils
 
 
@@ -56,7 +57,7 @@ def create_consumers(dispatcher, prefix, topic_details):
     return connection
 
 
-class PluginReportStateAPI(proxy.RpcProxy):
+class PluginReportStateAPI(n_rpc.RpcProxy):
     BASE_RPC_API_VERSION = '1.0'
 
     def __init__(self, topic):
@@ -74,19 +75,68 @@ class PluginReportStateAPI(proxy.RpcProxy):
             return self.cast(context, msg, topic=self.topic)
 
 
-class PluginApi(proxy.RpcProxy):
+class PluginApi(n_rpc.RpcProxy):
     '''Agent side of the rpc API.
 
     API version history:
         1.0 - Initial version.
+        1.2 - Added get_devices_details_list, update_devices_up and
+              update_devices_down.
 
     '''
 
     BASE_RPC_API_VERSION = '1.1'
+    BULK_RPC_API_VERSION = '1.2'
 
     def __init__(self, topic):
         super(PluginApi, self).__init__(
             topic=topic, default_version=self.BASE_RPC_API_VERSION)
+        # None until the first bulk call tells us whether the server
+        # implements the 1.2 bulk device methods.
+        self.bulk_supported = None
+
+    def _is_bulk_unsupported(self, e, method):
+        if isinstance(e, rpc_common.UnsupportedRpcVersion):
+            return True
+        # The dispatcher of a server without the bulk methods raises an
+        # AttributeError naming the method. It comes back as such, or as a
+        # RemoteError when the builtin exceptions may not be deserialized;
+        # any other AttributeError is a failure of the bulk method itself.
+        if isinstance(e, rpc_common.RemoteError):
+            if e.exc_type == 'UnsupportedRpcVersion':
+                return True
+            if e.exc_type != 'AttributeError':
+                return False
+            message = e.value or ''
+        elif isinstance(e, AttributeError):
+            message = str(e)
+        else:
+            return False
+        return message.startswith("No such RPC function '%s'" % method)
+
+    def _call_bulk(self, context, method, fallback, devices, **kwargs):
+        """Issue a bulk device call, falling back to per-device calls.
+
+        The first call probes the server; if it does not advertise the bulk
+        methods, every later call goes straight to the per-device fallback.
+        """
+        if self.bulk_supported is not False:
+            try:
+                result = self.call(context,
+                                   self.make_msg(method, devices=devices,
+                                                 **kwargs),
+                                   topic=self.topic,
+                                   version=self.BULK_RPC_API_VERSION)
+                self.bulk_supported = True
+                return result
+            except (rpc_common.UnsupportedRpcVersion,
+                    rpc_common.RemoteError, AttributeError) as e:
+                if not self._is_bulk_unsupported(e, method):
+                    raise
+                LOG.info(_("Server does not support %s, falling back to "
+                           "per-device RPC calls"), method)
+                self.bulk_supported = False
+        return [fallback(context, device, **kwargs) for device in devices]
 
     def get_device_details(self, context, device, agent_id):
         return self.call(context,
@@ -94,6 +144,11 @@ class PluginApi(proxy.RpcProxy):
                                        agent_id=agent_id),
                          topic=self.topic)
 
+    def get_devices_details_list(self, context, devices, agent_id):
+        return self._call_bulk(context, 'get_devices_details_list',
+                               self.get_device_details, devices,
+                               agent_id=agent_id)
+
     def update_device_down(self, context, device, agent_id, host=None):
         return self.call(context,
                          self.make_msg('update_device_down', device=device,
@@ -106,6 +161,16 @@ class PluginApi(proxy.RpcProxy):
                                        agent_id=agent_id, host=host),
                          topic=self.topic)
 
+    def update_devices_down(self, context, devices, agent_id, host=None):
+        return self._call_bulk(context, 'update_devices_down',
+                               self.update_device_down, devices,
+                               agent_id=agent_id, host=host)
+
+    def update_devices_up(self, context, devices, agent_id, host=None):
+        return self._call_bulk(context, 'update_devices_up',
+                               self.update_device_up, devices,
+                               agent_id=agent_id, host=host)
+
     def tunnel_sync(self, context, tunnel_ip, tunnel_type=None):
         return self.call(context,
                          self.make_msg('tunnel_sync', tunnel_ip=tunnel_ip,
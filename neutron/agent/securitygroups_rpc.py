@@ -16,20 +16,32 @@
 #    under the License.
 #
 
+import netaddr
 from oslo.config import cfg
 
 from neutron.common import topics
 from neutron.openstack.common import importutils
 from neutron.openstack.common import log as logging
+from neutron.openstack.common.rpc import common as rpc_common
 
 LOG = logging.getLogger(__name__)
 SG_RPC_VERSION = "1.1"
+SG_INFO_RPC_VERSION = "1.3"
+
+DIRECTION_IP_PREFIX = {'ingress': 'source_ip_prefix',
+                       'egress': 'dest_ip_prefix'}
 
 security_group_opts = [
     cfg.StrOpt(
         'firewall_driver',
         default='neutron.agent.firewall.NoopFirewallDriver',
-        help=_('Driver for Security Groups Firewall'))
+        help=_('Driver for Security Groups Firewall')),
+    cfg.BoolOpt(
+        'enable_ipset',
+        default=False,
+        help=_('Match remote security group members with one ipset per '
+               'security group and ethertype instead of one iptables rule '
+               'per member, if the firewall driver supports it'))
 ]
 cfg.CONF.register_opts(security_group_opts, 'SECURITYGROUP')
 
@@ -57,6 +69,15 @@ class SecurityGroupServerRpcApiMixin(object):
                          version=SG_RPC_VERSION,
                          topic=self.topic)
 
+    def security_group_info_for_devices(self, context, devices):
+        LOG.debug(_("Get security group information "
+                    "for devices via rpc %r"), devices)
+        return self.call(context,
+                         self.make_msg('security_group_info_for_devices',
+                                       devices=devices),
+                         version=SG_INFO_RPC_VERSION,
+                         topic=self.topic)
+
 
 class SecurityGroupAgentRpcCallbackMixin(object):
     """A mix-in that enable SecurityGroup agent
@@ -106,18 +127,35 @@ class SecurityGroupAgentRpcMixin(object):
     """A mix-in that enable SecurityGroup agent
     support in agent implementations.
     """
-
-    def init_firewall(self):
+    # None until the first call tells us whether the server implements
+    # security_group_info_for_devices.
+    sg_info_supported = None
+    defer_refresh_firewall = False
+
+    def init_firewall(self, defer_refresh_firewall=False):
+        """Load the firewall driver.
+
+        :param defer_refresh_firewall: if True, the refreshes requested by
+            the server are recorded and only applied when the agent calls
+            refresh_pending_firewall from its polling loop, coalescing the
+            updates received in the meantime.
+        """
         firewall_driver = cfg.CONF.SECURITYGROUP.firewall_driver
         LOG.debug(_("Init firewall settings (driver=%s)"), firewall_driver)
         self.firewall = importutils.import_object(firewall_driver)
+        self.defer_refresh_firewall = defer_refresh_firewall
+        self.devices_to_refilter = set()
+        self.sg_members_to_update = set()
+        self.global_refresh_firewall = False
 
     def prepare_devices_filter(self, device_ids):
         if not device_ids:
             return
         LOG.info(_("Preparing filters for devices %s"), device_ids)
-        devices = self.plugin_rpc.security_group_rules_for_devices(
-            self.context, list(device_ids))
+        if self.defer_refresh_firewall:
+            # The rules fetched now include the pending updates
+            self.devices_to_refilter -= set(device_ids)
+        devices = self._get_devices_with_rules(device_ids)
         with self.firewall.defer_apply():
             for device in devices.values():
                 self.firewall.prepare_port_filter(device)
@@ -132,10 +170,36 @@ class SecurityGroupAgentRpcMixin(object):
     def security_groups_member_updated(self, security_groups):
         LOG.info(_("Security group "
                    "member updated %r"), security_groups)
+        if self.firewall.handles_remote_groups and self.sg_info_supported:
+            if self.defer_refresh_firewall:
+                self.sg_members_to_update |= set(security_groups)
+            else:
+                self._update_security_group_members(security_groups)
+            return
         self._security_group_updated(
             security_groups,
             'security_group_source_groups')
 
+    def _update_security_group_members(self, security_groups):
+        """Only update the members known to the firewall driver.
+
+        The port filters refer to the remote groups rather than to their
+        members, so they are left as they are.
+        """
+        sec_grp_set = set(security_groups)
+        device_ids = [device['device']
+                      for device in self.firewall.ports.values()
+                      if sec_grp_set & set(
+                          device.get('security_group_source_groups', []))]
+        if not device_ids:
+            return
+        info = self.plugin_rpc.security_group_info_for_devices(
+            self.context, device_ids)
+        for sg_id, member_ips in info['sg_member_ips'].iteritems():
+            if sg_id in sec_grp_set:
+                self.firewall.update_security_group_members(sg_id,
+                                                            member_ips)
+
     def _security_group_updated(self, security_groups, attribute):
         devices = []
         sec_grp_set = set(security_groups)
@@ -143,12 +207,67 @@ class SecurityGroupAgentRpcMixin(object):
             if sec_grp_set & set(device.get(attribute, [])):
                 devices.append(device)
 
-        if devices:
+        if not devices:
+            return
+        if self.defer_refresh_firewall:
+            self.devices_to_refilter |= set(d['device'] for d in devices)
+        else:
             self.refresh_firewall(devices)
 
     def security_groups_provider_updated(self):
         LOG.info(_("Provider rule updated"))
-        self.refresh_firewall()
+        if self.defer_refresh_firewall:
+            self.global_refresh_firewall = True
+        else:
+            self.refresh_firewall()
+
+    def firewall_refresh_needed(self):
+        return bool(self.global_refresh_firewall or self.devices_to_refilter or
+                    self.sg_members_to_update)
+
+    def refresh_pending_firewall(self):
+        """Apply the refreshes deferred since the previous call.
+
+        The devices updated several times, possibly by updates of different
+        security groups, are refreshed once. The rules of all the devices
+        and the members of the updated remote groups are fetched by one
+        call to the server and applied by one deferred apply of the
+        firewall. If the refresh fails, the whole firewall is refreshed by
+        the next call.
+        """
+        if not self.firewall_refresh_needed():
+            return
+        global_refresh = self.global_refresh_firewall
+        device_ids = self.devices_to_refilter
+        security_groups = self.sg_members_to_update
+        self.global_refresh_firewall = False
+        self.devices_to_refilter = set()
+        self.sg_members_to_update = set()
+        try:
+            if global_refresh:
+                self.refresh_firewall()
+                return
+            # Devices may have been removed since the update was received
+            device_ids = set(device_id for device_id in device_ids
+                             if device_id in self.firewall.ports)
+            # The members of the remote groups are updated by fetching the
+            # devices referring to them, whose filters are left as they are
+            member_device_ids = set(
+                device['device'] for device in self.firewall.ports.values()
+                if security_groups & set(
+                    device.get('security_group_source_groups', [])))
+            if not device_ids and not member_device_ids:
+                return
+            LOG.info(_("Refresh firewall rules of devices %s"), device_ids)
+            devices = self._get_devices_with_rules(device_ids |
+                                                   member_device_ids)
+            with self.firewall.defer_apply():
+                for device_id in device_ids:
+                    if device_id in devices:
+                        self.firewall.update_port_filter(devices[device_id])
+        except Exception:
+            self.global_refresh_firewall = True
+            raise
 
     def remove_devices_filter(self, device_ids):
         if not device_ids:
@@ -171,13 +290,77 @@ class SecurityGroupAgentRpcMixin(object):
         if not device_ids:
             LOG.info(_("No ports here to refresh firewall"))
             return
-        devices = self.plugin_rpc.security_group_rules_for_devices(
-            self.context, device_ids)
+        devices = self._get_devices_with_rules(device_ids)
         with self.firewall.defer_apply():
             for device in devices.values():
                 LOG.debug(_("Update port filter for %s"), device['device'])
                 self.firewall.update_port_filter(device)
 
+    def _get_devices_with_rules(self, device_ids):
+        """Fetch the devices along with their security group rules.
+
+        Servers supporting security_group_info_for_devices send the rules
+        once per security group, which are expanded here. Older servers
+        expand the rules of every device themselves.
+        """
+        if self.sg_info_supported is not False:
+            try:
+                info = self.plugin_rpc.security_group_info_for_devices(
+                    self.context, list(device_ids))
+                self.sg_info_supported = True
+                return self._expand_security_group_info(info)
+            except (rpc_common.UnsupportedRpcVersion,
+                    rpc_common.RemoteError) as e:
+                if (isinstance(e, rpc_common.RemoteError) and
+                        e.exc_type not in ('UnsupportedRpcVersion',
+                                           'AttributeError')):
+                    raise
+                LOG.info(_("Server does not support "
+                           "security_group_info_for_devices, falling back "
+                           "to security_group_rules_for_devices"))
+                self.sg_info_supported = False
+        return self.plugin_rpc.security_group_rules_for_devices(
+            self.context, list(device_ids))
+
+    def _expand_security_group_info(self, info):
+        """Build the rules of each device from the per group rules.
+
+        A remote group rule turns into one rule per member IP of the remote
+        group, leaving out the IPs of the device itself. Firewall drivers
+        handling remote groups get the members instead and the rule is kept
+        as it is.
+        """
+        security_groups = info['security_groups']
+        member_ips = info['sg_member_ips']
+        devices = info['devices']
+        expand = not self.firewall.handles_remote_groups
+        if not expand:
+            for sg_id, ips in member_ips.iteritems():
+                self.firewall.update_security_group_members(sg_id, ips)
+        for device in devices.values():
+            rules = []
+            for sg_id in device.get('security_groups', []):
+                for rule in security_groups.get(sg_id, []):
+                    remote_group_id = rule.get('remote_group_id')
+                    if not remote_group_id or not expand:
+                        rules.append(rule)
+                        continue
+                    direction_ip_prefix = DIRECTION_IP_PREFIX[
+                        rule['direction']]
+                    ips = member_ips.get(remote_group_id, {}).get(
+                        rule['ethertype'], [])
+                    for ip in ips:
+                        if ip in device.get('fixed_ips', []):
+                            continue
+                        ip_rule = rule.copy()
+                        ip_rule[direction_ip_prefix] = str(
+                            netaddr.IPNetwork(ip).cidr)
+                        rules.append(ip_rule)
+            # The provider rules come after the security group rules
+            device['security_group_rules'] = (
+                rules + device.get('security_group_rules', []))
+        return devices
+
 
 class SecurityGroupAgentRpcApiMixin(object):
 
@@ -186,25 +369,41 @@ class SecurityGroupAgentRpcApiMixin(object):
                                      topics.SECURITY_GROUP,
                                      topics.UPDATE)
 
-    def security_groups_rule_updated(self, context, security_groups):
+    def _notify_security_groups(self, context, msg, hosts):
+        """Cast the message to the agents of the hosts, or to all agents.
+
+        :param hosts: hosts whose agents are concerned, None if unknown.
+        """
+        topic = self._get_security_group_topic()
+        if hosts is None:
+            self.fanout_cast(context, msg, version=SG_RPC_VERSION,
+                             topic=topic)
+            return
+        for host in hosts:
+            self.cast(context, msg, version=SG_RPC_VERSION,
+                      topic='%s.%s' % (topic, host))
+
+    def security_groups_rule_updated(self, context, security_groups,
+                                     hosts=None):
         """Notify rule updated security groups."""
         if not security_groups:
             return
-        self.fanout_cast(context,
-                         self.make_msg('security_groups_rule_updated',
-                                       security_groups=security_groups),
-                         version=SG_RPC_VERSION,
-                         topic=self._get_security_group_topic())
-
-    def security_groups_member_updated(self, context, security_groups):
+        self._notify_security_groups(
+            context,
+            self.make_msg('security_groups_rule_updated',
+                          security_groups=security_groups),
+            hosts)
+
+    def security_groups_member_updated(self, context, security_groups,
+                                       hosts=None):
         """Notify member updated security groups."""
         if not security_groups:
             return
-        self.fanout_cast(context,
-                         self.make_msg('security_groups_member_updated',
-                                       security_groups=security_groups),
-                         version=SG_RPC_VERSION,
-                         topic=self._get_security_group_topic())
+        self._notify_security_groups(
+            context,
+            self.make_msg('security_groups_member_updated',
+                          security_groups=security_groups),
+            hosts)
 
     def security_groups_provider_updated(self, context):
         """Notify provider updated security groups."""
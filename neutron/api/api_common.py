@@ -174,6 +174,8 @@ def get_pagination_links(request, items, limit,
 
 class PaginationHelper(object):
 
+    limit = None
+
     def __init__(self, request, primary_key='id'):
         self.request = request
         self.primary_key = primary_key
@@ -208,6 +210,8 @@ class PaginationEmulatedHelper(PaginationHelper):
     def paginate(self, items):
         if not self.limit:
             return items
+        # The plugin may have returned a generator
+        items = list(items)
         i = -1
         if self.marker:
             for item in items:
@@ -101,6 +101,7 @@ class Controller(object):
         for action in [self.CREATE, self.UPDATE, self.DELETE]:
             self._plugin_handlers[action] = '%s%s_%s' % (action, parent_part,
                                                          self._resource)
+        self._list_iter_handler = self._get_list_iter_handler()
 
     def _get_primary_key(self, default_primary_key='id'):
         for key, value in self._attr_info.iteritems():
@@ -123,7 +124,22 @@ class Controller(object):
                                     % self._plugin.__class__.__name__)
         return getattr(self._plugin, native_sorting_attr_name, False)
 
-    def _is_visible(self, context, attr_name, data):
+    def _get_list_iter_handler(self):
+        # NOTE: a plugin may list a collection by chunks with
+        # get_<collection>_iter, unless one of its classes overrides
+        # get_<collection> without overriding the iterator too.
+        list_name = self._plugin_handlers[self.LIST]
+        iter_name = '%s_iter' % list_name
+        list_cls = iter_cls = None
+        for cls in type(self._plugin).__mro__:
+            if list_cls is None and list_name in cls.__dict__:
+                list_cls = cls
+            if iter_cls is None and iter_name in cls.__dict__:
+                iter_cls = cls
+        if iter_cls and list_cls and issubclass(iter_cls, list_cls):
+            return iter_name
+
+    def _is_visible(self, checker, attr_name, data):
         action = "%s:%s" % (self._plugin_handlers[self.SHOW], attr_name)
         # Optimistically init authz_check to True
         authz_check = True
@@ -131,8 +147,7 @@ class Controller(object):
             attr = (attributes.RESOURCE_ATTRIBUTE_MAP
                     [self._collection].get(attr_name))
             if attr and attr.get('enforce_policy'):
-                authz_check = policy.check_if_exists(
-                    context, action, data)
+                authz_check = checker.check_if_exists(action, data)
         except KeyError:
             # The extension was not configured for adding its resources
             # to the global resource attribute map. Policy check should
@@ -150,13 +165,17 @@ class Controller(object):
         attr_val = self._attr_info.get(attr_name)
         return attr_val and attr_val['is_visible'] and authz_check
 
-    def _view(self, context, data, fields_to_strip=None):
+    def _view(self, context, data, fields_to_strip=None, checker=None):
         # make sure fields_to_strip is iterable
         if not fields_to_strip:
             fields_to_strip = []
+        # Views of the same request share the credentials and the results
+        # of the checks which do not depend on the resource
+        if checker is None:
+            checker = policy.PolicyChecker(context)
 
         return dict(item for item in data.iteritems()
-                    if (self._is_visible(context, item[0], data) and
+                    if (self._is_visible(checker, item[0], data) and
                         item[0] not in fields_to_strip))
 
     def _do_field_list(self, original_fields):
@@ -229,24 +248,39 @@ class Controller(object):
         pagination_helper.update_fields(original_fields, fields_to_add)
         if parent_id:
             kwargs[self._parent_id_name] = parent_id
-        obj_getter = getattr(self._plugin, self._plugin_handlers[self.LIST])
-        obj_list = obj_getter(request.context, **kwargs)
-        obj_list = sorting_helper.sort(obj_list)
-        obj_list = pagination_helper.paginate(obj_list)
+        if (cfg.CONF.stream_list_responses and self._list_iter_handler and
+                not parent_id and not pagination_helper.limit and
+                not api_common.list_args(request, 'sort_key')):
+            # The resources are read by chunks as the response is sent
+            obj_getter = getattr(self._plugin, self._list_iter_handler)
+            obj_list = obj_getter(request.context, filters=filters,
+                                  fields=original_fields)
+        else:
+            obj_getter = getattr(self._plugin,
+                                 self._plugin_handlers[self.LIST])
+            obj_list = obj_getter(request.context, **kwargs)
+            obj_list = sorting_helper.sort(obj_list)
+            obj_list = pagination_helper.paginate(obj_list)
+        checker = policy.PolicyChecker(request.context)
+        # NOTE: the items are checked and formatted while the response is
+        # serialized, so that plugins may return generators and the whole
+        # collection is not held in memory. The pagination links need the
+        # complete page though.
         # Check authz
         if do_authz:
             # FIXME(salvatore-orlando): obj_getter might return references to
             # other resources. Must check authZ on them too.
             # Omit items from list that should not be visible
-            obj_list = [obj for obj in obj_list
-                        if policy.check(request.context,
-                                        self._plugin_handlers[self.SHOW],
-                                        obj,
-                                        plugin=self._plugin)]
+            obj_list = (obj for obj in obj_list
+                        if checker.check(self._plugin_handlers[self.SHOW],
+                                         obj))
+        if pagination_helper.limit:
+            obj_list = list(obj_list)
         collection = {self._collection:
-                      [self._view(request.context, obj,
-                                  fields_to_strip=fields_to_add)
-                       for obj in obj_list]}
+                      (self._view(request.context, obj,
+                                  fields_to_strip=fields_to_add,
+                                  checker=checker)
+                       for obj in obj_list)}
         pagination_links = pagination_helper.get_links(obj_list)
         if pagination_links:
             collection[self._collection + "_links"] = pagination_links
@@ -350,35 +384,17 @@ class Controller(object):
         if self._collection in body:
             # Have to account for bulk create
             items = body[self._collection]
-            deltas = {}
-            bulk = True
         else:
             items = [body]
-            bulk = False
+        deltas = {}
         for item in items:
             self._validate_network_tenant_ownership(request,
                                                     item[self._resource])
             policy.enforce(request.context,
                            action,
                            item[self._resource])
-            try:
-                tenant_id = item[self._resource]['tenant_id']
-                count = quota.QUOTAS.count(request.context, self._resource,
-                                           self._plugin, self._collection,
-                                           tenant_id)
-                if bulk:
-                    delta = deltas.get(tenant_id, 0) + 1
-                    deltas[tenant_id] = delta
-                else:
-                    delta = 1
-                kwargs = {self._resource: count + delta}
-            except exceptions.QuotaResourceUnknown as e:
-                # We don't want to quota this resource
-                LOG.debug(e)
-            else:
-                quota.QUOTAS.limit_check(request.context,
-                                         item[self._resource]['tenant_id'],
-                                         **kwargs)
+            tenant_id = item[self._resource]['tenant_id']
+            deltas[tenant_id] = deltas.get(tenant_id, 0) + 1
 
         def notify(create_result):
             notifier_method = self._resource + '.create.end'
@@ -392,25 +408,44 @@ class Controller(object):
                                          notifier_method)
             return create_result
 
-        kwargs = {self._parent_id_name: parent_id} if parent_id else {}
-        if self._collection in body and self._native_bulk:
-            # plugin does atomic bulk create operations
-            obj_creator = getattr(self._plugin, "%s_bulk" % action)
-            objs = obj_creator(request.context, body, **kwargs)
-            return notify({self._collection: [self._view(request.context, obj)
-                                              for obj in objs]})
-        else:
-            obj_creator = getattr(self._plugin, action)
-            if self._collection in body:
-                # Emulate atomic bulk behavior
-                objs = self._emulate_bulk_create(obj_creator, request,
-                                                 body, parent_id)
-                return notify({self._collection: objs})
+        reservations = []
+        try:
+            for tenant_id, delta in sorted(deltas.items()):
+                try:
+                    reservations.append(quota.QUOTAS.make_reservation(
+                        request.context, tenant_id, self._resource, delta,
+                        self._plugin, self._collection, tenant_id))
+                except exceptions.QuotaResourceUnknown as e:
+                    # We don't want to quota this resource
+                    LOG.debug(e)
+                    break
+
+            kwargs = {self._parent_id_name: parent_id} if parent_id else {}
+            if self._collection in body and self._native_bulk:
+                # plugin does atomic bulk create operations
+                obj_creator = getattr(self._plugin, "%s_bulk" % action)
+                objs = obj_creator(request.context, body, **kwargs)
+                checker = policy.PolicyChecker(request.context)
+                return notify({self._collection: [
+                    self._view(request.context, obj, checker=checker)
+                    for obj in objs]})
             else:
-                kwargs.update({self._resource: body})
-                obj = obj_creator(request.context, **kwargs)
-                return notify({self._resource: self._view(request.context,
-                                                          obj)})
+                obj_creator = getattr(self._plugin, action)
+                if self._collection in body:
+                    # Emulate atomic bulk behavior
+                    objs = self._emulate_bulk_create(obj_creator, request,
+                                                     body, parent_id)
+                    return notify({self._collection: objs})
+                else:
+                    kwargs.update({self._resource: body})
+                    obj = obj_creator(request.context, **kwargs)
+                    return notify({self._resource: self._view(
+                        request.context, obj)})
+        finally:
+            # The usages tracked were updated with the creation
+            for reservation in reservations:
+                quota.QUOTAS.release_reservation(request.context,
+                                                 reservation)
 
     def delete(self, request, id, **kwargs):
         """Deletes the specified entity."""
@@ -17,7 +17,10 @@
 Utility methods for working with WSGI servers redux
 """
 
+import types
+
 import netaddr
+from oslo.config import cfg
 import webob.dec
 import webob.exc
 
@@ -82,6 +85,10 @@ def Resource(controller, faults=None, deserializers=None, serializers=None):
             method = getattr(controller, action)
 
             result = method(request=request, **args)
+            stream = (action == 'index' and cfg.CONF.stream_list_responses
+                      and hasattr(serializer, 'stream'))
+            if not stream:
+                result = _expand_collections(result)
         except (exceptions.NeutronException,
                 netaddr.AddrFormatError) as e:
             LOG.exception(_('%s failed'), action)
@@ -125,6 +132,10 @@ def Resource(controller, faults=None, deserializers=None, serializers=None):
             raise webob.exc.HTTPInternalServerError(**kwargs)
 
         status = action_status.get(action, 200)
+        if stream:
+            return webob.Response(request=request, status=status,
+                                  content_type=content_type,
+                                  app_iter=serializer.stream(result))
         body = serializer.serialize(result)
         # NOTE(jkoelker) Comply with RFC2616 section 9.7
         if status == 204:
@@ -137,6 +148,15 @@ def Resource(controller, faults=None, deserializers=None, serializers=None):
     return resource
 
 
+def _expand_collections(result):
+    """Turn the collections returned as generators into lists."""
+    if isinstance(result, dict):
+        for key, value in result.items():
+            if isinstance(value, types.GeneratorType):
+                result[key] = list(value)
+    return result
+
+
 def translate(translatable, locale):
     """Translates the object to the given locale.
 
@@ -45,6 +45,10 @@ core_opts = [
                help=_("The path for API extensions")),
     cfg.StrOpt('policy_file', default="policy.json",
                help=_("The policy file to use")),
+    cfg.BoolOpt('policy_compile', default=True,
+                help=_("Build the policy rule of an action once for each "
+                       "set of attributes, and reuse within a request the "
+                       "checks which do not depend on the target")),
     cfg.StrOpt('auth_strategy', default='keystone',
                help=_("The type of authentication to use")),
     cfg.StrOpt('core_plugin',
@@ -65,6 +69,11 @@ core_opts = [
                help=_("The maximum number of items returned in a single "
                       "response, value was 'infinite' or negative integer "
                       "means no limit")),
+    cfg.BoolOpt('stream_list_responses', default=False,
+                help=_("Serialize the JSON body of list responses while the "
+                       "resources are formatted, instead of building the "
+                       "whole body first; networks and ports listed "
+                       "without limit or sort_key are also read by chunks")),
     cfg.IntOpt('max_dns_nameservers', default=5,
                help=_("Maximum number of DNS nameservers")),
     cfg.IntOpt('max_subnet_host_routes', default=20,
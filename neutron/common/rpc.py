@@ -15,13 +15,31 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import bisect
+import time
+
+from oslo.config import cfg
+
 from neutron import context
 from neutron.openstack.common import log as logging
+from neutron.openstack.common.rpc import amqp as rpc_amqp
 from neutron.openstack.common.rpc import dispatcher
+from neutron.openstack.common.rpc import proxy
 
 
 LOG = logging.getLogger(__name__)
 
+rpc_opts = [
+    cfg.IntOpt('rpc_conn_pool_idle_timeout',
+               default=0,
+               help=_('Seconds after which a connection left unused in the '
+                      'RPC connection pool of neutron.common.rpc_kombu is '
+                      'closed, 0 to keep them open. The pool grows back on '
+                      'demand, up to rpc_conn_pool_size.')),
+]
+
+cfg.CONF.register_opts(rpc_opts)
+
 
 class PluginRpcDispatcher(dispatcher.RpcDispatcher):
     """This class is used to convert RPC common context into
@@ -43,3 +61,136 @@ class PluginRpcDispatcher(dispatcher.RpcDispatcher):
                                        load_admin_roles=False, **rpc_ctxt_dict)
         return super(PluginRpcDispatcher, self).dispatch(
             neutron_ctxt, version, method, namespace, **kwargs)
+
+
+class RpcProxy(proxy.RpcProxy):
+    """RpcProxy recording the latency of its calls by method."""
+
+    def call(self, context, msg, topic=None, version=None, timeout=None):
+        start = time.time()
+        try:
+            return super(RpcProxy, self).call(context, msg, topic=topic,
+                                              version=version,
+                                              timeout=timeout)
+        finally:
+            record_latency('call.%s' % msg.get('method'),
+                           time.time() - start)
+
+
+class Pool(rpc_amqp.Pool):
+    """Connection pool closing the connections left unused for a while.
+
+    The time spent waiting for a connection is recorded as the
+    'connection_pool_wait' latency.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(Pool, self).__init__(*args, **kwargs)
+        # Time at which each free connection was put back
+        self._released_at = {}
+
+    def get(self):
+        start = time.time()
+        connection = super(Pool, self).get()
+        record_latency('connection_pool_wait', time.time() - start)
+        self._released_at.pop(connection, None)
+        return connection
+
+    def put(self, connection):
+        super(Pool, self).put(connection)
+        now = time.time()
+        # The connection may have been handed to a waiting caller instead
+        if connection in self.free_items:
+            self._released_at[connection] = now
+        self._close_idle_connections(now)
+
+    def _close_idle_connections(self, now):
+        """Close the free connections unused for the idle timeout.
+
+        Connections are reused in a stack order, so the idle ones are the
+        last of the free connections.
+        """
+        timeout = self.conf.rpc_conn_pool_idle_timeout
+        if not timeout:
+            return
+        while (self.free_items and now - self._released_at.get(
+                self.free_items[-1], now) > timeout):
+            connection = self.free_items.pop()
+            self._released_at.pop(connection, None)
+            self.current_size -= 1
+            LOG.debug(_('Pool closing idle connection'))
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def empty(self):
+        super(Pool, self).empty()
+        self._released_at.clear()
+
+
+class LatencyHistogram(object):
+    """Distribution of latencies, in seconds, over fixed buckets."""
+
+    # Upper bounds of the buckets, the last bucket being unbounded
+    BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5,
+               1, 2, 5, 10, 30, 60)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, latency):
+        self.counts[bisect.bisect_left(self.BUCKETS, latency)] += 1
+        self.count += 1
+        self.total += latency
+        self.max = max(self.max, latency)
+
+    def percentile(self, percent):
+        """Return the upper bound of the bucket holding the percentile.
+
+        None is returned for the last bucket, which is unbounded.
+        """
+        if not self.count:
+            return 0.0
+        rank = self.count * percent / 100.0
+        seen = 0
+        for bound, count in zip(self.BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def to_dict(self):
+        return {'count': self.count,
+                'sum': self.total,
+                'max': self.max,
+                'buckets': zip(self.BUCKETS + (None,), self.counts)}
+
+
+_latencies = {}
+
+
+def record_latency(name, latency):
+    """Add a latency, in seconds, to the histogram of the given name."""
+    histogram = _latencies.get(name)
+    if histogram is None:
+        histogram = _latencies[name] = LatencyHistogram()
+    histogram.add(latency)
+
+
+def get_latencies():
+    """Return the latency histograms of this process by name.
+
+    The histograms are named 'call.<method>' for the calls of remote
+    methods through RpcProxy, and 'connection_pool_wait' for the time
+    spent waiting for a connection of the pool of rpc_kombu.
+    """
+    return dict((name, histogram.to_dict())
+                for name, histogram in _latencies.iteritems())
+
+
+def reset_latencies():
+    _latencies.clear()
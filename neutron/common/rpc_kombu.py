@@ -0,0 +1,186 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+RPC backend over kombu reusing the publishers and the connections.
+
+This is the rpc_backend neutron.openstack.common.rpc.impl_kombu, with the
+following additions kept out of the oslo-incubator copy. It is only used
+when rpc_backend is set to neutron.common.rpc_kombu.
+
+- the topic and fanout publishers of a connection are cached by exchange
+  and topic, instead of declaring the exchange for every message. The
+  publishers of the replies, whose msg_id topics are used once, are not.
+- connections without consumers keep their channel, and so their
+  publishers, when they are returned to the pool.
+- the pool closes the connections left unused for
+  rpc_conn_pool_idle_timeout seconds and records the time waited for a
+  connection, see neutron.common.rpc.Pool.
+"""
+
+import collections
+
+from eventlet import semaphore
+
+from neutron.common import rpc as n_rpc
+from neutron.openstack.common import log as logging
+from neutron.openstack.common.rpc import amqp as rpc_amqp
+from neutron.openstack.common.rpc import impl_kombu
+
+LOG = logging.getLogger(__name__)
+
+
+class Connection(impl_kombu.Connection):
+
+    pool = None
+
+    # Number of publishers kept for reuse by a connection
+    MAX_PUBLISHERS = 64
+    # Publishers cached, those of the replies being used once
+    CACHED_PUBLISHERS = (impl_kombu.TopicPublisher,
+                         impl_kombu.FanoutPublisher)
+
+    def __init__(self, conf, server_params=None):
+        # Publishers by class and topic, the most recently used last
+        self.publishers = collections.OrderedDict()
+        super(Connection, self).__init__(conf, server_params=server_params)
+
+    def _connect(self, params):
+        super(Connection, self)._connect(params)
+        # The publishers are bound to the channel of the previous connection
+        self.publishers.clear()
+
+    def reset(self):
+        if self.consumers:
+            super(Connection, self).reset()
+            self.publishers.clear()
+        else:
+            # The channel was only used to publish, keep it along with its
+            # publishers for the next sends
+            self.cancel_consumer_thread()
+            self.wait_on_proxy_callbacks()
+
+    def publisher_send(self, cls, topic, msg, timeout=None, **kwargs):
+        if kwargs or cls not in self.CACHED_PUBLISHERS:
+            return super(Connection, self).publisher_send(
+                cls, topic, msg, timeout, **kwargs)
+
+        def _error_callback(exc):
+            LOG.exception(_("Failed to publish message to topic "
+                            "'%(topic)s': %(err_str)s"),
+                          {'topic': topic, 'err_str': str(exc)})
+
+        def _publish():
+            key = (cls, topic)
+            publisher = self.publishers.pop(key, None)
+            if publisher is None:
+                publisher = cls(self.conf, self.channel, topic)
+                if len(self.publishers) >= self.MAX_PUBLISHERS:
+                    self.publishers.popitem(last=False)
+            self.publishers[key] = publisher
+            publisher.send(msg, timeout)
+
+        self.ensure(_error_callback, _publish)
+
+    def create_consumer(self, topic, proxy, fanout=False):
+        proxy_cb = rpc_amqp.ProxyCallback(self.conf, proxy,
+                                          get_connection_pool(self.conf))
+        self.proxy_callbacks.append(proxy_cb)
+        if fanout:
+            self.declare_fanout_consumer(topic, proxy_cb)
+        else:
+            self.declare_topic_consumer(topic, proxy_cb)
+
+    def create_worker(self, topic, proxy, pool_name):
+        proxy_cb = rpc_amqp.ProxyCallback(self.conf, proxy,
+                                          get_connection_pool(self.conf))
+        self.proxy_callbacks.append(proxy_cb)
+        self.declare_topic_consumer(topic, proxy_cb, pool_name)
+
+    def join_consumer_pool(self, callback, pool_name, topic,
+                           exchange_name=None):
+        callback_wrapper = rpc_amqp.CallbackWrapper(
+            conf=self.conf,
+            callback=callback,
+            connection_pool=get_connection_pool(self.conf))
+        self.proxy_callbacks.append(callback_wrapper)
+        self.declare_topic_consumer(queue_name=pool_name,
+                                    topic=topic,
+                                    exchange_name=exchange_name,
+                                    callback=callback_wrapper)
+
+
+_pool_create_sem = semaphore.Semaphore()
+
+
+def get_connection_pool(conf):
+    with _pool_create_sem:
+        if not Connection.pool:
+            Connection.pool = n_rpc.Pool(conf, Connection)
+    return Connection.pool
+
+
+def create_connection(conf, new=True):
+    """Create a connection."""
+    return rpc_amqp.create_connection(conf, new, get_connection_pool(conf))
+
+
+def multicall(conf, context, topic, msg, timeout=None):
+    """Make a call that returns multiple times."""
+    return rpc_amqp.multicall(conf, context, topic, msg, timeout,
+                              get_connection_pool(conf))
+
+
+def call(conf, context, topic, msg, timeout=None):
+    """Sends a message on a topic and wait for a response."""
+    return rpc_amqp.call(conf, context, topic, msg, timeout,
+                         get_connection_pool(conf))
+
+
+def cast(conf, context, topic, msg):
+    """Sends a message on a topic without waiting for a response."""
+    return rpc_amqp.cast(conf, context, topic, msg,
+                         get_connection_pool(conf))
+
+
+def fanout_cast(conf, context, topic, msg):
+    """Sends a message on a fanout exchange without waiting for a response."""
+    return rpc_amqp.fanout_cast(conf, context, topic, msg,
+                                get_connection_pool(conf))
+
+
+def cast_to_server(conf, context, server_params, topic, msg):
+    """Sends a message on a topic to a specific server."""
+    return rpc_amqp.cast_to_server(conf, context, server_params, topic, msg,
+                                   get_connection_pool(conf))
+
+
+def fanout_cast_to_server(conf, context, server_params, topic, msg):
+    """Sends a message on a fanout exchange to a specific server."""
+    return rpc_amqp.fanout_cast_to_server(conf, context, server_params,
+                                          topic, msg,
+                                          get_connection_pool(conf))
+
+
+def notify(conf, context, topic, msg, envelope):
+    """Sends a notification event on a topic."""
+    return rpc_amqp.notify(conf, context, topic, msg,
+                           get_connection_pool(conf), envelope)
+
+
+def cleanup():
+    return rpc_amqp.cleanup(Connection.pool)
@@ -21,6 +21,7 @@ from oslo.config import cfg
 import sqlalchemy as sa
 from sqlalchemy.orm import exc
 
+from neutron.db import api as db_api
 from neutron.db import model_base
 from neutron.db import models_v2
 from neutron.extensions import agent as ext_agent
@@ -28,6 +29,7 @@ from neutron import manager
 from neutron.openstack.common.db import exception as db_exc
 from neutron.openstack.common import jsonutils
 from neutron.openstack.common import log as logging
+from neutron.openstack.common import loopingcall
 from neutron.openstack.common import timeutils
 
 LOG = logging.getLogger(__name__)
@@ -36,6 +38,14 @@ cfg.CONF.register_opt(
                help=_("Seconds to regard the agent is down; should be at "
                       "least twice report_interval, to be sure the "
                       "agent is down for good.")))
+cfg.CONF.register_opt(
+    cfg.IntOpt('agent_heartbeat_flush_interval', default=0,
+               help=_("Seconds between the batched writes of the heartbeats "
+                      "of agents whose state did not change; 0 writes "
+                      "every heartbeat as it is reported.")))
+
+# The heartbeat aggregator of this server process, if enabled
+_aggregator = None
 
 
 class Agent(model_base.BASEV2, models_v2.HasId):
@@ -78,7 +88,10 @@ class AgentDbMixin(ext_agent.AgentPluginBase):
         return agent
 
     @classmethod
-    def is_agent_down(cls, heart_beat_time):
+    def is_agent_down(cls, heart_beat_time, agent_id=None):
+        if agent_id and _aggregator:
+            heart_beat_time = _aggregator.last_heartbeat(agent_id,
+                                                         heart_beat_time)
         return timeutils.is_older_than(heart_beat_time,
                                        cfg.CONF.agent_down_time)
 
@@ -98,6 +111,9 @@ class AgentDbMixin(ext_agent.AgentPluginBase):
             ext_agent.RESOURCE_NAME + 's')
         res = dict((k, agent[k]) for k in attr
                    if k not in ['alive', 'configurations'])
+        if _aggregator:
+            res['heartbeat_timestamp'] = _aggregator.last_heartbeat(
+                res['id'], res['heartbeat_timestamp'])
         res['alive'] = not AgentDbMixin.is_agent_down(
             res['heartbeat_timestamp'])
         res['configurations'] = self.get_configuration_dict(agent)
@@ -107,6 +123,8 @@ class AgentDbMixin(ext_agent.AgentPluginBase):
         with context.session.begin(subtransactions=True):
             agent = self._get_agent(context, id)
             context.session.delete(agent)
+        if _aggregator:
+            _aggregator.forget([id])
 
     def update_agent(self, context, id, agent):
         agent_data = agent['agent']
@@ -167,6 +185,7 @@ class AgentDbMixin(ext_agent.AgentPluginBase):
                 greenthread.sleep(0)
                 context.session.add(agent_db)
             greenthread.sleep(0)
+        return agent_db
 
     def create_or_update_agent(self, context, agent):
         """Create or update agent according to report."""
@@ -191,6 +210,137 @@ class AgentDbMixin(ext_agent.AgentPluginBase):
             raise
 
 
+class HeartbeatAggregator(object):
+    """Coalesces the heartbeats reported by agents into batched writes.
+
+    A report creating an agent, flagging its start or changing its binary,
+    topic or configurations is written at once. Other reports only record
+    the heartbeat in memory, and the pending heartbeats are written by a
+    single UPDATE every interval seconds.
+
+    The heartbeats are kept in memory to tell whether an agent is down
+    before they are written. Other server processes only see them once
+    they are flushed.
+
+    Reports of an agent may be received by several server processes, each
+    comparing them to the state it last wrote. The UPDATE of the heartbeats
+    is then conditioned on the configurations written by this process: an
+    agent whose row was since written by another process has its heartbeat
+    written alone and its next report written in full.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        # (agent_type, host) -> (agent id, state last written)
+        self._agents = {}
+        # agent id -> last heartbeat reported to this process
+        self._heartbeats = {}
+        # agent id -> heartbeat to write at the next flush
+        self._pending = {}
+        self._loop = None
+
+    def report_state(self, context, plugin, agent):
+        key = (agent['agent_type'], agent['host'])
+        state = (agent['binary'], agent['topic'],
+                 jsonutils.dumps(agent.get('configurations', {})))
+        known = self._agents.get(key)
+        if known and known[1] == state and not agent.get('start_flag'):
+            agent_id = known[0]
+            self._heartbeats[agent_id] = timeutils.utcnow()
+            self._pending[agent_id] = self._heartbeats[agent_id]
+            self._start()
+            return
+        agent_db = plugin.create_or_update_agent(context, agent)
+        if agent_db is None:
+            return
+        self._agents[key] = (agent_db.id, state)
+        self._heartbeats[agent_db.id] = agent_db.heartbeat_timestamp
+        self._pending.pop(agent_db.id, None)
+
+    def last_heartbeat(self, agent_id, heart_beat_time):
+        """Return the latest of heart_beat_time and the one in memory."""
+        recent = self._heartbeats.get(agent_id)
+        if recent and (not heart_beat_time or recent > heart_beat_time):
+            return recent
+        return heart_beat_time
+
+    def forget(self, agent_ids):
+        agent_ids = set(agent_ids)
+        for key, (agent_id, _state) in self._agents.items():
+            if agent_id in agent_ids:
+                del self._agents[key]
+        for agent_id in agent_ids:
+            self._heartbeats.pop(agent_id, None)
+            self._pending.pop(agent_id, None)
+
+    def flush(self):
+        """Write the pending heartbeats in a single UPDATE."""
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        session = db_api.get_session()
+        configurations = dict((agent_id, state[2])
+                              for agent_id, state in self._agents.itervalues())
+        try:
+            with session.begin(subtransactions=True):
+                table = Agent.__table__
+                expected = [(agent_id, configurations.get(agent_id))
+                            for agent_id in pending]
+                result = session.execute(
+                    self._update_heartbeats(pending).
+                    where(table.c.configurations ==
+                          sa.case(expected, value=table.c.id)))
+                if result.rowcount < len(pending):
+                    # Agents deleted through another server are recreated
+                    # by their next report, those written by another server
+                    # have their next report written
+                    query = session.query(Agent.id, Agent.configurations).\
+                        filter(Agent.id.in_(pending.keys()))
+                    written = dict((row.id, row.configurations)
+                                   for row in query)
+                    changed = dict(
+                        (agent_id, pending[agent_id])
+                        for agent_id, config in written.iteritems()
+                        if config != configurations.get(agent_id))
+                    if changed:
+                        session.execute(self._update_heartbeats(changed))
+                    self.forget(set(pending) - set(written) | set(changed))
+        except Exception:
+            LOG.exception(_("Failed to write the heartbeats of %d agents"),
+                          len(pending))
+            for agent_id, heartbeat in pending.iteritems():
+                self._pending.setdefault(agent_id, heartbeat)
+
+    @staticmethod
+    def _update_heartbeats(heartbeats):
+        table = Agent.__table__
+        whens = [(agent_id, sa.literal(heartbeat, sa.DateTime))
+                 for agent_id, heartbeat in heartbeats.iteritems()]
+        return (table.update().
+                where(table.c.id.in_(heartbeats.keys())).
+                values(heartbeat_timestamp=sa.case(whens, value=table.c.id)))
+
+    def _start(self):
+        if not self._loop:
+            self._loop = loopingcall.FixedIntervalLoopingCall(self.flush)
+            self._loop.start(self.interval, initial_delay=self.interval)
+
+    def stop(self):
+        if self._loop:
+            self._loop.stop()
+            self._loop = None
+        self.flush()
+
+
+def get_heartbeat_aggregator():
+    """Return the heartbeat aggregator of this process, None if disabled."""
+    global _aggregator
+    if not _aggregator and cfg.CONF.agent_heartbeat_flush_interval > 0:
+        _aggregator = HeartbeatAggregator(
+            cfg.CONF.agent_heartbeat_flush_interval)
+    return _aggregator
+
+
 class AgentExtRpcCallback(object):
     """Processes the rpc report in plugin implementations."""
 
@@ -210,4 +360,8 @@ class AgentExtRpcCallback(object):
         agent_state = kwargs['agent_state']['agent_state']
         if not self.plugin:
             self.plugin = manager.NeutronManager.get_plugin()
-        self.plugin.create_or_update_agent(context, agent_state)
+        aggregator = get_heartbeat_aggregator()
+        if aggregator:
+            aggregator.report_state(context, self.plugin, agent_state)
+        else:
+            self.plugin.create_or_update_agent(context, agent_state)
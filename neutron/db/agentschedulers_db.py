@@ -79,7 +79,7 @@ class AgentSchedulerDbMixin(agents_db.AgentDbMixin):
             #                   (i.e. have a recent heartbeat timestamp)
             #                   are eligible, even if active is False
             return not agents_db.AgentDbMixin.is_agent_down(
-                agent['heartbeat_timestamp'])
+                agent['heartbeat_timestamp'], agent['id'])
 
     def update_agent(self, context, id, agent):
         original_agent = self.get_agent(context, id)
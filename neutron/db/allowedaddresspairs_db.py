@@ -93,6 +93,13 @@ class AllowedAddressPairsMixin(object):
     db_base_plugin_v2.NeutronDbPluginV2.register_dict_extend_funcs(
         attr.PORTS, ['_extend_port_dict_allowed_address_pairs'])
 
+    db_base_plugin_v2.NeutronDbPluginV2.register_model_query_hook(
+        models_v2.Port,
+        "allowed_address_pairs_port",
+        None,
+        None,
+        eager_loads=['allowed_address_pairs'])
+
     def _delete_allowed_address_pairs(self, context, id):
         query = self._model_query(context, AllowedAddressPair)
         with context.session.begin(subtransactions=True):
@@ -16,7 +16,6 @@
 #    under the License.
 
 import datetime
-import itertools
 import random
 
 import netaddr
@@ -28,9 +27,12 @@ from neutron.api.v2 import attributes
 from neutron.common import constants
 from neutron.common import exceptions as q_exc
 from neutron.db import api as db
+from neutron.db import ipam_backend
+from neutron.db import mac_allocator
 from neutron.db import models_v2
 from neutron.db import sqlalchemyutils
 from neutron import neutron_plugin_base_v2
+from neutron.openstack.common.db import exception as db_exc
 from neutron.openstack.common import excutils
 from neutron.openstack.common import log as logging
 from neutron.openstack.common import timeutils
@@ -41,6 +43,9 @@ LOG = logging.getLogger(__name__)
 
 AGENT_OWNER_PREFIX = 'network:'
 
+# Rows read by each query of the collections listed by chunks
+LIST_CHUNK_SIZE = 1000
+
 # Ports with the following 'device_owner' values will not prevent
 # network deletion.  If delete_network() finds that all ports on a
 # network have these owners, it will explicitly delete each port
@@ -65,9 +70,14 @@ class CommonDbMixin(object):
     # TODO(salvatore-orlando): Avoid using class-level variables
     _dict_extend_functions = {}
 
+    # This dictionary will store methods extending the attributes of all
+    # the api resources of a page at once, for mixins which would otherwise
+    # issue a query for each resource
+    _dict_extend_batch_functions = {}
+
     @classmethod
     def register_model_query_hook(cls, model, name, query_hook, filter_hook,
-                                  result_filters=None):
+                                  result_filters=None, eager_loads=None):
         """Register a hook to be invoked when a query is executed.
 
         Add the hooks to the _model_query_hooks dict. Models are the keys
@@ -81,6 +91,12 @@ class CommonDbMixin(object):
 
         Filter hooks take as input the filter expression being built and return
         a transformed filter expression
+
+        Eager loads name relationships of the model which are loaded by a
+        separate query when _get_collection lists a collection, rather than
+        joined to each row or lazily loaded for each row. A page of resources
+        is then read by a constant number of queries, whose rows are not
+        multiplied by each one-to-many relationship of the model.
         """
         model_hooks = cls._model_query_hooks.get(model)
         if not model_hooks:
@@ -88,7 +104,8 @@ class CommonDbMixin(object):
             model_hooks = {}
             cls._model_query_hooks[model] = model_hooks
         model_hooks[name] = {'query': query_hook, 'filter': filter_hook,
-                             'result_filters': result_filters}
+                             'result_filters': result_filters,
+                             'eager_loads': eager_loads}
 
     def _model_query(self, context, model):
         query = context.session.query(model)
@@ -160,6 +177,15 @@ class CommonDbMixin(object):
                     query = result_filter(query, filters)
         return query
 
+    def _apply_eager_loads(self, query, model):
+        options = [orm.subqueryload(relationship)
+                   for hooks in self._model_query_hooks.get(model,
+                                                            {}).itervalues()
+                   for relationship in hooks.get('eager_loads') or []]
+        if options:
+            query = query.options(*options)
+        return query
+
     def _apply_dict_extend_functions(self, resource_type,
                                      response, db_object):
         for func in self._dict_extend_functions.get(
@@ -173,31 +199,88 @@ class CommonDbMixin(object):
             if func:
                 func(*args)
 
+    def _apply_dict_extend_batch_functions(self, resource_type, context,
+                                           responses, db_objects):
+        for func in self._dict_extend_batch_functions.get(
+            resource_type, []):
+            args = (context, responses, db_objects)
+            if isinstance(func, basestring):
+                func = getattr(self, func, None)
+            else:
+                # must call unbound method - use self as 1st argument
+                args = (self,) + args
+            if func:
+                func(*args)
+
+    def _make_collection_dicts(self, context, resource_type, dict_func,
+                               db_objects, fields=None):
+        """Build the dicts of a page of resources.
+
+        The batched dict extend functions registered for the resource type
+        are given all the dicts of the page, before they are restricted to
+        the requested fields.
+        """
+        if not self._dict_extend_batch_functions.get(resource_type):
+            return [dict_func(db_object, fields) for db_object in db_objects]
+        db_objects = list(db_objects)
+        items = [dict_func(db_object) for db_object in db_objects]
+        self._apply_dict_extend_batch_functions(resource_type, context,
+                                                items, db_objects)
+        return [self._fields(item, fields) for item in items]
+
     def _get_collection_query(self, context, model, filters=None,
                               sorts=None, limit=None, marker_obj=None,
-                              page_reverse=False):
+                              page_reverse=False, marker_id=None):
         collection = self._model_query(context, model)
         collection = self._apply_filters_to_query(collection, model, filters)
         if limit and page_reverse and sorts:
             sorts = [(s[0], not s[1]) for s in sorts]
         collection = sqlalchemyutils.paginate_query(collection, model, limit,
                                                     sorts,
-                                                    marker_obj=marker_obj)
+                                                    marker_obj=marker_obj,
+                                                    marker_id=marker_id)
         return collection
 
     def _get_collection(self, context, model, dict_func, filters=None,
                         fields=None, sorts=None, limit=None, marker_obj=None,
-                        page_reverse=False):
+                        page_reverse=False, resource_type=None,
+                        marker_id=None):
         query = self._get_collection_query(context, model, filters=filters,
                                            sorts=sorts,
                                            limit=limit,
                                            marker_obj=marker_obj,
-                                           page_reverse=page_reverse)
-        items = [dict_func(c, fields) for c in query]
+                                           page_reverse=page_reverse,
+                                           marker_id=marker_id)
+        query = self._apply_eager_loads(query, model)
+        items = self._make_collection_dicts(context, resource_type, dict_func,
+                                            query, fields)
         if limit and page_reverse:
             items.reverse()
         return items
 
+    def _get_collection_chunks(self, context, query, model, resource_type,
+                               dict_func, fields=None):
+        """Yield the dicts of the rows of query, by lists of LIST_CHUNK_SIZE.
+
+        The rows are read by chunks of ids, so that no cursor is left open
+        between two chunks and the models of a chunk may be freed once its
+        dicts are consumed.
+        """
+        chunk_size = LIST_CHUNK_SIZE
+        query = self._apply_eager_loads(query.order_by(model.id), model)
+        last_id = None
+        while True:
+            chunk_query = query
+            if last_id is not None:
+                chunk_query = chunk_query.filter(model.id > last_id)
+            rows = chunk_query.limit(chunk_size).all()
+            if rows:
+                yield self._make_collection_dicts(context, resource_type,
+                                                  dict_func, rows, fields)
+            if len(rows) < chunk_size:
+                return
+            last_id = rows[-1].id
+
     def _get_collection_count(self, context, model, filters=None):
         return self._get_collection_query(context, model, filters).count()
 
@@ -206,6 +289,20 @@ class CommonDbMixin(object):
             return getattr(self, '_get_%s' % resource)(context, marker)
         return None
 
+    def _get_marker_id(self, limit, marker):
+        """Return the marker to read within the query of the page, if any.
+
+        Unlike _get_marker_obj, the marker is not fetched first, so the
+        caller must call _check_marker with the page.
+        """
+        if limit and marker:
+            return marker
+
+    def _check_marker(self, context, resource, marker_id, items):
+        # An unknown marker gives an empty page, look it up to report it
+        if marker_id and not items:
+            getattr(self, '_get_%s' % resource)(context, marker_id)
+
 
 class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
                         CommonDbMixin):
@@ -237,6 +334,17 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
         cur_funcs.extend(funcs)
         cls._dict_extend_functions[resource] = cur_funcs
 
+    @classmethod
+    def register_dict_extend_batch_funcs(cls, resource, funcs):
+        """Register functions extending the dicts of a page at once.
+
+        The functions take the context, the list of resource dicts and the
+        list of their db objects, in the same order.
+        """
+        cur_funcs = cls._dict_extend_batch_functions.get(resource, [])
+        cur_funcs.extend(funcs)
+        cls._dict_extend_batch_functions[resource] = cur_funcs
+
     def _filter_non_model_columns(self, data, model):
         """Remove all the attributes from data which are not columns of
         the model passed as second parameter.
@@ -285,31 +393,63 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
 
     @staticmethod
     def _generate_mac(context, network_id):
+        return NeutronDbPluginV2._generate_macs(context, network_id, 1)[0]
+
+    @staticmethod
+    def _generate_macs(context, network_id, count, exclude=()):
+        """Generate count MAC addresses unused on the network.
+
+        The addresses are taken from the MAC allocator when it is enabled.
+        Otherwise, or once it runs out of blocks, they are generated
+        randomly: the candidates of each attempt are checked by a single
+        query, and the ones in use or in exclude are generated again.
+        """
+        mac_addresses = set()
+        allocator = mac_allocator.get_mac_allocator()
+        if allocator:
+            mac_addresses.update(allocator.allocate(context, count, exclude))
+            if len(mac_addresses) == count:
+                return list(mac_addresses)
         base_mac = cfg.CONF.base_mac.split(':')
         max_retries = cfg.CONF.mac_generation_retries
         for i in range(max_retries):
-            mac = [int(base_mac[0], 16), int(base_mac[1], 16),
-                   int(base_mac[2], 16), random.randint(0x00, 0xff),
-                   random.randint(0x00, 0xff), random.randint(0x00, 0xff)]
-            if base_mac[3] != '00':
-                mac[3] = int(base_mac[3], 16)
-            mac_address = ':'.join(map(lambda x: "%02x" % x, mac))
-            if NeutronDbPluginV2._check_unique_mac(context, network_id,
-                                                   mac_address):
-                LOG.debug(_("Generated mac for network %(network_id)s "
-                            "is %(mac_address)s"),
+            candidates = set()
+            for j in range(count - len(mac_addresses)):
+                mac = [int(base_mac[0], 16), int(base_mac[1], 16),
+                       int(base_mac[2], 16), random.randint(0x00, 0xff),
+                       random.randint(0x00, 0xff), random.randint(0x00, 0xff)]
+                if base_mac[3] != '00':
+                    mac[3] = int(base_mac[3], 16)
+                candidates.add(':'.join(map(lambda x: "%02x" % x, mac)))
+            candidates -= mac_addresses
+            candidates.difference_update(exclude)
+            mac_addresses |= candidates - NeutronDbPluginV2._get_macs_in_use(
+                context, network_id, candidates)
+            if len(mac_addresses) == count:
+                LOG.debug(_("Generated macs for network %(network_id)s "
+                            "are %(mac_addresses)s"),
                           {'network_id': network_id,
-                           'mac_address': mac_address})
-                return mac_address
-            else:
-                LOG.debug(_("Generated mac %(mac_address)s exists. Remaining "
-                            "attempts %(max_retries)s."),
-                          {'mac_address': mac_address,
-                           'max_retries': max_retries - (i + 1)})
+                           'mac_addresses': ', '.join(mac_addresses)})
+                return list(mac_addresses)
+            LOG.debug(_("%(existing)s generated macs exist. Remaining "
+                        "attempts %(max_retries)s."),
+                      {'existing': count - len(mac_addresses),
+                       'max_retries': max_retries - (i + 1)})
         LOG.error(_("Unable to generate mac address after %s attempts"),
                   max_retries)
         raise q_exc.MacAddressGenerationFailure(net_id=network_id)
 
+    @staticmethod
+    def _get_macs_in_use(context, network_id, mac_addresses):
+        """Return which of the MAC addresses are used on the network."""
+        if not mac_addresses:
+            return set()
+        mac_qry = context.session.query(models_v2.Port.mac_address)
+        mac_qry = mac_qry.filter(
+            models_v2.Port.network_id == network_id,
+            models_v2.Port.mac_address.in_(list(mac_addresses)))
+        return set(mac_address for mac_address, in mac_qry)
+
     @staticmethod
     def _check_unique_mac(context, network_id, mac_address):
         mac_qry = context.session.query(models_v2.Port)
@@ -325,92 +465,7 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
         """Return an IP address to the pool of free IP's on the network
         subnet.
         """
-        # Grab all allocation pools for the subnet
-        allocation_pools = (context.session.query(
-            models_v2.IPAllocationPool).filter_by(subnet_id=subnet_id).
-            options(orm.joinedload('available_ranges', innerjoin=True)).
-            with_lockmode('update'))
-        # If there are no available ranges the previous query will return no
-        # results as it uses an inner join to avoid errors with the postgresql
-        # backend (see lp bug 1215350). In this case IP allocation pools must
-        # be loaded with a different query, which does not require lock for
-        # update as the allocation pools for a subnet are immutable.
-        # The 2nd query will be executed only if the first yields no results
-        unlocked_allocation_pools = (context.session.query(
-            models_v2.IPAllocationPool).filter_by(subnet_id=subnet_id))
-
-        # Find the allocation pool for the IP to recycle
-        pool_id = None
-
-        for allocation_pool in itertools.chain(allocation_pools,
-                                               unlocked_allocation_pools):
-            allocation_pool_range = netaddr.IPRange(
-                allocation_pool['first_ip'], allocation_pool['last_ip'])
-            if netaddr.IPAddress(ip_address) in allocation_pool_range:
-                pool_id = allocation_pool['id']
-                break
-        if not pool_id:
-            NeutronDbPluginV2._delete_ip_allocation(
-                context, network_id, subnet_id, ip_address)
-            return
-        # Two requests will be done on the database. The first will be to
-        # search if an entry starts with ip_address + 1 (r1). The second
-        # will be to see if an entry ends with ip_address -1 (r2).
-        # If 1 of the above holds true then the specific entry will be
-        # modified. If both hold true then the two ranges will be merged.
-        # If there are no entries then a single entry will be added.
-        range_qry = context.session.query(
-            models_v2.IPAvailabilityRange).with_lockmode('update')
-        ip_first = str(netaddr.IPAddress(ip_address) + 1)
-        ip_last = str(netaddr.IPAddress(ip_address) - 1)
-        LOG.debug(_("Recycle %s"), ip_address)
-        try:
-            r1 = range_qry.filter_by(allocation_pool_id=pool_id,
-                                     first_ip=ip_first).one()
-            LOG.debug(_("Recycle: first match for %(first_ip)s-%(last_ip)s"),
-                      {'first_ip': r1['first_ip'], 'last_ip': r1['last_ip']})
-        except exc.NoResultFound:
-            r1 = []
-        try:
-            r2 = range_qry.filter_by(allocation_pool_id=pool_id,
-                                     last_ip=ip_last).one()
-            LOG.debug(_("Recycle: last match for %(first_ip)s-%(last_ip)s"),
-                      {'first_ip': r2['first_ip'], 'last_ip': r2['last_ip']})
-        except exc.NoResultFound:
-            r2 = []
-
-        if r1 and r2:
-            # Merge the two ranges
-            ip_range = models_v2.IPAvailabilityRange(
-                allocation_pool_id=pool_id,
-                first_ip=r2['first_ip'],
-                last_ip=r1['last_ip'])
-            context.session.add(ip_range)
-            LOG.debug(_("Recycle: merged %(first_ip1)s-%(last_ip1)s and "
-                        "%(first_ip2)s-%(last_ip2)s"),
-                      {'first_ip1': r2['first_ip'], 'last_ip1': r2['last_ip'],
-                       'first_ip2': r1['first_ip'], 'last_ip2': r1['last_ip']})
-            context.session.delete(r1)
-            context.session.delete(r2)
-        elif r1:
-            # Update the range with matched first IP
-            r1['first_ip'] = ip_address
-            LOG.debug(_("Recycle: updated first %(first_ip)s-%(last_ip)s"),
-                      {'first_ip': r1['first_ip'], 'last_ip': r1['last_ip']})
-        elif r2:
-            # Update the range with matched last IP
-            r2['last_ip'] = ip_address
-            LOG.debug(_("Recycle: updated last %(first_ip)s-%(last_ip)s"),
-                      {'first_ip': r2['first_ip'], 'last_ip': r2['last_ip']})
-        else:
-            # Create a new range
-            ip_range = models_v2.IPAvailabilityRange(
-                allocation_pool_id=pool_id,
-                first_ip=ip_address,
-                last_ip=ip_address)
-            context.session.add(ip_range)
-            LOG.debug(_("Recycle: created new %(first_ip)s-%(last_ip)s"),
-                      {'first_ip': ip_address, 'last_ip': ip_address})
+        ipam_backend.get_backend().recycle_ip(context, subnet_id, ip_address)
         NeutronDbPluginV2._delete_ip_allocation(context, network_id, subnet_id,
                                                 ip_address)
 
@@ -454,65 +509,19 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
         The IP address will be generated from one of the subnets defined on
         the network.
         """
-        range_qry = context.session.query(
-            models_v2.IPAvailabilityRange).join(
-                models_v2.IPAllocationPool).with_lockmode('update')
-        for subnet in subnets:
-            range = range_qry.filter_by(subnet_id=subnet['id']).first()
-            if not range:
-                LOG.debug(_("All IPs from subnet %(subnet_id)s (%(cidr)s) "
-                            "allocated"),
-                          {'subnet_id': subnet['id'], 'cidr': subnet['cidr']})
-                continue
-            ip_address = range['first_ip']
-            LOG.debug(_("Allocated IP - %(ip_address)s from %(first_ip)s "
-                        "to %(last_ip)s"),
-                      {'ip_address': ip_address,
-                       'first_ip': range['first_ip'],
-                       'last_ip': range['last_ip']})
-            if range['first_ip'] == range['last_ip']:
-                # No more free indices on subnet => delete
-                LOG.debug(_("No more free IP's in slice. Deleting allocation "
-                            "pool."))
-                context.session.delete(range)
-            else:
-                # increment the first free
-                range['first_ip'] = str(netaddr.IPAddress(ip_address) + 1)
-            return {'ip_address': ip_address, 'subnet_id': subnet['id']}
-        raise q_exc.IpAddressGenerationFailure(net_id=subnets[0]['network_id'])
+        return ipam_backend.get_backend().generate_ip(context, subnets)
+
+    @staticmethod
+    def _generate_ips(context, subnets, count):
+        """Generate count IP addresses from the subnets of a network."""
+        return ipam_backend.get_backend().generate_ips(context, subnets,
+                                                       count)
 
     @staticmethod
     def _allocate_specific_ip(context, subnet_id, ip_address):
         """Allocate a specific IP address on the subnet."""
-        ip = int(netaddr.IPAddress(ip_address))
-        range_qry = context.session.query(
-            models_v2.IPAvailabilityRange).join(
-                models_v2.IPAllocationPool).with_lockmode('update')
-        results = range_qry.filter_by(subnet_id=subnet_id)
-        for range in results:
-            first = int(netaddr.IPAddress(range['first_ip']))
-            last = int(netaddr.IPAddress(range['last_ip']))
-            if first <= ip <= last:
-                if first == last:
-                    context.session.delete(range)
-                    return
-                elif first == ip:
-                    range['first_ip'] = str(netaddr.IPAddress(ip_address) + 1)
-                    return
-                elif last == ip:
-                    range['last_ip'] = str(netaddr.IPAddress(ip_address) - 1)
-                    return
-                else:
-                    # Split into two ranges
-                    new_first = str(netaddr.IPAddress(ip_address) + 1)
-                    new_last = range['last_ip']
-                    range['last_ip'] = str(netaddr.IPAddress(ip_address) - 1)
-                    ip_range = models_v2.IPAvailabilityRange(
-                        allocation_pool_id=range['allocation_pool_id'],
-                        first_ip=new_first,
-                        last_ip=new_last)
-                    context.session.add(ip_range)
-                    return
+        ipam_backend.get_backend().allocate_specific_ip(context, subnet_id,
+                                                        ip_address)
 
     @staticmethod
     def _check_unique_ip(context, network_id, subnet_id, ip_address):
@@ -720,6 +729,79 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
                                 'subnet_id': result['subnet_id']})
         return ips
 
+    def _allocate_ips_for_ports(self, context, networks, ports):
+        """Allocate IP addresses for several ports.
+
+        The ports with fixed_ips configured are served first, one by one,
+        then the addresses of the other ports are generated by blocks, one
+        per network and IP version. Returns the list of IPs of each port.
+        """
+        ips = [None] * len(ports)
+        allocated = set()
+        pending = {}
+        for i, port in enumerate(ports):
+            p = port['port']
+            if p['fixed_ips'] is attributes.ATTR_NOT_SPECIFIED:
+                pending.setdefault(p['network_id'], []).append(i)
+                continue
+            ips[i] = self._allocate_ips_for_port(
+                context, networks[p['network_id']], port)
+            # The addresses of the previous ports are not in the database yet
+            for ip in ips[i]:
+                key = (ip['subnet_id'], ip['ip_address'])
+                if key in allocated:
+                    raise q_exc.IpAddressInUse(net_id=p['network_id'],
+                                               ip_address=ip['ip_address'])
+                allocated.add(key)
+
+        for network_id, indexes in pending.iteritems():
+            for i in indexes:
+                ips[i] = []
+            filter = {'network_id': [network_id]}
+            subnets = self.get_subnets(context, filters=filter)
+            for ip_version in (4, 6):
+                version_subnets = [subnet for subnet in subnets
+                                   if subnet['ip_version'] == ip_version]
+                if not version_subnets:
+                    continue
+                results = NeutronDbPluginV2._generate_ips(
+                    context, version_subnets, len(indexes))
+                for i, result in zip(indexes, results):
+                    ips[i].append({'ip_address': result['ip_address'],
+                                   'subnet_id': result['subnet_id']})
+        return ips
+
+    def _allocate_macs_for_ports(self, context, ports):
+        """Return the MAC addresses of the ports, generating the unset ones.
+
+        The configured addresses are checked to be unique on their network,
+        and among the ports, by a single query per network.
+        """
+        mac_addresses = [port['port']['mac_address'] for port in ports]
+        by_network = {}
+        for i, port in enumerate(ports):
+            by_network.setdefault(port['port']['network_id'], []).append(i)
+        for network_id, indexes in by_network.iteritems():
+            configured = [mac_addresses[i] for i in indexes
+                          if mac_addresses[i] is not
+                          attributes.ATTR_NOT_SPECIFIED]
+            in_use = NeutronDbPluginV2._get_macs_in_use(context, network_id,
+                                                        configured)
+            seen = set()
+            for mac_address in configured:
+                if mac_address in in_use or mac_address in seen:
+                    raise q_exc.MacAddressInUse(net_id=network_id,
+                                                mac=mac_address)
+                seen.add(mac_address)
+            unset = [i for i in indexes
+                     if mac_addresses[i] is attributes.ATTR_NOT_SPECIFIED]
+            if unset:
+                generated = NeutronDbPluginV2._generate_macs(
+                    context, network_id, len(unset), exclude=seen)
+                for i, mac_address in zip(unset, generated):
+                    mac_addresses[i] = mac_address
+        return mac_addresses
+
     def _validate_subnet_cidr(self, context, network, new_subnet_cidr):
         """Validate the CIDR for a subnet.
 
@@ -1005,9 +1087,10 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
             for port in ports:
                 self._delete_port(context, port['id'])
 
-            # clean up subnets
-            subnets_qry = context.session.query(models_v2.Subnet)
-            subnets_qry.filter_by(network_id=id).delete()
+            # clean up subnets, through the session for the quota usages
+            # tracked to be updated
+            for subnet in network.subnets:
+                context.session.delete(subnet)
             context.session.delete(network)
 
     def get_network(self, context, id, fields=None):
@@ -1017,14 +1100,34 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
     def get_networks(self, context, filters=None, fields=None,
                      sorts=None, limit=None, marker=None,
                      page_reverse=False):
-        marker_obj = self._get_marker_obj(context, 'network', limit, marker)
-        return self._get_collection(context, models_v2.Network,
-                                    self._make_network_dict,
-                                    filters=filters, fields=fields,
-                                    sorts=sorts,
-                                    limit=limit,
-                                    marker_obj=marker_obj,
-                                    page_reverse=page_reverse)
+        marker_id = self._get_marker_id(limit, marker)
+        networks = self._get_collection(context, models_v2.Network,
+                                        self._make_network_dict,
+                                        filters=filters, fields=fields,
+                                        sorts=sorts,
+                                        limit=limit,
+                                        marker_id=marker_id,
+                                        page_reverse=page_reverse,
+                                        resource_type=attributes.NETWORKS)
+        self._check_marker(context, 'network', marker_id, networks)
+        return networks
+
+    def _get_networks_chunks(self, context, filters=None, fields=None):
+        query = self._get_collection_query(context, models_v2.Network,
+                                           filters=filters)
+        return self._get_collection_chunks(context, query, models_v2.Network,
+                                           attributes.NETWORKS,
+                                           self._make_network_dict, fields)
+
+    def get_networks_iter(self, context, filters=None, fields=None):
+        """Yield the networks, reading them by chunks.
+
+        This is get_networks without sorting and pagination, for the list
+        responses streamed by the API.
+        """
+        for networks in self._get_networks_chunks(context, filters, fields):
+            for network in networks:
+                yield network
 
     def get_networks_count(self, context, filters=None):
         return self._get_collection_count(context, models_v2.Network,
@@ -1280,6 +1383,7 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
                     raise q_exc.SubnetInUse(subnet_id=id)
 
             context.session.delete(subnet)
+        ipam_backend.get_backend().remove_subnet(id)
 
     def get_subnet(self, context, id, fields=None):
         subnet = self._get_subnet(context, id)
@@ -1288,14 +1392,16 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
     def get_subnets(self, context, filters=None, fields=None,
                     sorts=None, limit=None, marker=None,
                     page_reverse=False):
-        marker_obj = self._get_marker_obj(context, 'subnet', limit, marker)
-        return self._get_collection(context, models_v2.Subnet,
-                                    self._make_subnet_dict,
-                                    filters=filters, fields=fields,
-                                    sorts=sorts,
-                                    limit=limit,
-                                    marker_obj=marker_obj,
-                                    page_reverse=page_reverse)
+        marker_id = self._get_marker_id(limit, marker)
+        subnets = self._get_collection(context, models_v2.Subnet,
+                                       self._make_subnet_dict,
+                                       filters=filters, fields=fields,
+                                       sorts=sorts,
+                                       limit=limit,
+                                       marker_id=marker_id,
+                                       page_reverse=page_reverse)
+        self._check_marker(context, 'subnet', marker_id, subnets)
+        return subnets
 
     def get_subnets_count(self, context, filters=None):
         return self._get_collection_count(context, models_v2.Subnet,
@@ -1305,69 +1411,112 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
         return self._create_bulk('port', context, ports)
 
     def create_port(self, context, port):
-        p = port['port']
-        port_id = p.get('id') or uuidutils.generate_uuid()
-        network_id = p['network_id']
-        mac_address = p['mac_address']
+        return self._create_ports_db(context, [port])[0]
+
+    def _create_ports_db(self, context, ports):
+        """Create the database rows of several ports.
+
+        The MAC and IP addresses of all the ports are allocated before any
+        row is added to the session, so that the ports and their IP
+        allocations are then flushed by one multi-row INSERT per table.
+        Returns the port dicts, in order, without extensions processed.
+        """
         # NOTE(jkoelker) Get the tenant_id outside of the session to avoid
         #                unneeded db action if the operation raises
-        tenant_id = self._get_tenant_id_for_create(context, p)
+        tenant_ids = [self._get_tenant_id_for_create(context, port['port'])
+                      for port in ports]
 
         with context.session.begin(subtransactions=True):
-            network = self._get_network(context, network_id)
-
-            # Ensure that a MAC address is defined and it is unique on the
-            # network
-            if mac_address is attributes.ATTR_NOT_SPECIFIED:
-                mac_address = NeutronDbPluginV2._generate_mac(context,
-                                                              network_id)
+            networks = {}
+            for port in ports:
+                network_id = port['port']['network_id']
+                if network_id not in networks:
+                    networks[network_id] = self._get_network(context,
+                                                             network_id)
+
+            # Ensure that the MAC addresses are defined and unique on the
+            # networks, then get the IP's for the ports
+            mac_addresses = self._allocate_macs_for_ports(context, ports)
+            ips = self._allocate_ips_for_ports(context, networks, ports)
+
+            max_retries = cfg.CONF.mac_generation_retries
+            for attempt in range(max_retries):
+                try:
+                    db_ports = self._add_ports_db(context, ports, tenant_ids,
+                                                  mac_addresses, ips)
+                    break
+                except db_exc.DBDuplicateEntry as e:
+                    if 'mac_address' not in e.columns:
+                        raise
+                    # A generated address was taken by a concurrent request
+                    LOG.debug(_("MAC address of a port in use, %s attempts "
+                                "left"), max_retries - (attempt + 1))
+                    mac_addresses = self._allocate_macs_for_ports(context,
+                                                                  ports)
             else:
-                # Ensure that the mac on the network is unique
-                if not NeutronDbPluginV2._check_unique_mac(context,
-                                                           network_id,
-                                                           mac_address):
-                    raise q_exc.MacAddressInUse(net_id=network_id,
-                                                mac=mac_address)
+                raise q_exc.MacAddressGenerationFailure(
+                    net_id=ports[0]['port']['network_id'])
+
+        return [self._make_port_dict(created, process_extensions=False)
+                for created in db_ports]
 
-            # Returns the IP's for the port
-            ips = self._allocate_ips_for_port(context, network, port)
+    def _add_ports_db(self, context, ports, tenant_ids, mac_addresses, ips):
+        """Add the rows of the ports to the session in a savepoint.
 
+        The savepoint lets the transaction go on when the unique constraint
+        on the MAC addresses of a network rejects a port. pysqlite does not
+        support savepoints, the rows are only added on SQLite.
+        """
+        if context.session.get_bind().dialect.name == 'sqlite':
+            return self._make_ports_db(context, ports, tenant_ids,
+                                       mac_addresses, ips)
+        with context.session.begin_nested():
+            return self._make_ports_db(context, ports, tenant_ids,
+                                       mac_addresses, ips)
+
+    def _make_ports_db(self, context, ports, tenant_ids, mac_addresses, ips):
+        db_ports = []
+        for port, tenant_id, mac_address, port_ips in zip(
+                ports, tenant_ids, mac_addresses, ips):
+            p = port['port']
+            port_id = p.get('id') or uuidutils.generate_uuid()
+            network_id = p['network_id']
             if 'status' not in p:
                 status = constants.PORT_STATUS_ACTIVE
             else:
                 status = p['status']
 
-            port = models_v2.Port(tenant_id=tenant_id,
-                                  name=p['name'],
-                                  id=port_id,
-                                  network_id=network_id,
-                                  mac_address=mac_address,
-                                  admin_state_up=p['admin_state_up'],
-                                  status=status,
-                                  device_id=p['device_id'],
-                                  device_owner=p['device_owner'])
-            context.session.add(port)
-
-            # Update the allocated IP's
-            if ips:
-                for ip in ips:
-                    ip_address = ip['ip_address']
-                    subnet_id = ip['subnet_id']
-                    LOG.debug(_("Allocated IP %(ip_address)s "
-                                "(%(network_id)s/%(subnet_id)s/%(port_id)s)"),
-                              {'ip_address': ip_address,
-                               'network_id': network_id,
-                               'subnet_id': subnet_id,
-                               'port_id': port_id})
-                    allocated = models_v2.IPAllocation(
-                        network_id=network_id,
-                        port_id=port_id,
-                        ip_address=ip_address,
-                        subnet_id=subnet_id,
-                    )
-                    context.session.add(allocated)
-
-        return self._make_port_dict(port, process_extensions=False)
+            fixed_ips = []
+            for ip in port_ips:
+                ip_address = ip['ip_address']
+                subnet_id = ip['subnet_id']
+                LOG.debug(_("Allocated IP %(ip_address)s "
+                            "(%(network_id)s/%(subnet_id)s/%(port_id)s)"),
+                          {'ip_address': ip_address,
+                           'network_id': network_id,
+                           'subnet_id': subnet_id,
+                           'port_id': port_id})
+                fixed_ips.append(models_v2.IPAllocation(
+                    network_id=network_id,
+                    port_id=port_id,
+                    ip_address=ip_address,
+                    subnet_id=subnet_id,
+                ))
+
+            db_port = models_v2.Port(tenant_id=tenant_id,
+                                     name=p['name'],
+                                     id=port_id,
+                                     network_id=network_id,
+                                     mac_address=mac_address,
+                                     admin_state_up=p['admin_state_up'],
+                                     status=status,
+                                     device_id=p['device_id'],
+                                     device_owner=p['device_owner'],
+                                     fixed_ips=fixed_ips)
+            context.session.add(db_port)
+            db_ports.append(db_port)
+
+        return db_ports
 
     def update_port(self, context, id, port):
         p = port['port']
@@ -1456,7 +1605,7 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
         return self._make_port_dict(port, fields)
 
     def _get_ports_query(self, context, filters=None, sorts=None, limit=None,
-                         marker_obj=None, page_reverse=False):
+                         marker_obj=None, page_reverse=False, marker_id=None):
         Port = models_v2.Port
         IPAllocation = models_v2.IPAllocation
 
@@ -1479,21 +1628,49 @@ class NeutronDbPluginV2(neutron_plugin_base_v2.NeutronPluginBaseV2,
         if limit and page_reverse and sorts:
             sorts = [(s[0], not s[1]) for s in sorts]
         query = sqlalchemyutils.paginate_query(query, Port, limit,
-                                               sorts, marker_obj)
+                                               sorts, marker_obj,
+                                               marker_id=marker_id)
         return query
 
     def get_ports(self, context, filters=None, fields=None,
                   sorts=None, limit=None, marker=None,
                   page_reverse=False):
-        marker_obj = self._get_marker_obj(context, 'port', limit, marker)
+        marker_id = self._get_marker_id(limit, marker)
         query = self._get_ports_query(context, filters=filters,
                                       sorts=sorts, limit=limit,
-                                      marker_obj=marker_obj,
+                                      marker_id=marker_id,
                                       page_reverse=page_reverse)
-        items = [self._make_port_dict(c, fields) for c in query]
+        query = self._apply_eager_loads(query, models_v2.Port)
+        items = self._make_collection_dicts(context, attributes.PORTS,
+                                            self._make_port_dict, query,
+                                            fields)
         if limit and page_reverse:
             items.reverse()
+        self._check_marker(context, 'port', marker_id, items)
         return items
 
+    def get_ports_iter(self, context, filters=None, fields=None):
+        """Yield the ports, reading them by chunks.
+
+        This is get_ports without sorting and pagination, for the list
+        responses streamed by the API.
+        """
+        query = self._get_ports_query(context, filters=filters)
+        for ports in self._get_collection_chunks(context, query,
+                                                 models_v2.Port,
+                                                 attributes.PORTS,
+                                                 self._make_port_dict,
+                                                 fields):
+            for port in ports:
+                yield port
+
     def get_ports_count(self, context, filters=None):
         return self._get_ports_query(context, filters).count()
+
+
+# The subnets of the networks and the fixed IPs of the ports of a page are
+# each read by a single query
+NeutronDbPluginV2.register_model_query_hook(
+    models_v2.Network, 'subnets', None, None, eager_loads=['subnets'])
+NeutronDbPluginV2.register_model_query_hook(
+    models_v2.Port, 'fixed_ips', None, None, eager_loads=['fixed_ips'])
@@ -124,3 +124,10 @@ class ExtraDhcpOptMixin(object):
 
     db_base_plugin_v2.NeutronDbPluginV2.register_dict_extend_funcs(
         attributes.PORTS, ['_extend_port_dict_extra_dhcp_opt'])
+
+    db_base_plugin_v2.NeutronDbPluginV2.register_model_query_hook(
+        models_v2.Port,
+        "extra_dhcp_opts_port",
+        None,
+        None,
+        eager_loads=['dhcp_opts'])
@@ -0,0 +1,638 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""IP address management backends for NeutronDbPluginV2.
+
+A backend owns the free address bookkeeping of subnet allocation pools,
+which is persisted in the IPAvailabilityRange table: it hands out
+addresses to new ports and takes them back when ports release them.
+"""
+
+import bisect
+import itertools
+
+import netaddr
+from oslo.config import cfg
+from sqlalchemy import orm
+from sqlalchemy.orm import exc
+
+from neutron.common import exceptions as q_exc
+from neutron.db import api as db_api
+from neutron.db import models_v2
+from neutron.openstack.common import importutils
+from neutron.openstack.common import log as logging
+
+
+LOG = logging.getLogger(__name__)
+
+ipam_opts = [
+    cfg.StrOpt('ipam_driver',
+               default='neutron.db.ipam_backend.LockingIpamBackend',
+               help=_("The IPAM backend the database plugin uses to manage "
+                      "free addresses of subnet allocation pools")),
+    cfg.IntOpt('ipam_allocation_retries', default=10,
+               help=_("How many times an optimistic IPAM backend retries "
+                      "an allocation after detecting a concurrent update")),
+]
+cfg.CONF.register_opts(ipam_opts)
+
+_BACKEND = None
+
+
+class IpamConcurrentUpdate(q_exc.Conflict):
+    message = _("Free IP ranges of subnet %(subnet_id)s kept changing "
+                "concurrently")
+
+
+def get_backend():
+    """Return the IPAM backend selected by the ipam_driver option."""
+    global _BACKEND
+    driver = cfg.CONF.ipam_driver
+    if _BACKEND is None or _BACKEND[0] != driver:
+        LOG.debug(_("Loading IPAM backend %s"), driver)
+        _BACKEND = (driver, importutils.import_object(driver))
+    return _BACKEND[1]
+
+
+class IpamBackend(object):
+    """Base class for IPAM backends."""
+
+    def generate_ip(self, context, subnets):
+        """Allocate an address from one of the given subnets.
+
+        Returns a dict with the allocated ip_address and its subnet_id, or
+        raises IpAddressGenerationFailure if all the subnets are exhausted.
+        """
+        raise NotImplementedError()
+
+    def generate_ips(self, context, subnets, count):
+        """Allocate count addresses from the given subnets.
+
+        The subnets are filled in order. Returns a list of dicts with the
+        allocated ip_address and its subnet_id, or raises
+        IpAddressGenerationFailure if the subnets run out of addresses.
+        """
+        return [self.generate_ip(context, subnets) for i in range(count)]
+
+    def allocate_specific_ip(self, context, subnet_id, ip_address):
+        """Remove a specific address from the free space of a subnet."""
+        raise NotImplementedError()
+
+    def recycle_ip(self, context, subnet_id, ip_address):
+        """Return an address to the free space of a subnet.
+
+        Addresses outside of the subnet allocation pools are ignored.
+        """
+        raise NotImplementedError()
+
+    def remove_subnet(self, subnet_id):
+        """Drop any state kept for a deleted subnet."""
+        pass
+
+
+class LockingIpamBackend(IpamBackend):
+    """Manage IPAvailabilityRange rows under SELECT ... FOR UPDATE locks."""
+
+    def generate_ip(self, context, subnets):
+        range_qry = context.session.query(
+            models_v2.IPAvailabilityRange).join(
+                models_v2.IPAllocationPool).with_lockmode('update')
+        for subnet in subnets:
+            range = range_qry.filter_by(subnet_id=subnet['id']).first()
+            if not range:
+                LOG.debug(_("All IPs from subnet %(subnet_id)s (%(cidr)s) "
+                            "allocated"),
+                          {'subnet_id': subnet['id'], 'cidr': subnet['cidr']})
+                continue
+            ip_address = range['first_ip']
+            LOG.debug(_("Allocated IP - %(ip_address)s from %(first_ip)s "
+                        "to %(last_ip)s"),
+                      {'ip_address': ip_address,
+                       'first_ip': range['first_ip'],
+                       'last_ip': range['last_ip']})
+            if range['first_ip'] == range['last_ip']:
+                # No more free indices on subnet => delete
+                LOG.debug(_("No more free IP's in slice. Deleting allocation "
+                            "pool."))
+                context.session.delete(range)
+            else:
+                # increment the first free
+                range['first_ip'] = str(netaddr.IPAddress(ip_address) + 1)
+            return {'ip_address': ip_address, 'subnet_id': subnet['id']}
+        raise q_exc.IpAddressGenerationFailure(net_id=subnets[0]['network_id'])
+
+    def generate_ips(self, context, subnets, count):
+        # The free ranges of each subnet are locked by a single query and
+        # the addresses are carved from their starts.
+        ips = []
+        range_qry = context.session.query(
+            models_v2.IPAvailabilityRange).join(
+                models_v2.IPAllocationPool).with_lockmode('update')
+        for subnet in subnets:
+            ranges = sorted(range_qry.filter_by(subnet_id=subnet['id']),
+                            key=lambda r: netaddr.IPAddress(r['first_ip']))
+            for free_range in ranges:
+                first = netaddr.IPAddress(free_range['first_ip'])
+                last = netaddr.IPAddress(free_range['last_ip'])
+                taken = min(count - len(ips), int(last) - int(first) + 1)
+                ips.extend({'ip_address': str(first + i),
+                            'subnet_id': subnet['id']}
+                           for i in range(taken))
+                if int(first) + taken > int(last):
+                    context.session.delete(free_range)
+                else:
+                    free_range['first_ip'] = str(first + taken)
+                if len(ips) == count:
+                    LOG.debug(_("Allocated %(count)s IPs from %(first_ip)s"),
+                              {'count': count,
+                               'first_ip': ips[0]['ip_address']})
+                    return ips
+            LOG.debug(_("All IPs from subnet %(subnet_id)s (%(cidr)s) "
+                        "allocated"),
+                      {'subnet_id': subnet['id'], 'cidr': subnet['cidr']})
+        raise q_exc.IpAddressGenerationFailure(net_id=subnets[0]['network_id'])
+
+    def allocate_specific_ip(self, context, subnet_id, ip_address):
+        ip = int(netaddr.IPAddress(ip_address))
+        range_qry = context.session.query(
+            models_v2.IPAvailabilityRange).join(
+                models_v2.IPAllocationPool).with_lockmode('update')
+        results = range_qry.filter_by(subnet_id=subnet_id)
+        for range in results:
+            first = int(netaddr.IPAddress(range['first_ip']))
+            last = int(netaddr.IPAddress(range['last_ip']))
+            if first <= ip <= last:
+                if first == last:
+                    context.session.delete(range)
+                    return
+                elif first == ip:
+                    range['first_ip'] = str(netaddr.IPAddress(ip_address) + 1)
+                    return
+                elif last == ip:
+                    range['last_ip'] = str(netaddr.IPAddress(ip_address) - 1)
+                    return
+                else:
+                    # Split into two ranges
+                    new_first = str(netaddr.IPAddress(ip_address) + 1)
+                    new_last = range['last_ip']
+                    range['last_ip'] = str(netaddr.IPAddress(ip_address) - 1)
+                    ip_range = models_v2.IPAvailabilityRange(
+                        allocation_pool_id=range['allocation_pool_id'],
+                        first_ip=new_first,
+                        last_ip=new_last)
+                    context.session.add(ip_range)
+                    return
+
+    def recycle_ip(self, context, subnet_id, ip_address):
+        # Grab all allocation pools for the subnet
+        allocation_pools = (context.session.query(
+            models_v2.IPAllocationPool).filter_by(subnet_id=subnet_id).
+            options(orm.joinedload('available_ranges', innerjoin=True)).
+            with_lockmode('update'))
+        # If there are no available ranges the previous query will return no
+        # results as it uses an inner join to avoid errors with the postgresql
+        # backend (see lp bug 1215350). In this case IP allocation pools must
+        # be loaded with a different query, which does not require lock for
+        # update as the allocation pools for a subnet are immutable.
+        # The 2nd query will be executed only if the first yields no results
+        unlocked_allocation_pools = (context.session.query(
+            models_v2.IPAllocationPool).filter_by(subnet_id=subnet_id))
+
+        # Find the allocation pool for the IP to recycle
+        pool_id = None
+
+        for allocation_pool in itertools.chain(allocation_pools,
+                                               unlocked_allocation_pools):
+            allocation_pool_range = netaddr.IPRange(
+                allocation_pool['first_ip'], allocation_pool['last_ip'])
+            if netaddr.IPAddress(ip_address) in allocation_pool_range:
+                pool_id = allocation_pool['id']
+                break
+        if not pool_id:
+            return
+        # Two requests will be done on the database. The first will be to
+        # search if an entry starts with ip_address + 1 (r1). The second
+        # will be to see if an entry ends with ip_address -1 (r2).
+        # If 1 of the above holds true then the specific entry will be
+        # modified. If both hold true then the two ranges will be merged.
+        # If there are no entries then a single entry will be added.
+        range_qry = context.session.query(
+            models_v2.IPAvailabilityRange).with_lockmode('update')
+        ip_first = str(netaddr.IPAddress(ip_address) + 1)
+        ip_last = str(netaddr.IPAddress(ip_address) - 1)
+        LOG.debug(_("Recycle %s"), ip_address)
+        try:
+            r1 = range_qry.filter_by(allocation_pool_id=pool_id,
+                                     first_ip=ip_first).one()
+            LOG.debug(_("Recycle: first match for %(first_ip)s-%(last_ip)s"),
+                      {'first_ip': r1['first_ip'], 'last_ip': r1['last_ip']})
+        except exc.NoResultFound:
+            r1 = []
+        try:
+            r2 = range_qry.filter_by(allocation_pool_id=pool_id,
+                                     last_ip=ip_last).one()
+            LOG.debug(_("Recycle: last match for %(first_ip)s-%(last_ip)s"),
+                      {'first_ip': r2['first_ip'], 'last_ip': r2['last_ip']})
+        except exc.NoResultFound:
+            r2 = []
+
+        if r1 and r2:
+            # Merge the two ranges
+            ip_range = models_v2.IPAvailabilityRange(
+                allocation_pool_id=pool_id,
+                first_ip=r2['first_ip'],
+                last_ip=r1['last_ip'])
+            context.session.add(ip_range)
+            LOG.debug(_("Recycle: merged %(first_ip1)s-%(last_ip1)s and "
+                        "%(first_ip2)s-%(last_ip2)s"),
+                      {'first_ip1': r2['first_ip'], 'last_ip1': r2['last_ip'],
+                       'first_ip2': r1['first_ip'], 'last_ip2': r1['last_ip']})
+            context.session.delete(r1)
+            context.session.delete(r2)
+        elif r1:
+            # Update the range with matched first IP
+            r1['first_ip'] = ip_address
+            LOG.debug(_("Recycle: updated first %(first_ip)s-%(last_ip)s"),
+                      {'first_ip': r1['first_ip'], 'last_ip': r1['last_ip']})
+        elif r2:
+            # Update the range with matched last IP
+            r2['last_ip'] = ip_address
+            LOG.debug(_("Recycle: updated last %(first_ip)s-%(last_ip)s"),
+                      {'first_ip': r2['first_ip'], 'last_ip': r2['last_ip']})
+        else:
+            # Create a new range
+            ip_range = models_v2.IPAvailabilityRange(
+                allocation_pool_id=pool_id,
+                first_ip=ip_address,
+                last_ip=ip_address)
+            context.session.add(ip_range)
+            LOG.debug(_("Recycle: created new %(first_ip)s-%(last_ip)s"),
+                      {'first_ip': ip_address, 'last_ip': ip_address})
+
+
+class FreeRangeList(object):
+    """Sorted list of disjoint, inclusive (first, last) integer ranges.
+
+    Lookups bisect the list of range starts, so finding the range holding
+    an address is O(log n) in the number of free ranges.
+    """
+
+    def __init__(self, ranges=()):
+        self._ranges = sorted(ranges)
+        self._firsts = [first for first, last in self._ranges]
+
+    def __len__(self):
+        return len(self._ranges)
+
+    def __iter__(self):
+        return iter(self._ranges)
+
+    def first(self):
+        """Return the lowest free range, or None if there is none."""
+        if self._ranges:
+            return self._ranges[0]
+
+    def find(self, ip):
+        """Return the free range holding ip, or None."""
+        index = bisect.bisect_right(self._firsts, ip) - 1
+        if index >= 0 and self._ranges[index][1] >= ip:
+            return self._ranges[index]
+
+    def take_block(self, count):
+        """Remove up to count addresses from the start of the lowest range.
+
+        Returns the (first_ip, taken, old_ranges, new_ranges) of the
+        allocation, or None if there is no free range.
+        """
+        if not self._ranges:
+            return
+        first, last = self._ranges[0]
+        taken = min(count, last - first + 1)
+        new_ranges = []
+        if first + taken <= last:
+            new_ranges.append((first + taken, last))
+        self._replace(0, 1, new_ranges)
+        return first, taken, [(first, last)], new_ranges
+
+    def take(self, ip):
+        """Remove ip from the free space.
+
+        Returns the (old_ranges, new_ranges) replacement that was applied,
+        or None if ip was not free.
+        """
+        index = bisect.bisect_right(self._firsts, ip) - 1
+        if index < 0 or self._ranges[index][1] < ip:
+            return
+        first, last = self._ranges[index]
+        new_ranges = []
+        if first < ip:
+            new_ranges.append((first, ip - 1))
+        if ip < last:
+            new_ranges.append((ip + 1, last))
+        self._replace(index, 1, new_ranges)
+        return [(first, last)], new_ranges
+
+    def release(self, ip):
+        """Add ip to the free space, merging it with adjacent ranges.
+
+        Returns the (old_ranges, new_ranges) replacement that was applied,
+        or None if ip was already free.
+        """
+        index = bisect.bisect_right(self._firsts, ip)
+        if index > 0 and self._ranges[index - 1][1] >= ip:
+            return
+        start, count = index, 0
+        first = last = ip
+        if index > 0 and self._ranges[index - 1][1] == ip - 1:
+            start -= 1
+            count += 1
+            first = self._ranges[index - 1][0]
+        if index < len(self._ranges) and self._ranges[index][0] == ip + 1:
+            count += 1
+            last = self._ranges[index][1]
+        old_ranges = self._ranges[start:start + count]
+        self._replace(start, count, [(first, last)])
+        return old_ranges, [(first, last)]
+
+    def _replace(self, index, count, new_ranges):
+        self._ranges[index:index + count] = new_ranges
+        self._firsts[index:index + count] = [first
+                                             for first, last in new_ranges]
+
+
+class _SubnetFreeSpace(object):
+    """In-process copy of the free ranges of a subnet, keyed by pool."""
+
+    def __init__(self, pools, ranges):
+        # pools: list of (pool_id, first, last); ranges: pool_id -> list
+        self.pools = pools
+        self.free = dict((pool_id, FreeRangeList(ranges.get(pool_id, [])))
+                         for pool_id, first, last in pools)
+
+    def pool_for(self, ip):
+        for pool_id, first, last in self.pools:
+            if first <= ip <= last:
+                return pool_id
+
+
+class OptimisticIpamBackend(IpamBackend):
+    """Allocate addresses from an in-process free list of each subnet.
+
+    The IPAvailabilityRange rows stay authoritative, but they are not
+    read with SELECT ... FOR UPDATE. Every change is written as a
+    compare-and-swap: the rows the cached free list expects are updated
+    or deleted, and the replacement rows inserted, only if every expected
+    row was still there. The conditional UPDATE and DELETE statements
+    still lock the rows they change until the request transaction ends,
+    but no rows are locked to be read. When another server process or a
+    rolled back transaction changed the rows, the swap fails, the subnet
+    free list is reloaded from the database and the allocation is retried.
+
+    The cached free list may also be stale the other way round, missing
+    addresses freed by another process or still holding an address taken
+    by a rolled back transaction. Before concluding that a subnet is
+    exhausted, that an address is not free or that it is already free,
+    the free list is reloaded and checked again.
+
+    The free list is reloaded by a session of its own, outside of the
+    transaction of the request: a reload within it could only read the
+    snapshot taken by the transaction, missing the concurrent change.
+    IpamConcurrentUpdate is raised when the swaps kept failing, rather
+    than IpAddressGenerationFailure which reports exhausted subnets.
+    """
+
+    def __init__(self):
+        self._subnets = {}
+
+    def _load(self, session, subnet_id):
+        # Only columns are queried: the rows are then changed with bulk
+        # statements, so no stale instances end up in the session.
+        pool_qry = session.query(
+            models_v2.IPAllocationPool.id,
+            models_v2.IPAllocationPool.first_ip,
+            models_v2.IPAllocationPool.last_ip).filter_by(subnet_id=subnet_id)
+        range_qry = session.query(
+            models_v2.IPAvailabilityRange.allocation_pool_id,
+            models_v2.IPAvailabilityRange.first_ip,
+            models_v2.IPAvailabilityRange.last_ip).join(
+                models_v2.IPAllocationPool).filter_by(subnet_id=subnet_id)
+        pools = [(pool_id,
+                  int(netaddr.IPAddress(first_ip)),
+                  int(netaddr.IPAddress(last_ip)))
+                 for pool_id, first_ip, last_ip in pool_qry]
+        ranges = {}
+        for pool_id, first_ip, last_ip in range_qry:
+            ranges.setdefault(pool_id, []).append(
+                (int(netaddr.IPAddress(first_ip)),
+                 int(netaddr.IPAddress(last_ip))))
+        space = _SubnetFreeSpace(pools, ranges)
+        self._subnets[subnet_id] = space
+        return space
+
+    def _get(self, context, subnet_id, reload=False):
+        space = self._subnets.get(subnet_id)
+        if reload:
+            space = self._load(db_api.get_session(), subnet_id)
+        elif space is None:
+            space = self._load(context.session, subnet_id)
+        return space
+
+    @staticmethod
+    def _swap(context, pool_id, old_ranges, new_ranges, version):
+        """Replace old_ranges by new_ranges if the rows are unchanged."""
+        def _row(first, last):
+            return {'allocation_pool_id': pool_id,
+                    'first_ip': str(netaddr.IPAddress(first, version)),
+                    'last_ip': str(netaddr.IPAddress(last, version))}
+
+        session = context.session
+        table = models_v2.IPAvailabilityRange.__table__
+        range_qry = session.query(models_v2.IPAvailabilityRange)
+        old_ranges = list(old_ranges)
+        new_ranges = list(new_ranges)
+        updated = None
+        if old_ranges and new_ranges:
+            # Most swaps shrink or grow a single range: do it in place
+            updated = (old_ranges.pop(0), new_ranges.pop(0))
+            count = range_qry.filter_by(**_row(*updated[0])).update(
+                _row(*updated[1]), synchronize_session=False)
+            if count != 1:
+                return False
+        deleted = []
+        for old_range in old_ranges:
+            count = range_qry.filter_by(**_row(*old_range)).delete(
+                synchronize_session=False)
+            if count != 1:
+                # Undo the part of the swap that already went through
+                if updated:
+                    range_qry.filter_by(**_row(*updated[1])).update(
+                        _row(*updated[0]), synchronize_session=False)
+                if deleted:
+                    session.execute(table.insert(),
+                                    [_row(*d_range) for d_range in deleted])
+                return False
+            deleted.append(old_range)
+        if new_ranges:
+            session.execute(table.insert(),
+                            [_row(*new_range) for new_range in new_ranges])
+        return True
+
+    def _retry(self, context, subnet_id, func):
+        """Run func against the subnet free space until its swap succeeds.
+
+        func returns None when there is nothing to change, otherwise a
+        (result, pool_id, old_ranges, new_ranges, version) tuple. None is
+        only trusted from a free space loaded by this call, a cached one
+        is reloaded and func is run again. Raises IpamConcurrentUpdate
+        once all attempts have failed.
+        """
+        loaded = subnet_id not in self._subnets
+        space = self._get(context, subnet_id)
+        attempts = cfg.CONF.ipam_allocation_retries
+        while True:
+            change = func(space)
+            if change is None:
+                if loaded:
+                    return
+                LOG.debug(_("Nothing to change in the cached free ranges "
+                            "of subnet %s, reloading."), subnet_id)
+            else:
+                result, pool_id, old_ranges, new_ranges, version = change
+                if self._swap(context, pool_id, old_ranges, new_ranges,
+                              version):
+                    return result
+                attempts -= 1
+                if attempts <= 0:
+                    raise IpamConcurrentUpdate(subnet_id=subnet_id)
+                LOG.debug(_("Free ranges of subnet %(subnet_id)s changed "
+                            "concurrently, reloading. Remaining attempts "
+                            "%(retries)s."),
+                          {'subnet_id': subnet_id, 'retries': attempts})
+            space = self._get(context, subnet_id, reload=True)
+            loaded = True
+
+    def generate_ip(self, context, subnets):
+        conflict = None
+        for subnet in subnets:
+            version = subnet['ip_version']
+
+            def _take_first(space):
+                for pool_id, first, last in space.pools:
+                    free_range = space.free[pool_id].first()
+                    if free_range:
+                        ip = free_range[0]
+                        old, new = space.free[pool_id].take(ip)
+                        return ip, pool_id, old, new, version
+
+            try:
+                ip = self._retry(context, subnet['id'], _take_first)
+            except IpamConcurrentUpdate as e:
+                conflict = e
+                LOG.warning(_("Unable to allocate an IP from subnet "
+                              "%(subnet_id)s after %(retries)s attempts"),
+                            {'subnet_id': subnet['id'],
+                             'retries': cfg.CONF.ipam_allocation_retries})
+                continue
+            if ip is None:
+                LOG.debug(_("All IPs from subnet %(subnet_id)s (%(cidr)s) "
+                            "allocated"),
+                          {'subnet_id': subnet['id'], 'cidr': subnet['cidr']})
+                continue
+            ip_address = str(netaddr.IPAddress(ip, version))
+            LOG.debug(_("Allocated IP - %s"), ip_address)
+            return {'ip_address': ip_address, 'subnet_id': subnet['id']}
+        if conflict:
+            raise conflict
+        raise q_exc.IpAddressGenerationFailure(net_id=subnets[0]['network_id'])
+
+    def generate_ips(self, context, subnets, count):
+        # Each swap takes a block from the start of a free range, so that
+        # count addresses usually cost a single UPDATE.
+        ips = []
+        conflict = None
+        for subnet in subnets:
+            version = subnet['ip_version']
+
+            def _take_block(space):
+                for pool_id, first, last in space.pools:
+                    change = space.free[pool_id].take_block(count - len(ips))
+                    if change:
+                        first_ip, taken, old, new = change
+                        return ((first_ip, taken), pool_id, old, new,
+                                version)
+
+            while len(ips) < count:
+                try:
+                    block = self._retry(context, subnet['id'], _take_block)
+                except IpamConcurrentUpdate as e:
+                    conflict = e
+                    LOG.warning(_("Unable to allocate IPs from subnet "
+                                  "%(subnet_id)s after %(retries)s attempts"),
+                                {'subnet_id': subnet['id'],
+                                 'retries': cfg.CONF.ipam_allocation_retries})
+                    break
+                if block is None:
+                    LOG.debug(_("All IPs from subnet %(subnet_id)s "
+                                "(%(cidr)s) allocated"),
+                              {'subnet_id': subnet['id'],
+                               'cidr': subnet['cidr']})
+                    break
+                first_ip, taken = block
+                ips.extend({'ip_address': str(netaddr.IPAddress(ip, version)),
+                            'subnet_id': subnet['id']}
+                           for ip in range(first_ip, first_ip + taken))
+            if len(ips) == count:
+                return ips
+        if conflict:
+            raise conflict
+        raise q_exc.IpAddressGenerationFailure(net_id=subnets[0]['network_id'])
+
+    def allocate_specific_ip(self, context, subnet_id, ip_address):
+        address = netaddr.IPAddress(ip_address)
+        ip = int(address)
+
+        def _take(space):
+            pool_id = space.pool_for(ip)
+            change = pool_id and space.free[pool_id].take(ip)
+            if change:
+                return ip, pool_id, change[0], change[1], address.version
+
+        self._retry(context, subnet_id, _take)
+
+    def recycle_ip(self, context, subnet_id, ip_address):
+        address = netaddr.IPAddress(ip_address)
+        ip = int(address)
+        LOG.debug(_("Recycle %s"), ip_address)
+
+        def _release(space):
+            pool_id = space.pool_for(ip)
+            change = pool_id and space.free[pool_id].release(ip)
+            if change:
+                return ip, pool_id, change[0], change[1], address.version
+
+        try:
+            self._retry(context, subnet_id, _release)
+        except IpamConcurrentUpdate:
+            # The address stays out of the free ranges; this only leaks it
+            # and never hands it out twice.
+            LOG.error(_("Unable to recycle IP %(ip_address)s on subnet "
+                        "%(subnet_id)s after %(retries)s attempts"),
+                      {'ip_address': ip_address, 'subnet_id': subnet_id,
+                       'retries': cfg.CONF.ipam_allocation_retries})
+
+    def remove_subnet(self, subnet_id):
+        self._subnets.pop(subnet_id, None)
@@ -148,6 +148,15 @@ class L3AgentSchedulerDbMixin(l3agentscheduler.L3AgentSchedulerPluginBase,
         else:
             return []
 
+    def list_router_ids_on_host(self, context, host):
+        agent = self._get_agent_by_type_and_host(
+            context, constants.AGENT_TYPE_L3, host)
+        if not agent.admin_state_up:
+            return []
+        query = context.session.query(RouterL3AgentBinding.router_id)
+        query = query.filter(RouterL3AgentBinding.l3_agent_id == agent.id)
+        return [item[0] for item in query]
+
     def get_l3_agents_hosting_routers(self, context, router_ids,
                                       admin_state_up=None,
                                       active=None):
@@ -168,7 +177,8 @@ class L3AgentSchedulerDbMixin(l3agentscheduler.L3AgentSchedulerPluginBase,
             l3_agents = [l3_agent for l3_agent in
                          l3_agents if not
                          agents_db.AgentDbMixin.is_agent_down(
-                             l3_agent['heartbeat_timestamp'])]
+                             l3_agent['heartbeat_timestamp'],
+                             l3_agent['id'])]
         return l3_agents
 
     def _get_l3_bindings_hosting_routers(self, context, router_ids):
@@ -29,6 +29,7 @@ from neutron.common import exceptions as q_exc
 from neutron.db import model_base
 from neutron.db import models_v2
 from neutron.extensions import l3
+from neutron.extensions import portbindings
 from neutron import manager
 from neutron.openstack.common import log as logging
 from neutron.openstack.common.notifier import api as notifier_api
@@ -56,6 +57,7 @@ class Router(model_base.BASEV2, models_v2.HasId, models_v2.HasTenant):
     status = sa.Column(sa.String(16))
     admin_state_up = sa.Column(sa.Boolean)
     gw_port_id = sa.Column(sa.String(36), sa.ForeignKey('ports.id'))
+    # Loaded with the routers, whose dicts include the gateway network
     gw_port = orm.relationship(models_v2.Port)
 
 
@@ -778,7 +780,12 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
         filters = {'id': router_ids} if router_ids else {}
         if active is not None:
             filters['admin_state_up'] = [active]
-        router_dicts = self.get_routers(context, filters=filters)
+        # The gateway ports are loaded along with the routers, instead of a
+        # query per gateway when the router dicts are made.
+        query = self._model_query(context, Router).options(
+            orm.joinedload(Router.gw_port))
+        query = self._apply_filters_to_query(query, Router, filters)
+        router_dicts = [self._make_router_dict(router) for router in query]
         gw_port_ids = []
         if not router_dicts:
             return []
@@ -795,66 +802,121 @@ class L3_NAT_db_mixin(l3.RouterPluginBase):
         """Query floating_ips that relate to list of router_ids."""
         if not router_ids:
             return []
-        return self.get_floatingips(context, {'router_id': router_ids})
+        query = context.session.query(
+            FloatingIP.id, FloatingIP.tenant_id,
+            FloatingIP.floating_ip_address, FloatingIP.floating_network_id,
+            FloatingIP.router_id, FloatingIP.fixed_port_id,
+            FloatingIP.fixed_ip_address)
+        query = query.filter(FloatingIP.router_id.in_(router_ids))
+        return [self._make_floatingip_dict(dict(zip(row.keys(), row)))
+                for row in query]
 
     def get_sync_gw_ports(self, context, gw_port_ids):
         if not gw_port_ids:
             return []
-        filters = {'id': gw_port_ids}
-        gw_ports = self._core_plugin.get_ports(context, filters)
-        if gw_ports:
-            self._populate_subnet_for_ports(context, gw_ports)
-        return gw_ports
+        return self._get_sync_ports(context,
+                                    models_v2.Port.id.in_(gw_port_ids))
 
     def get_sync_interfaces(self, context, router_ids,
                             device_owner=DEVICE_OWNER_ROUTER_INTF):
         """Query router interfaces that relate to list of router_ids."""
         if not router_ids:
             return []
-        filters = {'device_id': router_ids,
-                   'device_owner': [device_owner]}
-        interfaces = self._core_plugin.get_ports(context, filters)
-        if interfaces:
-            self._populate_subnet_for_ports(context, interfaces)
-        return interfaces
-
-    def _populate_subnet_for_ports(self, context, ports):
-        """Populate ports with subnet.
-
-        These ports already have fixed_ips populated.
+        return self._get_sync_ports(
+            context, sa.and_(models_v2.Port.device_id.in_(router_ids),
+                             models_v2.Port.device_owner == device_owner))
+
+    def _get_sync_ports(self, context, port_filter):
+        """Build the l3 agent payload of the ports matching a filter.
+
+        The ports are read along with their IPs and subnets by a single
+        column query, and their dicts built here rather than through the
+        core plugin, which would run every port dict extend function.
+        The binding attributes of the ports are added when the core plugin
+        supports the binding extension.
         """
-        if not ports:
-            return
-        subnet_id_ports_dict = {}
-        for port in ports:
-            fixed_ips = port.get('fixed_ips', [])
+        query = context.session.query(
+            models_v2.Port.id, models_v2.Port.tenant_id, models_v2.Port.name,
+            models_v2.Port.network_id, models_v2.Port.mac_address,
+            models_v2.Port.admin_state_up, models_v2.Port.status,
+            models_v2.Port.device_id, models_v2.Port.device_owner,
+            models_v2.IPAllocation.ip_address,
+            models_v2.IPAllocation.subnet_id,
+            models_v2.Subnet.cidr, models_v2.Subnet.gateway_ip)
+        query = query.outerjoin(
+            models_v2.IPAllocation,
+            models_v2.IPAllocation.port_id == models_v2.Port.id)
+        query = query.outerjoin(
+            models_v2.Subnet,
+            models_v2.Subnet.id == models_v2.IPAllocation.subnet_id)
+        query = query.filter(port_filter)
+
+        ports = {}
+        subnets = {}
+        for row in query:
+            port = ports.get(row.id)
+            if port is None:
+                port = ports[row.id] = {'id': row.id,
+                                        'tenant_id': row.tenant_id,
+                                        'name': row.name,
+                                        'network_id': row.network_id,
+                                        'mac_address': row.mac_address,
+                                        'admin_state_up': row.admin_state_up,
+                                        'status': row.status,
+                                        'device_id': row.device_id,
+                                        'device_owner': row.device_owner,
+                                        'fixed_ips': []}
+            if row.ip_address:
+                port['fixed_ips'].append({'subnet_id': row.subnet_id,
+                                          'ip_address': row.ip_address})
+                subnets[row.subnet_id] = (row.cidr, row.gateway_ip)
+        for port in ports.itervalues():
+            fixed_ips = port['fixed_ips']
             if len(fixed_ips) > 1:
                 LOG.info(_("Ignoring multiple IPs on router port %s"),
                          port['id'])
-                continue
             elif not fixed_ips:
                 # Skip ports without IPs, which can occur if a subnet
                 # attached to a router is deleted
                 LOG.info(_("Skipping port %s as no IP is configure on it"),
                          port['id'])
-                continue
-            fixed_ip = fixed_ips[0]
-            my_ports = subnet_id_ports_dict.get(fixed_ip['subnet_id'], [])
-            my_ports.append(port)
-            subnet_id_ports_dict[fixed_ip['subnet_id']] = my_ports
-        if not subnet_id_ports_dict:
-            return
-        filters = {'id': subnet_id_ports_dict.keys()}
-        fields = ['id', 'cidr', 'gateway_ip']
-        subnet_dicts = self._core_plugin.get_subnets(context, filters, fields)
-        for subnet_dict in subnet_dicts:
-            ports = subnet_id_ports_dict.get(subnet_dict['id'], [])
-            for port in ports:
+            else:
+                subnet_id = fixed_ips[0]['subnet_id']
+                cidr, gateway_ip = subnets[subnet_id]
                 # TODO(gongysh) stash the subnet into fixed_ips
                 # to make the payload smaller.
-                port['subnet'] = {'id': subnet_dict['id'],
-                                  'cidr': subnet_dict['cidr'],
-                                  'gateway_ip': subnet_dict['gateway_ip']}
+                port['subnet'] = {'id': subnet_id,
+                                  'cidr': cidr,
+                                  'gateway_ip': gateway_ip}
+
+        if ports:
+            bindings = self._get_sync_port_bindings(context, ports.keys())
+            for port_id, binding in bindings.iteritems():
+                ports[port_id].update(binding)
+        return ports.values()
+
+    def _get_sync_port_bindings(self, context, port_ids):
+        """Return the binding attributes of the ports by port id.
+
+        The core plugins without get_port_bindings but supporting the
+        binding extension have the attributes read from their port dicts.
+        """
+        get_port_bindings = getattr(self._core_plugin, 'get_port_bindings',
+                                    None)
+        if get_port_bindings:
+            return get_port_bindings(context, port_ids)
+        aliases = getattr(self._core_plugin, 'supported_extension_aliases',
+                          [])
+        if 'binding' not in aliases:
+            return {}
+        attrs = (portbindings.VIF_TYPE, portbindings.HOST_ID,
+                 portbindings.PROFILE, portbindings.CAPABILITIES)
+        bindings = {}
+        for port in self._core_plugin.get_ports(context,
+                                                filters={'id': port_ids}):
+            bindings[port['id']] = dict((attr, port[attr])
+                                        for attr in attrs if attr in port)
+        return bindings
 
     def _process_sync_data(self, routers, interfaces, floating_ips):
         routers_dict = {}
@@ -0,0 +1,266 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""MAC address allocation from blocks reserved by each server process.
+
+The addresses generated under base_mac are split into blocks. A server
+process reserves a block by inserting a row in the macaddressblocks table,
+then hands its addresses out from memory, without checking each of them
+against the ports table. The row records the host and the process ID of
+its owner, so that the blocks of the processes which stopped are
+reclaimed by the next process started on the same host.
+"""
+
+import collections
+import errno
+import os
+import random
+import time
+
+from oslo.config import cfg
+import sqlalchemy as sa
+
+from neutron.common import rpc as n_rpc
+from neutron.db import api as db_api
+from neutron.db import model_base
+from neutron.db import models_v2
+from neutron.openstack.common.db import exception as db_exc
+from neutron.openstack.common import log as logging
+
+
+LOG = logging.getLogger(__name__)
+
+cfg.CONF.register_opt(
+    cfg.IntOpt('mac_allocation_block_size', default=0,
+               help=_("Number of MAC addresses a server process reserves "
+                      "at once and hands out from memory; 0 generates "
+                      "random addresses checked against the database.")))
+
+# Number of free blocks looked for by a single query when reserving one
+BLOCK_CANDIDATES = 16
+# Seconds without reserving a block once no free one was found
+RESERVE_RETRY_INTERVAL = 60
+
+# The MAC allocator of this server process, if enabled
+_allocator = None
+
+
+class MacAddressBlock(model_base.BASEV2):
+    """A block of generated MAC addresses reserved by a server process."""
+
+    first_mac = sa.Column(sa.String(32), primary_key=True)
+    last_mac = sa.Column(sa.String(32), nullable=False)
+    host = sa.Column(sa.String(255), nullable=False)
+
+
+def _format_mac(value):
+    return ':'.join('%02x' % ((value >> shift) & 0xff)
+                    for shift in range(40, -8, -8))
+
+
+def _parse_mac(mac_address):
+    return int(mac_address.replace(':', ''), 16)
+
+
+def _block_owner():
+    return '%s:%d' % (cfg.CONF.host, os.getpid())
+
+
+def _is_running(owner):
+    """Return whether the process of this host owning a block still runs."""
+    pid = owner.rpartition(':')[2]
+    if not pid.isdigit():
+        # Reserved before the process ID was recorded
+        return False
+    if int(pid) == os.getpid():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except OSError as e:
+        return e.errno != errno.ESRCH
+    return True
+
+
+class MacAllocator(object):
+    """Hand out MAC addresses from blocks reserved by this process.
+
+    The addresses of a block already used by ports are skipped when the
+    block is reserved, so allocations need no query until the block is
+    exhausted. Two processes never reserve the same block, as its row
+    is the primary key of the table. The block is reserved by its own
+    transaction, which the request needing it cannot roll back. The
+    addresses used by ports not committed yet when the block was
+    reserved, or configured on ports created since, may still collide
+    with the allocated addresses: the unique constraint on the MAC
+    addresses of a network rejects these ports, and the plugin allocates
+    them other addresses.
+
+    The blocks of the stopped processes of this host are reclaimed when
+    the allocator starts and when no free block is found. When no block
+    can be reserved any more, allocate returns fewer addresses than
+    requested and the plugin generates the others randomly. No block is
+    then looked for during RESERVE_RETRY_INTERVAL seconds.
+    """
+
+    def __init__(self, block_size):
+        self.block_size = block_size
+        self._base_mac = None
+        self._free = collections.deque()
+        self._reserve_after = 0
+        self.blocks = 0
+        self.allocated = 0
+        self.latencies = n_rpc.LatencyHistogram()
+
+    def _space(self):
+        """Return the first address and the size of the space of base_mac."""
+        base_mac = cfg.CONF.base_mac.split(':')
+        if base_mac[3] != '00':
+            prefix = ''.join(base_mac[:4]) + '0000'
+            return int(prefix, 16), 1 << 16
+        prefix = ''.join(base_mac[:3]) + '000000'
+        return int(prefix, 16), 1 << 24
+
+    def _reclaim_blocks(self):
+        """Release the blocks of the stopped processes of this host."""
+        session = db_api.get_session()
+        with session.begin():
+            blocks = session.query(MacAddressBlock.first_mac,
+                                   MacAddressBlock.host).filter(
+                sa.or_(MacAddressBlock.host == cfg.CONF.host,
+                       MacAddressBlock.host.startswith(
+                           '%s:' % cfg.CONF.host)))
+            stopped = [first_mac for first_mac, owner in blocks
+                       if not _is_running(owner)]
+            if stopped:
+                session.query(MacAddressBlock).filter(
+                    MacAddressBlock.first_mac.in_(stopped)).delete(
+                        synchronize_session=False)
+        if stopped:
+            LOG.info(_("Reclaimed %(count)s blocks of MAC addresses of "
+                       "stopped processes of host %(host)s"),
+                     {'count': len(stopped), 'host': cfg.CONF.host})
+        return len(stopped)
+
+    def _reserve_block(self):
+        """Reserve a free block, returning False if none was found."""
+        first, size = self._space()
+        count = (size + self.block_size - 1) // self.block_size
+        starts = dict(
+            (_format_mac(first + index * self.block_size),
+             min(first + (index + 1) * self.block_size, first + size) - 1)
+            for index in random.sample(xrange(count),
+                                       min(count, BLOCK_CANDIDATES)))
+        session = db_api.get_session()
+        with session.begin():
+            reserved = session.query(MacAddressBlock.first_mac).filter(
+                MacAddressBlock.first_mac.in_(starts.keys()))
+            for first_mac, in reserved:
+                del starts[first_mac]
+        while starts:
+            # Processes looking at the same candidates should not all pick
+            # the same one
+            first_mac = random.choice(starts.keys())
+            last = starts.pop(first_mac)
+            last_mac = _format_mac(last)
+            try:
+                with session.begin():
+                    session.add(MacAddressBlock(first_mac=first_mac,
+                                                last_mac=last_mac,
+                                                host=_block_owner()))
+                    session.flush()
+                    used_qry = session.query(
+                        models_v2.Port.mac_address).filter(
+                            models_v2.Port.mac_address.between(first_mac,
+                                                               last_mac))
+                    used = set(_parse_mac(mac_address)
+                               for mac_address, in used_qry)
+            except db_exc.DBDuplicateEntry:
+                LOG.debug(_("MAC addresses %s reserved concurrently"),
+                          first_mac)
+                continue
+            break
+        else:
+            return False
+        self._free.extend(mac for mac in xrange(_parse_mac(first_mac),
+                                                last + 1)
+                          if mac not in used)
+        self.blocks += 1
+        LOG.info(_("Reserved MAC addresses %(first_mac)s to %(last_mac)s, "
+                   "%(free)s free. Allocation latency p50 %(p50)ss, "
+                   "p99 %(p99)ss over %(count)s allocations."),
+                 {'first_mac': first_mac, 'last_mac': last_mac,
+                  'free': len(self._free),
+                  'p50': self.latencies.percentile(50),
+                  'p99': self.latencies.percentile(99),
+                  'count': self.latencies.count})
+        return True
+
+    def _reserve(self):
+        now = time.time()
+        if now < self._reserve_after:
+            return False
+        if (self._reserve_block() or
+                (self._reclaim_blocks() and self._reserve_block())):
+            return True
+        self._reserve_after = now + RESERVE_RETRY_INTERVAL
+        LOG.warning(_("No free block of MAC addresses left under "
+                      "%(base_mac)s, generating random addresses for "
+                      "%(interval)s seconds"),
+                    {'base_mac': cfg.CONF.base_mac,
+                     'interval': RESERVE_RETRY_INTERVAL})
+        return False
+
+    def allocate(self, context, count, exclude=()):
+        """Return up to count MAC addresses, none of them in exclude."""
+        start = time.time()
+        if self._base_mac != cfg.CONF.base_mac:
+            if self._base_mac is None:
+                self._reclaim_blocks()
+            self._base_mac = cfg.CONF.base_mac
+            self._free.clear()
+            self._reserve_after = 0
+        exclude = set(_parse_mac(mac_address) for mac_address in exclude)
+        mac_addresses = []
+        while len(mac_addresses) < count:
+            if not self._free:
+                if not self._reserve():
+                    break
+                continue
+            mac = self._free.popleft()
+            if mac not in exclude:
+                mac_addresses.append(_format_mac(mac))
+        self.allocated += len(mac_addresses)
+        self.latencies.add(time.time() - start)
+        return mac_addresses
+
+    def get_stats(self):
+        """Return the counters and the allocation latencies."""
+        return {'blocks': self.blocks,
+                'allocated': self.allocated,
+                'free': len(self._free),
+                'latency': self.latencies.to_dict()}
+
+
+def get_mac_allocator():
+    """Return the MAC allocator of this process, None if disabled."""
+    global _allocator
+    block_size = cfg.CONF.mac_allocation_block_size
+    if block_size <= 0:
+        return
+    if not _allocator or _allocator.block_size != block_size:
+        _allocator = MacAllocator(block_size)
+    return _allocator
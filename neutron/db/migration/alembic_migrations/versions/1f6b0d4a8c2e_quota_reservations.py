@@ -0,0 +1,58 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""Store the quota reservations with their expiration
+
+Revision ID: 1f6b0d4a8c2e
+Revises: 2e4f1c5d6b7a
+Create Date: 2013-11-26 16:21:45.109823
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '1f6b0d4a8c2e'
+down_revision = '2e4f1c5d6b7a'
+
+# Change to ['*'] if this migration applies to all plugins
+
+migration_for_plugins = [
+    '*'
+]
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade(active_plugins=None, options=None):
+    op.create_table(
+        'reservations',
+        sa.Column('id', sa.String(length=36), nullable=False),
+        sa.Column('tenant_id', sa.String(length=255), nullable=False),
+        sa.Column('resource', sa.String(length=255), nullable=False),
+        sa.Column('delta', sa.Integer(), nullable=False),
+        sa.Column('expiration', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'))
+    op.create_index('ix_reservations_expiration', 'reservations',
+                    ['expiration'])
+    # The reservations made so far cannot expire, the next corrections of
+    # the usages drop them
+    op.execute("UPDATE quotausages SET reserved = 0")
+
+
+def downgrade(active_plugins=None, options=None):
+    op.drop_index('ix_reservations_expiration', 'reservations')
+    op.drop_table('reservations')
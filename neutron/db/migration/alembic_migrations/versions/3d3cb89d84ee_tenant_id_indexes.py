@@ -0,0 +1,49 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""Index tenant_id of networks, subnets and ports
+
+Revision ID: 3d3cb89d84ee
+Revises: 50e86cb2637a
+Create Date: 2013-11-04 10:12:43.219812
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '3d3cb89d84ee'
+down_revision = '50e86cb2637a'
+
+# Change to ['*'] if this migration applies to all plugins
+
+migration_for_plugins = [
+    '*'
+]
+
+from alembic import op
+
+TABLES = ['networks', 'subnets', 'ports']
+
+
+def upgrade(active_plugins=None, options=None):
+    # The pages of a tenant are read from the index, ordered by id
+    for table in TABLES:
+        op.create_index('ix_%s_tenant_id' % table, table, ['tenant_id'])
+
+
+def downgrade(active_plugins=None, options=None):
+    for table in TABLES:
+        op.drop_index('ix_%s_tenant_id' % table, table)
@@ -0,0 +1,97 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+# Copyright 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""Reserve blocks of MAC addresses and make them unique on a network
+
+Revision ID: 4b2b6d6c3a1f
+Revises: 3d3cb89d84ee
+Create Date: 2013-11-12 14:06:31.574019
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '4b2b6d6c3a1f'
+down_revision = '3d3cb89d84ee'
+
+# Change to ['*'] if this migration applies to all plugins
+
+migration_for_plugins = [
+    '*'
+]
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.engine import reflection
+
+from neutron.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+UC_NAME = 'uniq_ports0network_id0mac_address'
+
+
+def _has_duplicate_macs():
+    if op.get_context().as_sql:
+        # Offline migrations emit the constraint, the data is not available
+        return False
+    duplicates = op.get_bind().execute(
+        "SELECT network_id, mac_address FROM ports "
+        "GROUP BY network_id, mac_address HAVING COUNT(*) > 1").fetchall()
+    for network_id, mac_address in duplicates:
+        LOG.warning(_("MAC address %(mac)s is used by several ports of "
+                      "network %(net)s"),
+                    {'mac': mac_address, 'net': network_id})
+    return bool(duplicates)
+
+
+def _has_unique_constraint():
+    if op.get_context().as_sql:
+        return True
+    inspector = reflection.Inspector.from_engine(op.get_bind())
+    return any(index['name'] == UC_NAME
+               for index in inspector.get_indexes('ports'))
+
+
+def upgrade(active_plugins=None, options=None):
+    op.create_table(
+        'macaddressblocks',
+        sa.Column('first_mac', sa.String(length=32), nullable=False),
+        sa.Column('last_mac', sa.String(length=32), nullable=False),
+        sa.Column('host', sa.String(length=255), nullable=False),
+        sa.PrimaryKeyConstraint('first_mac'))
+    # Changing the MAC address of existing ports would break the instances
+    # using them, the constraint is left out until they are updated
+    if _has_duplicate_macs():
+        LOG.warning(_("Unique constraint %s not created on the ports table, "
+                      "update the ports above and create it manually"),
+                    UC_NAME)
+        return
+    op.create_unique_constraint(
+        name=UC_NAME,
+        source='ports',
+        local_cols=['network_id', 'mac_address']
+    )
+
+
+def downgrade(active_plugins=None, options=None):
+    if _has_unique_constraint():
+        op.drop_constraint(
+            name=UC_NAME,
+            table_name='ports',
+            type_='unique'
+        )
+    op.drop_table('macaddressblocks')
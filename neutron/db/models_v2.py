@@ -119,6 +119,13 @@ class SubnetRoute(model_base.BASEV2, Route):
 class Port(model_base.BASEV2, HasId, HasTenant):
     """Represents a port on a Neutron v2 network."""
 
+    # Indexed to list the resources of a tenant by pages
+    __table_args__ = (sa.Index('ix_ports_tenant_id', 'tenant_id'),
+                      sa.UniqueConstraint(
+                          'network_id', 'mac_address',
+                          name='uniq_ports0network_id0mac_address'),
+                      model_base.BASEV2.__table_args__)
+
     name = sa.Column(sa.String(255))
     network_id = sa.Column(sa.String(36), sa.ForeignKey("networks.id"),
                            nullable=False)
@@ -147,6 +154,10 @@ class Subnet(model_base.BASEV2, HasId, HasTenant):
     are used for the IP allocation.
     """
 
+    # Indexed to list the resources of a tenant by pages
+    __table_args__ = (sa.Index('ix_subnets_tenant_id', 'tenant_id'),
+                      model_base.BASEV2.__table_args__)
+
     name = sa.Column(sa.String(255))
     network_id = sa.Column(sa.String(36), sa.ForeignKey('networks.id'))
     ip_version = sa.Column(sa.Integer, nullable=False)
@@ -169,6 +180,10 @@ class Subnet(model_base.BASEV2, HasId, HasTenant):
 class Network(model_base.BASEV2, HasId, HasTenant):
     """Represents a v2 neutron network."""
 
+    # Indexed to list the resources of a tenant by pages
+    __table_args__ = (sa.Index('ix_networks_tenant_id', 'tenant_id'),
+                      model_base.BASEV2.__table_args__)
+
     name = sa.Column(sa.String(255))
     ports = orm.relationship(Port, backref='networks')
     subnets = orm.relationship(Subnet, backref='networks')
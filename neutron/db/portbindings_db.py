@@ -41,6 +41,7 @@ class PortBindingPort(model_base.BASEV2):
 
 class PortBindingMixin(portbindings_base.PortBindingBaseMixin):
     extra_binding_dict = None
+    port_binding_model = PortBindingPort
 
     def _port_model_hook(self, context, original_model, query):
         query = query.outerjoin(PortBindingPort,
@@ -92,6 +93,22 @@ class PortBindingMixin(portbindings_base.PortBindingBaseMixin):
                 PortBindingPort).filter_by(port_id=port_id).first()
             return bind_port and bind_port.host or None
 
+    def get_port_bindings(self, context, port_ids):
+        """Return the binding attributes of several ports by port id."""
+        if not port_ids:
+            return {}
+        with context.session.begin(subtransactions=True):
+            query = context.session.query(
+                PortBindingPort.port_id, PortBindingPort.host).filter(
+                    PortBindingPort.port_id.in_(port_ids))
+            hosts = dict(query)
+        bindings = {}
+        for port_id in port_ids:
+            bindings[port_id] = {}
+            self._extend_port_dict_binding_host(bindings[port_id],
+                                                hosts.get(port_id))
+        return bindings
+
     def _extend_port_dict_binding_host(self, port_res, host):
         super(PortBindingMixin, self).extend_port_dict_binding(
             port_res, None)
@@ -15,11 +15,55 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import datetime
+import weakref
+
+from oslo.config import cfg
 import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy import orm
 
 from neutron.common import exceptions
+from neutron import context as neutron_context
 from neutron.db import model_base
 from neutron.db import models_v2
+from neutron.openstack.common.db import exception as db_exc
+from neutron.openstack.common import importutils
+from neutron.openstack.common import log as logging
+from neutron.openstack.common import loopingcall
+from neutron.openstack.common import timeutils
+
+LOG = logging.getLogger(__name__)
+
+tracked_usage_opts = [
+    cfg.IntOpt('quota_usage_reconcile_interval',
+               default=600,
+               help=_('Seconds between the corrections of the usages '
+                      'tracked by TrackedUsageQuotaDriver, 0 to disable')),
+    cfg.IntOpt('quota_reservation_expiration',
+               default=600,
+               help=_('Seconds after which the reservations left by a '
+                      'request which did not release them are dropped by '
+                      'the corrections of the usages')),
+]
+cfg.CONF.register_opts(tracked_usage_opts, 'QUOTAS')
+
+# Usage changes of the sessions being flushed, by resource and tenant
+_usage_deltas = weakref.WeakKeyDictionary()
+
+# Models of the resources whose usages are tracked, by resource name
+TRACKED_RESOURCE_MODELS = {
+    'network': 'neutron.db.models_v2.Network',
+    'subnet': 'neutron.db.models_v2.Subnet',
+    'port': 'neutron.db.models_v2.Port',
+    'router': 'neutron.db.l3_db.Router',
+    'floatingip': 'neutron.db.l3_db.FloatingIP',
+    'security_group': 'neutron.db.securitygroups_db.SecurityGroup',
+    'security_group_rule': 'neutron.db.securitygroups_db.SecurityGroupRule',
+}
+
+# Resource names of the models listened to, set by TrackedUsageQuotaDriver
+_tracked_models = {}
 
 
 class Quota(model_base.BASEV2, models_v2.HasId):
@@ -33,6 +77,81 @@ class Quota(model_base.BASEV2, models_v2.HasId):
     limit = sa.Column(sa.Integer)
 
 
+class QuotaUsage(model_base.BASEV2):
+    """Represent the number of resources of a tenant in use and reserved.
+
+    The row of a tenant and resource is created by counting the resources
+    when it is first reserved, then kept up to date by the flushes creating
+    or deleting such resources. Reserved is the sum of the deltas of the
+    reservations of the tenant and resource.
+    """
+    tenant_id = sa.Column(sa.String(255), primary_key=True)
+    resource = sa.Column(sa.String(255), primary_key=True)
+    in_use = sa.Column(sa.Integer, nullable=False, default=0)
+    reserved = sa.Column(sa.Integer, nullable=False, default=0)
+    updated_at = sa.Column(sa.DateTime)
+
+
+class Reservation(model_base.BASEV2, models_v2.HasId):
+    """Represent resources reserved by a request until it creates them.
+
+    The reservations left by a request which did not release them are
+    dropped once expired.
+    """
+    tenant_id = sa.Column(sa.String(255), nullable=False)
+    resource = sa.Column(sa.String(255), nullable=False)
+    delta = sa.Column(sa.Integer, nullable=False)
+    expiration = sa.Column(sa.DateTime, nullable=False, index=True)
+
+
+def _record_usage_change(mapper, target, delta):
+    resource = _tracked_models.get(mapper.class_)
+    tenant_id = getattr(target, 'tenant_id', None)
+    if resource and tenant_id:
+        deltas = _usage_deltas.setdefault(orm.object_session(target), {})
+        key = (resource, tenant_id)
+        deltas[key] = deltas.get(key, 0) + delta
+
+
+def _resource_created(mapper, connection, target):
+    _record_usage_change(mapper, target, 1)
+
+
+def _resource_deleted(mapper, connection, target):
+    _record_usage_change(mapper, target, -1)
+
+
+def _update_usages(session, flush_context):
+    deltas = _usage_deltas.pop(session, None)
+    if not deltas:
+        return
+    table = QuotaUsage.__table__
+    for (resource, tenant_id), delta in deltas.iteritems():
+        if delta:
+            session.execute(
+                table.update().
+                where(sa.and_(table.c.tenant_id == tenant_id,
+                              table.c.resource == resource)).
+                values(in_use=table.c.in_use + delta))
+
+
+def _forget_usage_changes(session, previous_transaction):
+    _usage_deltas.pop(session, None)
+
+
+def _track_usages(models):
+    """Listen to the flushes of models, a dict of resource names by model."""
+    if not _tracked_models:
+        event.listen(orm.Session, 'after_flush', _update_usages)
+        event.listen(orm.Session, 'after_soft_rollback',
+                     _forget_usage_changes)
+    for model, resource in models.iteritems():
+        if model not in _tracked_models:
+            event.listen(model, 'after_insert', _resource_created)
+            event.listen(model, 'after_delete', _resource_deleted)
+            _tracked_models[model] = resource
+
+
 class DbQuotaDriver(object):
     """Driver to perform necessary checks to enforce quotas and obtain quota
     information.
@@ -179,3 +298,183 @@ class DbQuotaDriver(object):
                  if quotas[key] >= 0 and quotas[key] < val]
         if overs:
             raise exceptions.OverQuota(overs=sorted(overs))
+
+
+class TrackedUsageQuotaDriver(DbQuotaDriver):
+    """Quota driver checking the quotas against usages kept in database.
+
+    Instead of counting the resources of a tenant for each request, the
+    resources requested are reserved against the quotausages table by a
+    single conditional update, along with a reservations row expiring
+    after quota_reservation_expiration seconds. The usages are updated in
+    the transactions creating or deleting the resources; the resources
+    deleted by bulk queries, and those changed before a usage row was
+    created by another server, are left out. A periodic task counts the
+    resources to correct the usages and drops the expired reservations,
+    left by failed servers.
+
+    Only the resources of TRACKED_RESOURCE_MODELS are tracked, the other
+    ones are counted as by DbQuotaDriver.
+    """
+
+    def __init__(self):
+        self._models = dict(
+            (resource, importutils.import_class(model))
+            for resource, model in TRACKED_RESOURCE_MODELS.iteritems())
+        _track_usages(dict((model, resource)
+                           for resource, model in self._models.iteritems()))
+        self._reconcile_loop = None
+        interval = cfg.CONF.QUOTAS.quota_usage_reconcile_interval
+        if interval > 0:
+            self._reconcile_loop = loopingcall.FixedIntervalLoopingCall(
+                self._reconcile)
+            self._reconcile_loop.start(interval, initial_delay=interval)
+
+    def tracks_usage(self, resource):
+        return resource in self._models
+
+    def _count(self, session, resource, tenant_id=None):
+        """Return the number of resources by tenant."""
+        table = self._models[resource].__table__
+        query = sa.select([table.c.tenant_id, sa.func.count()]).group_by(
+            table.c.tenant_id)
+        if tenant_id:
+            query = query.where(table.c.tenant_id == tenant_id)
+        return dict(session.execute(query).fetchall())
+
+    @staticmethod
+    def _count_reserved(session, resource):
+        """Return the number of resources reserved by tenant."""
+        table = Reservation.__table__
+        query = sa.select([table.c.tenant_id, sa.func.sum(table.c.delta)]).\
+            where(table.c.resource == resource).group_by(table.c.tenant_id)
+        return dict(session.execute(query).fetchall())
+
+    def _ensure_usage(self, context, tenant_id, resource):
+        usage = context.session.query(QuotaUsage).filter_by(
+            tenant_id=tenant_id, resource=resource).first()
+        if usage:
+            return
+        try:
+            with context.session.begin(subtransactions=True):
+                in_use = self._count(context.session, resource,
+                                     tenant_id).get(tenant_id, 0)
+                context.session.add(QuotaUsage(tenant_id=tenant_id,
+                                               resource=resource,
+                                               in_use=in_use, reserved=0,
+                                               updated_at=timeutils.utcnow()))
+        except db_exc.DBDuplicateEntry:
+            # Created by a concurrent request
+            pass
+
+    def make_reservation(self, context, tenant_id, resources, resource,
+                         delta):
+        """Reserve delta resources if they fit in the quota of a tenant.
+
+        :param context: The request context, for access checks.
+        :param tenant_id: The tenant_id to check the quota.
+        :param resources: A dictionary of the registered resources.
+        :param resource: The name of the resource, as a string.
+        :param delta: The number of resources to be created.
+        :return: The ID of the reservation to release once the resources
+                 are created, None if the quota is unlimited.
+        """
+        if delta < 0:
+            raise exceptions.InvalidQuotaValue(unders=[resource])
+        limit = self._get_quotas(context, tenant_id, resources,
+                                 [resource])[resource]
+        if limit < 0:
+            return
+        self._ensure_usage(context, tenant_id, resource)
+        table = QuotaUsage.__table__
+        now = timeutils.utcnow()
+        with context.session.begin(subtransactions=True):
+            result = context.session.execute(
+                table.update().
+                where(sa.and_(table.c.tenant_id == tenant_id,
+                              table.c.resource == resource,
+                              table.c.in_use + table.c.reserved + delta <=
+                              limit)).
+                values(reserved=table.c.reserved + delta, updated_at=now))
+            if result.rowcount:
+                reservation = Reservation(
+                    tenant_id=tenant_id, resource=resource, delta=delta,
+                    expiration=now + datetime.timedelta(
+                        seconds=cfg.CONF.QUOTAS.quota_reservation_expiration))
+                context.session.add(reservation)
+        if not result.rowcount:
+            raise exceptions.OverQuota(overs=[resource])
+        return reservation.id
+
+    def release_reservation(self, context, reservation_id):
+        table = QuotaUsage.__table__
+        with context.session.begin(subtransactions=True):
+            reservation = context.session.query(Reservation).filter_by(
+                id=reservation_id).with_lockmode('update').first()
+            if not reservation:
+                # Dropped as expired
+                return
+            context.session.delete(reservation)
+            context.session.execute(
+                table.update().
+                where(sa.and_(table.c.tenant_id == reservation.tenant_id,
+                              table.c.resource == reservation.resource,
+                              table.c.reserved >= reservation.delta)).
+                values(reserved=table.c.reserved - reservation.delta,
+                       updated_at=timeutils.utcnow()))
+
+    def reconcile_usages(self, context):
+        """Drop the expired reservations and correct the usages.
+
+        The resources in use are counted, and those reserved summed from
+        the reservations left. The usages changed since they were read are
+        left for the next correction.
+
+        :return: The number of usages corrected.
+        """
+        with context.session.begin(subtransactions=True):
+            context.session.query(Reservation).filter(
+                Reservation.expiration < timeutils.utcnow()).delete(
+                    synchronize_session=False)
+        table = QuotaUsage.__table__
+        usages = {}
+        for usage in context.session.query(QuotaUsage):
+            usages.setdefault(usage.resource, []).append(usage)
+        corrected = 0
+        for resource, resource_usages in usages.iteritems():
+            if not self.tracks_usage(resource):
+                continue
+            with context.session.begin(subtransactions=True):
+                counts = self._count(context.session, resource)
+                reserved_counts = self._count_reserved(context.session,
+                                                       resource)
+                for usage in resource_usages:
+                    in_use = counts.get(usage.tenant_id, 0)
+                    reserved = reserved_counts.get(usage.tenant_id, 0)
+                    if (in_use, reserved) == (usage.in_use, usage.reserved):
+                        continue
+                    result = context.session.execute(
+                        table.update().
+                        where(sa.and_(table.c.tenant_id == usage.tenant_id,
+                                      table.c.resource == resource,
+                                      table.c.in_use == usage.in_use,
+                                      table.c.reserved == usage.reserved)).
+                        values(in_use=in_use, reserved=reserved))
+                    if result.rowcount:
+                        LOG.warning(_("Corrected the %(resource)s usage of "
+                                      "tenant %(tenant_id)s from %(old)s in "
+                                      "use and %(old_reserved)s reserved to "
+                                      "%(in_use)s and %(reserved)s"),
+                                    {'resource': resource,
+                                     'tenant_id': usage.tenant_id,
+                                     'old': usage.in_use,
+                                     'old_reserved': usage.reserved,
+                                     'in_use': in_use, 'reserved': reserved})
+                        corrected += 1
+        return corrected
+
+    def _reconcile(self):
+        try:
+            self.reconcile_usages(neutron_context.get_admin_context())
+        except Exception:
+            LOG.exception(_("Failed to correct the quota usages"))
@@ -458,6 +458,13 @@ class SecurityGroupDbMixin(ext_sg.SecurityGroupPluginBase):
     db_base_plugin_v2.NeutronDbPluginV2.register_dict_extend_funcs(
         attr.PORTS, ['_extend_port_dict_security_group'])
 
+    db_base_plugin_v2.NeutronDbPluginV2.register_model_query_hook(
+        models_v2.Port,
+        "security_group_port",
+        None,
+        None,
+        eager_loads=['security_groups'])
+
     def _process_port_create_security_group(self, context, port,
                                             security_group_ids):
         if attr.is_attr_set(security_group_ids):
@@ -491,33 +498,54 @@ class SecurityGroupDbMixin(ext_sg.SecurityGroupPluginBase):
 
         :returns: all security groups IDs on port belonging to tenant.
         """
-        p = port['port']
-        if not attr.is_attr_set(p.get(ext_sg.SECURITYGROUPS)):
-            return
-        if p.get('device_owner') and p['device_owner'].startswith('network:'):
-            return
+        return self._get_security_groups_on_ports(context, [port])[0]
 
-        valid_groups = self.get_security_groups(context, fields=['id'])
-        valid_group_map = dict((g['id'], g['id']) for g in valid_groups)
-        try:
-            return set([valid_group_map[sg_id]
-                        for sg_id in p.get(ext_sg.SECURITYGROUPS, [])])
-        except KeyError as e:
-            raise ext_sg.SecurityGroupNotFound(id=str(e))
+    def _get_security_groups_on_ports(self, context, ports):
+        """Check that all security groups on ports belong to tenant.
+
+        :returns: the security groups IDs on each port, in order.
+        """
+        valid_group_map = None
+        results = []
+        for port in ports:
+            p = port['port']
+            if (not attr.is_attr_set(p.get(ext_sg.SECURITYGROUPS)) or
+                (p.get('device_owner') and
+                 p['device_owner'].startswith('network:'))):
+                results.append(None)
+                continue
+            if valid_group_map is None:
+                valid_groups = self.get_security_groups(context,
+                                                        fields=['id'])
+                valid_group_map = dict((g['id'], g['id'])
+                                       for g in valid_groups)
+            try:
+                results.append(set([valid_group_map[sg_id] for sg_id
+                                    in p.get(ext_sg.SECURITYGROUPS, [])]))
+            except KeyError as e:
+                raise ext_sg.SecurityGroupNotFound(id=str(e))
+        return results
 
     def _ensure_default_security_group_on_port(self, context, port):
-        # we don't apply security groups for dhcp, router
-        if (port['port'].get('device_owner') and
-                port['port']['device_owner'].startswith('network:')):
-            return
-        tenant_id = self._get_tenant_id_for_create(context,
-                                                   port['port'])
-        default_sg = self._ensure_default_security_group(context, tenant_id)
-        if attr.is_attr_set(port['port'].get(ext_sg.SECURITYGROUPS)):
-            sgids = port['port'].get(ext_sg.SECURITYGROUPS)
-        else:
-            sgids = [default_sg]
-        port['port'][ext_sg.SECURITYGROUPS] = sgids
+        self._ensure_default_security_group_on_ports(context, [port])
+
+    def _ensure_default_security_group_on_ports(self, context, ports):
+        default_sgs = {}
+        for port in ports:
+            # we don't apply security groups for dhcp, router
+            if (port['port'].get('device_owner') and
+                    port['port']['device_owner'].startswith('network:')):
+                continue
+            tenant_id = self._get_tenant_id_for_create(context,
+                                                       port['port'])
+            if tenant_id not in default_sgs:
+                default_sgs[tenant_id] = self._ensure_default_security_group(
+                    context, tenant_id)
+            if attr.is_attr_set(port['port'].get(ext_sg.SECURITYGROUPS)):
+                sgids = port['port'].get(ext_sg.SECURITYGROUPS)
+            else:
+                sgids = [default_sgs[tenant_id]]
+            port['port'][ext_sg.SECURITYGROUPS] = sgids
 
     def _check_update_deletes_security_groups(self, port):
         """Return True if port has as a security group and it's value
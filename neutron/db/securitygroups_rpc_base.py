@@ -16,16 +16,34 @@
 #    under the License.
 
 import netaddr
+from oslo.config import cfg
 
 from neutron.common import constants as q_const
 from neutron.common import utils
 from neutron.db import models_v2
 from neutron.db import securitygroups_db as sg_db
+from neutron.extensions import allowedaddresspairs as addr_pair
 from neutron.extensions import securitygroup as ext_sg
 from neutron.openstack.common import log as logging
 
 LOG = logging.getLogger(__name__)
 
+cfg.CONF.import_opt('api_workers', 'neutron.service')
+cfg.CONF.import_opt('rpc_workers', 'neutron.service')
+cfg.CONF.register_opt(
+    cfg.BoolOpt('notify_security_groups_by_host', default=False,
+                help=_("Send the updates of security groups only to the "
+                       "agents of the hosts having ports concerned, instead "
+                       "of to every agent. Requires agents consuming the "
+                       "security group topic of their host.")))
+cfg.CONF.register_opt(
+    cfg.BoolOpt('cache_security_group_rules', default=False,
+                help=_("Cache the rules and member IPs of security groups "
+                       "sent to the agents. The cache is invalidated by the "
+                       "changes made through this process only: enable it "
+                       "only when a single neutron-server process, without "
+                       "API or RPC workers, runs in the deployment.")))
+
 
 IP_MASK = {q_const.IPv4: 32,
            q_const.IPv6: 128}
@@ -35,14 +53,88 @@ DIRECTION_IP_PREFIX = {'ingress': 'source_ip_prefix',
                        'egress': 'dest_ip_prefix'}
 
 
+class SecurityGroupRuleCache(object):
+    """Compiled rules and member IPs of security groups, keyed by group id.
+
+    Rules are kept in the format sent to the agents, with remote group rules
+    left unexpanded. Member IPs are kept per ethertype. Entries are dropped
+    when the plugin changes the rules or members of a group; a generation
+    counter keeps a lookup which raced with such a change from caching what
+    it read.
+
+    The invalidation is local to the process: the changes made by other
+    server processes, including API and RPC workers, are not seen by this
+    one. The cache is then only used when enabled by
+    cache_security_group_rules, and never with workers.
+    """
+
+    def __init__(self):
+        self._rules = {}
+        self._members = {}
+        self.generation = 0
+
+    def _get(self, cache, sg_ids):
+        found, missing = {}, []
+        for sg_id in set(sg_ids):
+            if sg_id in cache:
+                found[sg_id] = cache[sg_id]
+            else:
+                missing.append(sg_id)
+        return found, missing
+
+    def _set(self, cache, entries, generation):
+        if (not cfg.CONF.cache_security_group_rules or
+                cfg.CONF.api_workers or cfg.CONF.rpc_workers):
+            return
+        if generation == self.generation:
+            cache.update(entries)
+
+    def get_rules(self, sg_ids):
+        """Return the cached rules by group and the list of missing groups."""
+        return self._get(self._rules, sg_ids)
+
+    def set_rules(self, rules, generation):
+        self._set(self._rules, rules, generation)
+
+    def get_members(self, sg_ids):
+        """Return the cached member IPs by group and the missing groups."""
+        return self._get(self._members, sg_ids)
+
+    def set_members(self, members, generation):
+        self._set(self._members, members, generation)
+
+    def invalidate_rules(self, sg_ids):
+        self.generation += 1
+        for sg_id in sg_ids:
+            self._rules.pop(sg_id, None)
+
+    def invalidate_members(self, sg_ids):
+        self.generation += 1
+        for sg_id in sg_ids:
+            self._members.pop(sg_id, None)
+
+    def clear(self):
+        self.generation += 1
+        self._rules.clear()
+        self._members.clear()
+
+
+rule_cache = SecurityGroupRuleCache()
+
+
 class SecurityGroupServerRpcMixin(sg_db.SecurityGroupDbMixin):
 
+    # The plugins binding ports to hosts set port_binding_model to the model
+    # holding the host of each port, which allows notifying the updates of
+    # security groups to the agents of these hosts only.
+
     def create_security_group_rule(self, context, security_group_rule):
         bulk_rule = {'security_group_rules': [security_group_rule]}
         rule = self.create_security_group_rule_bulk_native(context,
                                                            bulk_rule)[0]
         sgids = [rule['security_group_id']]
-        self.notifier.security_groups_rule_updated(context, sgids)
+        rule_cache.invalidate_rules(sgids)
+        self.notify_security_groups_rule_updated(context, sgids)
         return rule
 
     def create_security_group_rule_bulk(self, context,
@@ -51,15 +143,23 @@ class SecurityGroupServerRpcMixin(sg_db.SecurityGroupDbMixin):
                       self).create_security_group_rule_bulk_native(
                           context, security_group_rule)
         sgids = set([r['security_group_id'] for r in rules])
-        self.notifier.security_groups_rule_updated(context, list(sgids))
+        rule_cache.invalidate_rules(sgids)
+        self.notify_security_groups_rule_updated(context, list(sgids))
         return rules
 
     def delete_security_group_rule(self, context, sgrid):
         rule = self.get_security_group_rule(context, sgrid)
         super(SecurityGroupServerRpcMixin,
               self).delete_security_group_rule(context, sgrid)
-        self.notifier.security_groups_rule_updated(context,
-                                                   [rule['security_group_id']])
+        rule_cache.invalidate_rules([rule['security_group_id']])
+        self.notify_security_groups_rule_updated(context,
+                                                 [rule['security_group_id']])
+
+    def delete_security_group(self, context, id):
+        super(SecurityGroupServerRpcMixin,
+              self).delete_security_group(context, id)
+        rule_cache.invalidate_rules([id])
+        rule_cache.invalidate_members([id])
 
     def update_security_group_on_port(self, context, id, port,
                                       original_port, updated_port):
@@ -99,10 +199,16 @@ class SecurityGroupServerRpcMixin(sg_db.SecurityGroupDbMixin):
         """
         need_notify = False
         if (original_port['fixed_ips'] != updated_port['fixed_ips'] or
+            (addr_pair.ADDRESS_PAIRS in updated_port and
+             original_port.get(addr_pair.ADDRESS_PAIRS) !=
+             updated_port[addr_pair.ADDRESS_PAIRS]) or
             not utils.compare_elements(
                 original_port.get(ext_sg.SECURITYGROUPS),
                 updated_port.get(ext_sg.SECURITYGROUPS))):
             need_notify = True
+            rule_cache.invalidate_members(
+                set(original_port.get(ext_sg.SECURITYGROUPS) or []) |
+                set(updated_port.get(ext_sg.SECURITYGROUPS) or []))
         return need_notify
 
     def notify_security_groups_member_updated(self, context, port):
@@ -116,11 +222,67 @@ class SecurityGroupServerRpcMixin(sg_db.SecurityGroupDbMixin):
         occurs and the plugin agent fetches the update provider
         rule in the other RPC call (security_group_rules_for_devices).
         """
-        if port['device_owner'] == q_const.DEVICE_OWNER_DHCP:
+        self.notify_security_groups_members_updated(context, [port])
+
+    def notify_security_groups_members_updated(self, context, ports):
+        """Notify update event of the security group members of ports.
+
+        The ports of a bulk create are notified by a single event for all
+        their groups.
+        """
+        members = [port for port in ports
+                   if port['device_owner'] != q_const.DEVICE_OWNER_DHCP]
+        if len(members) < len(ports):
             self.notifier.security_groups_provider_updated(context)
+        if not members:
+            return
+        sg_ids = []
+        for port in members:
+            for sg_id in port.get(ext_sg.SECURITYGROUPS) or []:
+                if sg_id not in sg_ids:
+                    sg_ids.append(sg_id)
+        rule_cache.invalidate_members(sg_ids)
+        if not sg_ids:
+            return
+        self.notifier.security_groups_member_updated(
+            context, sg_ids,
+            hosts=self._get_security_group_hosts(context, sg_ids,
+                                                 remote=True))
+
+    def notify_security_groups_rule_updated(self, context, sg_ids):
+        """Notify the agents of the hosts with ports in the groups."""
+        self.notifier.security_groups_rule_updated(
+            context, sg_ids,
+            hosts=self._get_security_group_hosts(context, sg_ids))
+
+    def _get_security_group_hosts(self, context, sg_ids, remote=False):
+        """Return the hosts of the ports concerned by security groups.
+
+        The ports concerned by the rules of the groups are the ports in the
+        groups. The ports concerned by the members of the groups are the
+        ports in groups having rules with one of the groups as remote group.
+
+        :returns: a set of hosts, or None if the agents to notify are not
+                  known, in which case every agent is notified.
+        """
+        binding_model = getattr(self, 'port_binding_model', None)
+        if (not cfg.CONF.notify_security_groups_by_host or
+                binding_model is None):
+            return None
+        sg_binding_port = sg_db.SecurityGroupPortBinding.port_id
+        sg_binding_sgid = sg_db.SecurityGroupPortBinding.security_group_id
+
+        query = context.session.query(binding_model.host).distinct()
+        query = query.join(sg_db.SecurityGroupPortBinding,
+                           sg_binding_port == binding_model.port_id)
+        if remote:
+            sgr = sg_db.SecurityGroupRule
+            query = query.join(sgr, sgr.security_group_id == sg_binding_sgid)
+            query = query.filter(sgr.remote_group_id.in_(sg_ids))
         else:
-            self.notifier.security_groups_member_updated(
-                context, port.get(ext_sg.SECURITYGROUPS))
+            query = query.filter(sg_binding_sgid.in_(sg_ids))
+        # Ports not bound yet get their rules once bound
+        return set(host for host, in query if host)
 
 
 class SecurityGroupServerRpcCallbackMixin(object):
@@ -138,7 +300,47 @@ class SecurityGroupServerRpcCallbackMixin(object):
         :returns: port correspond to the devices with security group rules
         """
         devices = kwargs.get('devices')
+        ports = self._get_ports_for_devices(devices)
+        return self._security_group_rules_for_ports(context, ports)
+
+    def security_group_info_for_devices(self, context, **kwargs):
+        """Return security group rules and members for each port.
+
+        Unlike security_group_rules_for_devices, remote_group_id rules are
+        not expanded per port. The rules are returned once per security
+        group, along with the member IPs of the remote groups they refer to.
+
+        :params devices: list of devices
+        :returns: a dict with the following keys:
+            devices: port correspond to the devices with their provider
+                     rules in security_group_rules
+            security_groups: security group rules by security group id
+            sg_member_ips: member IPs of the remote groups by security
+                           group id and ethertype
+        """
+        devices = kwargs.get('devices')
+        ports = self._get_ports_for_devices(devices)
+        sg_ids = set()
+        for port in ports.values():
+            sg_ids.update(port.get(ext_sg.SECURITYGROUPS) or [])
+        rules = self._get_security_group_rules(context, sg_ids)
 
+        remote_group_ids = set()
+        for port in ports.values():
+            source_groups = set()
+            for sg_id in port.get(ext_sg.SECURITYGROUPS) or []:
+                source_groups.update(rule['remote_group_id']
+                                     for rule in rules[sg_id]
+                                     if rule.get('remote_group_id'))
+            port['security_group_source_groups'] = list(source_groups)
+            remote_group_ids |= source_groups
+        self._apply_provider_rule(context, ports)
+        return {'devices': ports,
+                'security_groups': rules,
+                'sg_member_ips': self._get_security_group_member_ips(
+                    context, remote_group_ids)}
+
+    def _get_ports_for_devices(self, devices):
         ports = {}
         for device in devices:
             port = self.get_port_from_device(device)
@@ -147,7 +349,38 @@ class SecurityGroupServerRpcCallbackMixin(object):
             if port['device_owner'].startswith('network:'):
                 continue
             ports[port['id']] = port
-        return self._security_group_rules_for_ports(context, ports)
+        return ports
+
+    def _get_security_group_rules(self, context, sg_ids):
+        generation = rule_cache.generation
+        rules, missing = rule_cache.get_rules(sg_ids)
+        if missing:
+            compiled = dict((sg_id, []) for sg_id in missing)
+            sgr_sgid = sg_db.SecurityGroupRule.security_group_id
+            query = context.session.query(sg_db.SecurityGroupRule)
+            query = query.filter(sgr_sgid.in_(missing))
+            for rule_in_db in query:
+                compiled[rule_in_db['security_group_id']].append(
+                    self._make_rule_dict(rule_in_db))
+            rule_cache.set_rules(compiled, generation)
+            rules.update(compiled)
+        return rules
+
+    def _get_security_group_member_ips(self, context, sg_ids):
+        generation = rule_cache.generation
+        members, missing = rule_cache.get_members(sg_ids)
+        if missing:
+            compiled = {}
+            ips = self._select_ips_for_remote_group(context, missing)
+            for sg_id, sg_ips in ips.iteritems():
+                member_ips = compiled[sg_id] = {q_const.IPv4: [],
+                                                q_const.IPv6: []}
+                for ip in sg_ips:
+                    version = netaddr.IPNetwork(ip).version
+                    member_ips['IPv%s' % version].append(ip)
+            rule_cache.set_members(compiled, generation)
+            members.update(compiled)
+        return members
 
     def _select_rules_for_ports(self, context, ports):
         if not ports:
@@ -293,20 +526,24 @@ class SecurityGroupServerRpcCallbackMixin(object):
         for (binding, rule_in_db) in rules_in_db:
             port_id = binding['port_id']
             port = ports[port_id]
-            direction = rule_in_db['direction']
-            rule_dict = {
-                'security_group_id': rule_in_db['security_group_id'],
-                'direction': direction,
-                'ethertype': rule_in_db['ethertype'],
-            }
-            for key in ('protocol', 'port_range_min', 'port_range_max',
-                        'remote_ip_prefix', 'remote_group_id'):
-                if rule_in_db.get(key):
-                    if key == 'remote_ip_prefix':
-                        direction_ip_prefix = DIRECTION_IP_PREFIX[direction]
-                        rule_dict[direction_ip_prefix] = rule_in_db[key]
-                        continue
-                    rule_dict[key] = rule_in_db[key]
-            port['security_group_rules'].append(rule_dict)
+            port['security_group_rules'].append(
+                self._make_rule_dict(rule_in_db))
         self._apply_provider_rule(context, ports)
         return self._convert_remote_group_id_to_ip_prefix(context, ports)
+
+    def _make_rule_dict(self, rule_in_db):
+        direction = rule_in_db['direction']
+        rule_dict = {
+            'security_group_id': rule_in_db['security_group_id'],
+            'direction': direction,
+            'ethertype': rule_in_db['ethertype'],
+        }
+        for key in ('protocol', 'port_range_min', 'port_range_max',
+                    'remote_ip_prefix', 'remote_group_id'):
+            if rule_in_db.get(key):
+                if key == 'remote_ip_prefix':
+                    direction_ip_prefix = DIRECTION_IP_PREFIX[direction]
+                    rule_dict[direction_ip_prefix] = rule_in_db[key]
+                    continue
+                rule_dict[key] = rule_in_db[key]
+        return rule_dict
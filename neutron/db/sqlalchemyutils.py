@@ -16,6 +16,7 @@
 #    under the License.
 
 import sqlalchemy
+from sqlalchemy import orm
 from sqlalchemy.orm.properties import RelationshipProperty
 
 from neutron.common import exceptions as q_exc
@@ -25,7 +26,23 @@ from neutron.openstack.common import log as logging
 LOG = logging.getLogger(__name__)
 
 
-def paginate_query(query, model, limit, sorts, marker_obj=None):
+def _get_marker_subqueries(model, sorts, marker_id):
+    # Read the sort values of the marker row within the query of the page
+    pk_name = model.__table__.primary_key.columns.keys()[0]
+    marker_model = orm.aliased(model)
+    marker_values = []
+    for sort_key, _sort_direction in sorts:
+        if sort_key == pk_name:
+            marker_values.append(marker_id)
+            continue
+        marker_values.append(
+            sqlalchemy.sql.select([getattr(marker_model, sort_key)]).where(
+                getattr(marker_model, pk_name) == marker_id).as_scalar())
+    return marker_values
+
+
+def paginate_query(query, model, limit, sorts, marker_obj=None,
+                   marker_id=None):
     """Returns a query with sorting / pagination criteria added.
 
     Pagination works by requiring a unique sort key, specified by sorts.
@@ -43,7 +60,10 @@ def paginate_query(query, model, limit, sorts, marker_obj=None):
 
     Typically, the id of the last row is used as the client-facing pagination
     marker, then the actual marker object must be fetched from the db and
-    passed in to us as marker.
+    passed in to us as marker. Alternatively, the primary key of the marker
+    can be passed in as marker_id: the sort values of the marker row are
+    then read by subqueries of the page query, so that a page is fetched
+    by a single query. An unknown marker_id gives an empty page.
 
     :param query: the query object to which we should add paging/sorting
     :param model: the ORM model class
@@ -52,6 +72,8 @@ def paginate_query(query, model, limit, sorts, marker_obj=None):
                  be sorted
     :param marker: the last item of the previous page; we returns the next
                     results after this value.
+    :param marker_id: the primary key of the last item of the previous page,
+                      used instead of marker.
     :rtype: sqlalchemy.orm.query.Query
     :return: The query with sorting/pagination added.
     """
@@ -82,8 +104,11 @@ def paginate_query(query, model, limit, sorts, marker_obj=None):
         query = query.order_by(sort_dir_func(sort_key_attr))
 
     # Add pagination
-    if marker_obj:
-        marker_values = [getattr(marker_obj, sort[0]) for sort in sorts]
+    if marker_obj or marker_id:
+        if marker_obj:
+            marker_values = [getattr(marker_obj, sort[0]) for sort in sorts]
+        else:
+            marker_values = _get_marker_subqueries(model, sorts, marker_id)
 
         # Build up an array of sort criteria as in the docstring
         criteria_list = []
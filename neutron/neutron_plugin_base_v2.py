@@ -325,3 +325,24 @@ class NeutronPluginBaseV2(object):
         :param id: UUID representing the port to delete.
         """
         pass
+
+    def start_rpc_listener(self):
+        """Start the RPC listener of the plugin.
+
+        Most plugins start an RPC listener implicitly on initialization.
+        The plugins implementing this method start it when it is called
+        instead, which lets the server run it in separate processes (see
+        the rpc_workers option).
+
+        :returns: the value returned by consume_in_thread, or a list of
+                  them for a plugin delegating to several plugins
+
+        .. note:: this method is optional, as it was not part of the originally
+                  defined plugin API.
+        """
+        raise NotImplementedError
+
+    def rpc_workers_supported(self):
+        """Return whether the plugin implements start_rpc_listener."""
+        return (self.__class__.start_rpc_listener !=
+                NeutronPluginBaseV2.start_rpc_listener)
@@ -53,6 +53,7 @@ import socket
 from oslo.config import cfg
 
 from neutron.api import extensions as neutron_extensions
+from neutron.api.v2 import attributes
 from neutron.api.rpc.agentnotifiers import dhcp_rpc_agent_api
 from neutron.common import constants as const
 from neutron.common import exceptions
@@ -689,8 +690,6 @@ class NeutronRestProxyV2(db_base_plugin_v2.NeutronDbPluginV2,
         with context.session.begin(subtransactions=True):
             ports = super(NeutronRestProxyV2, self).get_ports(context, filters,
                                                               fields)
-            for port in ports:
-                self._extend_port_dict_binding(context, port)
         return [self._fields(port, fields) for port in ports]
 
     def update_port(self, context, port_id, port):
@@ -1276,6 +1275,19 @@ class NeutronRestProxyV2(db_base_plugin_v2.NeutronDbPluginV2,
         return data
 
     def _extend_port_dict_binding(self, context, port):
+        hostid = porttracker_db.get_port_hostid(context, port['id'])
+        return self._update_port_dict_binding(port, hostid)
+
+    def _bsn_extend_ports_dict_binding(self, context, ports, ports_db):
+        # The host of each port is loaded with the port
+        for port, port_db in zip(ports, ports_db):
+            hostid = port_db.portbinding and port_db.portbinding.host
+            self._update_port_dict_binding(port, hostid)
+
+    db_base_plugin_v2.NeutronDbPluginV2.register_dict_extend_batch_funcs(
+        attributes.PORTS, ['_bsn_extend_ports_dict_binding'])
+
+    def _update_port_dict_binding(self, port, hostid):
         cfg_vif_type = cfg.CONF.NOVA.vif_type.lower()
         if not cfg_vif_type in (portbindings.VIF_TYPE_OVS,
                                 portbindings.VIF_TYPE_IVS):
@@ -1283,8 +1295,6 @@ class NeutronRestProxyV2(db_base_plugin_v2.NeutronDbPluginV2,
                           "[%s]. Defaulting to ovs. "),
                         cfg_vif_type)
             cfg_vif_type = portbindings.VIF_TYPE_OVS
-        hostid = porttracker_db.get_port_hostid(context,
-                                                port['id'])
         if hostid:
             override = self._check_hostvif_override(hostid)
             if override:
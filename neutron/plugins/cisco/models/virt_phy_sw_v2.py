@@ -53,7 +53,7 @@ class VirtualPhysicalSwitchModelV2(neutron_plugin_base_v2.NeutronPluginBaseV2):
     _methods_to_delegate = ['create_network_bulk',
                             'get_network', 'get_networks',
                             'create_port_bulk',
-                            'get_port', 'get_ports',
+                            'get_port', 'get_ports', 'get_port_bindings',
                             'create_subnet', 'create_subnet_bulk',
                             'delete_subnet', 'update_subnet',
                             'get_subnet', 'get_subnets',
@@ -80,6 +80,12 @@ class VirtualPhysicalSwitchModelV2(neutron_plugin_base_v2.NeutronPluginBaseV2):
             self.supported_extension_aliases.extend(
                 self._plugins[const.VSWITCH_PLUGIN].
                 supported_extension_aliases)
+        # The server only knows the Cisco plugin, start the RPC listener
+        # that the vswitch plugin leaves to the server.
+        vswitch_plugin = self._plugins.get(const.VSWITCH_PLUGIN)
+        supported = getattr(vswitch_plugin, 'rpc_workers_supported', None)
+        if supported and supported():
+            vswitch_plugin.start_rpc_listener()
         # At this point, all the database models should have been loaded. It's
         # possible that configure_db() may have been called by one of the
         # plugins loaded in above. Otherwise, this call is to make sure that
@@ -0,0 +1,214 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Allocation of segmentation IDs (VLAN tags, tunnel IDs, VXLAN VNIs) from the
+configured ranges without a table row per allocatable ID.
+"""
+
+import bisect
+import random
+
+from neutron.openstack.common.db import exception as db_exc
+from neutron.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+
+class SegmentAllocator(object):
+    """Allocate segmentation IDs from ranges, storing only allocated IDs.
+
+    The allocation table holds a row for each allocated segmentation ID,
+    inside or outside the configured ranges, and an ID of the ranges
+    without a row is free. Synchronizing with the ranges at startup is
+    then a single statement, whatever the size of the ranges.
+
+    Tenant allocations pick random IDs of the ranges, weighted by the
+    size of each range, and keep a free one at random, so that concurrent
+    allocations rarely compete for the same row. Nearly full ranges are
+    then scanned in order for the remaining free IDs. The row of an ID
+    allocated meanwhile by a concurrent transaction is detected by the
+    unique constraint of the table when inserting it.
+
+    :param model: the allocation model, with an allocated column.
+    :param id_attr: the name of the segmentation ID column of model.
+    :param ranges: a dict of the (min, max) ranges of each pool, a pool
+                   being a physical network, or None for tunnels.
+    :param pool_attr: the name of the pool column of model, if any.
+    """
+
+    # IDs sampled by each attempt of allocate, and attempts before scanning
+    SAMPLE_SIZE = 16
+    SAMPLE_ATTEMPTS = 3
+
+    def __init__(self, model, id_attr, ranges, pool_attr=None):
+        self.model = model
+        self.id_attr = id_attr
+        self.pool_attr = pool_attr
+        self.ranges = []
+        self._offsets = []
+        self.size = 0
+        for pool in sorted(ranges):
+            for seg_min, seg_max in ranges[pool]:
+                self.ranges.append((pool, seg_min, seg_max))
+                self._offsets.append(self.size)
+                self.size += seg_max + 1 - seg_min
+
+    def _filter(self, query, pool):
+        if self.pool_attr:
+            query = query.filter_by(**{self.pool_attr: pool})
+        return query
+
+    def _create(self, seg_id, pool, allocated):
+        kwargs = {self.id_attr: seg_id}
+        if self.pool_attr:
+            kwargs[self.pool_attr] = pool
+        alloc = self.model(**kwargs)
+        alloc.allocated = allocated
+        return alloc
+
+    def in_ranges(self, seg_id, pool=None):
+        for range_pool, seg_min, seg_max in self.ranges:
+            if range_pool == pool and seg_min <= seg_id <= seg_max:
+                return True
+        return False
+
+    def sync(self, session):
+        """Delete the unallocated rows left by releases into the pool."""
+        with session.begin(subtransactions=True):
+            count = (session.query(self.model).
+                     filter_by(allocated=False).
+                     delete(synchronize_session=False))
+        if count:
+            LOG.debug(_("Removed %(count)s unallocated %(table)s rows"),
+                      {'count': count, 'table': self.model.__tablename__})
+
+    def get(self, session, seg_id, pool=None):
+        """Return the allocation of seg_id, or None if it is unknown.
+
+        A free ID of the ranges is returned as an unallocated instance
+        which is not added to session.
+        """
+        alloc = self._filter(session.query(self.model).
+                             filter_by(**{self.id_attr: seg_id}),
+                             pool).first()
+        if alloc is None and self.in_ranges(seg_id, pool):
+            alloc = self._create(seg_id, pool, False)
+        return alloc
+
+    def _insert(self, session, seg_id, pool):
+        """Insert the allocated row of seg_id, returning False if it exists.
+
+        The row is inserted in a savepoint, so that the transaction can go
+        on when a concurrent one inserted it first.
+        """
+        alloc = self._create(seg_id, pool, True)
+        if session.get_bind().dialect.name == 'sqlite':
+            # pysqlite does not support savepoints, the transaction fails
+            # on a concurrent insert
+            session.add(alloc)
+            return True
+        try:
+            with session.begin_nested():
+                session.add(alloc)
+        except db_exc.DBDuplicateEntry:
+            LOG.debug(_("%(table)s row of %(seg_id)s inserted concurrently"),
+                      {'table': self.model.__tablename__, 'seg_id': seg_id})
+            return False
+        return True
+
+    def reserve(self, session, seg_id, pool=None):
+        """Mark seg_id allocated, returning False if it already was."""
+        with session.begin(subtransactions=True):
+            alloc = self._filter(session.query(self.model).
+                                 filter_by(**{self.id_attr: seg_id}).
+                                 with_lockmode('update'),
+                                 pool).first()
+            if alloc is None:
+                return self._insert(session, seg_id, pool)
+            elif alloc.allocated:
+                return False
+            else:
+                alloc.allocated = True
+        return True
+
+    def release(self, session, seg_id, pool=None):
+        """Delete the allocation of seg_id, returning whether it existed."""
+        with session.begin(subtransactions=True):
+            count = self._filter(session.query(self.model).
+                                 filter_by(**{self.id_attr: seg_id}),
+                                 pool).delete(synchronize_session=False)
+        return bool(count)
+
+    def allocate(self, session):
+        """Allocate a free ID of the ranges, returning (pool, seg_id).
+
+        None is returned when every ID of the ranges is allocated.
+        """
+        with session.begin(subtransactions=True):
+            for attempt in range(self.SAMPLE_ATTEMPTS):
+                allocation = self._sample_free(session)
+                if allocation and self._insert(session, allocation[1],
+                                               allocation[0]):
+                    return allocation
+            for pool, seg_min, seg_max in self.ranges:
+                seg_id = self._scan(session, pool, seg_min, seg_max)
+                while seg_id is not None:
+                    if self._insert(session, seg_id, pool):
+                        return pool, seg_id
+                    # Allocated concurrently, which the rows read by this
+                    # transaction may not show
+                    seg_id = self._scan(session, pool, seg_id + 1, seg_max)
+
+    def _sample_free(self, session):
+        # Rows left unallocated by older releases are removed by sync, so
+        # that every row found here is an allocated ID
+        if self.size <= self.SAMPLE_SIZE:
+            indexes = range(self.size)
+            random.shuffle(indexes)
+        else:
+            indexes = random.sample(xrange(self.size), self.SAMPLE_SIZE)
+        candidates = {}
+        for index in indexes:
+            position = bisect.bisect_right(self._offsets, index) - 1
+            pool, seg_min, seg_max = self.ranges[position]
+            seg_id = seg_min + index - self._offsets[position]
+            candidates.setdefault(pool, []).append(seg_id)
+
+        free = []
+        id_column = getattr(self.model, self.id_attr)
+        for pool, seg_ids in candidates.iteritems():
+            query = self._filter(session.query(id_column).
+                                 filter(id_column.in_(seg_ids)), pool)
+            allocated = set(row[0] for row in query)
+            free.extend((pool, seg_id) for seg_id in seg_ids
+                        if seg_id not in allocated)
+        if free:
+            return random.choice(free)
+
+    def _scan(self, session, pool, seg_min, seg_max):
+        id_column = getattr(self.model, self.id_attr)
+        query = self._filter(session.query(id_column).
+                             filter(id_column.between(seg_min, seg_max)),
+                             pool)
+        expected = seg_min
+        for row in query.order_by(id_column):
+            if row[0] != expected:
+                break
+            expected += 1
+        if expected <= seg_max:
+            return expected
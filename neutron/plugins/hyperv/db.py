@@ -114,6 +114,16 @@ class HyperVPluginDB(object):
         except exc.NoResultFound:
             return
 
+    def get_network_bindings(self, session, network_ids):
+        """Get the bindings of several networks, keyed by network id."""
+        if not network_ids:
+            return {}
+        session = session or db_api.get_session()
+        binding_q = session.query(hyperv_model.NetworkBinding)
+        binding_q = binding_q.filter(
+            hyperv_model.NetworkBinding.network_id.in_(network_ids))
+        return dict((binding.network_id, binding) for binding in binding_q)
+
     def set_port_status(self, port_id, status):
         session = db_api.get_session()
         try:
@@ -257,6 +257,20 @@ class HyperVNeutronPlugin(agents_db.AgentDbMixin,
     def _extend_network_dict_provider(self, context, network):
         binding = self._db.get_network_binding(
             context.session, network['id'])
+        self._update_network_dict_provider(network, binding)
+
+    def _hyperv_extend_networks_dict_provider(self, context, networks,
+                                              networks_db):
+        bindings = self._db.get_network_bindings(
+            context.session, [network['id'] for network in networks])
+        for network in networks:
+            self._update_network_dict_provider(network,
+                                               bindings.get(network['id']))
+
+    db_base_plugin_v2.NeutronDbPluginV2.register_dict_extend_batch_funcs(
+        attributes.NETWORKS, ['_hyperv_extend_networks_dict_provider'])
+
+    def _update_network_dict_provider(self, network, binding):
         network[provider.NETWORK_TYPE] = binding.network_type
         p = self._network_providers_map[binding.network_type]
         p.extend_network_dict(network, binding)
@@ -289,12 +303,8 @@ class HyperVNeutronPlugin(agents_db.AgentDbMixin,
         return self._fields(net, fields)
 
     def get_networks(self, context, filters=None, fields=None):
-        nets = super(HyperVNeutronPlugin, self).get_networks(
-            context, filters, None)
-        for net in nets:
-            self._extend_network_dict_provider(context, net)
-
-        return [self._fields(net, fields) for net in nets]
+        return super(HyperVNeutronPlugin, self).get_networks(
+            context, filters, fields)
 
     def create_port(self, context, port):
         port_data = port['port']
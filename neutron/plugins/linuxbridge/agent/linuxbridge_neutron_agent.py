@@ -794,7 +794,7 @@ class LinuxBridgeNeutronAgentRPC(sg_rpc.SecurityGroupAgentRpcMixin):
             'start_flag': True}
 
         self.setup_rpc(interface_mappings.values())
-        self.init_firewall()
+        self.init_firewall(defer_refresh_firewall=True)
 
     def _report_state(self):
         try:
@@ -832,7 +832,7 @@ class LinuxBridgeNeutronAgentRPC(sg_rpc.SecurityGroupAgentRpcMixin):
         # Define the listening consumers for the agent
         consumers = [[topics.PORT, topics.UPDATE],
                      [topics.NETWORK, topics.DELETE],
-                     [topics.SECURITY_GROUP, topics.UPDATE]]
+                     [topics.SECURITY_GROUP, topics.UPDATE, cfg.CONF.host]]
         if cfg.CONF.VXLAN.l2_population:
             consumers.append([topics.L2POPULATION,
                               topics.UPDATE, cfg.CONF.host])
@@ -864,20 +864,21 @@ class LinuxBridgeNeutronAgentRPC(sg_rpc.SecurityGroupAgentRpcMixin):
         return (resync_a | resync_b)
 
     def treat_devices_added(self, devices):
-        resync = False
         self.prepare_devices_filter(devices)
-        for device in devices:
+        try:
+            devices_details_list = self.plugin_rpc.get_devices_details_list(
+                self.context, list(devices), self.agent_id)
+        except Exception as e:
+            LOG.debug(_("Unable to get port details for "
+                        "%(devices)s: %(e)s"),
+                      {'devices': devices, 'e': e})
+            # resync is needed
+            return True
+        devices_up = []
+        devices_down = []
+        for details in devices_details_list:
+            device = details['device']
             LOG.debug(_("Port %s added"), device)
-            try:
-                details = self.plugin_rpc.get_device_details(self.context,
-                                                             device,
-                                                             self.agent_id)
-            except Exception as e:
-                LOG.debug(_("Unable to get port details for "
-                            "%(device)s: %(e)s"),
-                          {'device': device, 'e': e})
-                resync = True
-                continue
             if 'port_id' in details:
                 LOG.info(_("Port %(device)s updated. Details: %(details)s"),
                          {'device': device, 'details': details})
@@ -896,43 +897,52 @@ class LinuxBridgeNeutronAgentRPC(sg_rpc.SecurityGroupAgentRpcMixin):
                                                  details['physical_network'],
                                                  segmentation_id,
                                                  details['port_id']):
-
-                        # update plugin about port status
-                        self.plugin_rpc.update_device_up(self.context,
-                                                         device,
-                                                         self.agent_id,
-                                                         cfg.CONF.host)
+                        devices_up.append(device)
                     else:
-                        self.plugin_rpc.update_device_down(self.context,
-                                                           device,
-                                                           self.agent_id,
-                                                           cfg.CONF.host)
+                        devices_down.append(device)
                 else:
                     self.remove_port_binding(details['network_id'],
                                              details['port_id'])
             else:
                 LOG.info(_("Device %s not defined on plugin"), device)
-        return resync
+        # update plugin about port status
+        try:
+            if devices_up:
+                self.plugin_rpc.update_devices_up(self.context,
+                                                  devices_up,
+                                                  self.agent_id,
+                                                  cfg.CONF.host)
+            if devices_down:
+                self.plugin_rpc.update_devices_down(self.context,
+                                                    devices_down,
+                                                    self.agent_id,
+                                                    cfg.CONF.host)
+        except Exception as e:
+            LOG.debug(_("Unable to update status of ports "
+                        "%(devices)s: %(e)s"),
+                      {'devices': devices_up + devices_down, 'e': e})
+            return True
+        return False
 
     def treat_devices_removed(self, devices):
         resync = False
         self.remove_devices_filter(devices)
-        for device in devices:
+        try:
+            devices_details_list = self.plugin_rpc.update_devices_down(
+                self.context, list(devices), self.agent_id, cfg.CONF.host)
+        except Exception as e:
+            LOG.debug(_("port_removed failed for %(devices)s: %(e)s"),
+                      {'devices': devices, 'e': e})
+            devices_details_list = []
+            resync = True
+        for details in devices_details_list:
+            device = details['device']
             LOG.info(_("Attachment %s removed"), device)
-            try:
-                details = self.plugin_rpc.update_device_down(self.context,
-                                                             device,
-                                                             self.agent_id,
-                                                             cfg.CONF.host)
-            except Exception as e:
-                LOG.debug(_("port_removed failed for %(device)s: %(e)s"),
-                          {'device': device, 'e': e})
-                resync = True
             if details['exists']:
                 LOG.info(_("Port %s updated."), device)
             else:
                 LOG.debug(_("Device %s not defined on plugin"), device)
-            self.br_mgr.remove_empty_bridges()
+        self.br_mgr.remove_empty_bridges()
         return resync
 
     def daemon_loop(self):
@@ -961,6 +971,8 @@ class LinuxBridgeNeutronAgentRPC(sg_rpc.SecurityGroupAgentRpcMixin):
                     # plugin
                     sync = self.process_network_devices(device_info)
                     devices = device_info['current']
+                # Apply the security group updates received meanwhile
+                self.refresh_pending_firewall()
             except Exception:
                 LOG.exception(_("Error in agent loop. Devices info: %s"),
                               device_info)
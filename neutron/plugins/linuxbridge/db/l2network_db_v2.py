@@ -14,6 +14,7 @@
 # limitations under the License.
 
 
+import sqlalchemy as sa
 from sqlalchemy.orm import exc
 
 from neutron.common import exceptions as q_exc
@@ -22,12 +23,18 @@ from neutron.db import models_v2
 from neutron.db import securitygroups_db as sg_db
 from neutron import manager
 from neutron.openstack.common import log as logging
+from neutron.plugins.common import segment_allocator
 from neutron.plugins.linuxbridge.common import config  # noqa
 from neutron.plugins.linuxbridge.common import constants
 from neutron.plugins.linuxbridge.db import l2network_models_v2
 
 LOG = logging.getLogger(__name__)
 
+# Allocator of the configured VLAN ranges, set by sync_network_states
+_network_state_allocator = segment_allocator.SegmentAllocator(
+    l2network_models_v2.NetworkState, 'vlan_id', {},
+    pool_attr='physical_network')
+
 
 def initialize():
     db.configure_db()
@@ -35,153 +42,57 @@ def initialize():
 
 def sync_network_states(network_vlan_ranges):
     """Synchronize network_states table with current configured VLAN ranges."""
-
-    session = db.get_session()
-    with session.begin():
-        # get existing allocations for all physical networks
-        allocations = dict()
-        states = (session.query(l2network_models_v2.NetworkState).
-                  all())
-        for state in states:
-            if state.physical_network not in allocations:
-                allocations[state.physical_network] = set()
-            allocations[state.physical_network].add(state)
-
-        # process vlan ranges for each configured physical network
-        for physical_network, vlan_ranges in network_vlan_ranges.iteritems():
-            # determine current configured allocatable vlans for this
-            # physical network
-            vlan_ids = set()
-            for vlan_range in vlan_ranges:
-                vlan_ids |= set(xrange(vlan_range[0], vlan_range[1] + 1))
-
-            # remove from table unallocated vlans not currently allocatable
-            if physical_network in allocations:
-                for state in allocations[physical_network]:
-                    try:
-                        # see if vlan is allocatable
-                        vlan_ids.remove(state.vlan_id)
-                    except KeyError:
-                        # it's not allocatable, so check if its allocated
-                        if not state.allocated:
-                            # it's not, so remove it from table
-                            LOG.debug(_("Removing vlan %(vlan_id)s on "
-                                        "physical network %(physical_network)s"
-                                        " from pool"),
-                                      {'vlan_id': state.vlan_id,
-                                       'physical_network': physical_network})
-                            session.delete(state)
-                del allocations[physical_network]
-
-            # add missing allocatable vlans to table
-            for vlan_id in sorted(vlan_ids):
-                state = l2network_models_v2.NetworkState(physical_network,
-                                                         vlan_id)
-                session.add(state)
-
-        # remove from table unallocated vlans for any unconfigured physical
-        # networks
-        for states in allocations.itervalues():
-            for state in states:
-                if not state.allocated:
-                    LOG.debug(_("Removing vlan %(vlan_id)s on physical "
-                                "network %(physical_network)s"
-                                " from pool"),
-                              {'vlan_id': state.vlan_id,
-                               'physical_network': physical_network})
-                    session.delete(state)
+    global _network_state_allocator
+    _network_state_allocator = segment_allocator.SegmentAllocator(
+        l2network_models_v2.NetworkState, 'vlan_id', network_vlan_ranges,
+        pool_attr='physical_network')
+    _network_state_allocator.sync(db.get_session())
 
 
 def get_network_state(physical_network, vlan_id):
     """Get state of specified network."""
 
     session = db.get_session()
-    try:
-        state = (session.query(l2network_models_v2.NetworkState).
-                 filter_by(physical_network=physical_network,
-                           vlan_id=vlan_id).
-                 one())
-        return state
-    except exc.NoResultFound:
-        return None
+    return _network_state_allocator.get(session, vlan_id, physical_network)
 
 
 def reserve_network(session):
-    with session.begin(subtransactions=True):
-        state = (session.query(l2network_models_v2.NetworkState).
-                 filter_by(allocated=False).
-                 with_lockmode('update').
-                 first())
-        if not state:
-            raise q_exc.NoNetworkAvailable()
-        LOG.debug(_("Reserving vlan %(vlan_id)s on physical network "
-                    "%(physical_network)s from pool"),
-                  {'vlan_id': state.vlan_id,
-                   'physical_network': state.physical_network})
-        state.allocated = True
-    return (state.physical_network, state.vlan_id)
+    allocation = _network_state_allocator.allocate(session)
+    if not allocation:
+        raise q_exc.NoNetworkAvailable()
+    physical_network, vlan_id = allocation
+    LOG.debug(_("Reserving vlan %(vlan_id)s on physical network "
+                "%(physical_network)s from pool"),
+              {'vlan_id': vlan_id,
+               'physical_network': physical_network})
+    return allocation
 
 
 def reserve_specific_network(session, physical_network, vlan_id):
-    with session.begin(subtransactions=True):
-        try:
-            state = (session.query(l2network_models_v2.NetworkState).
-                     filter_by(physical_network=physical_network,
-                               vlan_id=vlan_id).
-                     with_lockmode('update').
-                     one())
-            if state.allocated:
-                if vlan_id == constants.FLAT_VLAN_ID:
-                    raise q_exc.FlatNetworkInUse(
-                        physical_network=physical_network)
-                else:
-                    raise q_exc.VlanIdInUse(vlan_id=vlan_id,
-                                            physical_network=physical_network)
-            LOG.debug(_("Reserving specific vlan %(vlan_id)s on physical "
-                        "network %(physical_network)s from pool"),
-                      {'vlan_id': vlan_id,
-                       'physical_network': physical_network})
-            state.allocated = True
-        except exc.NoResultFound:
-            LOG.debug(_("Reserving specific vlan %(vlan_id)s on physical "
-                        "network %(physical_network)s outside pool"),
-                      {'vlan_id': vlan_id,
-                       'physical_network': physical_network})
-            state = l2network_models_v2.NetworkState(physical_network, vlan_id)
-            state.allocated = True
-            session.add(state)
+    if not _network_state_allocator.reserve(session, vlan_id,
+                                            physical_network):
+        if vlan_id == constants.FLAT_VLAN_ID:
+            raise q_exc.FlatNetworkInUse(physical_network=physical_network)
+        else:
+            raise q_exc.VlanIdInUse(vlan_id=vlan_id,
+                                    physical_network=physical_network)
+    LOG.debug(_("Reserving specific vlan %(vlan_id)s on physical "
+                "network %(physical_network)s"),
+              {'vlan_id': vlan_id,
+               'physical_network': physical_network})
 
 
 def release_network(session, physical_network, vlan_id, network_vlan_ranges):
-    with session.begin(subtransactions=True):
-        try:
-            state = (session.query(l2network_models_v2.NetworkState).
-                     filter_by(physical_network=physical_network,
-                               vlan_id=vlan_id).
-                     with_lockmode('update').
-                     one())
-            state.allocated = False
-            inside = False
-            for vlan_range in network_vlan_ranges.get(physical_network, []):
-                if vlan_id >= vlan_range[0] and vlan_id <= vlan_range[1]:
-                    inside = True
-                    break
-            if inside:
-                LOG.debug(_("Releasing vlan %(vlan_id)s on physical network "
-                            "%(physical_network)s to pool"),
-                          {'vlan_id': vlan_id,
-                           'physical_network': physical_network})
-            else:
-                LOG.debug(_("Releasing vlan %(vlan_id)s on physical network "
-                          "%(physical_network)s outside pool"),
-                          {'vlan_id': vlan_id,
-                           'physical_network': physical_network})
-                session.delete(state)
-        except exc.NoResultFound:
-            LOG.warning(_("vlan_id %(vlan_id)s on physical network "
-                          "%(physical_network)s not found"),
-                        {'vlan_id': vlan_id,
-                         'physical_network': physical_network})
+    if _network_state_allocator.release(session, vlan_id, physical_network):
+        LOG.debug(_("Releasing vlan %(vlan_id)s on physical network "
+                    "%(physical_network)s"),
+                  {'vlan_id': vlan_id,
+                   'physical_network': physical_network})
+    else:
+        LOG.warning(_("vlan_id %(vlan_id)s on physical network "
+                      "%(physical_network)s not found"),
+                    {'vlan_id': vlan_id,
+                     'physical_network': physical_network})
 
 
 def add_network_binding(session, network_id, physical_network, vlan_id):
@@ -201,6 +112,34 @@ def get_network_binding(session, network_id):
         return
 
 
+def get_network_bindings(session, network_ids):
+    """Get the bindings of several networks, keyed by network id."""
+    if not network_ids:
+        return {}
+    bindings = (session.query(l2network_models_v2.NetworkBinding).
+                filter(l2network_models_v2.NetworkBinding.network_id.in_(
+                    network_ids)))
+    return dict((binding.network_id, binding) for binding in bindings)
+
+
+def get_ports_from_devices(devices):
+    """Get ports matching several device prefixes with a single query."""
+    LOG.debug(_("get_ports_from_devices() called"))
+    if not devices:
+        return {}
+    session = db.get_session()
+    ports = (session.query(models_v2.Port).
+             filter(sa.or_(*[models_v2.Port.id.startswith(device)
+                             for device in devices])).all())
+    result = {}
+    for device in devices:
+        for port in ports:
+            if port['id'].startswith(device):
+                result[device] = port
+                break
+    return result
+
+
 def get_port_from_device(device):
     """Get port from database."""
     LOG.debug(_("get_port_from_device() called"))
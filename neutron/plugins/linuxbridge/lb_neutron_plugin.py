@@ -62,7 +62,10 @@ class LinuxBridgeRpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
 
     # history
     #   1.1 Support Security Group RPC
-    RPC_API_VERSION = '1.1'
+    #   1.2 Support get_devices_details_list, update_devices_up and
+    #       update_devices_down
+    #   1.3 Support security_group_info_for_devices
+    RPC_API_VERSION = '1.3'
     # Device names start with "tap"
     TAP_PREFIX_LEN = 3
 
@@ -89,9 +92,31 @@ class LinuxBridgeRpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
         LOG.debug(_("Device %(device)s details requested from %(agent_id)s"),
                   {'device': device, 'agent_id': agent_id})
         port = self.get_port_from_device(device)
+        binding = port and db.get_network_binding(db_api.get_session(),
+                                                  port['network_id'])
+        return self._get_device_details(device, port, binding)
+
+    def get_devices_details_list(self, rpc_context, **kwargs):
+        """Agent requests details for a list of devices."""
+        agent_id = kwargs.get('agent_id')
+        devices = kwargs.get('devices', [])
+        LOG.debug(_("Details for devices %(devices)s requested from "
+                    "%(agent_id)s"),
+                  {'devices': devices, 'agent_id': agent_id})
+        ports = db.get_ports_from_devices(
+            [device[self.TAP_PREFIX_LEN:] for device in devices])
+        bindings = db.get_network_bindings(
+            db_api.get_session(),
+            set(port['network_id'] for port in ports.values()))
+        entries = []
+        for device in devices:
+            port = ports.get(device[self.TAP_PREFIX_LEN:])
+            binding = port and bindings.get(port['network_id'])
+            entries.append(self._get_device_details(device, port, binding))
+        return entries
+
+    def _get_device_details(self, device, port, binding):
         if port:
-            binding = db.get_network_binding(db_api.get_session(),
-                                             port['network_id'])
             (network_type,
              segmentation_id) = constants.interpret_vlan_id(binding.vlan_id)
             entry = {'device': device,
@@ -161,6 +186,18 @@ class LinuxBridgeRpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
         else:
             LOG.debug(_("%s can not be found in database"), device)
 
+    def update_devices_down(self, rpc_context, **kwargs):
+        """Devices no longer exist on agent."""
+        devices = kwargs.pop('devices', [])
+        return [self.update_device_down(rpc_context, device=device, **kwargs)
+                for device in devices]
+
+    def update_devices_up(self, rpc_context, **kwargs):
+        """Devices are up on agent."""
+        devices = kwargs.pop('devices', [])
+        return [self.update_device_up(rpc_context, device=device, **kwargs)
+                for device in devices]
+
 
 class AgentNotifierApi(proxy.RpcProxy,
                        sg_rpc.SecurityGroupAgentRpcApiMixin):
@@ -315,6 +352,20 @@ class LinuxBridgePluginV2(db_base_plugin_v2.NeutronDbPluginV2,
 
     def _extend_network_dict_provider(self, context, network):
         binding = db.get_network_binding(context.session, network['id'])
+        self._update_network_dict_provider(network, binding)
+
+    def _lb_extend_networks_dict_provider(self, context, networks,
+                                          networks_db):
+        bindings = db.get_network_bindings(
+            context.session, [network['id'] for network in networks])
+        for network in networks:
+            self._update_network_dict_provider(network,
+                                               bindings.get(network['id']))
+
+    db_base_plugin_v2.NeutronDbPluginV2.register_dict_extend_batch_funcs(
+        attributes.NETWORKS, ['_lb_extend_networks_dict_provider'])
+
+    def _update_network_dict_provider(self, network, binding):
         if binding.vlan_id == constants.FLAT_VLAN_ID:
             network[provider.NETWORK_TYPE] = svc_constants.TYPE_FLAT
             network[provider.PHYSICAL_NETWORK] = binding.physical_network
@@ -466,8 +517,6 @@ class LinuxBridgePluginV2(db_base_plugin_v2.NeutronDbPluginV2,
             nets = super(LinuxBridgePluginV2,
                          self).get_networks(context, filters, None, sorts,
                                             limit, marker, page_reverse)
-            for net in nets:
-                self._extend_network_dict_provider(context, net)
 
         return [self._fields(net, fields) for net in nets]
 
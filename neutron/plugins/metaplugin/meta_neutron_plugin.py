@@ -111,6 +111,23 @@ class MetaPluginV2(db_base_plugin_v2.NeutronDbPluginV2,
 
         self.default_flavor = cfg.CONF.META.default_flavor
 
+    def _get_rpc_plugins(self):
+        plugins = []
+        for plugin in self.plugins.values() + self.l3_plugins.values():
+            supported = getattr(plugin, 'rpc_workers_supported', None)
+            if plugin not in plugins and supported and supported():
+                plugins.append(plugin)
+        return plugins
+
+    def start_rpc_listener(self):
+        # The server only knows the metaplugin, start the RPC listeners
+        # that the flavor plugins leave to the server.
+        return [plugin.start_rpc_listener()
+                for plugin in self._get_rpc_plugins()]
+
+    def rpc_workers_supported(self):
+        return bool(self._get_rpc_plugins())
+
     def _load_plugin(self, plugin_provider):
         LOG.debug(_("Plugin location: %s"), plugin_provider)
         plugin_klass = importutils.import_class(plugin_provider)
@@ -13,6 +13,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import sqlalchemy as sa
 from sqlalchemy.orm import exc
 
 from neutron.db import api as db_api
@@ -27,6 +28,8 @@ from neutron.plugins.ml2 import models
 
 LOG = log.getLogger(__name__)
 
+UUID_LEN = 36
+
 
 def initialize():
     db_api.configure_db()
@@ -60,6 +63,24 @@ def get_network_segments(session, network_id):
                 for record in records]
 
 
+def get_networks_segments(session, network_ids):
+    """Get the segments of several networks, keyed by network id."""
+
+    if not network_ids:
+        return {}
+    with session.begin(subtransactions=True):
+        records = (session.query(models.NetworkSegment).
+                   filter(models.NetworkSegment.network_id.in_(network_ids)))
+        result = dict((network_id, []) for network_id in network_ids)
+        for record in records:
+            result[record.network_id].append(
+                {api.ID: record.id,
+                 api.NETWORK_TYPE: record.network_type,
+                 api.PHYSICAL_NETWORK: record.physical_network,
+                 api.SEGMENTATION_ID: record.segmentation_id})
+        return result
+
+
 def ensure_port_binding(session, port_id):
     with session.begin(subtransactions=True):
         try:
@@ -76,6 +97,20 @@ def ensure_port_binding(session, port_id):
         return record
 
 
+def add_port_bindings(session, port_ids):
+    """Add the unbound bindings of new ports, returned by port id."""
+    with session.begin(subtransactions=True):
+        records = {}
+        for port_id in port_ids:
+            records[port_id] = models.PortBinding(
+                port_id=port_id,
+                host='',
+                vif_type=portbindings.VIF_TYPE_UNBOUND,
+                cap_port_filter=False)
+            session.add(records[port_id])
+        return records
+
+
 def get_port(session, port_id):
     """Get port record for update within transcation."""
 
@@ -93,6 +128,44 @@ def get_port(session, port_id):
             return
 
 
+def get_ports(session, port_ids):
+    """Get port records within transaction.
+
+    port_ids may hold full ids or the truncated ids agents derive from
+    device names. All ports are fetched with a single query and returned
+    in a dict keyed by the requested id.
+    """
+
+    port_ids = set(port_ids)
+    if not port_ids:
+        return {}
+    full_ids = [port_id for port_id in port_ids
+                if len(port_id) == UUID_LEN]
+    prefixes = [port_id for port_id in port_ids
+                if len(port_id) != UUID_LEN]
+    criteria = [models_v2.Port.id.startswith(prefix) for prefix in prefixes]
+    if full_ids:
+        criteria.append(models_v2.Port.id.in_(full_ids))
+
+    with session.begin(subtransactions=True):
+        records = (session.query(models_v2.Port).
+                   filter(sa.or_(*criteria)).all())
+
+    result = {}
+    for record in records:
+        if record.id in port_ids:
+            result[record.id] = record
+    for prefix in prefixes:
+        matches = [record for record in records
+                   if record.id.startswith(prefix)]
+        if len(matches) == 1:
+            result[prefix] = matches[0]
+        elif matches:
+            LOG.error(_("Multiple ports have port_id starting with %s"),
+                      prefix)
+    return result
+
+
 def get_port_and_sgs(port_id):
     """Get port from database with security group info."""
 
@@ -121,6 +194,20 @@ def get_port_and_sgs(port_id):
         return port_dict
 
 
+def get_port_bindings(session, port_ids):
+    """Get the host and VIF type bound to several ports, keyed by port id."""
+
+    if not port_ids:
+        return {}
+    with session.begin(subtransactions=True):
+        query = (session.query(models.PortBinding.port_id,
+                               models.PortBinding.host,
+                               models.PortBinding.vif_type).
+                 filter(models.PortBinding.port_id.in_(port_ids)))
+        return dict((port_id, (host, vif_type))
+                    for port_id, host, vif_type in query)
+
+
 def get_port_binding_host(port_id):
     session = db_api.get_session()
     with session.begin(subtransactions=True):
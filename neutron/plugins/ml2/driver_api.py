@@ -496,6 +496,33 @@ class MechanismDriver(object):
         """
         pass
 
+    def create_ports_precommit(self, contexts):
+        """Allocate resources for several new ports.
+
+        :param contexts: list of PortContext instances, one per port.
+
+        Called inside transaction context on session for the ports of
+        a bulk create, in place of create_port_precommit. Call cannot
+        block. Raising an exception will result in a rollback of the
+        whole bulk create. The default implementation calls
+        create_port_precommit for each port.
+        """
+        for context in contexts:
+            self.create_port_precommit(context)
+
+    def create_ports_postcommit(self, contexts):
+        """Create several ports.
+
+        :param contexts: list of PortContext instances, one per port.
+
+        Called after the transaction of a bulk create completes, in
+        place of create_port_postcommit. Raising an exception will
+        result in the deletion of all the ports. The default
+        implementation calls create_port_postcommit for each port.
+        """
+        for context in contexts:
+            self.create_port_postcommit(context)
+
     def update_port_precommit(self, context):
         """Update resources of a port.
 
@@ -25,6 +25,7 @@ from neutron.db import api as db_api
 from neutron.db import model_base
 from neutron.openstack.common import log
 from neutron.plugins.common import constants as p_const
+from neutron.plugins.common import segment_allocator
 from neutron.plugins.common import utils as plugin_utils
 from neutron.plugins.ml2 import driver_api as api
 
@@ -46,15 +47,14 @@ cfg.CONF.register_opts(vlan_opts, "ml2_type_vlan")
 class VlanAllocation(model_base.BASEV2):
     """Represent allocation state of a vlan_id on a physical network.
 
-    If allocated is False, the vlan_id on the physical_network is
-    available for allocation to a tenant network. If allocated is
-    True, the vlan_id on the physical_network is in use, either as a
-    tenant or provider network.
+    A record exists for each vlan_id allocated on the physical_network,
+    either as a tenant or provider network, and allocated is True. A
+    vlan_id inside the pool described by VlanTypeDriver.network_vlan_ranges
+    without a record is available for allocation to a tenant network.
 
-    When an allocation is released, if the vlan_id for the
-    physical_network is inside the pool described by
-    VlanTypeDriver.network_vlan_ranges, then allocated is set to
-    False. If it is outside the pool, the record is deleted.
+    When an allocation is released, the record is deleted. Records with
+    allocated False, left by releases into the pool of older releases,
+    are deleted when the pool is synchronized.
     """
 
     __tablename__ = 'ml2_vlan_allocations'
@@ -93,64 +93,10 @@ class VlanTypeDriver(api.TypeDriver):
         LOG.info(_("Network VLAN ranges: %s"), self.network_vlan_ranges)
 
     def _sync_vlan_allocations(self):
-        session = db_api.get_session()
-        with session.begin(subtransactions=True):
-            # get existing allocations for all physical networks
-            allocations = dict()
-            allocs = (session.query(VlanAllocation).
-                      with_lockmode('update'))
-            for alloc in allocs:
-                if alloc.physical_network not in allocations:
-                    allocations[alloc.physical_network] = set()
-                allocations[alloc.physical_network].add(alloc)
-
-            # process vlan ranges for each configured physical network
-            for (physical_network,
-                 vlan_ranges) in self.network_vlan_ranges.items():
-                # determine current configured allocatable vlans for
-                # this physical network
-                vlan_ids = set()
-                for vlan_min, vlan_max in vlan_ranges:
-                    vlan_ids |= set(xrange(vlan_min, vlan_max + 1))
-
-                # remove from table unallocated vlans not currently
-                # allocatable
-                if physical_network in allocations:
-                    for alloc in allocations[physical_network]:
-                        try:
-                            # see if vlan is allocatable
-                            vlan_ids.remove(alloc.vlan_id)
-                        except KeyError:
-                            # it's not allocatable, so check if its allocated
-                            if not alloc.allocated:
-                                # it's not, so remove it from table
-                                LOG.debug(_("Removing vlan %(vlan_id)s on "
-                                            "physical network "
-                                            "%(physical_network)s from pool"),
-                                          {'vlan_id': alloc.vlan_id,
-                                           'physical_network':
-                                           physical_network})
-                                session.delete(alloc)
-                    del allocations[physical_network]
-
-                # add missing allocatable vlans to table
-                for vlan_id in sorted(vlan_ids):
-                    alloc = VlanAllocation(physical_network=physical_network,
-                                           vlan_id=vlan_id,
-                                           allocated=False)
-                    session.add(alloc)
-
-            # remove from table unallocated vlans for any unconfigured
-            # physical networks
-            for allocs in allocations.itervalues():
-                for alloc in allocs:
-                    if not alloc.allocated:
-                        LOG.debug(_("Removing vlan %(vlan_id)s on physical "
-                                    "network %(physical_network)s from pool"),
-                                  {'vlan_id': alloc.vlan_id,
-                                   'physical_network':
-                                   alloc.physical_network})
-                        session.delete(alloc)
+        self._allocator = segment_allocator.SegmentAllocator(
+            VlanAllocation, 'vlan_id', self.network_vlan_ranges,
+            pool_attr='physical_network')
+        self._allocator.sync(db_api.get_session())
 
     def get_type(self):
         return p_const.TYPE_VLAN
@@ -190,77 +136,36 @@ class VlanTypeDriver(api.TypeDriver):
     def reserve_provider_segment(self, session, segment):
         physical_network = segment[api.PHYSICAL_NETWORK]
         vlan_id = segment[api.SEGMENTATION_ID]
-        with session.begin(subtransactions=True):
-            try:
-                alloc = (session.query(VlanAllocation).
-                         filter_by(physical_network=physical_network,
-                                   vlan_id=vlan_id).
-                         with_lockmode('update').
-                         one())
-                if alloc.allocated:
-                    raise exc.VlanIdInUse(vlan_id=vlan_id,
-                                          physical_network=physical_network)
-                LOG.debug(_("Reserving specific vlan %(vlan_id)s on physical "
-                            "network %(physical_network)s from pool"),
-                          {'vlan_id': vlan_id,
-                           'physical_network': physical_network})
-                alloc.allocated = True
-            except sa.orm.exc.NoResultFound:
-                LOG.debug(_("Reserving specific vlan %(vlan_id)s on physical "
-                            "network %(physical_network)s outside pool"),
-                          {'vlan_id': vlan_id,
-                           'physical_network': physical_network})
-                alloc = VlanAllocation(physical_network=physical_network,
-                                       vlan_id=vlan_id,
-                                       allocated=True)
-                session.add(alloc)
+        if not self._allocator.reserve(session, vlan_id, physical_network):
+            raise exc.VlanIdInUse(vlan_id=vlan_id,
+                                  physical_network=physical_network)
+        LOG.debug(_("Reserving specific vlan %(vlan_id)s on physical "
+                    "network %(physical_network)s"),
+                  {'vlan_id': vlan_id,
+                   'physical_network': physical_network})
 
     def allocate_tenant_segment(self, session):
-        with session.begin(subtransactions=True):
-            alloc = (session.query(VlanAllocation).
-                     filter_by(allocated=False).
-                     with_lockmode('update').
-                     first())
-            if alloc:
-                LOG.debug(_("Allocating vlan %(vlan_id)s on physical network "
-                            "%(physical_network)s from pool"),
-                          {'vlan_id': alloc.vlan_id,
-                           'physical_network': alloc.physical_network})
-                alloc.allocated = True
-                return {api.NETWORK_TYPE: p_const.TYPE_VLAN,
-                        api.PHYSICAL_NETWORK: alloc.physical_network,
-                        api.SEGMENTATION_ID: alloc.vlan_id}
+        allocation = self._allocator.allocate(session)
+        if allocation:
+            physical_network, vlan_id = allocation
+            LOG.debug(_("Allocating vlan %(vlan_id)s on physical network "
+                        "%(physical_network)s from pool"),
+                      {'vlan_id': vlan_id,
+                       'physical_network': physical_network})
+            return {api.NETWORK_TYPE: p_const.TYPE_VLAN,
+                    api.PHYSICAL_NETWORK: physical_network,
+                    api.SEGMENTATION_ID: vlan_id}
 
     def release_segment(self, session, segment):
         physical_network = segment[api.PHYSICAL_NETWORK]
         vlan_id = segment[api.SEGMENTATION_ID]
-        with session.begin(subtransactions=True):
-            try:
-                alloc = (session.query(VlanAllocation).
-                         filter_by(physical_network=physical_network,
-                                   vlan_id=vlan_id).
-                         with_lockmode('update').
-                         one())
-                alloc.allocated = False
-                inside = False
-                for vlan_min, vlan_max in self.network_vlan_ranges.get(
-                    physical_network, []):
-                    if vlan_min <= vlan_id <= vlan_max:
-                        inside = True
-                        break
-                if not inside:
-                    session.delete(alloc)
-                    LOG.debug(_("Releasing vlan %(vlan_id)s on physical "
-                                "network %(physical_network)s outside pool"),
-                              {'vlan_id': vlan_id,
-                               'physical_network': physical_network})
-                else:
-                    LOG.debug(_("Releasing vlan %(vlan_id)s on physical "
-                                "network %(physical_network)s to pool"),
-                              {'vlan_id': vlan_id,
-                               'physical_network': physical_network})
-            except sa.orm.exc.NoResultFound:
-                LOG.warning(_("No vlan_id %(vlan_id)s found on physical "
-                              "network %(physical_network)s"),
-                            {'vlan_id': vlan_id,
-                             'physical_network': physical_network})
+        if self._allocator.release(session, vlan_id, physical_network):
+            LOG.debug(_("Releasing vlan %(vlan_id)s on physical "
+                        "network %(physical_network)s"),
+                      {'vlan_id': vlan_id,
+                       'physical_network': physical_network})
+        else:
+            LOG.warning(_("No vlan_id %(vlan_id)s found on physical "
+                          "network %(physical_network)s"),
+                        {'vlan_id': vlan_id,
+                         'physical_network': physical_network})
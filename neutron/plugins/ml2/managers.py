@@ -366,6 +366,34 @@ class MechanismManager(stevedore.named.NamedExtensionManager):
         """
         self._call_on_drivers("create_port_postcommit", context)
 
+    def create_ports_precommit(self, contexts):
+        """Notify all mechanism drivers during bulk port creation.
+
+        :raises: neutron.plugins.ml2.common.MechanismDriverError
+        if any mechanism driver create_ports_precommit call fails.
+
+        Called within the database transaction with the contexts of
+        all the ports. If a mechanism driver raises an exception, then
+        a MechanismDriverError is propogated to the caller, triggering
+        a rollback. There is no guarantee that all mechanism drivers
+        are called in this case.
+        """
+        self._call_on_drivers("create_ports_precommit", contexts)
+
+    def create_ports_postcommit(self, contexts):
+        """Notify all mechanism drivers of bulk port creation.
+
+        :raises: neutron.plugins.ml2.common.MechanismDriverError
+        if any mechanism driver create_ports_postcommit call fails.
+
+        Called after the database transaction with the contexts of all
+        the ports. Errors raised by mechanism drivers are left to
+        propagate to the caller, where the ports will be deleted,
+        triggering any required cleanup. There is no guarantee that
+        all mechanism drivers are called in this case.
+        """
+        self._call_on_drivers("create_ports_postcommit", contexts)
+
     def update_port_precommit(self, context):
         """Notify all mechanism drivers during port update.
 
@@ -88,6 +88,9 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
                                     "multi-provider", "allowed-address-pairs",
                                     "extra_dhcp_opt"]
 
+    # Model holding the host each port is bound to
+    port_binding_model = models.PortBinding
+
     @property
     def supported_extension_aliases(self):
         if not hasattr(self, '_aliases'):
@@ -120,11 +123,13 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
         )
         self.callbacks = rpc.RpcCallbacks(self.notifier, self.type_manager)
         self.topic = topics.PLUGIN
+
+    def start_rpc_listener(self):
         self.conn = c_rpc.create_connection(new=True)
         self.dispatcher = self.callbacks.create_rpc_dispatcher()
         self.conn.create_consumer(self.topic, self.dispatcher,
                                   fanout=False)
-        self.conn.consume_in_thread()
+        return self.conn.consume_in_thread()
 
     def _process_provider_segment(self, segment):
         network_type = self._get_attribute(segment, provider.NETWORK_TYPE)
@@ -176,10 +181,23 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
         return value
 
     def _extend_network_dict_provider(self, context, network):
-        id = network['id']
-        segments = db.get_network_segments(context.session, id)
+        segments = db.get_network_segments(context.session, network['id'])
+        self._update_network_dict_provider(network, segments)
+
+    def _ml2_extend_networks_dict_provider(self, context, networks,
+                                           networks_db):
+        segments = db.get_networks_segments(
+            context.session, [network['id'] for network in networks])
+        for network in networks:
+            self._update_network_dict_provider(network,
+                                               segments[network['id']])
+
+    db_base_plugin_v2.NeutronDbPluginV2.register_dict_extend_batch_funcs(
+        attributes.NETWORKS, ['_ml2_extend_networks_dict_provider'])
+
+    def _update_network_dict_provider(self, network, segments):
         if not segments:
-            LOG.error(_("Network %s has no segments"), id)
+            LOG.error(_("Network %s has no segments"), network['id'])
             network[provider.NETWORK_TYPE] = None
             network[provider.PHYSICAL_NETWORK] = None
             network[provider.SEGMENTATION_ID] = None
@@ -230,6 +248,13 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
         port[portbindings.CAPABILITIES] = {
             portbindings.CAP_PORT_FILTER: binding.cap_port_filter}
 
+    def get_port_bindings(self, context, port_ids):
+        """Return the binding attributes of several ports by port id."""
+        bindings = db.get_port_bindings(context.session, port_ids)
+        return dict((port_id, {portbindings.HOST_ID: host,
+                               portbindings.VIF_TYPE: vif_type})
+                    for port_id, (host, vif_type) in bindings.iteritems())
+
     def _delete_port_binding(self, mech_context):
         binding = mech_context._binding
         port = mech_context.current
@@ -361,14 +386,19 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
             nets = super(Ml2Plugin,
                          self).get_networks(context, filters, None, sorts,
                                             limit, marker, page_reverse)
-            for net in nets:
-                self._extend_network_dict_provider(context, net)
 
             nets = self._filter_nets_provider(context, nets, filters)
             nets = self._filter_nets_l3(context, nets, filters)
 
         return [self._fields(net, fields) for net in nets]
 
+    def get_networks_iter(self, context, filters=None, fields=None):
+        for nets in self._get_networks_chunks(context, filters):
+            nets = self._filter_nets_provider(context, nets, filters)
+            nets = self._filter_nets_l3(context, nets, filters)
+            for net in nets:
+                yield self._fields(net, fields)
+
     def delete_network(self, context, id):
         # REVISIT(rkukura) The super(Ml2Plugin, self).delete_network()
         # function is not used because it auto-deletes ports and
@@ -546,37 +576,57 @@ class Ml2Plugin(db_base_plugin_v2.NeutronDbPluginV2,
             LOG.error(_("mechanism_manager.delete_subnet_postcommit failed"))
 
     def create_port(self, context, port):
-        attrs = port['port']
-        attrs['status'] = const.PORT_STATUS_DOWN
+        return self.create_port_bulk(context, {'ports': [port]})[0]
+
+    def create_port_bulk(self, context, ports):
+        items = ports['ports']
+        for item in items:
+            item['port']['status'] = const.PORT_STATUS_DOWN
 
         session = context.session
         with session.begin(subtransactions=True):
-            self._ensure_default_security_group_on_port(context, port)
-            sgids = self._get_security_groups_on_port(context, port)
-            dhcp_opts = port['port'].get(edo_ext.EXTRADHCPOPTS, [])
-            result = super(Ml2Plugin, self).create_port(context, port)
-            self._process_port_create_security_group(context, result, sgids)
-            network = self.get_network(context, result['network_id'])
-            mech_context = driver_context.PortContext(self, context, result,
-                                                      network)
-            self._process_port_binding(mech_context, attrs)
-            result[addr_pair.ADDRESS_PAIRS] = (
-                self._process_create_allowed_address_pairs(
-                    context, result,
-                    attrs.get(addr_pair.ADDRESS_PAIRS)))
-            self._process_port_create_extra_dhcp_opts(context, result,
-                                                      dhcp_opts)
-            self.mechanism_manager.create_port_precommit(mech_context)
+            self._ensure_default_security_group_on_ports(context, items)
+            sgids = self._get_security_groups_on_ports(context, items)
+            dhcp_opts = [item['port'].get(edo_ext.EXTRADHCPOPTS, [])
+                         for item in items]
+            results = self._create_ports_db(context, items)
+            bindings = db.add_port_bindings(
+                session, [result['id'] for result in results])
+            networks = {}
+            mech_contexts = []
+            for item, result, port_sgids, port_dhcp_opts in zip(
+                    items, results, sgids, dhcp_opts):
+                attrs = item['port']
+                self._process_port_create_security_group(context, result,
+                                                         port_sgids)
+                network_id = result['network_id']
+                if network_id not in networks:
+                    networks[network_id] = self.get_network(context,
+                                                            network_id)
+                mech_context = driver_context.PortContext(
+                    self, context, result, networks[network_id],
+                    binding=bindings[result['id']])
+                self._process_port_binding(mech_context, attrs)
+                result[addr_pair.ADDRESS_PAIRS] = (
+                    self._process_create_allowed_address_pairs(
+                        context, result,
+                        attrs.get(addr_pair.ADDRESS_PAIRS)))
+                self._process_port_create_extra_dhcp_opts(context, result,
+                                                          port_dhcp_opts)
+                mech_contexts.append(mech_context)
+            self.mechanism_manager.create_ports_precommit(mech_contexts)
 
         try:
-            self.mechanism_manager.create_port_postcommit(mech_context)
+            self.mechanism_manager.create_ports_postcommit(mech_contexts)
         except ml2_exc.MechanismDriverError:
             with excutils.save_and_reraise_exception():
-                LOG.error(_("mechanism_manager.create_port_postcommit "
-                            "failed, deleting port '%s'"), result['id'])
-                self.delete_port(context, result['id'])
-        self.notify_security_groups_member_updated(context, result)
-        return result
+                port_ids = [result['id'] for result in results]
+                LOG.error(_("mechanism_manager.create_ports_postcommit "
+                            "failed, deleting ports %s"), port_ids)
+                for port_id in port_ids:
+                    self.delete_port(context, port_id)
+        self.notify_security_groups_members_updated(context, results)
+        return results
 
     def update_port(self, context, id, port):
         attrs = port['port']
@@ -201,6 +201,16 @@ def get_network_binding(session, network_id):
             filter_by(network_id=network_id).first())
 
 
+def get_network_bindings(session, network_ids):
+    """Get the bindings of several networks, keyed by network id."""
+    if not network_ids:
+        return {}
+    bindings = (session.query(mlnx_models_v2.NetworkBinding).
+                filter(mlnx_models_v2.NetworkBinding.network_id.in_(
+                    network_ids)))
+    return dict((binding.network_id, binding) for binding in bindings)
+
+
 def add_port_profile_binding(session, port_id, vnic_type):
     with session.begin(subtransactions=True):
         binding = mlnx_models_v2.PortProfileBinding(port_id, vnic_type)
@@ -212,6 +222,16 @@ def get_port_profile_binding(session, port_id):
             filter_by(port_id=port_id).first())
 
 
+def get_port_profile_bindings(session, port_ids):
+    """Get the profile bindings of several ports, keyed by port id."""
+    if not port_ids:
+        return {}
+    bindings = (session.query(mlnx_models_v2.PortProfileBinding).
+                filter(mlnx_models_v2.PortProfileBinding.port_id.in_(
+                    port_ids)))
+    return dict((binding.port_id, binding) for binding in bindings)
+
+
 def get_port_from_device(device):
     """Get port from database."""
     LOG.debug(_("get_port_from_device() called"))
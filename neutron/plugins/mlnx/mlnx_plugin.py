@@ -152,6 +152,20 @@ class MellanoxEswitchPlugin(db_base_plugin_v2.NeutronDbPluginV2,
 
     def _extend_network_dict_provider(self, context, network):
         binding = db.get_network_binding(context.session, network['id'])
+        self._update_network_dict_provider(network, binding)
+
+    def _mlnx_extend_networks_dict_provider(self, context, networks,
+                                            networks_db):
+        bindings = db.get_network_bindings(
+            context.session, [network['id'] for network in networks])
+        for network in networks:
+            self._update_network_dict_provider(network,
+                                               bindings.get(network['id']))
+
+    db_base_plugin_v2.NeutronDbPluginV2.register_dict_extend_batch_funcs(
+        attributes.NETWORKS, ['_mlnx_extend_networks_dict_provider'])
+
+    def _update_network_dict_provider(self, network, binding):
         network[provider.NETWORK_TYPE] = binding.network_type
         if binding.network_type == svc_constants.TYPE_FLAT:
             network[provider.PHYSICAL_NETWORK] = binding.physical_network
@@ -377,18 +391,32 @@ class MellanoxEswitchPlugin(db_base_plugin_v2.NeutronDbPluginV2,
             nets = super(MellanoxEswitchPlugin,
                          self).get_networks(context, filters, None, sorts,
                                             limit, marker, page_reverse)
-            for net in nets:
-                self._extend_network_dict_provider(context, net)
 
         return [self._fields(net, fields) for net in nets]
 
     def _extend_port_dict_binding(self, context, port):
         port_binding = db.get_port_profile_binding(context.session,
                                                    port['id'])
-        if port_binding:
-            port[portbindings.VIF_TYPE] = port_binding.vnic_type
         binding = db.get_network_binding(context.session,
                                          port['network_id'])
+        return self._update_port_dict_binding(port, port_binding, binding)
+
+    def _mlnx_extend_ports_dict_binding(self, context, ports, ports_db):
+        port_bindings = db.get_port_profile_bindings(
+            context.session, [port['id'] for port in ports])
+        bindings = db.get_network_bindings(
+            context.session, list(set(port['network_id'] for port in ports)))
+        for port in ports:
+            self._update_port_dict_binding(port,
+                                           port_bindings.get(port['id']),
+                                           bindings.get(port['network_id']))
+
+    db_base_plugin_v2.NeutronDbPluginV2.register_dict_extend_batch_funcs(
+        attributes.PORTS, ['_mlnx_extend_ports_dict_binding'])
+
+    def _update_port_dict_binding(self, port, port_binding, binding):
+        if port_binding:
+            port[portbindings.VIF_TYPE] = port_binding.vnic_type
         fabric = binding.physical_network
         port[portbindings.PROFILE] = {'physical_network': fabric}
         return port
@@ -426,17 +454,6 @@ class MellanoxEswitchPlugin(db_base_plugin_v2.NeutronDbPluginV2,
         self._extend_port_dict_binding(context, port)
         return self._fields(port, fields)
 
-    def get_ports(self, context, filters=None, fields=None,
-                  sorts=None, limit=None, marker=None, page_reverse=False):
-        res_ports = []
-        ports = super(MellanoxEswitchPlugin,
-                      self).get_ports(context, filters, fields, sorts,
-                                      limit, marker, page_reverse)
-        for port in ports:
-            port = self._extend_port_dict_binding(context, port)
-            res_ports.append(self._fields(port, fields))
-        return res_ports
-
     def update_port(self, context, port_id, port):
         original_port = self.get_port(context, port_id)
         session = context.session
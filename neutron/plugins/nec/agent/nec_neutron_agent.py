@@ -107,7 +107,7 @@ class SecurityGroupAgentRpc(sg_rpc.SecurityGroupAgentRpcMixin):
     def __init__(self, context):
         self.context = context
         self.plugin_rpc = SecurityGroupServerRpcApi(topics.PLUGIN)
-        self.init_firewall()
+        self.init_firewall(defer_refresh_firewall=True)
 
 
 class NECNeutronAgent(object):
@@ -158,7 +158,8 @@ class NECNeutronAgent(object):
                                                     self.callback_sg])
         # Define the listening consumer for the agent
         consumers = [[topics.PORT, topics.UPDATE],
-                     [topics.SECURITY_GROUP, topics.UPDATE]]
+                     [topics.SECURITY_GROUP, topics.UPDATE,
+                      config.CONF.host]]
         self.connection = agent_rpc.create_consumers(self.dispatcher,
                                                      self.topic,
                                                      consumers)
@@ -217,6 +218,8 @@ class NECNeutronAgent(object):
                 self._process_security_group(port_added, port_removed)
             else:
                 LOG.debug(_("No port changed."))
+            # Apply the security group updates received meanwhile
+            self.sg_agent.refresh_pending_firewall()
 
             self.cur_ports = new_ports
             self.need_sync = False
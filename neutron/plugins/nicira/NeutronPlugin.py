@@ -804,10 +804,10 @@ class NvpPluginV2(addr_pair_db.AllowedAddressPairsMixin,
 
     def _extend_network_dict_provider(self, context, network,
                                       multiprovider=None, bindings=None):
-        if not bindings:
+        if bindings is None:
             bindings = nicira_db.get_network_bindings(context.session,
                                                       network['id'])
-        if not multiprovider:
+        if multiprovider is None:
             multiprovider = nicira_db.is_multiprovider_network(context.session,
                                                                network['id'])
         # With NVP plugin 'normal' overlay networks will have no binding
@@ -827,6 +827,22 @@ class NvpPluginV2(addr_pair_db.AllowedAddressPairsMixin,
                      pnet.SEGMENTATION_ID: binding.vlan_id}
                     for binding in bindings]
 
+    def _nvp_extend_networks_dict_provider(self, context, networks,
+                                           networks_db):
+        network_ids = [network['id'] for network in networks]
+        bindings = nicira_db.get_networks_bindings(context.session,
+                                                   network_ids)
+        multiprovider_ids = nicira_db.get_multiprovider_network_ids(
+            context.session, network_ids)
+        for network in networks:
+            self._extend_network_dict_provider(
+                context, network,
+                multiprovider=network['id'] in multiprovider_ids,
+                bindings=bindings[network['id']])
+
+    db_base_plugin_v2.NeutronDbPluginV2.register_dict_extend_batch_funcs(
+        attr.NETWORKS, ['_nvp_extend_networks_dict_provider'])
+
     def _handle_lswitch_selection(self, cluster, network,
                                   network_bindings, max_ports,
                                   allow_extra_lswitches):
@@ -1069,8 +1085,6 @@ class NvpPluginV2(addr_pair_db.AllowedAddressPairsMixin,
         filters = filters or {}
         with context.session.begin(subtransactions=True):
             networks = super(NvpPluginV2, self).get_networks(context, filters)
-            for net in networks:
-                self._extend_network_dict_provider(context, net)
         return [self._fields(network, fields) for network in networks]
 
     def update_network(self, context, id, network):
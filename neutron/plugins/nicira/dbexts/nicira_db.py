@@ -32,6 +32,18 @@ def get_network_bindings(session, network_id):
             all())
 
 
+def get_networks_bindings(session, network_ids):
+    """Get the bindings of several networks, keyed by network id."""
+    result = dict((network_id, []) for network_id in network_ids)
+    if network_ids:
+        session = session or db.get_session()
+        query = session.query(nicira_models.NvpNetworkBinding).filter(
+            nicira_models.NvpNetworkBinding.network_id.in_(network_ids))
+        for binding in query:
+            result[binding.network_id].append(binding)
+    return result
+
+
 def get_network_bindings_by_vlanid(session, vlan_id):
     session = session or db.get_session()
     return (session.query(nicira_models.NvpNetworkBinding).
@@ -99,3 +111,15 @@ def is_multiprovider_network(session, network_id):
         return bool(
             session.query(nicira_models.MultiProviderNetworks).filter_by(
                 network_id=network_id).first())
+
+
+def get_multiprovider_network_ids(session, network_ids):
+    """Return the ids of the multiprovider networks among network_ids."""
+    if not network_ids:
+        return set()
+    with session.begin(subtransactions=True):
+        query = session.query(
+            nicira_models.MultiProviderNetworks.network_id).filter(
+                nicira_models.MultiProviderNetworks.network_id.in_(
+                    network_ids))
+        return set(row.network_id for row in query)
@@ -119,7 +119,7 @@ class OVSSecurityGroupAgent(sg_rpc.SecurityGroupAgentRpcMixin):
         self.context = context
         self.plugin_rpc = plugin_rpc
         self.root_helper = root_helper
-        self.init_firewall()
+        self.init_firewall(defer_refresh_firewall=True)
 
 
 class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
@@ -199,6 +199,9 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
 
         # Keep track of int_br's device count for use by _report_state()
         self.int_br_device_count = 0
+        # VIF ports of int_br by id, as last listed or learnt from the
+        # ovsdb monitor events
+        self.int_br_vif_ports = {}
 
         self.int_br = ovs_lib.OVSBridge(integ_br, self.root_helper)
         self.setup_rpc()
@@ -263,7 +266,7 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
         consumers = [[topics.PORT, topics.UPDATE],
                      [topics.NETWORK, topics.DELETE],
                      [constants.TUNNEL, topics.UPDATE],
-                     [topics.SECURITY_GROUP, topics.UPDATE]]
+                     [topics.SECURITY_GROUP, topics.UPDATE, cfg.CONF.host]]
         if self.l2_pop:
             consumers.append([topics.L2POPULATION,
                               topics.UPDATE, cfg.CONF.host])
@@ -831,7 +834,9 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
                 phys_veth.link.set_mtu(self.veth_mtu)
 
     def update_ports(self, registered_ports):
-        ports = self.int_br.get_vif_port_set()
+        self.int_br_vif_ports = dict((port.vif_id, port)
+                                     for port in self.int_br.get_vif_ports())
+        ports = set(self.int_br_vif_ports)
         if ports == registered_ports:
             return
         self.int_br_device_count = len(ports)
@@ -841,6 +846,75 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
                 'added': added,
                 'removed': removed}
 
+    def _get_event_vif_id(self, interface):
+        external_ids = interface['external_ids']
+        if 'attached-mac' not in external_ids:
+            return
+        if 'iface-id' in external_ids:
+            return external_ids['iface-id']
+        if 'xs-vif-uuid' in external_ids:
+            # if this is a xenserver and iface-id is not automatically
+            # synced to OVS from XAPI, we grab it from XAPI directly
+            return self.int_br.get_xapi_iface_id(
+                external_ids['xs-vif-uuid'])
+
+    def update_ports_from_events(self, registered_ports, events):
+        """Compute the port changes from the ovsdb monitor events.
+
+        Only the interfaces reported by the events are looked at. The ports
+        of int_br are listed only when an interface which is not known yet
+        has been plugged, to leave out the interfaces of other bridges.
+        """
+        ports = set(registered_ports)
+        names = dict((vif_port.port_name, vif_id)
+                     for vif_id, vif_port in self.int_br_vif_ports.items())
+        removed = set()
+        for interface in events['removed']:
+            vif_id = self._get_event_vif_id(interface)
+            if vif_id in ports:
+                removed.add(vif_id)
+                self.int_br_vif_ports.pop(vif_id, None)
+
+        changed = {}
+        for interface in events['added'] + events['modified']:
+            vif_id = self._get_event_vif_id(interface)
+            old_vif_id = names.get(interface['name'])
+            if old_vif_id and old_vif_id != vif_id:
+                # The interface is not attached to this port anymore
+                removed.add(old_vif_id)
+                self.int_br_vif_ports.pop(old_vif_id, None)
+            if vif_id:
+                changed[vif_id] = interface
+
+        added = set()
+        port_names = None
+        for vif_id, interface in changed.items():
+            vif_port = self.int_br_vif_ports.get(vif_id)
+            if vif_port and vif_port.port_name == interface['name']:
+                if vif_port.ofport == (interface['ofport'] or -1):
+                    continue
+            else:
+                if port_names is None:
+                    port_names = set(self.int_br.get_port_name_list())
+                if interface['name'] not in port_names:
+                    continue
+            # New ports and ports whose ofport changed are (re)bound
+            ofport = interface['ofport']
+            self.int_br_vif_ports[vif_id] = ovs_lib.VifPort(
+                interface['name'], -1 if ofport is None else ofport, vif_id,
+                interface['external_ids']['attached-mac'], self.int_br)
+            added.add(vif_id)
+            # A port unplugged and plugged again is still there
+            removed.discard(vif_id)
+
+        if not added and not removed:
+            return
+        ports = (ports - removed) | added
+        self.int_br_device_count = len(ports)
+        return {'current': ports,
+                'added': added,
+                'removed': removed}
+
     def update_ancillary_ports(self, registered_ports):
         ports = set()
         for bridge in self.ancillary_brs:
@@ -918,21 +992,27 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
                     self.tun_br_ofports[tunnel_type].pop(remote_ip, None)
 
     def treat_devices_added(self, devices):
-        resync = False
         self.sg_agent.prepare_devices_filter(devices)
-        for device in devices:
+        try:
+            devices_details_list = self.plugin_rpc.get_devices_details_list(
+                self.context, list(devices), self.agent_id)
+        except Exception as e:
+            LOG.debug(_("Unable to get port details for "
+                        "%(devices)s: %(e)s"),
+                      {'devices': devices, 'e': e})
+            # resync is needed
+            return True
+        vif_ports = dict((device, self.int_br_vif_ports[device])
+                         for device in devices
+                         if device in self.int_br_vif_ports)
+        missing = set(devices) - set(vif_ports)
+        if missing:
+            vif_ports.update(self.int_br.get_vif_ports_by_ids(missing))
+        devices_up = []
+        for details in devices_details_list:
+            device = details['device']
             LOG.info(_("Port %s added"), device)
-            try:
-                details = self.plugin_rpc.get_device_details(self.context,
-                                                             device,
-                                                             self.agent_id)
-            except Exception as e:
-                LOG.debug(_("Unable to get port details for "
-                            "%(device)s: %(e)s"),
-                          {'device': device, 'e': e})
-                resync = True
-                continue
-            port = self.int_br.get_vif_port_by_id(details['device'])
+            port = vif_ports.get(device)
             if 'port_id' in details:
                 LOG.info(_("Port %(device)s updated. Details: %(details)s"),
                          {'device': device, 'details': details})
@@ -942,17 +1022,24 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
                                     details['physical_network'],
                                     details['segmentation_id'],
                                     details['admin_state_up'])
-
-                # update plugin about port status
-                self.plugin_rpc.update_device_up(self.context,
-                                                 device,
-                                                 self.agent_id,
-                                                 cfg.CONF.host)
+                devices_up.append(device)
             else:
                 LOG.debug(_("Device %s not defined on plugin"), device)
                 if (port and int(port.ofport) != -1):
                     self.port_dead(port)
-        return resync
+        if devices_up:
+            # update plugin about port status
+            try:
+                self.plugin_rpc.update_devices_up(self.context,
+                                                  devices_up,
+                                                  self.agent_id,
+                                                  cfg.CONF.host)
+            except Exception as e:
+                LOG.debug(_("Unable to update status of ports "
+                            "%(devices)s: %(e)s"),
+                          {'devices': devices_up, 'e': e})
+                return True
+        return False
 
     def treat_ancillary_devices_added(self, devices):
         resync = False
@@ -976,22 +1063,22 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
         return resync
 
     def treat_devices_removed(self, devices):
-        resync = False
         self.sg_agent.remove_devices_filter(devices)
         for device in devices:
             LOG.info(_("Attachment %s removed"), device)
-            try:
-                self.plugin_rpc.update_device_down(self.context,
-                                                   device,
-                                                   self.agent_id,
-                                                   cfg.CONF.host)
-            except Exception as e:
-                LOG.debug(_("port_removed failed for %(device)s: %(e)s"),
-                          {'device': device, 'e': e})
-                resync = True
-                continue
+        try:
+            self.plugin_rpc.update_devices_down(self.context,
+                                                list(devices),
+                                                self.agent_id,
+                                                cfg.CONF.host)
+        except Exception as e:
+            LOG.debug(_("port_removed failed for %(devices)s: %(e)s"),
+                      {'devices': devices, 'e': e})
+            # resync is needed
+            return True
+        for device in devices:
             self.port_unbound(device)
-        return resync
+        return False
 
     def treat_ancillary_devices_removed(self, devices):
         resync = False
@@ -1095,6 +1182,7 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
                               'ancillary': {'added': 0, 'removed': 0}}
                 LOG.debug(_("Agent rpc_loop - iteration:%d started"),
                           self.iter_num)
+                full_scan = sync
                 if sync:
                     LOG.info(_("Agent out of sync with plugin!"))
                     ports.clear()
@@ -1111,7 +1199,13 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
                                 "starting polling. Elapsed:%(elapsed).3f"),
                               {'iter_num': self.iter_num,
                                'elapsed': time.time() - start})
-                    port_info = self.update_ports(ports)
+                    # Always consume the events, which a full scan covers
+                    events = polling_manager.get_events()
+                    if events is None or full_scan:
+                        port_info = self.update_ports(ports)
+                    else:
+                        port_info = self.update_ports_from_events(ports,
+                                                                  events)
                     LOG.debug(_("Agent rpc_loop - iteration:%(iter_num)d - "
                                 "port information retrieved. "
                                 "Elapsed:%(elapsed).3f"),
@@ -1158,6 +1252,9 @@ class OVSNeutronAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin,
 
                     polling_manager.polling_completed()
 
+                # Apply the security group updates received meanwhile
+                self.sg_agent.refresh_pending_firewall()
+
             except Exception:
                 LOG.exception(_("Error in agent event loop"))
                 sync = True
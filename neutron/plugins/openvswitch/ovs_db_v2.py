@@ -27,11 +27,19 @@ from neutron.extensions import securitygroup as ext_sg
 from neutron import manager
 from neutron.openstack.common.db import exception as db_exc
 from neutron.openstack.common import log as logging
+from neutron.plugins.common import segment_allocator
 from neutron.plugins.openvswitch.common import constants
 from neutron.plugins.openvswitch import ovs_models_v2
 
 LOG = logging.getLogger(__name__)
 
+# Allocators of the configured ranges, set by the sync functions
+_vlan_allocator = segment_allocator.SegmentAllocator(
+    ovs_models_v2.VlanAllocation, 'vlan_id', {},
+    pool_attr='physical_network')
+_tunnel_allocator = segment_allocator.SegmentAllocator(
+    ovs_models_v2.TunnelAllocation, 'tunnel_id', {})
+
 
 def initialize():
     db.configure_db()
@@ -48,6 +56,17 @@ def get_network_binding(session, network_id):
         return
 
 
+def get_network_bindings(session, network_ids):
+    """Get the bindings of several networks, keyed by network id."""
+    if not network_ids:
+        return {}
+    session = session or db.get_session()
+    bindings = (session.query(ovs_models_v2.NetworkBinding).
+                filter(ovs_models_v2.NetworkBinding.network_id.in_(
+                    network_ids)))
+    return dict((binding.network_id, binding) for binding in bindings)
+
+
 def add_network_binding(session, network_id, network_type,
                         physical_network, segmentation_id):
     with session.begin(subtransactions=True):
@@ -59,156 +78,62 @@ def add_network_binding(session, network_id, network_type,
 
 def sync_vlan_allocations(network_vlan_ranges):
     """Synchronize vlan_allocations table with configured VLAN ranges."""
-
-    session = db.get_session()
-    with session.begin():
-        # get existing allocations for all physical networks
-        allocations = dict()
-        allocs = (session.query(ovs_models_v2.VlanAllocation).
-                  all())
-        for alloc in allocs:
-            if alloc.physical_network not in allocations:
-                allocations[alloc.physical_network] = set()
-            allocations[alloc.physical_network].add(alloc)
-
-        # process vlan ranges for each configured physical network
-        for physical_network, vlan_ranges in network_vlan_ranges.iteritems():
-            # determine current configured allocatable vlans for this
-            # physical network
-            vlan_ids = set()
-            for vlan_range in vlan_ranges:
-                vlan_ids |= set(xrange(vlan_range[0], vlan_range[1] + 1))
-
-            # remove from table unallocated vlans not currently allocatable
-            if physical_network in allocations:
-                for alloc in allocations[physical_network]:
-                    try:
-                        # see if vlan is allocatable
-                        vlan_ids.remove(alloc.vlan_id)
-                    except KeyError:
-                        # it's not allocatable, so check if its allocated
-                        if not alloc.allocated:
-                            # it's not, so remove it from table
-                            LOG.debug(_("Removing vlan %(vlan_id)s on "
-                                        "physical network "
-                                        "%(physical_network)s from pool"),
-                                      {'vlan_id': alloc.vlan_id,
-                                       'physical_network': physical_network})
-                            session.delete(alloc)
-                del allocations[physical_network]
-
-            # add missing allocatable vlans to table
-            for vlan_id in sorted(vlan_ids):
-                alloc = ovs_models_v2.VlanAllocation(physical_network, vlan_id)
-                session.add(alloc)
-
-        # remove from table unallocated vlans for any unconfigured physical
-        # networks
-        for allocs in allocations.itervalues():
-            for alloc in allocs:
-                if not alloc.allocated:
-                    LOG.debug(_("Removing vlan %(vlan_id)s on physical "
-                                "network %(physical_network)s from pool"),
-                              {'vlan_id': alloc.vlan_id,
-                               'physical_network': alloc.physical_network})
-                    session.delete(alloc)
+    global _vlan_allocator
+    _vlan_allocator = segment_allocator.SegmentAllocator(
+        ovs_models_v2.VlanAllocation, 'vlan_id', network_vlan_ranges,
+        pool_attr='physical_network')
+    _vlan_allocator.sync(db.get_session())
 
 
 def get_vlan_allocation(physical_network, vlan_id):
     session = db.get_session()
-    try:
-        alloc = (session.query(ovs_models_v2.VlanAllocation).
-                 filter_by(physical_network=physical_network,
-                           vlan_id=vlan_id).
-                 one())
-        return alloc
-    except exc.NoResultFound:
-        return
+    return _vlan_allocator.get(session, vlan_id, physical_network)
 
 
 def reserve_vlan(session):
-    with session.begin(subtransactions=True):
-        alloc = (session.query(ovs_models_v2.VlanAllocation).
-                 filter_by(allocated=False).
-                 with_lockmode('update').
-                 first())
-        if alloc:
-            LOG.debug(_("Reserving vlan %(vlan_id)s on physical network "
-                        "%(physical_network)s from pool"),
-                      {'vlan_id': alloc.vlan_id,
-                       'physical_network': alloc.physical_network})
-            alloc.allocated = True
-            return (alloc.physical_network, alloc.vlan_id)
+    allocation = _vlan_allocator.allocate(session)
+    if allocation:
+        physical_network, vlan_id = allocation
+        LOG.debug(_("Reserving vlan %(vlan_id)s on physical network "
+                    "%(physical_network)s from pool"),
+                  {'vlan_id': vlan_id,
+                   'physical_network': physical_network})
+        return allocation
     raise q_exc.NoNetworkAvailable()
 
 
 def reserve_specific_vlan(session, physical_network, vlan_id):
-    with session.begin(subtransactions=True):
-        try:
-            alloc = (session.query(ovs_models_v2.VlanAllocation).
-                     filter_by(physical_network=physical_network,
-                               vlan_id=vlan_id).
-                     with_lockmode('update').
-                     one())
-            if alloc.allocated:
-                if vlan_id == constants.FLAT_VLAN_ID:
-                    raise q_exc.FlatNetworkInUse(
-                        physical_network=physical_network)
-                else:
-                    raise q_exc.VlanIdInUse(vlan_id=vlan_id,
-                                            physical_network=physical_network)
-            LOG.debug(_("Reserving specific vlan %(vlan_id)s on physical "
-                        "network %(physical_network)s from pool"),
-                      {'vlan_id': vlan_id,
-                       'physical_network': physical_network})
-            alloc.allocated = True
-        except exc.NoResultFound:
-            LOG.debug(_("Reserving specific vlan %(vlan_id)s on physical "
-                        "network %(physical_network)s outside pool"),
-                      {'vlan_id': vlan_id,
-                       'physical_network': physical_network})
-            alloc = ovs_models_v2.VlanAllocation(physical_network, vlan_id)
-            alloc.allocated = True
-            session.add(alloc)
+    if not _vlan_allocator.reserve(session, vlan_id, physical_network):
+        if vlan_id == constants.FLAT_VLAN_ID:
+            raise q_exc.FlatNetworkInUse(physical_network=physical_network)
+        else:
+            raise q_exc.VlanIdInUse(vlan_id=vlan_id,
+                                    physical_network=physical_network)
+    LOG.debug(_("Reserving specific vlan %(vlan_id)s on physical "
+                "network %(physical_network)s"),
+              {'vlan_id': vlan_id,
+               'physical_network': physical_network})
 
 
 def release_vlan(session, physical_network, vlan_id, network_vlan_ranges):
-    with session.begin(subtransactions=True):
-        try:
-            alloc = (session.query(ovs_models_v2.VlanAllocation).
-                     filter_by(physical_network=physical_network,
-                               vlan_id=vlan_id).
-                     with_lockmode('update').
-                     one())
-            alloc.allocated = False
-            inside = False
-            for vlan_range in network_vlan_ranges.get(physical_network, []):
-                if vlan_id >= vlan_range[0] and vlan_id <= vlan_range[1]:
-                    inside = True
-                    break
-            if not inside:
-                session.delete(alloc)
-                LOG.debug(_("Releasing vlan %(vlan_id)s on physical network "
-                            "%(physical_network)s outside pool"),
-                          {'vlan_id': vlan_id,
-                           'physical_network': physical_network})
-            else:
-                LOG.debug(_("Releasing vlan %(vlan_id)s on physical network "
-                            "%(physical_network)s to pool"),
-                          {'vlan_id': vlan_id,
-                           'physical_network': physical_network})
-        except exc.NoResultFound:
-            LOG.warning(_("vlan_id %(vlan_id)s on physical network "
-                          "%(physical_network)s not found"),
-                        {'vlan_id': vlan_id,
-                         'physical_network': physical_network})
+    if _vlan_allocator.release(session, vlan_id, physical_network):
+        LOG.debug(_("Releasing vlan %(vlan_id)s on physical network "
+                    "%(physical_network)s"),
+                  {'vlan_id': vlan_id,
+                   'physical_network': physical_network})
+    else:
+        LOG.warning(_("vlan_id %(vlan_id)s on physical network "
+                      "%(physical_network)s not found"),
+                    {'vlan_id': vlan_id,
+                     'physical_network': physical_network})
 
 
 def sync_tunnel_allocations(tunnel_id_ranges):
     """Synchronize tunnel_allocations table with configured tunnel ranges."""
+    global _tunnel_allocator
 
     # determine current configured allocatable tunnels
-    tunnel_ids = set()
+    ranges = []
     for tunnel_id_range in tunnel_id_ranges:
         tun_min, tun_max = tunnel_id_range
         if tun_max + 1 - tun_min > 1000000:
@@ -216,96 +141,37 @@ def sync_tunnel_allocations(tunnel_id_ranges):
                         "%(tun_min)s:%(tun_max)s"),
                       {'tun_min': tun_min, 'tun_max': tun_max})
         else:
-            tunnel_ids |= set(xrange(tun_min, tun_max + 1))
+            ranges.append((tun_min, tun_max))
 
-    session = db.get_session()
-    with session.begin():
-        # remove from table unallocated tunnels not currently allocatable
-        allocs = (session.query(ovs_models_v2.TunnelAllocation).
-                  all())
-        for alloc in allocs:
-            try:
-                # see if tunnel is allocatable
-                tunnel_ids.remove(alloc.tunnel_id)
-            except KeyError:
-                # it's not allocatable, so check if its allocated
-                if not alloc.allocated:
-                    # it's not, so remove it from table
-                    LOG.debug(_("Removing tunnel %s from pool"),
-                              alloc.tunnel_id)
-                    session.delete(alloc)
-
-        # add missing allocatable tunnels to table
-        for tunnel_id in sorted(tunnel_ids):
-            alloc = ovs_models_v2.TunnelAllocation(tunnel_id)
-            session.add(alloc)
+    _tunnel_allocator = segment_allocator.SegmentAllocator(
+        ovs_models_v2.TunnelAllocation, 'tunnel_id', {None: ranges})
+    _tunnel_allocator.sync(db.get_session())
 
 
 def get_tunnel_allocation(tunnel_id):
     session = db.get_session()
-    try:
-        alloc = (session.query(ovs_models_v2.TunnelAllocation).
-                 filter_by(tunnel_id=tunnel_id).
-                 with_lockmode('update').
-                 one())
-        return alloc
-    except exc.NoResultFound:
-        return
+    return _tunnel_allocator.get(session, tunnel_id)
 
 
 def reserve_tunnel(session):
-    with session.begin(subtransactions=True):
-        alloc = (session.query(ovs_models_v2.TunnelAllocation).
-                 filter_by(allocated=False).
-                 with_lockmode('update').
-                 first())
-        if alloc:
-            LOG.debug(_("Reserving tunnel %s from pool"), alloc.tunnel_id)
-            alloc.allocated = True
-            return alloc.tunnel_id
+    allocation = _tunnel_allocator.allocate(session)
+    if allocation:
+        LOG.debug(_("Reserving tunnel %s from pool"), allocation[1])
+        return allocation[1]
     raise q_exc.NoNetworkAvailable()
 
 
 def reserve_specific_tunnel(session, tunnel_id):
-    with session.begin(subtransactions=True):
-        try:
-            alloc = (session.query(ovs_models_v2.TunnelAllocation).
-                     filter_by(tunnel_id=tunnel_id).
-                     with_lockmode('update').
-                     one())
-            if alloc.allocated:
-                raise q_exc.TunnelIdInUse(tunnel_id=tunnel_id)
-            LOG.debug(_("Reserving specific tunnel %s from pool"), tunnel_id)
-            alloc.allocated = True
-        except exc.NoResultFound:
-            LOG.debug(_("Reserving specific tunnel %s outside pool"),
-                      tunnel_id)
-            alloc = ovs_models_v2.TunnelAllocation(tunnel_id)
-            alloc.allocated = True
-            session.add(alloc)
+    if not _tunnel_allocator.reserve(session, tunnel_id):
+        raise q_exc.TunnelIdInUse(tunnel_id=tunnel_id)
+    LOG.debug(_("Reserving specific tunnel %s"), tunnel_id)
 
 
 def release_tunnel(session, tunnel_id, tunnel_id_ranges):
-    with session.begin(subtransactions=True):
-        try:
-            alloc = (session.query(ovs_models_v2.TunnelAllocation).
-                     filter_by(tunnel_id=tunnel_id).
-                     with_lockmode('update').
-                     one())
-            alloc.allocated = False
-            inside = False
-            for tunnel_id_range in tunnel_id_ranges:
-                if (tunnel_id >= tunnel_id_range[0]
-                    and tunnel_id <= tunnel_id_range[1]):
-                    inside = True
-                    break
-            if not inside:
-                session.delete(alloc)
-                LOG.debug(_("Releasing tunnel %s outside pool"), tunnel_id)
-            else:
-                LOG.debug(_("Releasing tunnel %s to pool"), tunnel_id)
-        except exc.NoResultFound:
-            LOG.warning(_("tunnel_id %s not found"), tunnel_id)
+    if _tunnel_allocator.release(session, tunnel_id):
+        LOG.debug(_("Releasing tunnel %s"), tunnel_id)
+    else:
+        LOG.warning(_("tunnel_id %s not found"), tunnel_id)
 
 
 def get_port(port_id):
@@ -317,6 +183,16 @@ def get_port(port_id):
     return port
 
 
+def get_ports(port_ids):
+    """Get several ports with a single query, keyed by port id."""
+    if not port_ids:
+        return {}
+    session = db.get_session()
+    ports = (session.query(models_v2.Port).
+             filter(models_v2.Port.id.in_(port_ids)))
+    return dict((port.id, port) for port in ports)
+
+
 def get_port_from_device(port_id):
     """Get port from database."""
     LOG.debug(_("get_port_with_securitygroups() called:port_id=%s"), port_id)
@@ -74,8 +74,11 @@ class OVSRpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
     # history
     #   1.0 Initial version
     #   1.1 Support Security Group RPC
+    #   1.2 Support get_devices_details_list, update_devices_up and
+    #       update_devices_down
+    #   1.3 Support security_group_info_for_devices
 
-    RPC_API_VERSION = '1.1'
+    RPC_API_VERSION = '1.3'
 
     def __init__(self, notifier, tunnel_type):
         self.notifier = notifier
@@ -104,8 +107,29 @@ class OVSRpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
         LOG.debug(_("Device %(device)s details requested from %(agent_id)s"),
                   {'device': device, 'agent_id': agent_id})
         port = ovs_db_v2.get_port(device)
+        binding = port and ovs_db_v2.get_network_binding(None,
+                                                         port['network_id'])
+        return self._get_device_details(device, port, binding)
+
+    def get_devices_details_list(self, rpc_context, **kwargs):
+        """Agent requests details for a list of devices."""
+        agent_id = kwargs.get('agent_id')
+        devices = kwargs.get('devices', [])
+        LOG.debug(_("Details for devices %(devices)s requested from "
+                    "%(agent_id)s"),
+                  {'devices': devices, 'agent_id': agent_id})
+        ports = ovs_db_v2.get_ports(devices)
+        bindings = ovs_db_v2.get_network_bindings(
+            None, set(port['network_id'] for port in ports.values()))
+        entries = []
+        for device in devices:
+            port = ports.get(device)
+            binding = port and bindings.get(port['network_id'])
+            entries.append(self._get_device_details(device, port, binding))
+        return entries
+
+    def _get_device_details(self, device, port, binding):
         if port:
-            binding = ovs_db_v2.get_network_binding(None, port['network_id'])
             entry = {'device': device,
                      'network_id': port['network_id'],
                      'port_id': port['id'],
@@ -171,6 +195,18 @@ class OVSRpcCallbacks(dhcp_rpc_base.DhcpRpcCallbackMixin,
         else:
             LOG.debug(_("%s can not be found in database"), device)
 
+    def update_devices_down(self, rpc_context, **kwargs):
+        """Devices no longer exist on agent."""
+        devices = kwargs.pop('devices', [])
+        return [self.update_device_down(rpc_context, device=device, **kwargs)
+                for device in devices]
+
+    def update_devices_up(self, rpc_context, **kwargs):
+        """Devices are up on agent."""
+        devices = kwargs.pop('devices', [])
+        return [self.update_device_up(rpc_context, device=device, **kwargs)
+                for device in devices]
+
     def tunnel_sync(self, rpc_context, **kwargs):
         """Update new tunnel.
 
@@ -337,7 +373,6 @@ class OVSNeutronPluginV2(db_base_plugin_v2.NeutronDbPluginV2,
         # RPC support
         self.service_topics = {svc_constants.CORE: topics.PLUGIN,
                                svc_constants.L3_ROUTER_NAT: topics.L3PLUGIN}
-        self.conn = rpc.create_connection(new=True)
         self.notifier = AgentNotifierApi(topics.AGENT)
         self.agent_notifiers[q_const.AGENT_TYPE_DHCP] = (
             dhcp_rpc_agent_api.DhcpAgentNotifyAPI()
@@ -346,11 +381,14 @@ class OVSNeutronPluginV2(db_base_plugin_v2.NeutronDbPluginV2,
             l3_rpc_agent_api.L3AgentNotify
         )
         self.callbacks = OVSRpcCallbacks(self.notifier, self.tunnel_type)
+
+    def start_rpc_listener(self):
+        self.conn = rpc.create_connection(new=True)
         self.dispatcher = self.callbacks.create_rpc_dispatcher()
         for svc_topic in self.service_topics.values():
             self.conn.create_consumer(svc_topic, self.dispatcher, fanout=False)
         # Consume from all consumers in a thread
-        self.conn.consume_in_thread()
+        return self.conn.consume_in_thread()
 
     def _parse_network_vlan_ranges(self):
         try:
@@ -377,6 +415,20 @@ class OVSNeutronPluginV2(db_base_plugin_v2.NeutronDbPluginV2,
     def _extend_network_dict_provider(self, context, network):
         binding = ovs_db_v2.get_network_binding(context.session,
                                                 network['id'])
+        self._update_network_dict_provider(network, binding)
+
+    def _ovs_extend_networks_dict_provider(self, context, networks,
+                                           networks_db):
+        bindings = ovs_db_v2.get_network_bindings(
+            context.session, [network['id'] for network in networks])
+        for network in networks:
+            self._update_network_dict_provider(network,
+                                               bindings.get(network['id']))
+
+    db_base_plugin_v2.NeutronDbPluginV2.register_dict_extend_batch_funcs(
+        attributes.NETWORKS, ['_ovs_extend_networks_dict_provider'])
+
+    def _update_network_dict_provider(self, network, binding):
         network[provider.NETWORK_TYPE] = binding.network_type
         if binding.network_type in constants.TUNNEL_NETWORK_TYPES:
             network[provider.PHYSICAL_NETWORK] = None
@@ -554,8 +606,6 @@ class OVSNeutronPluginV2(db_base_plugin_v2.NeutronDbPluginV2,
             nets = super(OVSNeutronPluginV2,
                          self).get_networks(context, filters, None, sorts,
                                             limit, marker, page_reverse)
-            for net in nets:
-                self._extend_network_dict_provider(context, net)
 
         return [self._fields(net, fields) for net in nets]
 
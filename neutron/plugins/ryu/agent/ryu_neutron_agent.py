@@ -124,28 +124,31 @@ class OVSBridge(ovs_lib.OVSBridge):
     def _get_ports(self, get_port):
         ports = []
         port_names = self.get_port_name_list()
+        if not port_names:
+            return ports
+        # Read the interfaces at once rather than their columns one by one
+        rows = dict((row['name'], row) for row in self.db_list(
+            'Interface', ['name', 'external_ids', 'options', 'ofport']))
         for name in port_names:
-            if self.get_ofport(name) < 0:
+            row = rows.get(name)
+            if row is None or row['ofport'] is None or row['ofport'] < 0:
                 continue
-            port = get_port(name)
+            port = get_port(row)
             if port:
                 ports.append(port)
 
         return ports
 
-    def _get_external_port(self, name):
+    def _get_external_port(self, row):
         # exclude vif ports
-        external_ids = self.db_get_map("Interface", name, "external_ids")
-        if external_ids:
+        if row['external_ids']:
             return
 
         # exclude tunnel ports
-        options = self.db_get_map("Interface", name, "options")
-        if "remote_ip" in options:
+        if "remote_ip" in (row['options'] or {}):
             return
 
-        ofport = self.get_ofport(name)
-        return VifPort(name, ofport, None, None, self)
+        return VifPort(row['name'], row['ofport'], None, None, self)
 
     def get_external_ports(self):
         return self._get_ports(self._get_external_port)
@@ -178,7 +181,7 @@ class RyuSecurityGroupAgent(sg_rpc.SecurityGroupAgentRpcMixin):
         self.context = context
         self.plugin_rpc = plugin_rpc
         self.root_helper = root_helper
-        self.init_firewall()
+        self.init_firewall(defer_refresh_firewall=True)
 
 
 class OVSNeutronOFPRyuAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin):
@@ -271,6 +274,8 @@ class OVSNeutronOFPRyuAgent(sg_rpc.SecurityGroupAgentRpcCallbackMixin):
                     LOG.debug(_("Agent loop has new device"))
                     self._process_devices_filter(port_info)
                     ports = port_info['current']
+                # Apply the security group updates received meanwhile
+                self.sg_agent.refresh_pending_firewall()
             except Exception:
                 LOG.exception(_("Error in agent event loop"))
 
@@ -35,6 +35,12 @@ from neutron.openstack.common import policy
 LOG = logging.getLogger(__name__)
 _POLICY_PATH = None
 _POLICY_CACHE = {}
+# (action, enforced attributes) -> match rule
+_MATCH_RULES = {}
+# rule name -> whether the rule can be evaluated without a target, for the
+# rules in _TARGET_INDEPENDENT_RULES
+_TARGET_INDEPENDENT = {}
+_TARGET_INDEPENDENT_RULES = None
 ADMIN_CTX_POLICY = 'context_is_admin'
 # Maps deprecated 'extension' policies to new-style policies
 DEPRECATED_POLICY_MAP = {
@@ -54,6 +60,7 @@ DEPRECATED_ACTION_MAP = {
 }
 
 cfg.CONF.import_opt('policy_file', 'neutron.common.config')
+cfg.CONF.import_opt('policy_compile', 'neutron.common.config')
 
 
 def reset():
@@ -61,6 +68,7 @@ def reset():
     global _POLICY_CACHE
     _POLICY_PATH = None
     _POLICY_CACHE = {}
+    _MATCH_RULES.clear()
     policy.reset()
 
 
@@ -151,6 +159,36 @@ def _build_subattr_match_rule(attr_name, attr, action, target):
     return policy.AndCheck(sub_attr_rules)
 
 
+def _get_enforced_attributes(action, target):
+    """Return the attributes of the target enforcing an attribute policy.
+
+    Returns a tuple of (attribute name, sub-attribute names) pairs, the
+    sub-attribute names being None for attributes without sub-attribute
+    rules. Attribute-based checks are not enforced on GETs.
+    """
+    resource, is_write = get_resource_and_action(action)
+    res_map = attributes.RESOURCE_ATTRIBUTE_MAP
+    if not is_write or resource not in res_map:
+        return ()
+    enforced = []
+    for attribute_name in res_map[resource]:
+        if _is_attribute_explicitly_set(attribute_name,
+                                        res_map[resource],
+                                        target):
+            attribute = res_map[resource][attribute_name]
+            if 'enforce_policy' in attribute:
+                sub_attrs = None
+                validate = attribute.get('validate')
+                if (validate and any([k.startswith('type:dict') and v
+                                      for (k, v) in
+                                      validate.iteritems()])):
+                    value = target[attribute_name]
+                    sub_attrs = (tuple(sorted(value))
+                                 if isinstance(value, dict) else ())
+                enforced.append((attribute_name, sub_attrs))
+    return tuple(enforced)
+
+
 def _build_match_rule(action, target):
     """Create the rule to match for a given action.
 
@@ -162,36 +200,71 @@ def _build_match_rule(action, target):
     4) add an entry for sub-attributes of a resource for which the
        action is being executed
        (e.g.: create_router:external_gateway_info:network_id)
+
+    With policy_compile, the rule is built once for each action and set
+    of enforced attributes.
     """
+    enforced = _get_enforced_attributes(action, target)
+    if not cfg.CONF.policy_compile:
+        return _compile_match_rule(action, enforced, target)
+    key = (action, enforced)
+    match_rule = _MATCH_RULES.get(key)
+    if match_rule is None:
+        match_rule = _MATCH_RULES[key] = _compile_match_rule(action,
+                                                             enforced,
+                                                             target)
+    return match_rule
 
+
+def _compile_match_rule(action, enforced, target):
     match_rule = policy.RuleCheck('rule', action)
-    resource, is_write = get_resource_and_action(action)
-    # Attribute-based checks shall not be enforced on GETs
-    if is_write:
-        # assigning to variable with short name for improving readability
-        res_map = attributes.RESOURCE_ATTRIBUTE_MAP
-        if resource in res_map:
-            for attribute_name in res_map[resource]:
-                if _is_attribute_explicitly_set(attribute_name,
-                                                res_map[resource],
-                                                target):
-                    attribute = res_map[resource][attribute_name]
-                    if 'enforce_policy' in attribute:
-                        attr_rule = policy.RuleCheck('rule', '%s:%s' %
-                                                     (action, attribute_name))
-                        # Build match entries for sub-attributes, if present
-                        validate = attribute.get('validate')
-                        if (validate and any([k.startswith('type:dict') and v
-                                              for (k, v) in
-                                              validate.iteritems()])):
-                            attr_rule = policy.AndCheck(
-                                [attr_rule, _build_subattr_match_rule(
-                                    attribute_name, attribute,
-                                    action, target)])
-                        match_rule = policy.AndCheck([match_rule, attr_rule])
+    resource, _is_write = get_resource_and_action(action)
+    for attribute_name, sub_attrs in enforced:
+        attr_rule = policy.RuleCheck('rule', '%s:%s' %
+                                     (action, attribute_name))
+        # Build match entries for sub-attributes, if present
+        if sub_attrs is not None:
+            attribute = attributes.RESOURCE_ATTRIBUTE_MAP[resource][
+                attribute_name]
+            attr_rule = policy.AndCheck(
+                [attr_rule, _build_subattr_match_rule(
+                    attribute_name, attribute, action, target)])
+        match_rule = policy.AndCheck([match_rule, attr_rule])
     return match_rule
 
 
+def _is_target_independent(rule):
+    """Return whether a rule only depends on the credentials.
+
+    Such rules have the same result for every target of a request.
+    """
+    global _TARGET_INDEPENDENT_RULES
+    if _TARGET_INDEPENDENT_RULES is not policy._rules:
+        # The rules were loaded again
+        _TARGET_INDEPENDENT.clear()
+        _TARGET_INDEPENDENT_RULES = policy._rules
+    if isinstance(rule, (policy.TrueCheck, policy.FalseCheck,
+                         policy.RoleCheck)):
+        return True
+    if isinstance(rule, policy.RuleCheck):
+        if rule.match not in _TARGET_INDEPENDENT:
+            # Assume a dependency until the rule is resolved, in case
+            # it refers to itself
+            _TARGET_INDEPENDENT[rule.match] = False
+            referenced = (policy._rules or {}).get(rule.match)
+            _TARGET_INDEPENDENT[rule.match] = (
+                referenced is None or _is_target_independent(referenced))
+        return _TARGET_INDEPENDENT[rule.match]
+    if isinstance(rule, (policy.AndCheck, policy.OrCheck)):
+        return all(_is_target_independent(r) for r in rule.rules)
+    if isinstance(rule, policy.NotCheck):
+        return _is_target_independent(rule.rule)
+    if type(rule) is policy.GenericCheck:
+        return '%(' not in rule.match
+    # Owner, field and HTTP checks, or unknown checks
+    return False
+
+
 # This check is registered as 'tenant_id' so that it can override
 # GenericCheck which was used for validating parent resource ownership.
 # This will prevent us from having to handling backward compatibility
@@ -325,6 +398,42 @@ def _prepare_check(context, action, target):
     return match_rule, target, credentials
 
 
+class PolicyChecker(object):
+    """Check the policy of several targets within the same request.
+
+    The policy file is checked for changes and the credentials are
+    computed once. With policy_compile, the result of the rules which do
+    not depend on the target is kept for the following checks.
+    """
+
+    def __init__(self, context):
+        init()
+        self.context = context
+        self.credentials = context.to_dict()
+        self._results = {}
+
+    def check(self, action, target):
+        """Same as the check function, for the context of the checker."""
+        # Compare with None to distinguish case in which target is {}
+        if target is None:
+            target = {}
+        match_rule = _build_match_rule(action, target)
+        if not cfg.CONF.policy_compile:
+            return policy.check(match_rule, target, self.credentials)
+        result = self._results.get(match_rule)
+        if result is None:
+            result = policy.check(match_rule, target, self.credentials)
+            if _is_target_independent(match_rule):
+                self._results[match_rule] = result
+        return result
+
+    def check_if_exists(self, action, target):
+        """Same as check_if_exists, for the context of the checker."""
+        if not policy._rules or action not in policy._rules:
+            raise exceptions.PolicyRuleNotFound(rule=action)
+        return self.check(action, target)
+
+
 def check(context, action, target, plugin=None):
     """Verifies that the action is valid on the target in this context.
 
@@ -29,6 +29,7 @@ from neutron.openstack.common import log as logging
 LOG = logging.getLogger(__name__)
 QUOTA_DB_MODULE = 'neutron.db.quota_db'
 QUOTA_DB_DRIVER = 'neutron.db.quota_db.DbQuotaDriver'
+QUOTA_TRACKED_DRIVER = 'neutron.db.quota_db.TrackedUsageQuotaDriver'
 QUOTA_CONF_DRIVER = 'neutron.quota.ConfDriver'
 
 quota_opts = [
@@ -223,7 +224,7 @@ class QuotaEngine(object):
         if self._driver is None:
             _driver_class = (self._driver_class or
                              cfg.CONF.QUOTAS.quota_driver)
-            if (_driver_class == QUOTA_DB_DRIVER and
+            if (_driver_class in (QUOTA_DB_DRIVER, QUOTA_TRACKED_DRIVER) and
                     QUOTA_DB_MODULE not in sys.modules):
                 # If quotas table is not loaded, force config quota driver.
                 _driver_class = QUOTA_CONF_DRIVER
@@ -301,6 +302,39 @@ class QuotaEngine(object):
         return self.get_driver().limit_check(context, tenant_id,
                                              self._resources, values)
 
+    def make_reservation(self, context, tenant_id, resource, delta,
+                         *args, **kwargs):
+        """Check that delta more resources fit in the quota of a tenant.
+
+        The drivers tracking the usage of the resource reserve the delta
+        until release_reservation is called with the reservation returned,
+        once the resources are created or failed to be. For the other
+        drivers, the resources are counted, passing the arguments following
+        delta to the count function as count() does, and None is returned.
+
+        This method will raise a QuotaResourceUnknown exception if the
+        resource is unknown, and an OverQuota exception if the delta does
+        not fit in the quota.
+
+        :param context: The request context, for access checks.
+        :param tenant_id: The tenant_id to check the quota.
+        :param resource: The name of the resource, as a string.
+        :param delta: The number of resources to be created.
+        """
+
+        driver = self.get_driver()
+        tracks_usage = getattr(driver, 'tracks_usage', None)
+        if tracks_usage and tracks_usage(resource):
+            return driver.make_reservation(context, tenant_id,
+                                           self._resources, resource, delta)
+        count = self.count(context, resource, *args, **kwargs)
+        self.limit_check(context, tenant_id, **{resource: count + delta})
+
+    def release_reservation(self, context, reservation):
+        """Release a reservation returned by make_reservation."""
+        if reservation:
+            self.get_driver().release_reservation(context, reservation)
+
     @property
     def resources(self):
         return self._resources
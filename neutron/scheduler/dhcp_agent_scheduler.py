@@ -71,7 +71,7 @@ class ChanceScheduler(object):
             active_dhcp_agents = [
                 agent for agent in set(enabled_dhcp_agents)
                 if not agents_db.AgentDbMixin.is_agent_down(
-                    agent['heartbeat_timestamp'])
+                    agent['heartbeat_timestamp'], agent['id'])
                 and agent not in dhcp_agents
             ]
             if not active_dhcp_agents:
@@ -97,7 +97,7 @@ class ChanceScheduler(object):
             dhcp_agents = query.all()
             for dhcp_agent in dhcp_agents:
                 if agents_db.AgentDbMixin.is_agent_down(
-                    dhcp_agent.heartbeat_timestamp):
+                    dhcp_agent.heartbeat_timestamp, dhcp_agent.id):
                     LOG.warn(_('DHCP agent %s is not active'), dhcp_agent.id)
                     continue
                 fields = ['network_id', 'enable_dhcp']
@@ -66,7 +66,7 @@ class L3Scheduler(object):
                           host)
                 return False
             if agents_db.AgentDbMixin.is_agent_down(
-                l3_agent.heartbeat_timestamp):
+                l3_agent.heartbeat_timestamp, l3_agent.id):
                 LOG.warn(_('L3 agent %s is not active'), l3_agent.id)
             # check if each of the specified routers is hosted
             if router_ids:
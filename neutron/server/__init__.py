@@ -25,11 +25,14 @@ import sys
 from oslo.config import cfg
 
 from neutron.common import config
+from neutron.openstack.common import log as logging
 from neutron import service
 
 from neutron.openstack.common import gettextutils
 gettextutils.install('neutron', lazy=False)
 
+LOG = logging.getLogger(__name__)
+
 
 def main():
     eventlet.monkey_patch()
@@ -41,8 +44,22 @@ def main():
                    " search paths (~/.neutron/, ~/, /etc/neutron/, /etc/) and"
                    " the '--config-file' option!"))
     try:
-        neutron_service = service.serve_wsgi(service.NeutronApiService)
-        neutron_service.wait()
+        pool = eventlet.GreenPool()
+
+        neutron_api = service.serve_wsgi(service.NeutronApiService)
+        api_thread = pool.spawn(neutron_api.wait)
+
+        try:
+            neutron_rpc = service.serve_rpc()
+        except NotImplementedError:
+            LOG.info(_("RPC was already started in parent process by "
+                       "plugin."))
+        else:
+            rpc_thread = pool.spawn(neutron_rpc.wait)
+            # The RPC workers stop with the API
+            api_thread.link(lambda gt: rpc_thread.kill())
+
+        pool.waitall()
     except RuntimeError as e:
         sys.exit(_("ERROR: %s") % e)
 
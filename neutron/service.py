@@ -20,15 +20,20 @@ import logging as std_logging
 import os
 import random
 
+import eventlet
 from oslo.config import cfg
 
 from neutron.common import config
 from neutron.common import legacy
 from neutron import context
+from neutron import manager
+from neutron.openstack.common.db.sqlalchemy import session
+from neutron.openstack.common import excutils
 from neutron.openstack.common import importutils
 from neutron.openstack.common import log as logging
 from neutron.openstack.common import loopingcall
 from neutron.openstack.common.rpc import service
+from neutron.openstack.common import service as common_service
 from neutron import wsgi
 
 
@@ -39,6 +44,9 @@ service_opts = [
     cfg.IntOpt('api_workers',
                default=0,
                help=_('Number of separate worker processes for service')),
+    cfg.IntOpt('rpc_workers',
+               default=0,
+               help=_('Number of separate RPC worker processes for service')),
     cfg.IntOpt('periodic_fuzzy_delay',
                default=5,
                help=_('Range of seconds to randomly delay when starting the '
@@ -108,6 +116,84 @@ def serve_wsgi(cls):
     return service
 
 
+class RpcWorker(object):
+    """Wraps the RPC listeners of the plugins to be run by ProcessLauncher."""
+
+    def __init__(self, plugins):
+        self._plugins = plugins
+        self._servers = []
+
+    def start(self):
+        # This may run in a process just forked from the server: the
+        # database connections inherited from it must not be used here.
+        session.get_engine(sqlite_fk=True).pool.dispose()
+        for plugin in self._plugins:
+            servers = plugin.start_rpc_listener()
+            if isinstance(servers, list):
+                self._servers.extend(servers)
+            else:
+                self._servers.append(servers)
+
+    def wait(self):
+        for server in self._servers:
+            if isinstance(server, eventlet.greenthread.GreenThread):
+                server.wait()
+
+    def stop(self):
+        for server in self._servers:
+            if isinstance(server, eventlet.greenthread.GreenThread):
+                server.kill()
+        self._servers = []
+
+
+def _get_rpc_plugins():
+    """Return the plugins which let the server start their RPC listeners."""
+    plugins = [manager.NeutronManager.get_plugin()]
+    plugins.extend(manager.NeutronManager.get_service_plugins().values())
+    rpc_plugins = []
+    for plugin in plugins:
+        if plugin in rpc_plugins:
+            continue
+        supported = getattr(plugin, 'rpc_workers_supported', None)
+        if supported and supported():
+            rpc_plugins.append(plugin)
+    return rpc_plugins
+
+
+def serve_rpc():
+    """Start the RPC listeners of the plugins.
+
+    They run in rpc_workers processes consuming the same topics, or in this
+    process when rpc_workers is 0. Raises NotImplementedError when no
+    plugin supports it, the plugins having started their listeners
+    themselves.
+    """
+    plugins = _get_rpc_plugins()
+    if not plugins:
+        LOG.debug(_("Active plugins don't implement start_rpc_listener"))
+        if cfg.CONF.rpc_workers > 0:
+            LOG.error(_("'rpc_workers = %d' ignored because "
+                        "start_rpc_listener is not implemented."),
+                      cfg.CONF.rpc_workers)
+        raise NotImplementedError()
+
+    try:
+        rpc = RpcWorker(plugins)
+        if cfg.CONF.rpc_workers < 1:
+            rpc.start()
+            return rpc
+
+        # Do not let the workers inherit connections of this process
+        session.get_engine(sqlite_fk=True).pool.dispose()
+        launcher = common_service.ProcessLauncher()
+        launcher.launch_service(rpc, workers=cfg.CONF.rpc_workers)
+        return launcher
+    except Exception:
+        with excutils.save_and_reraise_exception():
+            LOG.exception(_('Unrecoverable error: please check log for '
+                            'details.'))
+
+
 def _run_wsgi(app_name):
     app = config.load_paste_app(app_name)
     if not app:
@@ -74,14 +74,19 @@ class L3RouterPlugin(db_base_plugin_v2.CommonDbMixin,
     def setup_rpc(self):
         # RPC support
         self.topic = topics.L3PLUGIN
-        self.conn = rpc.create_connection(new=True)
         self.agent_notifiers.update(
             {q_const.AGENT_TYPE_L3: l3_rpc_agent_api.L3AgentNotify})
         self.callbacks = L3RouterPluginRpcCallbacks()
+
+    def start_rpc_listener(self):
+        self.conn = rpc.create_connection(new=True)
         self.dispatcher = self.callbacks.create_rpc_dispatcher()
         self.conn.create_consumer(self.topic, self.dispatcher,
                                   fanout=False)
-        self.conn.consume_in_thread()
+        return self.conn.consume_in_thread()
+
+    def rpc_workers_supported(self):
+        return True
 
     def get_plugin_type(self):
         return constants.L3_ROUTER_NAT
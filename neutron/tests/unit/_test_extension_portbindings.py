@@ -247,6 +247,26 @@ class PortBindingsHostTestCaseMixin(object):
         for port in ports:
             self.assertEqual('testhosttemp', port[portbindings.HOST_ID])
 
+    def test_get_port_bindings(self):
+        cfg.CONF.set_default('allow_overlapping_ips', True)
+        host_arg = {portbindings.HOST_ID: self.hostname}
+        with contextlib.nested(
+            self.port(name='name1',
+                      arg_list=(portbindings.HOST_ID,),
+                      **host_arg),
+            self.port(name='name2')) as (port1, port2):
+            ctx = context.get_admin_context()
+            plugin = NeutronManager.get_plugin()
+            port_ids = [port1['port']['id'], port2['port']['id']]
+            bindings = plugin.get_port_bindings(ctx, port_ids)
+            self.assertEqual(self.hostname,
+                             bindings[port_ids[0]][portbindings.HOST_ID])
+            self.assertFalse(bindings[port_ids[1]][portbindings.HOST_ID])
+            for port_id in port_ids:
+                port = plugin.get_port(ctx, port_id)
+                self.assertEqual(port[portbindings.VIF_TYPE],
+                                 bindings[port_id][portbindings.VIF_TYPE])
+
     def test_ports_vif_host_list(self):
         cfg.CONF.set_default('allow_overlapping_ips', True)
         host_arg = {portbindings.HOST_ID: self.hostname}
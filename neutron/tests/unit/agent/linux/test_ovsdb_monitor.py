@@ -18,6 +18,7 @@ import eventlet.event
 import mock
 
 from neutron.agent.linux import ovsdb_monitor
+from neutron.openstack.common import jsonutils
 from neutron.tests import base
 
 
@@ -110,3 +111,75 @@ class TestSimpleInterfaceMonitor(base.BaseTestCase):
                 return_value=output):
             self.monitor._read_stdout()
         self.assertFalse(self.monitor.data_received)
+
+    def _output(self, *rows):
+        return ('{"data":%s,"headings":["row","action","name","ofport",'
+                '"external_ids"]}' % jsonutils.dumps(list(rows)))
+
+    def mock_output(self, *lines):
+        return mock.patch.object(self.monitor, 'iter_stdout',
+                                 return_value=iter(lines))
+
+    def mock_is_active(self, active=True):
+        target = ('neutron.agent.linux.ovsdb_monitor.SimpleInterfaceMonitor'
+                  '.is_active')
+        return mock.patch(target,
+                          new_callable=mock.PropertyMock(return_value=active))
+
+    def test_process_events(self):
+        external_ids = ['map', [['iface-id', 'id1'],
+                                ['attached-mac', 'fa:16:3e:00:00:01']]]
+        with self.mock_output(
+            self._output(['uuid1', 'initial', 'br-int', 65534,
+                          ['map', []]]),
+            self._output(['uuid2', 'insert', 'tap1', ['set', []],
+                          external_ids]),
+            self._output(['uuid2', 'old', '', ['set', []], ''],
+                         ['uuid2', 'new', 'tap1', 5, external_ids]),
+            self._output(['uuid2', 'delete', 'tap1', 5, external_ids])):
+            self.monitor.process_events()
+        tap1 = {'name': 'tap1', 'ofport': 5,
+                'external_ids': {'iface-id': 'id1',
+                                 'attached-mac': 'fa:16:3e:00:00:01'}}
+        self.assertEqual(self.monitor.new_events, {
+            'added': [{'name': 'br-int', 'ofport': 65534,
+                       'external_ids': {}},
+                      dict(tap1, ofport=None)],
+            'modified': [tap1],
+            'removed': [tap1]})
+
+    def test_has_updates_is_true_for_events(self):
+        self.monitor.events_lost = False
+        with self.mock_is_active():
+            with self.mock_output(self._output(
+                    ['uuid1', 'insert', 'tap1', 1, ['map', []]])):
+                self.assertTrue(self.monitor.has_updates)
+            self.assertTrue(self.monitor.has_updates)
+            self.monitor.get_events()
+            self.assertFalse(self.monitor.has_updates)
+
+    def test_get_events_returns_none_until_active(self):
+        with self.mock_is_active(False):
+            self.assertIsNone(self.monitor.get_events())
+        self.assertTrue(self.monitor.events_lost)
+        with self.mock_is_active():
+            with self.mock_output(self._output(
+                    ['uuid1', 'initial', 'tap1', 1, ['map', []]])):
+                # The caller has to list the interfaces once
+                self.assertIsNone(self.monitor.get_events())
+            self.assertEqual(self.monitor.get_events(),
+                             {'added': [], 'removed': [], 'modified': []})
+
+    def test_get_events_returns_none_for_invalid_output(self):
+        self.monitor.events_lost = False
+        with self.mock_is_active():
+            with self.mock_output('garbage'):
+                self.assertTrue(self.monitor.has_updates)
+            self.assertIsNone(self.monitor.get_events())
+
+    def test__kill_loses_events(self):
+        self.monitor.events_lost = False
+        with mock.patch(
+                'neutron.agent.linux.ovsdb_monitor.OvsdbMonitor._kill'):
+            self.monitor._kill()
+        self.assertTrue(self.monitor.events_lost)
@@ -86,6 +86,9 @@ class TestAlwaysPoll(base.BaseTestCase):
         pm = polling.AlwaysPoll()
         self.assertTrue(pm.is_polling_required)
 
+    def test_get_events_returns_none(self):
+        self.assertIsNone(polling.AlwaysPoll().get_events())
+
 
 class TestInterfacePollingMinimizer(base.BaseTestCase):
 
@@ -114,3 +117,8 @@ class TestInterfacePollingMinimizer(base.BaseTestCase):
     def test__is_polling_required_returns_when_updates_are_present(self):
         with self.mock_has_updates(True):
             self.assertTrue(self.pm._is_polling_required())
+
+    def test_get_events_returns_monitor_events(self):
+        with mock.patch.object(self.pm._monitor, 'get_events',
+                               return_value='events'):
+            self.assertEqual(self.pm.get_events(), 'events')
@@ -15,13 +15,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import datetime
+
 import mock
+from oslo.config import cfg
 
 from neutron import context
 from neutron.db import agents_db
 from neutron.db import api as db
 from neutron.db import db_base_plugin_v2 as base_plugin
 from neutron.openstack.common.db import exception as exc
+from neutron.openstack.common import jsonutils
+from neutron.openstack.common import timeutils
 from neutron.tests import base
 
 
@@ -84,3 +89,136 @@ class TestAgentsDbMixin(base.BaseTestCase):
 
             self.assertEqual(add_mock.call_count, 2,
                              "Agent entry creation hasn't been retried")
+
+
+class TestHeartbeatAggregator(TestAgentsDbMixin):
+    def setUp(self):
+        super(TestHeartbeatAggregator, self).setUp()
+        self.aggregator = agents_db.HeartbeatAggregator(1)
+        mock.patch.object(self.aggregator, '_start').start()
+        self.addCleanup(mock.patch.stopall)
+
+    def _report(self, **kwargs):
+        agent_status = dict(self.agent_status, **kwargs)
+        self.aggregator.report_state(self.context, self.plugin, agent_status)
+
+    def _get_agent_db(self):
+        return self.plugin.get_agents_db(self.context)[0]
+
+    def test_report_state_writes_new_agent(self):
+        self._report(configurations={'devices': 1})
+
+        agent = self.plugin.get_agents(self.context)[0]
+        self.assertEqual({'devices': 1}, agent['configurations'])
+        self.assertTrue(agent['alive'])
+        self.assertFalse(self.aggregator._pending)
+
+    def test_report_state_defers_heartbeat(self):
+        self._report()
+        heartbeat = self._get_agent_db().heartbeat_timestamp
+
+        with mock.patch.object(self.plugin,
+                               'create_or_update_agent') as update:
+            self._report()
+            self._report()
+            self.assertFalse(update.called)
+        agent_db = self._get_agent_db()
+        self.assertEqual(heartbeat, agent_db.heartbeat_timestamp)
+        self.assertEqual(self.aggregator._pending[agent_db.id],
+                         self.aggregator.last_heartbeat(agent_db.id,
+                                                        heartbeat))
+
+    def test_report_state_writes_changed_configurations(self):
+        self._report(configurations={'devices': 1})
+        self._report(configurations={'devices': 2})
+
+        agent = self.plugin.get_agents(self.context)[0]
+        self.assertEqual({'devices': 2}, agent['configurations'])
+        self.assertFalse(self.aggregator._pending)
+
+    def test_report_state_writes_start_flag(self):
+        self._report()
+        with mock.patch.object(self.plugin,
+                               'create_or_update_agent') as update:
+            self._report(start_flag=True)
+            self.assertTrue(update.called)
+
+    def test_flush(self):
+        self._report()
+        agent_id = self._get_agent_db().id
+        heartbeat = datetime.datetime(2030, 1, 1)
+        self.aggregator._pending[agent_id] = heartbeat
+
+        self.aggregator.flush()
+
+        self.context.session.expire_all()
+        self.assertEqual(heartbeat, self._get_agent_db().heartbeat_timestamp)
+        self.assertFalse(self.aggregator._pending)
+
+    def test_flush_forgets_deleted_agents(self):
+        self._report()
+        agent_id = self._get_agent_db().id
+        self._report()
+        with self.context.session.begin():
+            self.context.session.query(agents_db.Agent).delete()
+
+        self.aggregator.flush()
+
+        self.assertFalse(self.aggregator._agents)
+        self._report()
+        self.assertEqual(1, len(self.plugin.get_agents(self.context)))
+        self.assertNotEqual(agent_id, self._get_agent_db().id)
+
+    def test_flush_agent_written_by_another_server(self):
+        self._report(configurations={'devices': 1})
+        agent_id = self._get_agent_db().id
+        # Written through another server since
+        with self.context.session.begin():
+            self.context.session.query(agents_db.Agent).update(
+                {'configurations': jsonutils.dumps({'devices': 2})})
+        self._report(configurations={'devices': 1})
+        heartbeat = self.aggregator._pending[agent_id]
+
+        self.aggregator.flush()
+
+        self.context.session.expire_all()
+        self.assertEqual(heartbeat, self._get_agent_db().heartbeat_timestamp)
+        self.assertFalse(self.aggregator._agents)
+        self._report(configurations={'devices': 1})
+        agent = self.plugin.get_agents(self.context)[0]
+        self.assertEqual({'devices': 1}, agent['configurations'])
+
+    def test_flush_failure_keeps_heartbeats(self):
+        self._report()
+        self._report()
+        pending = dict(self.aggregator._pending)
+        with mock.patch.object(self.context.session, 'execute',
+                               side_effect=Exception):
+            with mock.patch.object(agents_db.db_api, 'get_session',
+                                   return_value=self.context.session):
+                self.aggregator.flush()
+        self.assertEqual(pending, self.aggregator._pending)
+
+    def test_is_agent_down_uses_heartbeat_in_memory(self):
+        self._report()
+        agent_id = self._get_agent_db().id
+        old = datetime.datetime(2000, 1, 1)
+        self.assertTrue(agents_db.AgentDbMixin.is_agent_down(old, agent_id))
+        with mock.patch.object(agents_db, '_aggregator', self.aggregator):
+            self.assertFalse(agents_db.AgentDbMixin.is_agent_down(old,
+                                                                  agent_id))
+            self.assertTrue(agents_db.AgentDbMixin.is_agent_down(old))
+
+    def test_rpc_callback_uses_aggregator(self):
+        cfg.CONF.set_override('agent_heartbeat_flush_interval', 1)
+        self.addCleanup(cfg.CONF.clear_override,
+                        'agent_heartbeat_flush_interval')
+        self.addCleanup(setattr, agents_db, '_aggregator', None)
+        with mock.patch.object(agents_db.HeartbeatAggregator,
+                               'report_state') as report_state:
+            callback = agents_db.AgentExtRpcCallback(self.plugin)
+            callback.report_state(
+                self.context, agent_state={'agent_state': self.agent_status},
+                time=timeutils.strtime())
+            report_state.assert_called_once_with(self.context, self.plugin,
+                                                 self.agent_status)
@@ -155,6 +155,21 @@ class TestLinuxBridgeAgent(base.BaseTestCase):
                     agent.daemon_loop()
                 self.assertEqual(3, log.call_count)
 
+    def test_daemon_loop_refreshes_pending_firewall(self):
+        agent = linuxbridge_neutron_agent.LinuxBridgeNeutronAgentRPC({},
+                                                                     0,
+                                                                     None)
+        self.assertTrue(agent.defer_refresh_firewall)
+        with contextlib.nested(
+            mock.patch.object(agent.br_mgr, 'update_devices',
+                              return_value={}),
+            mock.patch.object(agent, 'refresh_pending_firewall',
+                              side_effect=[None, SystemExit])
+        ) as (update_devices, refresh_pending_firewall):
+            with testtools.ExpectedException(SystemExit):
+                agent.daemon_loop()
+            self.assertEqual(2, refresh_pending_firewall.call_count)
+
 
 class TestLinuxBridgeManager(base.BaseTestCase):
     def setUp(self):
@@ -15,6 +15,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
 import os
 
 import mock
@@ -301,3 +302,24 @@ class MetaNeutronPluginV2Test(base.BaseTestCase):
             self.fail("AttributeError Error is not raised")
 
         self.fail("No Error is not raised")
+
+    def test_rpc_listener_not_supported(self):
+        self.assertFalse(self.plugin.rpc_workers_supported())
+        self.assertEqual(self.plugin.start_rpc_listener(), [])
+
+    def test_start_rpc_listener_delegates(self):
+        fake1 = self.plugin.plugins['fake1']
+        fake2 = self.plugin.plugins['fake2']
+        with contextlib.nested(
+            mock.patch.object(fake1, 'rpc_workers_supported',
+                              return_value=True),
+            mock.patch.object(fake1, 'start_rpc_listener',
+                              return_value='listener1'),
+            mock.patch.object(fake2, 'start_rpc_listener')
+        ) as (supported, start1, start2):
+            self.assertTrue(self.plugin.rpc_workers_supported())
+            self.assertEqual(self.plugin.start_rpc_listener(),
+                             ['listener1'])
+        # fake1 is also the l3 plugin of its flavor
+        start1.assert_called_once_with()
+        self.assertFalse(start2.called)
@@ -229,10 +229,12 @@ class TestCiscoPortsV2(CiscoML2MechanismTestCase,
 
         with mock.patch('__builtin__.hasattr',
                         new=fakehasattr):
+            # The bulk create of ml2 processes the ports without calling
+            # create_port, the fault is injected in the second port
             plugin_obj = NeutronManager.get_plugin()
-            orig = plugin_obj.create_port
-            with mock.patch.object(plugin_obj,
-                                   'create_port') as patched_plugin:
+            orig = plugin_obj._process_port_binding
+            with mock.patch.object(
+                    plugin_obj, '_process_port_binding') as patched_plugin:
 
                 def side_effect(*args, **kwargs):
                     return self._do_side_effect(patched_plugin, orig,
@@ -263,10 +265,12 @@ class TestCiscoPortsV2(CiscoML2MechanismTestCase,
             self.skipTest("Plugin does not support native bulk port create")
         ctx = context.get_admin_context()
         with self.network() as net:
+            # The bulk create of ml2 processes the ports without calling
+            # create_port, the fault is injected in the second port
             plugin_obj = NeutronManager.get_plugin()
-            orig = plugin_obj.create_port
-            with mock.patch.object(plugin_obj,
-                                   'create_port') as patched_plugin:
+            orig = plugin_obj._process_port_binding
+            with mock.patch.object(
+                    plugin_obj, '_process_port_binding') as patched_plugin:
 
                 def side_effect(*args, **kwargs):
                     return self._do_side_effect(patched_plugin, orig,
@@ -13,6 +13,9 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+# Registers the router columns of the L3 service plugin before ML2 creates
+# the tables, whichever test loads the plugins first
+from neutron.services.l3_router import l3_router_plugin  # noqa
 from neutron.tests.unit.ml2 import test_ml2_plugin
 from neutron.tests.unit.openvswitch import test_agent_scheduler
 
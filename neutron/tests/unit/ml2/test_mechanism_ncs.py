@@ -15,6 +15,7 @@
 
 from neutron.plugins.ml2 import config as config
 from neutron.plugins.ml2.drivers import mechanism_ncs
+from neutron.tests.unit.ml2 import test_ml2_plugin
 from neutron.tests.unit import test_db_plugin as test_plugin
 
 PLUGIN_NAME = 'neutron.plugins.ml2.plugin.Ml2Plugin'
@@ -47,5 +48,6 @@ class NCSMechanismTestNetworksV2(test_plugin.TestNetworksV2, NCSTestCase):
     pass
 
 
-class NCSMechanismTestPortsV2(test_plugin.TestPortsV2, NCSTestCase):
+class NCSMechanismTestPortsV2(test_ml2_plugin.Ml2PortsBulkFailureTestMixin,
+                              test_plugin.TestPortsV2, NCSTestCase):
     pass
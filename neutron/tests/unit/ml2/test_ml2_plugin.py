@@ -13,9 +13,14 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import mock
+import webob.exc
+
 from neutron.extensions import multiprovidernet as mpnet
 from neutron.extensions import portbindings
 from neutron.extensions import providernet as pnet
+from neutron import manager
+from neutron.plugins.ml2.common import exceptions as ml2_exc
 from neutron.plugins.ml2 import config
 from neutron.tests.unit import _test_extension_portbindings as test_bindings
 from neutron.tests.unit import test_db_plugin as test_plugin
@@ -67,13 +72,91 @@ class TestMl2NetworksV2(test_plugin.TestNetworksV2,
     pass
 
 
-class TestMl2PortsV2(test_plugin.TestPortsV2, Ml2PluginV2TestCase):
+class Ml2PortsBulkFailureTestMixin(object):
+    """Inject the bulk create faults of TestPortsV2 into the ml2 plugin.
+
+    Both a single and a bulk create go through create_port_bulk, so the
+    faults are not injected into create_port.
+    """
+
+    def test_create_ports_bulk_native_plugin_failure(self):
+        # The native bulk create does not go through create_port, the
+        # fault is injected while processing the second port instead
+        plugin = manager.NeutronManager.get_plugin()
+        orig = plugin._process_port_binding
+        with self.network() as net:
+            with mock.patch.object(plugin,
+                                   '_process_port_binding') as patched:
+
+                def side_effect(*args, **kwargs):
+                    return self._do_side_effect(patched, orig,
+                                                *args, **kwargs)
+
+                patched.side_effect = side_effect
+                res = self._create_port_bulk(self.fmt, 2,
+                                             net['network']['id'],
+                                             'test', True)
+                self._validate_behavior_on_bulk_failure(
+                    res, 'ports', webob.exc.HTTPServerError.code)
+
+    def test_create_ports_bulk_emulated_plugin_failure(self):
+        # The API controller always uses the native bulk create of ml2
+        self.test_create_ports_bulk_native_plugin_failure()
+
+
+class TestMl2PortsV2(Ml2PortsBulkFailureTestMixin, test_plugin.TestPortsV2,
+                     Ml2PluginV2TestCase):
 
     def test_update_port_status_build(self):
         with self.port() as port:
             self.assertEqual(port['port']['status'], 'DOWN')
             self.assertEqual(self.port_create_status, 'DOWN')
 
+    def test_create_ports_bulk_postcommit_failure(self):
+        plugin = manager.NeutronManager.get_plugin()
+        with self.network() as net:
+            with mock.patch.object(
+                    plugin.mechanism_manager, 'create_ports_postcommit',
+                    side_effect=ml2_exc.MechanismDriverError(
+                        method='create_ports_postcommit')):
+                res = self._create_port_bulk(self.fmt, 2,
+                                             net['network']['id'],
+                                             'test', True)
+                self._validate_behavior_on_bulk_failure(
+                    res, 'ports', webob.exc.HTTPServerError.code)
+
+    def test_create_port_through_bulk_create(self):
+        plugin = manager.NeutronManager.get_plugin()
+        with self.network() as net:
+            with mock.patch.object(plugin, 'create_port_bulk',
+                                   wraps=plugin.create_port_bulk) as bulk:
+                with self.port(network=net):
+                    self.assertEqual(bulk.call_count, 1)
+                    self.assertEqual(len(bulk.call_args[0][1]['ports']), 1)
+
+    def test_create_ports_bulk_calls_drivers_once(self):
+        plugin = manager.NeutronManager.get_plugin()
+        with self.subnet() as subnet:
+            with mock.patch.object(plugin.mechanism_manager,
+                                   'create_ports_precommit') as precommit:
+                res = self._create_port_bulk(self.fmt, 3,
+                                             subnet['subnet']['network_id'],
+                                             'test', True)
+                ports = self.deserialize(self.fmt, res)['ports']
+                self.assertEqual(precommit.call_count, 1)
+                contexts = precommit.call_args[0][0]
+                self.assertEqual([c.current['id'] for c in contexts],
+                                 [port['id'] for port in ports])
+            ips = [port['fixed_ips'][0]['ip_address'] for port in ports]
+            self.assertEqual(ips, ['10.0.0.2', '10.0.0.3', '10.0.0.4'])
+            self.assertEqual(len(set(port['mac_address'] for port in ports)),
+                             3)
+            for port in ports:
+                self.assertEqual(port['status'], 'DOWN')
+                self.assertEqual(port[portbindings.VIF_TYPE],
+                                 portbindings.VIF_TYPE_UNBOUND)
+                self._delete('ports', port['id'])
+
 
 class TestMl2PortBinding(Ml2PluginV2TestCase,
                          test_bindings.PortBindingsTestCase):
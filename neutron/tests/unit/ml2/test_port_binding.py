@@ -13,6 +13,9 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
+
+from neutron import context
 from neutron.extensions import portbindings
 from neutron import manager
 from neutron.plugins.ml2 import config as config
@@ -76,3 +79,43 @@ class PortBindingTestCase(test_plugin.NeutronDbPluginV2TestCase):
         self._test_port_binding("host-bridge-filter",
                                 portbindings.VIF_TYPE_BRIDGE,
                                 True, True)
+
+    def test_devices_details_list(self):
+        host_arg = {portbindings.HOST_ID: "host-ovs-no_filter"}
+        with self.subnet() as subnet:
+            with contextlib.nested(
+                self.port(subnet=subnet, name='name1',
+                          arg_list=(portbindings.HOST_ID,), **host_arg),
+                self.port(subnet=subnet, name='name2')
+            ) as (port1, port2):
+                devices = ['tap' + port1['port']['id'],
+                           port2['port']['id'][:11],
+                           'fake_device']
+                details = self.plugin.callbacks.get_devices_details_list(
+                    None, agent_id="theAgentId", devices=devices)
+                self.assertEqual([entry['device'] for entry in details],
+                                 devices)
+                self.assertEqual(details[0]['port_id'],
+                                 port1['port']['id'])
+                self.assertEqual(details[0]['network_type'], 'local')
+                # unbound and unknown devices only echo the device name
+                self.assertEqual(details[1], {'device': devices[1]})
+                self.assertEqual(details[2], {'device': devices[2]})
+
+    def test_get_port_bindings(self):
+        host_arg = {portbindings.HOST_ID: "host-ovs-no_filter"}
+        with self.subnet() as subnet:
+            with contextlib.nested(
+                self.port(subnet=subnet, name='name1',
+                          arg_list=(portbindings.HOST_ID,), **host_arg),
+                self.port(subnet=subnet, name='name2')
+            ) as (port1, port2):
+                ctx = context.get_admin_context()
+                port_ids = [port1['port']['id'], port2['port']['id']]
+                bindings = self.plugin.get_port_bindings(ctx, port_ids)
+                for port_id in port_ids:
+                    port = self.plugin.get_port(ctx, port_id)
+                    self.assertEqual(
+                        {portbindings.HOST_ID: port[portbindings.HOST_ID],
+                         portbindings.VIF_TYPE: port[portbindings.VIF_TYPE]},
+                        bindings[port_id])
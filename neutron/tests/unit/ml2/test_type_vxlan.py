@@ -14,13 +14,18 @@
 #    under the License.
 # @author: Kyle Mestery, Cisco Systems, Inc.
 
+import contextlib
+
+import mock
 from oslo.config import cfg
 import testtools
 from testtools import matchers
 
 from neutron.common import exceptions as exc
 from neutron.db import api as db
+from neutron.openstack.common.db import exception as db_exc
 from neutron.plugins.common import constants as p_const
+from neutron.plugins.common import segment_allocator
 from neutron.plugins.ml2 import db as ml2_db
 from neutron.plugins.ml2 import driver_api as api
 from neutron.plugins.ml2.drivers import type_vxlan
@@ -173,6 +178,71 @@ class VxlanTypeTest(base.BaseTestCase):
             segment[api.SEGMENTATION_ID] = tunnel_id
             self.driver.release_segment(self.session, segment)
 
+    def test_allocate_tenant_segment_scans_when_sampling_fails(self):
+        with mock.patch.object(segment_allocator.SegmentAllocator,
+                               '_sample_free', return_value=[]):
+            for vxlan_vni in xrange(TUN_MIN, TUN_MAX + 1):
+                segment = self.driver.allocate_tenant_segment(self.session)
+                self.assertEqual(segment[api.SEGMENTATION_ID], vxlan_vni)
+            self.assertIsNone(
+                self.driver.allocate_tenant_segment(self.session))
+
+    def test_allocate_tenant_segment_resamples_concurrent_allocation(self):
+        with contextlib.nested(
+            mock.patch.object(segment_allocator.SegmentAllocator,
+                              '_sample_free',
+                              side_effect=[(None, TUN_MIN),
+                                           (None, TUN_MIN + 1)]),
+            mock.patch.object(segment_allocator.SegmentAllocator, '_insert',
+                              side_effect=[False, True])
+        ) as (sample_free, insert):
+            segment = self.driver.allocate_tenant_segment(self.session)
+        self.assertEqual(segment[api.SEGMENTATION_ID], TUN_MIN + 1)
+        insert.assert_called_with(self.session, TUN_MIN + 1, None)
+
+    def test_allocate_tenant_segment_scan_skips_concurrent_allocation(self):
+        with contextlib.nested(
+            mock.patch.object(segment_allocator.SegmentAllocator,
+                              '_sample_free', return_value=None),
+            mock.patch.object(segment_allocator.SegmentAllocator, '_insert',
+                              side_effect=[False, True])
+        ) as (sample_free, insert):
+            segment = self.driver.allocate_tenant_segment(self.session)
+        self.assertEqual(segment[api.SEGMENTATION_ID], TUN_MIN + 1)
+        self.assertEqual(insert.call_args_list,
+                         [mock.call(self.session, TUN_MIN, None),
+                          mock.call(self.session, TUN_MIN + 1, None)])
+
+    def test_reserve_provider_segment_concurrent_allocation(self):
+        segment = {api.NETWORK_TYPE: 'vxlan',
+                   api.PHYSICAL_NETWORK: 'None',
+                   api.SEGMENTATION_ID: TUN_MIN}
+        with mock.patch.object(segment_allocator.SegmentAllocator, '_insert',
+                               return_value=False):
+            with testtools.ExpectedException(exc.TunnelIdInUse):
+                self.driver.reserve_provider_segment(self.session, segment)
+
+    def test_insert_in_savepoint(self):
+        session = mock.MagicMock()
+        session.get_bind.return_value.dialect.name = 'mysql'
+        session.begin_nested.return_value.__exit__.return_value = False
+        allocator = self.driver._allocator
+        self.assertTrue(allocator._insert(session, TUN_MIN, None))
+        session.begin_nested.assert_called_once_with()
+
+        session.add.side_effect = db_exc.DBDuplicateEntry(['vxlan_vni'])
+        self.assertFalse(allocator._insert(session, TUN_MIN, None))
+
+    def test_sync_removes_unallocated_vnis(self):
+        self.session.add(type_vxlan.VxlanAllocation(vxlan_vni=TUN_MIN,
+                                                    allocated=False))
+        self.session.flush()
+
+        self.driver._sync_vxlan_allocations()
+
+        self.assertEqual(
+            self.session.query(type_vxlan.VxlanAllocation).count(), 0)
+
     def test_vxlan_endpoints(self):
         """Test VXLAN allocation/de-allocation."""
 
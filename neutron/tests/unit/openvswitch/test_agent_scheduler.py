@@ -603,6 +603,18 @@ class OvsAgentSchedulerTestCase(OvsAgentSchedulerTestCaseBase):
         self.assertEqual(1, len(l3_agents['agents']))
         self.assertEqual(L3_HOSTA, l3_agents['agents'][0]['host'])
 
+    def test_get_router_ids_auto_schedules(self):
+        with self.router() as router:
+            l3_rpc = l3_rpc_base.L3RpcCallbackMixin()
+            self._register_agent_states()
+            ids_a = l3_rpc.get_router_ids(self.adminContext, host=L3_HOSTA)
+            ids_b = l3_rpc.get_router_ids(self.adminContext, host=L3_HOSTB)
+            self.assertEqual([router['router']['id']], ids_a)
+            self.assertEqual([], ids_b)
+            ret_a = l3_rpc.sync_routers(self.adminContext, host=L3_HOSTA,
+                                        router_ids=ids_a)
+            self.assertEqual(ids_a, [r['id'] for r in ret_a])
+
     def test_router_auto_schedule_restart_l3_agent(self):
         with self.router():
             l3_rpc = l3_rpc_base.L3RpcCallbackMixin()
@@ -188,6 +188,17 @@ class VlanAllocationsTest(base.BaseTestCase):
                                VLAN_RANGES)
         ovs_db_v2.sync_vlan_allocations({})
 
+    def test_sync_removes_unallocated_vlans(self):
+        self.session.add(ovs_models.VlanAllocation(PHYS_NET, VLAN_MIN))
+        self.session.flush()
+
+        ovs_db_v2.sync_vlan_allocations(VLAN_RANGES)
+
+        self.assertEqual(
+            self.session.query(ovs_models.VlanAllocation).count(), 0)
+        self.assertFalse(ovs_db_v2.get_vlan_allocation(PHYS_NET,
+                                                       VLAN_MIN).allocated)
+
 
 class TunnelAllocationsTest(base.BaseTestCase):
     def setUp(self):
@@ -240,6 +251,18 @@ class TunnelAllocationsTest(base.BaseTestCase):
         for tunnel_id in tunnel_ids:
             ovs_db_v2.release_tunnel(self.session, tunnel_id, TUNNEL_RANGES)
 
+    def test_tunnel_pool_without_rows(self):
+        ovs_db_v2.sync_tunnel_allocations([(1, 1000000)])
+        self.assertEqual(
+            self.session.query(ovs_models.TunnelAllocation).count(), 0)
+
+        tunnel_id = ovs_db_v2.reserve_tunnel(self.session)
+        self.assertThat(tunnel_id, matchers.GreaterThan(0))
+        self.assertThat(tunnel_id, matchers.LessThan(1000001))
+        self.assertTrue(ovs_db_v2.get_tunnel_allocation(tunnel_id).allocated)
+        self.assertEqual(
+            self.session.query(ovs_models.TunnelAllocation).count(), 1)
+
     def test_add_tunnel_endpoints(self):
         tun_1 = ovs_db_v2.add_tunnel_endpoint('192.168.0.1')
         tun_2 = ovs_db_v2.add_tunnel_endpoint('192.168.0.2')
@@ -340,30 +340,29 @@ class OVS_Lib_Test(base.BaseTestCase):
 
     def _test_get_vif_ports(self, is_xen=False):
         pname = "tap99"
-        ofport = "6"
+        ofport = 6
         vif_id = uuidutils.generate_uuid()
         mac = "ca:fe:de:ad:be:ef"
 
         if is_xen:
-            external_ids = ('{xs-vif-uuid="%s", attached-mac="%s"}'
-                            % (vif_id, mac))
+            external_ids = {"xs-vif-uuid": vif_id, "attached-mac": mac}
         else:
-            external_ids = ('{iface-id="%s", attached-mac="%s"}'
-                            % (vif_id, mac))
+            external_ids = {"iface-id": vif_id, "attached-mac": mac}
+        headings = ['name', 'external_ids', 'ofport']
+        data = [[pname, external_ids, ofport],
+                # A vif port on another bridge
+                ['tap88', {"iface-id": 'tap88id', "attached-mac": mac}, 3]]
 
         # Each element is a tuple of (expected mock call, return_value)
         expected_calls_and_values = [
             (mock.call(["ovs-vsctl", self.TO, "list-ports", self.BR_NAME],
                        root_helper=self.root_helper),
              "%s\n" % pname),
-            (mock.call(["ovs-vsctl", self.TO, "get",
-                        "Interface", pname, "external_ids"],
-                       root_helper=self.root_helper),
-             external_ids),
-            (mock.call(["ovs-vsctl", self.TO, "get",
-                        "Interface", pname, "ofport"],
+            (mock.call(["ovs-vsctl", self.TO, "--format=json",
+                        "--", "--columns=name,external_ids,ofport",
+                        "list", "Interface"],
                        root_helper=self.root_helper),
-             ofport),
+             self._encode_ovs_json(headings, data)),
         ]
         if is_xen:
             expected_calls_and_values.append(
@@ -391,12 +390,15 @@ class OVS_Lib_Test(base.BaseTestCase):
             ovs_row = []
             r["data"].append(ovs_row)
             for cell in row:
-                if isinstance(cell, str):
+                if isinstance(cell, (str, int)):
                     ovs_row.append(cell)
                 elif isinstance(cell, dict):
                     ovs_row.append(["map", cell.items()])
+                elif cell is None:
+                    ovs_row.append(["set", []])
                 else:
-                    raise TypeError('%r not str or dict' % type(cell))
+                    raise TypeError('%r not str, int, dict or None' %
+                                    type(cell))
         return jsonutils.dumps(r)
 
     def _test_get_vif_port_set(self, is_xen):
@@ -405,14 +407,14 @@ class OVS_Lib_Test(base.BaseTestCase):
         else:
             id_key = 'iface-id'
 
-        headings = ['name', 'external_ids']
+        headings = ['name', 'external_ids', 'ofport']
         data = [
             # A vif port on this bridge:
-            ['tap99', {id_key: 'tap99id', 'attached-mac': 'tap99mac'}],
+            ['tap99', {id_key: 'tap99id', 'attached-mac': 'tap99mac'}, 1],
             # A vif port on another bridge:
-            ['tap88', {id_key: 'tap88id', 'attached-mac': 'tap88id'}],
+            ['tap88', {id_key: 'tap88id', 'attached-mac': 'tap88id'}, 2],
             # Non-vif port on this bridge:
-            ['tun22', {}],
+            ['tun22', {}, 3],
         ]
 
         # Each element is a tuple of (expected mock call, return_value)
@@ -421,7 +423,7 @@ class OVS_Lib_Test(base.BaseTestCase):
                        root_helper=self.root_helper),
              'tap99\ntun22'),
             (mock.call(["ovs-vsctl", self.TO, "--format=json",
-                        "--", "--columns=name,external_ids",
+                        "--", "--columns=name,external_ids,ofport",
                         "list", "Interface"],
                        root_helper=self.root_helper),
              self._encode_ovs_json(headings, data)),
@@ -457,10 +459,11 @@ class OVS_Lib_Test(base.BaseTestCase):
                        root_helper=self.root_helper),
              RuntimeError()),
             (mock.call(["ovs-vsctl", self.TO, "--format=json",
-                        "--", "--columns=name,external_ids",
+                        "--", "--columns=name,external_ids,ofport",
                         "list", "Interface"],
                        root_helper=self.root_helper),
-             self._encode_ovs_json(['name', 'external_ids'], []))
+             self._encode_ovs_json(['name', 'external_ids', 'ofport'],
+                                   []))
         ]
         tools.setup_mock_calls(self.execute, expected_calls_and_values)
         self.assertEqual(set(), self.br.get_vif_port_set())
@@ -472,7 +475,7 @@ class OVS_Lib_Test(base.BaseTestCase):
                        root_helper=self.root_helper),
              'tap99\n'),
             (mock.call(["ovs-vsctl", self.TO, "--format=json",
-                        "--", "--columns=name,external_ids",
+                        "--", "--columns=name,external_ids,ofport",
                         "list", "Interface"],
                        root_helper=self.root_helper),
              RuntimeError()),
@@ -488,20 +491,71 @@ class OVS_Lib_Test(base.BaseTestCase):
             ["ovs-vsctl", self.TO, "clear", "Port", pname, "tag"],
             root_helper=self.root_helper)
 
-    def test_port_id_regex(self):
-        result = ('external_ids        : {attached-mac="fa:16:3e:23:5b:f2",'
-                  ' iface-id="5c1321a7-c73f-4a77-95e6-9f86402e5c8f",'
-                  ' iface-status=active}\nname                :'
-                  ' "dhc5c1321a7-c7"\nofport              : 2\n')
-        match = self.br.re_id.search(result)
-        vif_mac = match.group('vif_mac')
-        vif_id = match.group('vif_id')
-        port_name = match.group('port_name')
-        ofport = int(match.group('ofport'))
-        self.assertEqual(vif_mac, 'fa:16:3e:23:5b:f2')
-        self.assertEqual(vif_id, '5c1321a7-c73f-4a77-95e6-9f86402e5c8f')
-        self.assertEqual(port_name, 'dhc5c1321a7-c7')
-        self.assertEqual(ofport, 2)
+    def _mock_find_vif_port(self, rows):
+        self.execute.return_value = self._encode_ovs_json(
+            ['name', 'external_ids', 'ofport'], rows)
+        port = self.br.get_vif_port_by_id('port1')
+        self.execute.assert_called_once_with(
+            ["ovs-vsctl", self.TO, "--format=json", "--",
+             "--columns=name,external_ids,ofport", "find", "Interface",
+             'external_ids:iface-id="port1"'],
+            root_helper=self.root_helper)
+        return port
+
+    def test_get_vif_port_by_id(self):
+        external_ids = {'iface-id': 'port1',
+                        'attached-mac': 'fa:16:3e:23:5b:f2',
+                        'iface-status': 'active'}
+        port = self._mock_find_vif_port([['dhc5c1321a7-c7', external_ids, 2]])
+        self.assertEqual(port.port_name, 'dhc5c1321a7-c7')
+        self.assertEqual(port.ofport, 2)
+        self.assertEqual(port.vif_id, 'port1')
+        self.assertEqual(port.vif_mac, 'fa:16:3e:23:5b:f2')
+
+    def test_get_vif_port_by_id_without_ofport(self):
+        external_ids = {'iface-id': 'port1',
+                        'attached-mac': 'fa:16:3e:23:5b:f2'}
+        self.assertIsNone(
+            self._mock_find_vif_port([['tap1', external_ids, None]]))
+
+    def test_get_vif_port_by_id_not_found(self):
+        self.assertIsNone(self._mock_find_vif_port([]))
+
+    def test_get_vif_ports_by_ids(self):
+        port1 = ovs_lib.VifPort('tap1', 1, 'id1', 'ca:fe:de:ad:be:ef', 'br')
+        port2 = ovs_lib.VifPort('tap2', 2, 'id2', 'ca:ee:de:ad:be:ef', 'br')
+        with mock.patch.object(self.br, 'get_vif_ports',
+                               return_value=[port1, port2]):
+            self.assertEqual(self.br.get_vif_ports_by_ids(['id2', 'id3']),
+                             {'id2': port2})
+
+    def test_get_vif_ports_without_ofport(self):
+        external_ids = {'iface-id': 'id1', 'attached-mac': 'tap1mac'}
+        expected_calls_and_values = [
+            (mock.call(["ovs-vsctl", self.TO, "list-ports", self.BR_NAME],
+                       root_helper=self.root_helper),
+             'tap1\n'),
+            (mock.call(["ovs-vsctl", self.TO, "--format=json",
+                        "--", "--columns=name,external_ids,ofport",
+                        "list", "Interface"],
+                       root_helper=self.root_helper),
+             self._encode_ovs_json(['name', 'external_ids', 'ofport'],
+                                   [['tap1', external_ids, None]])),
+        ]
+        tools.setup_mock_calls(self.execute, expected_calls_and_values)
+        ports = self.br.get_vif_ports()
+        self.assertEqual(ports[0].ofport, -1)
+
+    def test_ovsdb_value_from_json(self):
+        self.assertEqual(ovs_lib.ovsdb_value_from_json(5), 5)
+        self.assertEqual(ovs_lib.ovsdb_value_from_json(['set', []]), None)
+        self.assertEqual(ovs_lib.ovsdb_value_from_json(['set', [1, 2]]),
+                         [1, 2])
+        self.assertEqual(
+            ovs_lib.ovsdb_value_from_json(['map', [['a', 'b']]]),
+            {'a': 'b'})
+        self.assertEqual(
+            ovs_lib.ovsdb_value_from_json(['uuid', 'a-b']), 'a-b')
 
     def test_iface_to_br(self):
         iface = 'tap0'
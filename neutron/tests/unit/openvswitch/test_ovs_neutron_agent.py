@@ -155,9 +155,12 @@ class TestOvsNeutronAgent(base.BaseTestCase):
         self.assertTrue(add_flow_func.called)
 
     def mock_update_ports(self, vif_port_set=None, registered_ports=None):
-        with mock.patch.object(self.agent.int_br, 'get_vif_port_set',
-                               return_value=vif_port_set):
-            return self.agent.update_ports(registered_ports)
+        vif_ports = [ovs_lib.VifPort('tap%s' % vif_id, 1, vif_id,
+                                     'fa:16:3e:00:00:01', self.agent.int_br)
+                     for vif_id in vif_port_set or []]
+        with mock.patch.object(self.agent.int_br, 'get_vif_ports',
+                               return_value=vif_ports):
+            return self.agent.update_ports(registered_ports or set())
 
     def test_update_ports_returns_none_for_unchanged_ports(self):
         self.assertIsNone(self.mock_update_ports())
@@ -169,8 +172,106 @@ class TestOvsNeutronAgent(base.BaseTestCase):
         actual = self.mock_update_ports(vif_port_set, registered_ports)
         self.assertEqual(expected, actual)
 
+    def test_update_ports_remembers_vif_ports(self):
+        self.agent.int_br_vif_ports = {'id1': mock.Mock()}
+        self.mock_update_ports(set(['id2']), set(['id1']))
+        self.assertEqual(self.agent.int_br_vif_ports.keys(), ['id2'])
+        self.assertEqual(self.agent.int_br_vif_ports['id2'].port_name,
+                         'tapid2')
+
+    def _interface(self, name, vif_id=None, ofport=1):
+        external_ids = {}
+        if vif_id:
+            external_ids = {'iface-id': vif_id,
+                            'attached-mac': 'fa:16:3e:00:00:01'}
+        return {'name': name, 'ofport': ofport, 'external_ids': external_ids}
+
+    def mock_update_ports_from_events(self, registered_ports, added=(),
+                                      removed=(), modified=(),
+                                      port_names=()):
+        events = {'added': list(added), 'removed': list(removed),
+                  'modified': list(modified)}
+        with mock.patch.object(self.agent.int_br, 'get_port_name_list',
+                               return_value=list(port_names)) as list_fn:
+            port_info = self.agent.update_ports_from_events(
+                set(registered_ports), events)
+        return port_info, list_fn.called
+
+    def test_update_ports_from_events_added(self):
+        port_info, listed = self.mock_update_ports_from_events(
+            ['id1'],
+            added=[self._interface('tap2', 'id2', ofport=3),
+                   self._interface('qg-3', 'id3'),
+                   self._interface('patch-tun')],
+            port_names=['tap2', 'patch-tun'])
+        self.assertTrue(listed)
+        self.assertEqual(port_info, {'current': set(['id1', 'id2']),
+                                     'added': set(['id2']),
+                                     'removed': set()})
+        vif_port = self.agent.int_br_vif_ports['id2']
+        self.assertEqual((vif_port.port_name, vif_port.ofport,
+                          vif_port.vif_mac),
+                         ('tap2', 3, 'fa:16:3e:00:00:01'))
+        self.assertEqual(self.agent.int_br_device_count, 2)
+
+    def test_update_ports_from_events_removed(self):
+        self.agent.int_br_vif_ports = {'id1': mock.Mock(port_name='tap1')}
+        port_info, listed = self.mock_update_ports_from_events(
+            ['id1', 'id2'],
+            removed=[self._interface('tap1', 'id1'),
+                     self._interface('qg-3', 'id3')])
+        self.assertFalse(listed)
+        self.assertEqual(port_info, {'current': set(['id2']),
+                                     'added': set(),
+                                     'removed': set(['id1'])})
+        self.assertEqual(self.agent.int_br_vif_ports, {})
+
+    def test_update_ports_from_events_without_port_change(self):
+        self.agent.int_br_vif_ports = {
+            'id1': ovs_lib.VifPort('tap1', 1, 'id1', 'fa:16:3e:00:00:01',
+                                   self.agent.int_br)}
+        port_info, listed = self.mock_update_ports_from_events(
+            ['id1'], modified=[self._interface('tap1', 'id1')])
+        self.assertIsNone(port_info)
+        self.assertFalse(listed)
+
+    def test_update_ports_from_events_ofport_changed(self):
+        self.agent.int_br_vif_ports = {
+            'id1': ovs_lib.VifPort('tap1', -1, 'id1', 'fa:16:3e:00:00:01',
+                                   self.agent.int_br)}
+        port_info, listed = self.mock_update_ports_from_events(
+            ['id1'], modified=[self._interface('tap1', 'id1', ofport=5)])
+        self.assertFalse(listed)
+        self.assertEqual(port_info['added'], set(['id1']))
+        self.assertEqual(self.agent.int_br_vif_ports['id1'].ofport, 5)
+
+    def test_update_ports_from_events_replugged_port(self):
+        self.agent.int_br_vif_ports = {
+            'id1': ovs_lib.VifPort('tap1', 1, 'id1', 'fa:16:3e:00:00:01',
+                                   self.agent.int_br)}
+        port_info, listed = self.mock_update_ports_from_events(
+            ['id1'],
+            removed=[self._interface('tap1', 'id1')],
+            added=[self._interface('tap1', 'id1', ofport=2)],
+            port_names=['tap1'])
+        self.assertEqual(port_info, {'current': set(['id1']),
+                                     'added': set(['id1']),
+                                     'removed': set()})
+
+    def test_update_ports_from_events_iface_id_changed(self):
+        self.agent.int_br_vif_ports = {
+            'id1': ovs_lib.VifPort('tap1', 1, 'id1', 'fa:16:3e:00:00:01',
+                                   self.agent.int_br)}
+        port_info, listed = self.mock_update_ports_from_events(
+            ['id1'], modified=[self._interface('tap1', 'id2')],
+            port_names=['tap1'])
+        self.assertEqual(port_info, {'current': set(['id2']),
+                                     'added': set(['id2']),
+                                     'removed': set(['id1'])})
+
     def test_treat_devices_added_returns_true_for_missing_device(self):
-        with mock.patch.object(self.agent.plugin_rpc, 'get_device_details',
+        with mock.patch.object(self.agent.plugin_rpc,
+                               'get_devices_details_list',
                                side_effect=Exception()):
             self.assertTrue(self.agent.treat_devices_added([{}]))
 
@@ -178,21 +279,43 @@ class TestOvsNeutronAgent(base.BaseTestCase):
         """Mock treat devices added.
 
         :param details: the details to return for the device
-        :param port: the port that get_vif_port_by_id should return
+        :param port: the port that get_vif_ports_by_ids should return
         :param func_name: the function that should be called
         :returns: whether the named function was called
         """
         with contextlib.nested(
-            mock.patch.object(self.agent.plugin_rpc, 'get_device_details',
-                              return_value=details),
-            mock.patch.object(self.agent.int_br, 'get_vif_port_by_id',
-                              return_value=port),
-            mock.patch.object(self.agent.plugin_rpc, 'update_device_up'),
+            mock.patch.object(self.agent.plugin_rpc,
+                              'get_devices_details_list',
+                              return_value=[details]),
+            mock.patch.object(self.agent.int_br, 'get_vif_ports_by_ids',
+                              return_value={details['device']: port}),
+            mock.patch.object(self.agent.plugin_rpc, 'update_devices_up'),
             mock.patch.object(self.agent, func_name)
         ) as (get_dev_fn, get_vif_func, upd_dev_up, func):
-            self.assertFalse(self.agent.treat_devices_added([{}]))
+            self.assertFalse(self.agent.treat_devices_added(['id1']))
+        get_vif_func.assert_called_once_with(set(['id1']))
         return func.called
 
+    def test_treat_devices_added_uses_known_vif_ports(self):
+        port = ovs_lib.VifPort('tap1', 1, 'id1', 'fa:16:3e:00:00:01',
+                               self.agent.int_br)
+        self.agent.int_br_vif_ports = {'id1': port}
+        details = {'device': 'id1', 'port_id': 'id1', 'network_id': 'net',
+                   'network_type': 'local', 'physical_network': None,
+                   'segmentation_id': None, 'admin_state_up': True}
+        with contextlib.nested(
+            mock.patch.object(self.agent.plugin_rpc,
+                              'get_devices_details_list',
+                              return_value=[details]),
+            mock.patch.object(self.agent.int_br, 'get_vif_ports_by_ids'),
+            mock.patch.object(self.agent.plugin_rpc, 'update_devices_up'),
+            mock.patch.object(self.agent, 'treat_vif_port')
+        ) as (get_dev_fn, get_vif_func, upd_dev_up, treat_vif_port):
+            self.assertFalse(self.agent.treat_devices_added(['id1']))
+        self.assertFalse(get_vif_func.called)
+        treat_vif_port.assert_called_once_with(port, 'id1', 'net', 'local',
+                                               None, None, True)
+
     def test_treat_devices_added_ignores_invalid_ofport(self):
         port = mock.Mock()
         port.ofport = -1
@@ -212,15 +335,40 @@ class TestOvsNeutronAgent(base.BaseTestCase):
                                                        mock.Mock(),
                                                        'treat_vif_port'))
 
+    def test_treat_devices_added_updates_devices_up_in_bulk(self):
+        details = {'device': 'tap1', 'port_id': 'port1',
+                   'network_id': 'net1', 'network_type': 'vlan',
+                   'physical_network': 'physnet1', 'segmentation_id': 1,
+                   'admin_state_up': True}
+        with contextlib.nested(
+            mock.patch.object(self.agent.plugin_rpc,
+                              'get_devices_details_list',
+                              return_value=[details,
+                                            dict(details, device='tap2')]),
+            mock.patch.object(self.agent.int_br, 'get_vif_ports_by_ids',
+                              return_value={}),
+            mock.patch.object(self.agent.plugin_rpc, 'update_devices_up'),
+            mock.patch.object(self.agent, 'treat_vif_port')
+        ) as (get_dev_fn, get_vif_func, upd_dev_up, treat_vif_port):
+            self.assertFalse(self.agent.treat_devices_added(['tap1', 'tap2']))
+            get_dev_fn.assert_called_once_with(self.agent.context,
+                                               ['tap1', 'tap2'],
+                                               self.agent.agent_id)
+            upd_dev_up.assert_called_once_with(self.agent.context,
+                                               ['tap1', 'tap2'],
+                                               self.agent.agent_id,
+                                               cfg.CONF.host)
+            self.assertEqual(treat_vif_port.call_count, 2)
+
     def test_treat_devices_removed_returns_true_for_missing_device(self):
-        with mock.patch.object(self.agent.plugin_rpc, 'update_device_down',
+        with mock.patch.object(self.agent.plugin_rpc, 'update_devices_down',
                                side_effect=Exception()):
             self.assertTrue(self.agent.treat_devices_removed([{}]))
 
     def _mock_treat_devices_removed(self, port_exists):
         details = dict(exists=port_exists)
-        with mock.patch.object(self.agent.plugin_rpc, 'update_device_down',
-                               return_value=details):
+        with mock.patch.object(self.agent.plugin_rpc, 'update_devices_down',
+                               return_value=[details]):
             with mock.patch.object(self.agent, 'port_unbound') as port_unbound:
                 self.assertFalse(self.agent.treat_devices_removed([{}]))
         self.assertTrue(port_unbound.called)
@@ -593,6 +741,20 @@ class TestOvsNeutronAgent(base.BaseTestCase):
                                        constants.DEFAULT_OVSDBMON_RESPAWN)
         mock_loop.called_once()
 
+    def test_rpc_loop_refreshes_pending_firewall(self):
+        polling_manager = mock.Mock()
+        polling_manager.get_events.return_value = None
+        with contextlib.nested(
+            mock.patch.object(self.agent, 'update_ports', return_value={}),
+            mock.patch.object(self.agent.sg_agent, 'refresh_pending_firewall',
+                              side_effect=[None, SystemExit]),
+            mock.patch('time.sleep')
+        ) as (update_ports, refresh_pending_firewall, sleep):
+            with testtools.ExpectedException(SystemExit):
+                self.agent.rpc_loop(polling_manager=polling_manager)
+        self.assertTrue(self.agent.sg_agent.defer_refresh_firewall)
+        self.assertEqual(2, refresh_pending_firewall.call_count)
+
     def test_setup_tunnel_port_error_negative(self):
         with contextlib.nested(
             mock.patch.object(self.agent.tun_br, 'add_tunnel_port',
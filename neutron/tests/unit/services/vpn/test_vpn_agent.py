@@ -181,7 +181,19 @@ class TestVPNAgent(base.BaseTestCase):
         self.agent._router_removed(router_id)
         device.destroy_router.assert_called_once_with(router_id)
 
-    def test_process_routers(self):
+    def test_routers_processed(self):
+        routers = [
+            {'id': _uuid(),
+             'admin_state_up': True,
+             'routes': [],
+             'external_gateway_info': {}}]
+
+        device = mock.Mock()
+        self.agent.devices = [device]
+        self.agent._routers_processed(routers)
+        device.sync.assert_called_once_with(mock.ANY, routers)
+
+    def test_process_routers_does_not_sync(self):
         self.plugin_api.get_external_network_id.return_value = None
         routers = [
             {'id': _uuid(),
@@ -192,4 +204,4 @@ class TestVPNAgent(base.BaseTestCase):
         device = mock.Mock()
         self.agent.devices = [device]
         self.agent._process_routers(routers, False)
-        device.sync.assert_called_once_with(mock.ANY, routers)
+        self.assertFalse(device.sync.called)
@@ -17,7 +17,9 @@
 
 import fixtures
 import mock
+from oslo.config import cfg
 
+from neutron.agent.common import config
 from neutron.agent.linux import utils
 from neutron.tests import base
 
@@ -79,6 +81,78 @@ class AgentUtilsExecuteTest(base.BaseTestCase):
         self.assertEqual(result, expected)
 
 
+class AgentUtilsExecuteDaemonTest(base.BaseTestCase):
+    def setUp(self):
+        super(AgentUtilsExecuteDaemonTest, self).setUp()
+        config.register_root_helper(cfg.CONF)
+        cfg.CONF.set_override('root_helper_daemon', 'sudo rootwrap-daemon',
+                              'AGENT')
+        self.addCleanup(cfg.CONF.reset)
+        self.client = mock.Mock()
+        get_client_p = mock.patch.object(utils, 'get_rootwrap_client',
+                                          return_value=self.client)
+        get_client_p.start()
+        self.addCleanup(get_client_p.stop)
+        self.mock_popen_p = mock.patch("subprocess.Popen.communicate")
+        self.mock_popen = self.mock_popen_p.start()
+        self.addCleanup(self.mock_popen_p.stop)
+
+    def test_with_helper(self):
+        self.client.execute.return_value = (0, "lo\n", "")
+        result = utils.execute(["ip", "link", "show", 1], "sudo",
+                               process_input="foo")
+        self.assertEqual(result, "lo\n")
+        self.client.execute.assert_called_once_with(
+            ["ip", "link", "show", "1"], "foo")
+        self.assertFalse(self.mock_popen.called)
+
+    def test_stderr_true(self):
+        self.client.execute.return_value = (0, "", "warning\n")
+        result = utils.execute(["ls"], "sudo", return_stderr=True)
+        self.assertEqual(result, ("", "warning\n"))
+
+    def test_execute_raises(self):
+        self.client.execute.return_value = (1, "", "error\n")
+        self.assertRaises(RuntimeError, utils.execute, ["ls"], "sudo")
+
+    def test_check_exit_code(self):
+        self.client.execute.return_value = (1, "", "")
+        result = utils.execute(["ls"], "sudo", check_exit_code=False)
+        self.assertEqual(result, "")
+
+    def test_without_helper(self):
+        self.mock_popen.return_value = ["", ""]
+        utils.execute(["ls"])
+        self.assertFalse(self.client.execute.called)
+        self.assertTrue(self.mock_popen.called)
+
+    def test_with_addl_env(self):
+        self.mock_popen.return_value = ["", ""]
+        utils.execute(["ls"], "echo", addl_env={'foo': 'bar'})
+        self.assertFalse(self.client.execute.called)
+        self.assertTrue(self.mock_popen.called)
+
+
+class AgentUtilsGetRootwrapClient(base.BaseTestCase):
+    def setUp(self):
+        super(AgentUtilsGetRootwrapClient, self).setUp()
+        config.register_root_helper(cfg.CONF)
+        self.addCleanup(cfg.CONF.reset)
+        clients_p = mock.patch.dict(utils._rootwrap_clients, clear=True)
+        clients_p.start()
+        self.addCleanup(clients_p.stop)
+
+    def test_no_daemon(self):
+        self.assertIsNone(utils.get_rootwrap_client())
+
+    def test_client_is_reused(self):
+        cfg.CONF.set_override('root_helper_daemon', 'sudo rootwrap-daemon',
+                              'AGENT')
+        client = utils.get_rootwrap_client()
+        self.assertEqual(client.daemon_cmd, 'sudo rootwrap-daemon')
+        self.assertIs(utils.get_rootwrap_client(), client)
+
+
 class AgentUtilsGetInterfaceMAC(base.BaseTestCase):
     def test_get_interface_mac(self):
         expect_val = '01:02:03:04:05:06'
@@ -0,0 +1,129 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import pipes
+import socket
+import sys
+
+import fixtures
+import mock
+
+from neutron.agent.linux import rootwrap_daemon
+from neutron.openstack.common.rootwrap import cmd as rootwrap_cmd
+from neutron.openstack.common.rootwrap import wrapper
+from neutron.tests import base
+
+
+FILTERS = """[Filters]
+cat: CommandFilter, cat, root
+sh: CommandFilter, sh, root
+missing: CommandFilter, neutron-missing-command, root
+"""
+
+DAEMON_MAIN = ('from neutron.agent.linux import rootwrap_daemon; '
+               'rootwrap_daemon.main()')
+
+
+class RootwrapDaemonTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(RootwrapDaemonTestCase, self).setUp()
+        self.tempdir = self.useFixture(fixtures.TempDir()).path
+        filters_dir = os.path.join(self.tempdir, 'rootwrap.d')
+        os.mkdir(filters_dir)
+        with open(os.path.join(filters_dir, 'test.filters'), 'w') as f:
+            f.write(FILTERS)
+        self.config_file = os.path.join(self.tempdir, 'rootwrap.conf')
+        with open(self.config_file, 'w') as f:
+            f.write('[DEFAULT]\nfilters_path=%s\n' % filters_dir)
+        config = mock.Mock(exec_dirs=['/bin', '/usr/bin'], use_syslog=False)
+        self.daemon = rootwrap_daemon.RootwrapDaemon(
+            'neutron-rootwrap-daemon', config,
+            wrapper.load_filters([filters_dir]))
+
+    def test_execute(self):
+        self.assertEqual(self.daemon.execute(['cat'], 'foo\n'),
+                         (0, 'foo\n', ''))
+
+    def test_execute_returns_exit_code(self):
+        self.assertEqual(self.daemon.execute(['sh', '-c', 'echo err >&2; '
+                                                          'exit 3']),
+                         (3, '', 'err\n'))
+
+    def test_execute_unauthorized(self):
+        returncode, stdout, stderr = self.daemon.execute(['ls', '/'])
+        self.assertEqual(returncode, rootwrap_cmd.RC_UNAUTHORIZED)
+        self.assertEqual(stderr, 'neutron-rootwrap-daemon: Unauthorized '
+                                 'command: ls / (no filter matched)\n')
+
+    def test_execute_not_executable(self):
+        returncode, stdout, stderr = self.daemon.execute(
+            ['neutron-missing-command'])
+        self.assertEqual(returncode, rootwrap_cmd.RC_NOEXECFOUND)
+
+    def test_same_key(self):
+        self.assertTrue(rootwrap_daemon._same_key('abc', 'abc'))
+        self.assertFalse(rootwrap_daemon._same_key('abd', 'abc'))
+        self.assertFalse(rootwrap_daemon._same_key('ab', 'abc'))
+        self.assertFalse(rootwrap_daemon._same_key(None, 'abc'))
+
+    def test_messages(self):
+        left, right = socket.socketpair()
+        self.addCleanup(left.close)
+        self.addCleanup(right.close)
+        rootwrap_daemon.send_message(left, {'stdout': u'\xff\n'})
+        self.assertEqual(rootwrap_daemon.recv_message(right),
+                         {'stdout': u'\xff\n'})
+        left.close()
+        self.assertIsNone(rootwrap_daemon.recv_message(right))
+
+    def _client(self):
+        daemon_cmd = ' '.join(pipes.quote(arg) for arg in
+                              [sys.executable, '-c', DAEMON_MAIN,
+                               self.config_file])
+        client = rootwrap_daemon.RootwrapDaemonClient(daemon_cmd)
+        self.addCleanup(client._stop_daemon)
+        return client
+
+    def test_client(self):
+        client = self._client()
+        self.assertEqual(client.execute(['cat'], '\x00\xff'),
+                         (0, '\x00\xff', ''))
+        returncode, stdout, stderr = client.execute(['ls'])
+        self.assertEqual(returncode, rootwrap_cmd.RC_UNAUTHORIZED)
+        self.assertIn('Unauthorized command: ls', stderr)
+        # The connection is reused
+        self.assertEqual(len(client._idle_conns), 1)
+
+    def test_client_restarts_daemon(self):
+        client = self._client()
+        client.execute(['cat'])
+        process = client._process
+        process.stdin.close()
+        process.wait()
+        self.assertEqual(client.execute(['cat'], 'foo'), (0, 'foo', ''))
+        self.assertNotEqual(client._process, process)
+
+    def test_client_refused_without_key(self):
+        client = self._client()
+        client.execute(['cat'])
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(conn.close)
+        conn.connect(client._address)
+        rootwrap_daemon.send_message(conn, {'authkey': 'wrong'})
+        self.assertIsNone(rootwrap_daemon.recv_message(conn))
@@ -19,6 +19,7 @@ import mock
 
 from neutron.agent import rpc
 from neutron.openstack.common import context
+from neutron.openstack.common.rpc import common as rpc_common
 from neutron.tests import base
 
 
@@ -45,6 +46,78 @@ class AgentRPCPluginApi(base.BaseTestCase):
     def test_tunnel_sync(self):
         self._test_rpc_call('tunnel_sync')
 
+    def test_get_devices_details_list(self):
+        self._test_rpc_call('get_devices_details_list')
+
+    def test_update_devices_down(self):
+        self._test_rpc_call('update_devices_down')
+
+    def test_update_devices_up(self):
+        self._test_rpc_call('update_devices_up')
+
+    def test_bulk_call_falls_back_when_unsupported(self):
+        agent = rpc.PluginApi('fake_topic')
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        with mock.patch('neutron.openstack.common.rpc.call') as rpc_call:
+            rpc_call.side_effect = [
+                rpc_common.RemoteError('UnsupportedRpcVersion'),
+                {'device': 'dev1'}, {'device': 'dev2'},
+                {'device': 'dev3'}]
+            actual_val = agent.get_devices_details_list(
+                ctxt, ['dev1', 'dev2'], 'fake_agent_id')
+            self.assertEqual(actual_val, [{'device': 'dev1'},
+                                          {'device': 'dev2'}])
+            self.assertFalse(agent.bulk_supported)
+            # the bulk method is not probed again
+            agent.get_devices_details_list(ctxt, ['dev3'], 'fake_agent_id')
+            self.assertEqual(rpc_call.call_count, 4)
+
+    def _test_bulk_call_missing_method(self, error):
+        agent = rpc.PluginApi('fake_topic')
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        with mock.patch('neutron.openstack.common.rpc.call') as rpc_call:
+            rpc_call.side_effect = [error, {'device': 'dev1'}]
+            actual_val = agent.get_devices_details_list(
+                ctxt, ['dev1'], 'fake_agent_id')
+            self.assertEqual(actual_val, [{'device': 'dev1'}])
+            self.assertFalse(agent.bulk_supported)
+
+    def test_bulk_call_falls_back_when_method_missing(self):
+        self._test_bulk_call_missing_method(AttributeError(
+            "No such RPC function 'get_devices_details_list'\nTraceback"))
+
+    def test_bulk_call_falls_back_when_method_missing_remote_error(self):
+        self._test_bulk_call_missing_method(rpc_common.RemoteError(
+            'AttributeError',
+            "No such RPC function 'get_devices_details_list'"))
+
+    def _test_bulk_call_reraises_attribute_error(self, error):
+        agent = rpc.PluginApi('fake_topic')
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        with mock.patch('neutron.openstack.common.rpc.call') as rpc_call:
+            rpc_call.side_effect = error
+            self.assertRaises(type(error), agent.get_devices_details_list,
+                              ctxt, ['dev1'], 'fake_agent_id')
+            self.assertIsNone(agent.bulk_supported)
+
+    def test_bulk_call_reraises_attribute_errors(self):
+        self._test_bulk_call_reraises_attribute_error(AttributeError(
+            "'NoneType' object has no attribute 'id'"))
+
+    def test_bulk_call_reraises_attribute_remote_errors(self):
+        self._test_bulk_call_reraises_attribute_error(rpc_common.RemoteError(
+            'AttributeError', "'NoneType' object has no attribute 'id'"))
+
+    def test_bulk_call_reraises_other_remote_errors(self):
+        agent = rpc.PluginApi('fake_topic')
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        with mock.patch('neutron.openstack.common.rpc.call') as rpc_call:
+            rpc_call.side_effect = rpc_common.RemoteError('DBError')
+            self.assertRaises(rpc_common.RemoteError,
+                              agent.get_devices_details_list,
+                              ctxt, ['dev1'], 'fake_agent_id')
+            self.assertIsNone(agent.bulk_supported)
+
 
 class AgentPluginReportState(base.BaseTestCase):
     def test_plugin_report_state_use_call(self):
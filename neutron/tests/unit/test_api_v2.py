@@ -39,6 +39,7 @@ from neutron.openstack.common import uuidutils
 from neutron import quota
 from neutron.tests import base
 from neutron.tests.unit import testlib_api
+from neutron import wsgi
 
 
 ROOTDIR = os.path.dirname(os.path.dirname(__file__))
@@ -521,6 +522,68 @@ class APIv2TestCase(APIv2TestBase):
         instance.get_networks.assert_called_once_with(mock.ANY, **kwargs)
 
 
+class NativeSupportTestCase(base.BaseTestCase):
+
+    class Plugin(object):
+        def get_networks(self, context, filters=None, fields=None,
+                         sorts=None, limit=None, marker=None,
+                         page_reverse=False):
+            return []
+
+    class NativePlugin(Plugin):
+        __native_pagination_support = True
+        __native_sorting_support = True
+
+    def _test_native_support(self, plugin, pagination, sorting):
+        controller = v2_base.Controller(plugin(), 'networks', 'network', {})
+        self.assertEqual(pagination, controller._native_pagination)
+        self.assertEqual(sorting, controller._native_sorting)
+
+    def test_undeclared_support(self):
+        # The arguments of the list method do not enable native support
+        self._test_native_support(self.Plugin, False, False)
+
+    def test_declared_support(self):
+        self._test_native_support(self.NativePlugin, True, True)
+
+
+class ListIterHandlerTestCase(base.BaseTestCase):
+
+    class Plugin(object):
+        def get_networks(self, context, filters=None, fields=None):
+            return []
+
+    class IterPlugin(Plugin):
+        def get_networks_iter(self, context, filters=None, fields=None):
+            return iter([])
+
+    class OverridingPlugin(IterPlugin):
+        def get_networks(self, context, filters=None, fields=None):
+            return []
+
+    class OverridingIterPlugin(OverridingPlugin):
+        def get_networks_iter(self, context, filters=None, fields=None):
+            return iter([])
+
+    def _test_list_iter_handler(self, plugin, handler):
+        controller = v2_base.Controller(plugin(), 'networks', 'network', {})
+        self.assertEqual(handler, controller._list_iter_handler)
+
+    def test_no_iterator(self):
+        self._test_list_iter_handler(self.Plugin, None)
+
+    def test_iterator(self):
+        self._test_list_iter_handler(self.IterPlugin, 'get_networks_iter')
+
+    def test_list_method_overridden(self):
+        # The iterator would not return what the overriding method returns
+        self._test_list_iter_handler(self.OverridingPlugin, None)
+
+    def test_iterator_overridden(self):
+        self._test_list_iter_handler(self.OverridingIterPlugin,
+                                     'get_networks_iter')
+
+
 # Note: since all resources use the same controller and validation
 # logic, we actually get really good coverage from testing just networks.
 class JSONV2TestCase(APIv2TestBase, testlib_api.WebTestCase):
@@ -569,6 +632,42 @@ class JSONV2TestCase(APIv2TestBase, testlib_api.WebTestCase):
         tenant_id = _uuid()
         self._test_list(tenant_id + "bad", tenant_id)
 
+    def _test_list_generator(self, params=None):
+        nets = [{'id': str(_uuid()),
+                 'name': 'net%d' % i,
+                 'admin_state_up': True,
+                 'status': "ACTIVE",
+                 'tenant_id': '',
+                 'shared': False,
+                 'subnets': []} for i in range(3)]
+        instance = self.plugin.return_value
+        instance.get_networks.return_value = (net for net in nets)
+
+        with mock.patch.object(wsgi.JSONDictSerializer, 'stream',
+                               autospec=True,
+                               side_effect=wsgi.JSONDictSerializer.stream):
+            res = self.api.get(_get_path('networks', fmt=self.fmt),
+                               params=params)
+            streamed = wsgi.JSONDictSerializer.stream.called
+        self.assertEqual([net['id'] for net in nets],
+                         [net['id'] for net in
+                          self.deserialize(res)['networks']])
+        return res, streamed
+
+    def test_list_generator(self):
+        cfg.CONF.set_override('stream_list_responses', True)
+        _res, streamed = self._test_list_generator()
+        self.assertEqual(self.fmt == 'json', streamed)
+
+    def test_list_generator_not_streamed(self):
+        _res, streamed = self._test_list_generator()
+        self.assertFalse(streamed)
+
+    def test_list_generator_pagination(self):
+        cfg.CONF.set_override('stream_list_responses', True)
+        res, _streamed = self._test_list_generator({'limit': ['3']})
+        self.assertIn('networks_links', self.deserialize(res))
+
     def test_list_pagination(self):
         id1 = str(_uuid())
         id2 = str(_uuid())
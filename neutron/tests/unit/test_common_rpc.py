@@ -0,0 +1,233 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+from oslo.config import cfg
+import testtools
+
+from neutron.common import rpc as n_rpc
+from neutron import context
+from neutron.openstack.common import rpc
+from neutron.openstack.common.rpc import dispatcher
+from neutron.tests import base
+
+try:
+    from neutron.common import rpc_kombu
+    from neutron.openstack.common.rpc import impl_kombu
+except ImportError:
+    rpc_kombu = None
+
+
+class FakeConnection(object):
+
+    pool = None
+
+    def __init__(self, conf):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class TestPool(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestPool, self).setUp()
+        self.addCleanup(cfg.CONF.reset)
+        self.pool = n_rpc.Pool(cfg.CONF, FakeConnection)
+        self.time = mock.patch.object(n_rpc.time, 'time').start()
+        self.addCleanup(mock.patch.stopall)
+
+    def _put_back(self, connections, now):
+        self.time.return_value = now
+        for connection in connections:
+            self.pool.put(connection)
+
+    def test_close_idle_connections(self):
+        cfg.CONF.set_override('rpc_conn_pool_idle_timeout', 10)
+        self.time.return_value = 0
+        first, second = self.pool.get(), self.pool.get()
+        self._put_back([first], 0)
+        self._put_back([second], 5)
+
+        self.pool._close_idle_connections(12)
+        self.assertTrue(first.closed)
+        self.assertFalse(second.closed)
+        self.assertEqual(list(self.pool.free_items), [second])
+        self.assertEqual(self.pool.current_size, 1)
+
+        self.pool._close_idle_connections(16)
+        self.assertTrue(second.closed)
+        self.assertEqual(self.pool.current_size, 0)
+
+    def test_close_idle_connections_disabled(self):
+        self.time.return_value = 0
+        connection = self.pool.get()
+        self._put_back([connection], 0)
+
+        self.pool._close_idle_connections(3600)
+        self.assertFalse(connection.closed)
+        self.assertEqual(list(self.pool.free_items), [connection])
+
+    def test_reused_connection_is_not_idle(self):
+        cfg.CONF.set_override('rpc_conn_pool_idle_timeout', 10)
+        self.time.return_value = 0
+        connection = self.pool.get()
+        self._put_back([connection], 0)
+        self.time.return_value = 20
+        self.assertIs(self.pool.get(), connection)
+
+        self.pool._close_idle_connections(20)
+        self.assertFalse(connection.closed)
+
+    def test_get_records_wait(self):
+        n_rpc.reset_latencies()
+        self.addCleanup(n_rpc.reset_latencies)
+        self.time.side_effect = [0, 0.003]
+        self.pool.get()
+        self.assertEqual(
+            n_rpc.get_latencies()['connection_pool_wait']['count'], 1)
+
+
+class TestLatencyHistogram(base.BaseTestCase):
+
+    def test_percentile(self):
+        histogram = n_rpc.LatencyHistogram()
+        for latency in [0.0005] * 90 + [0.015] * 9 + [100]:
+            histogram.add(latency)
+        self.assertEqual(histogram.percentile(50), 0.001)
+        self.assertEqual(histogram.percentile(90), 0.001)
+        self.assertEqual(histogram.percentile(99), 0.02)
+        self.assertIsNone(histogram.percentile(100))
+
+    def test_percentile_empty(self):
+        self.assertEqual(n_rpc.LatencyHistogram().percentile(99), 0.0)
+
+    def test_to_dict(self):
+        histogram = n_rpc.LatencyHistogram()
+        histogram.add(0.003)
+        histogram.add(0.004)
+        histogram.add(120)
+        result = histogram.to_dict()
+        self.assertEqual(result['count'], 3)
+        self.assertAlmostEqual(result['sum'], 120.007)
+        self.assertEqual(result['max'], 120)
+        buckets = dict(result['buckets'])
+        self.assertEqual(len(result['buckets']),
+                         len(n_rpc.LatencyHistogram.BUCKETS) + 1)
+        self.assertEqual(buckets[0.005], 2)
+        self.assertEqual(buckets[None], 1)
+        self.assertEqual(sum(buckets.values()), 3)
+
+
+class EchoCallback(object):
+    RPC_API_VERSION = '1.0'
+
+    def echo(self, context, value):
+        return value
+
+    def fail(self, context):
+        raise ValueError()
+
+
+class TestRpcProxy(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestRpcProxy, self).setUp()
+        cfg.CONF.set_override('rpc_backend',
+                              'neutron.openstack.common.rpc.impl_fake')
+        self.addCleanup(cfg.CONF.reset)
+        n_rpc.reset_latencies()
+        self.addCleanup(n_rpc.reset_latencies)
+        self.connection = rpc.create_connection(new=True)
+        self.connection.create_consumer(
+            'test-topic', dispatcher.RpcDispatcher([EchoCallback()]))
+        self.addCleanup(self.connection.close)
+        self.proxy = n_rpc.RpcProxy(topic='test-topic',
+                                    default_version='1.0')
+        self.context = context.get_admin_context()
+
+    def test_call_records_latency(self):
+        result = self.proxy.call(self.context,
+                                 self.proxy.make_msg('echo', value=42))
+        self.assertEqual(result, 42)
+        latencies = n_rpc.get_latencies()
+        self.assertEqual(latencies['call.echo']['count'], 1)
+
+    def test_failed_call_records_latency(self):
+        with testtools.ExpectedException(ValueError):
+            self.proxy.call(self.context, self.proxy.make_msg('fail'))
+        self.assertEqual(n_rpc.get_latencies()['call.fail']['count'], 1)
+
+
+@testtools.skipIf(rpc_kombu is None, 'kombu is not available')
+class TestKombuConnection(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestKombuConnection, self).setUp()
+        cfg.CONF.set_override('fake_rabbit', True)
+        self.addCleanup(cfg.CONF.reset)
+        self.connection = rpc_kombu.Connection(cfg.CONF)
+        self.addCleanup(self.connection.close)
+
+    def _publishers(self):
+        return [topic for cls, topic in self.connection.publishers]
+
+    def test_topic_publisher_reused(self):
+        self.connection.topic_send('topic1', {'a': 1})
+        publisher = self.connection.publishers[(impl_kombu.TopicPublisher,
+                                                'topic1')]
+        self.connection.topic_send('topic1', {'a': 2})
+        self.assertIs(self.connection.publishers[
+            (impl_kombu.TopicPublisher, 'topic1')], publisher)
+
+    def test_publishers_lru(self):
+        with mock.patch.object(rpc_kombu.Connection, 'MAX_PUBLISHERS', 2):
+            for topic in ('topic1', 'topic2', 'topic1', 'topic3'):
+                self.connection.topic_send(topic, {})
+        self.assertEqual(self._publishers(), ['topic1', 'topic3'])
+
+    def test_direct_publisher_not_cached(self):
+        self.connection.topic_send('topic1', {})
+        self.connection.direct_send('msg-id', {})
+        self.assertEqual(self._publishers(), ['topic1'])
+
+    def test_publishers_cleared_on_reconnect(self):
+        self.connection.fanout_send('topic1', {})
+        self.assertEqual(self._publishers(), ['topic1'])
+        self.connection.reconnect()
+        self.assertEqual(self.connection.publishers, {})
+
+    def test_reset_keeps_publishers_without_consumers(self):
+        self.connection.topic_send('topic1', {})
+        self.connection.reset()
+        self.assertEqual(self._publishers(), ['topic1'])
+
+    def test_reset_clears_publishers_with_consumers(self):
+        self.connection.declare_topic_consumer('topic2', lambda msg: None)
+        self.connection.topic_send('topic1', {})
+        self.connection.reset()
+        self.assertEqual(self.connection.publishers, {})
+
+    def test_connection_pool(self):
+        self.addCleanup(rpc_kombu.cleanup)
+        pool = rpc_kombu.get_connection_pool(cfg.CONF)
+        self.assertIsInstance(pool, n_rpc.Pool)
+        self.assertIs(rpc_kombu.get_connection_pool(cfg.CONF), pool)
+        connection = pool.get()
+        self.assertIsInstance(connection, rpc_kombu.Connection)
+        pool.put(connection)
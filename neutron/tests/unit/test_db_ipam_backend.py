@@ -0,0 +1,244 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import contextlib
+
+import mock
+from oslo.config import cfg
+import testtools
+
+from neutron import context
+from neutron.db import ipam_backend
+from neutron.db import models_v2
+from neutron.tests import base
+from neutron.tests.unit import test_db_plugin
+
+
+OPTIMISTIC_BACKEND = 'neutron.db.ipam_backend.OptimisticIpamBackend'
+OPTIMISTIC_BACKEND_CLS = ipam_backend.OptimisticIpamBackend
+
+
+class TestFreeRangeList(base.BaseTestCase):
+
+    def test_find(self):
+        free = ipam_backend.FreeRangeList([(20, 30), (1, 5)])
+        self.assertEqual(free.find(3), (1, 5))
+        self.assertEqual(free.find(30), (20, 30))
+        self.assertIsNone(free.find(0))
+        self.assertIsNone(free.find(10))
+        self.assertIsNone(free.find(31))
+
+    def test_take_first_and_last(self):
+        free = ipam_backend.FreeRangeList([(1, 5)])
+        self.assertEqual(free.take(1), ([(1, 5)], [(2, 5)]))
+        self.assertEqual(free.take(5), ([(2, 5)], [(2, 4)]))
+        self.assertEqual(list(free), [(2, 4)])
+
+    def test_take_splits_range(self):
+        free = ipam_backend.FreeRangeList([(1, 5)])
+        self.assertEqual(free.take(3), ([(1, 5)], [(1, 2), (4, 5)]))
+        self.assertEqual(list(free), [(1, 2), (4, 5)])
+        self.assertEqual(free.find(4), (4, 5))
+
+    def test_take_single_address_range(self):
+        free = ipam_backend.FreeRangeList([(1, 1), (3, 4)])
+        self.assertEqual(free.take(1), ([(1, 1)], []))
+        self.assertEqual(free.first(), (3, 4))
+
+    def test_take_block(self):
+        free = ipam_backend.FreeRangeList([(1, 3), (10, 12)])
+        self.assertEqual(free.take_block(2), (1, 2, [(1, 3)], [(3, 3)]))
+        self.assertEqual(free.take_block(5), (3, 1, [(3, 3)], []))
+        self.assertEqual(list(free), [(10, 12)])
+        self.assertEqual(free.find(11), (10, 12))
+
+    def test_take_allocated_address(self):
+        free = ipam_backend.FreeRangeList([(1, 1), (3, 4)])
+        self.assertIsNone(free.take(2))
+        self.assertEqual(list(free), [(1, 1), (3, 4)])
+
+    def test_release_merges_adjacent_ranges(self):
+        free = ipam_backend.FreeRangeList([(1, 2), (4, 5)])
+        self.assertEqual(free.release(3), ([(1, 2), (4, 5)], [(1, 5)]))
+        self.assertEqual(list(free), [(1, 5)])
+
+    def test_release_extends_range(self):
+        free = ipam_backend.FreeRangeList([(1, 2), (10, 12)])
+        self.assertEqual(free.release(3), ([(1, 2)], [(1, 3)]))
+        self.assertEqual(free.release(9), ([(10, 12)], [(9, 12)]))
+        self.assertEqual(list(free), [(1, 3), (9, 12)])
+
+    def test_release_isolated_address(self):
+        free = ipam_backend.FreeRangeList([(1, 2)])
+        self.assertEqual(free.release(7), ([], [(7, 7)]))
+        self.assertEqual(free.first(), (1, 2))
+        self.assertEqual(free.find(7), (7, 7))
+
+    def test_release_free_address(self):
+        free = ipam_backend.FreeRangeList([(1, 2)])
+        self.assertIsNone(free.release(2))
+
+
+class OptimisticIpamTestMixin(object):
+
+    def setUp(self):
+        super(OptimisticIpamTestMixin, self).setUp()
+        cfg.CONF.set_override('ipam_driver', OPTIMISTIC_BACKEND)
+
+
+class TestOptimisticIpamPortsV2(OptimisticIpamTestMixin,
+                                test_db_plugin.TestPortsV2):
+
+    def _get_ranges(self, ctx, subnet_id):
+        ranges = ctx.session.query(models_v2.IPAvailabilityRange).join(
+            models_v2.IPAllocationPool).filter_by(subnet_id=subnet_id)
+        return sorted((r['first_ip'], r['last_ip']) for r in ranges)
+
+    def test_allocation_recovers_from_concurrent_update(self):
+        with self.subnet(cidr='10.0.0.0/24') as subnet:
+            subnet_id = subnet['subnet']['id']
+            with self.port(subnet=subnet) as port1:
+                self.assertEqual(port1['port']['fixed_ips'][0]['ip_address'],
+                                 '10.0.0.2')
+                # Another server takes 10.0.0.3 behind the back of the cache
+                ctx = context.get_admin_context()
+                with ctx.session.begin(subtransactions=True):
+                    pool = ctx.session.query(
+                        models_v2.IPAllocationPool).filter_by(
+                            subnet_id=subnet_id).one()
+                    ctx.session.query(models_v2.IPAvailabilityRange).filter_by(
+                        allocation_pool_id=pool['id']).delete()
+                    ctx.session.add(models_v2.IPAvailabilityRange(
+                        allocation_pool_id=pool['id'],
+                        first_ip='10.0.0.4', last_ip='10.0.0.254'))
+                backend = ipam_backend.get_backend()
+                load = backend._load
+                in_transaction = []
+
+                def _load(session, subnet_id):
+                    in_transaction.append(bool(session.is_active))
+                    return load(session, subnet_id)
+
+                with contextlib.nested(
+                    mock.patch.object(backend, '_load', side_effect=_load),
+                    self.port(subnet=subnet)
+                ) as (_load_mock, port2):
+                    # Reloaded outside of the transaction of the request
+                    self.assertEqual(in_transaction, [False])
+                    ips = port2['port']['fixed_ips']
+                    self.assertEqual(ips[0]['ip_address'], '10.0.0.4')
+                    self.assertEqual(self._get_ranges(ctx, subnet_id),
+                                     [('10.0.0.5', '10.0.0.254')])
+
+    def test_allocation_conflict_after_retries(self):
+        cfg.CONF.set_override('ipam_allocation_retries', 2)
+        backend = ipam_backend.get_backend()
+        with self.subnet(cidr='10.0.0.0/24') as subnet:
+            with mock.patch.object(backend, '_swap',
+                                   return_value=False) as swap:
+                res = self._create_port(self.fmt,
+                                        subnet['subnet']['network_id'])
+                self.assertEqual(res.status_int, 409)
+                self.assertEqual(swap.call_count, 2)
+
+    def test_generate_ips_raises_conflict(self):
+        backend = ipam_backend.OptimisticIpamBackend()
+        subnets = [{'id': 'fake-subnet', 'network_id': 'fake-net',
+                    'ip_version': 4, 'cidr': '10.0.0.0/24'}]
+        with mock.patch.object(
+            backend, '_retry',
+            side_effect=ipam_backend.IpamConcurrentUpdate(
+                subnet_id='fake-subnet')):
+            with testtools.ExpectedException(
+                    ipam_backend.IpamConcurrentUpdate):
+                backend.generate_ip(None, subnets)
+            with testtools.ExpectedException(
+                    ipam_backend.IpamConcurrentUpdate):
+                backend.generate_ips(None, subnets, 2)
+
+    def _other_backend(self):
+        # The backend of another server process, with its own free lists
+        return mock.patch.object(ipam_backend, 'get_backend',
+                                 return_value=OPTIMISTIC_BACKEND_CLS())
+
+    def test_allocation_after_release_by_other_backend(self):
+        with self.subnet(cidr='10.0.0.0/30') as subnet:
+            net_id = subnet['subnet']['network_id']
+            res = self._create_port(self.fmt, net_id)
+            port = self.deserialize(self.fmt, res)['port']
+            self.assertEqual(port['fixed_ips'][0]['ip_address'], '10.0.0.2')
+            with self._other_backend():
+                self._delete('ports', port['id'])
+            # The cached free list of this backend is empty
+            res = self._create_port(self.fmt, net_id)
+            self.assertEqual(res.status_int, 201)
+            port = self.deserialize(self.fmt, res)['port']
+            self.assertEqual(port['fixed_ips'][0]['ip_address'], '10.0.0.2')
+            self._delete('ports', port['id'])
+
+    def test_specific_ip_after_release_by_other_backend(self):
+        with self.subnet(cidr='10.0.0.0/29') as subnet:
+            subnet_id = subnet['subnet']['id']
+            net_id = subnet['subnet']['network_id']
+            fixed_ips = [{'subnet_id': subnet_id,
+                          'ip_address': '10.0.0.3'}]
+            res = self._create_port(self.fmt, net_id, fixed_ips=fixed_ips)
+            port_id = self.deserialize(self.fmt, res)['port']['id']
+            with self._other_backend():
+                self._delete('ports', port_id)
+            # This backend still caches 10.0.0.3 as allocated
+            res = self._create_port(self.fmt, net_id, fixed_ips=fixed_ips)
+            self.assertEqual(res.status_int, 201)
+            port_id = self.deserialize(self.fmt, res)['port']['id']
+            ctx = context.get_admin_context()
+            self.assertEqual(self._get_ranges(ctx, subnet_id),
+                             [('10.0.0.2', '10.0.0.2'),
+                              ('10.0.0.4', '10.0.0.6')])
+            self._delete('ports', port_id)
+
+    def test_recycle_after_allocation_by_other_backend(self):
+        with self.subnet(cidr='10.0.0.0/29') as subnet:
+            subnet_id = subnet['subnet']['id']
+            net_id = subnet['subnet']['network_id']
+            ctx = context.get_admin_context()
+            # This backend caches the whole pool as free
+            ipam_backend.get_backend()._get(ctx, subnet_id)
+            with self._other_backend():
+                res = self._create_port(self.fmt, net_id)
+            port = self.deserialize(self.fmt, res)['port']
+            self.assertEqual(port['fixed_ips'][0]['ip_address'], '10.0.0.2')
+            self._delete('ports', port['id'])
+            self.assertEqual(self._get_ranges(ctx, subnet_id),
+                             [('10.0.0.2', '10.0.0.6')])
+
+    def test_recycle_merges_ranges(self):
+        with self.subnet(cidr='10.0.0.0/24') as subnet:
+            subnet_id = subnet['subnet']['id']
+            ctx = context.get_admin_context()
+            fixed_ips = [{'subnet_id': subnet_id,
+                          'ip_address': '10.0.0.10'}]
+            with self.port(subnet=subnet, fixed_ips=fixed_ips):
+                self.assertEqual(self._get_ranges(ctx, subnet_id),
+                                 [('10.0.0.11', '10.0.0.254'),
+                                  ('10.0.0.2', '10.0.0.9')])
+            self.assertEqual(self._get_ranges(ctx, subnet_id),
+                             [('10.0.0.2', '10.0.0.254')])
+
+
+class TestOptimisticIpamSubnetsV2(OptimisticIpamTestMixin,
+                                  test_db_plugin.TestSubnetsV2):
+    pass
@@ -0,0 +1,253 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import contextlib
+import errno
+import os
+
+import mock
+from oslo.config import cfg
+
+from neutron import context
+from neutron.db import mac_allocator
+from neutron.db import models_v2
+from neutron import manager
+from neutron.openstack.common.db import exception as db_exc
+from neutron.tests.unit import test_db_plugin
+
+
+class MacAllocatorTestMixin(object):
+
+    def setUp(self):
+        super(MacAllocatorTestMixin, self).setUp()
+        cfg.CONF.set_override('base_mac', 'fa:16:3e:00:00:00')
+        cfg.CONF.set_override('mac_allocation_block_size', 16)
+        mac_allocator._allocator = None
+        self.addCleanup(setattr, mac_allocator, '_allocator', None)
+
+
+class TestMacAllocatorPortsV2(MacAllocatorTestMixin,
+                              test_db_plugin.TestPortsV2):
+
+    def _get_blocks(self):
+        ctx = context.get_admin_context()
+        return [(block['first_mac'], block['last_mac'])
+                for block in ctx.session.query(mac_allocator.MacAddressBlock)]
+
+    def test_macs_of_a_block_are_handed_out_in_sequence(self):
+        with mock.patch('random.sample', return_value=[2]):
+            with self.network() as net:
+                res = self._create_port_bulk(self.fmt, 3,
+                                             net['network']['id'],
+                                             'test', True)
+                ports = self.deserialize(self.fmt, res)['ports']
+                self.assertEqual([port['mac_address'] for port in ports],
+                                 ['fa:16:3e:00:00:20', 'fa:16:3e:00:00:21',
+                                  'fa:16:3e:00:00:22'])
+                self.assertEqual(self._get_blocks(),
+                                 [('fa:16:3e:00:00:20', 'fa:16:3e:00:00:2f')])
+                for port in ports:
+                    self._delete('ports', port['id'])
+
+    def test_block_skips_used_macs(self):
+        with mock.patch('random.sample', return_value=[0]):
+            with self.network() as net:
+                net_id = net['network']['id']
+                res = self._create_port(self.fmt, net_id,
+                                        arg_list=('mac_address',),
+                                        mac_address='fa:16:3e:00:00:00')
+                port1 = self.deserialize(self.fmt, res)
+                res = self._create_port(self.fmt, net_id)
+                port2 = self.deserialize(self.fmt, res)
+                self.assertEqual(port2['port']['mac_address'],
+                                 'fa:16:3e:00:00:01')
+                self._delete('ports', port1['port']['id'])
+                self._delete('ports', port2['port']['id'])
+
+    def test_next_block_is_reserved_when_exhausted(self):
+        cfg.CONF.set_override('mac_allocation_block_size', 2)
+        with mock.patch('random.sample', side_effect=[[5], [1]]):
+            with self.network() as net:
+                res = self._create_port_bulk(self.fmt, 3,
+                                             net['network']['id'],
+                                             'test', True)
+                ports = self.deserialize(self.fmt, res)['ports']
+                self.assertEqual([port['mac_address'] for port in ports],
+                                 ['fa:16:3e:00:00:0a', 'fa:16:3e:00:00:0b',
+                                  'fa:16:3e:00:00:02'])
+                self.assertEqual(sorted(self._get_blocks()),
+                                 [('fa:16:3e:00:00:02', 'fa:16:3e:00:00:03'),
+                                  ('fa:16:3e:00:00:0a', 'fa:16:3e:00:00:0b')])
+                stats = mac_allocator.get_mac_allocator().get_stats()
+                self.assertEqual(stats['blocks'], 2)
+                self.assertEqual(stats['allocated'], 3)
+                self.assertEqual(stats['free'], 1)
+                self.assertEqual(stats['latency']['count'], 3)
+                for port in ports:
+                    self._delete('ports', port['id'])
+
+    def test_random_macs_once_all_blocks_are_reserved(self):
+        cfg.CONF.set_override('base_mac', '12:34:56:78:00:00')
+        cfg.CONF.set_override('mac_allocation_block_size', 1 << 16)
+        ctx = context.get_admin_context()
+        with ctx.session.begin(subtransactions=True):
+            ctx.session.add(mac_allocator.MacAddressBlock(
+                first_mac='12:34:56:78:00:00', last_mac='12:34:56:78:ff:ff',
+                host='other'))
+        allocator = mac_allocator.get_mac_allocator()
+        with mock.patch.object(allocator, '_reserve_block',
+                               wraps=allocator._reserve_block) as reserve:
+            with self.subnet() as subnet:
+                with contextlib.nested(self.port(subnet=subnet),
+                                       self.port(subnet=subnet)) as ports:
+                    for port in ports:
+                        self.assertTrue(port['port']['mac_address'].
+                                        startswith('12:34:56:78'))
+            # No block is looked for again until the retry interval
+            self.assertEqual(reserve.call_count, 1)
+        stats = allocator.get_stats()
+        self.assertEqual(stats['blocks'], 0)
+        self.assertEqual(stats['allocated'], 0)
+
+    def test_block_reserved_concurrently(self):
+        # The session of the other process, created before get_session is
+        # mocked
+        session = context.get_admin_context().session
+        get_session = mac_allocator.db_api.get_session
+        taken = []
+
+        def _choice(first_macs):
+            first_mac = min(first_macs)
+            if not taken:
+                # Another process reserves the block meanwhile
+                taken.append(first_mac)
+                with session.begin(subtransactions=True):
+                    session.add(mac_allocator.MacAddressBlock(
+                        first_mac=first_mac, last_mac=first_mac,
+                        host='other'))
+            return first_mac
+
+        def _get_session():
+            # The unique constraint of the table, as reported by MySQL
+            new_session = get_session()
+            flush = new_session.flush
+
+            def _flush(*args, **kwargs):
+                for obj in new_session.new:
+                    if (isinstance(obj, mac_allocator.MacAddressBlock) and
+                            obj.first_mac in taken):
+                        raise db_exc.DBDuplicateEntry(['first_mac'])
+                return flush(*args, **kwargs)
+
+            new_session.flush = _flush
+            return new_session
+
+        with contextlib.nested(
+            mock.patch('random.sample', return_value=[2, 5]),
+            mock.patch('random.choice', side_effect=_choice),
+            mock.patch.object(mac_allocator.db_api, 'get_session',
+                              side_effect=_get_session)
+        ):
+            with self.port() as port:
+                self.assertEqual(port['port']['mac_address'],
+                                 'fa:16:3e:00:00:50')
+        self.assertEqual(sorted(self._get_blocks()),
+                         [('fa:16:3e:00:00:20', 'fa:16:3e:00:00:20'),
+                          ('fa:16:3e:00:00:50', 'fa:16:3e:00:00:5f')])
+
+    def test_blocks_of_stopped_processes_reclaimed(self):
+        cfg.CONF.set_override('host', 'myhost')
+        ctx = context.get_admin_context()
+        owners = ['myhost:1', 'myhost:2', 'myhost', 'otherhost:1']
+        with ctx.session.begin(subtransactions=True):
+            for i, owner in enumerate(owners):
+                first_mac = 'fa:16:3e:00:0%d:00' % i
+                ctx.session.add(mac_allocator.MacAddressBlock(
+                    first_mac=first_mac, last_mac=first_mac, host=owner))
+
+        def _kill(pid, signal):
+            if pid == 1:
+                raise OSError(errno.ESRCH, 'No such process')
+
+        with mock.patch('os.kill', side_effect=_kill):
+            mac_allocator.get_mac_allocator().allocate(ctx, 1)
+        owners = [block['host'] for block in ctx.session.query(
+            mac_allocator.MacAddressBlock)]
+        self.assertEqual(sorted(owners),
+                         sorted(['myhost:%d' % os.getpid(), 'myhost:2',
+                                 'otherhost:1']))
+
+    def test_duplicate_mac_rejected_by_database(self):
+        with self.port() as port:
+            ctx = context.get_admin_context()
+            ctx.session.add(models_v2.Port(
+                tenant_id='tenant', name='', id='duplicate',
+                network_id=port['port']['network_id'],
+                mac_address=port['port']['mac_address'],
+                admin_state_up=True, status='ACTIVE', device_id='',
+                device_owner=''))
+            self.assertRaises(db_exc.DBError, ctx.session.flush)
+
+    def test_block_reserved_by_its_own_transaction(self):
+        ctx = context.get_admin_context()
+        allocator = mac_allocator.get_mac_allocator()
+        with mock.patch.object(ctx.session, 'add') as add:
+            allocator.allocate(ctx, 1)
+        self.assertFalse(add.called)
+        self.assertEqual(len(self._get_blocks()), 1)
+
+    def test_port_mac_regenerated_when_taken_concurrently(self):
+        plugin = manager.NeutronManager.get_plugin()
+        add_ports_db = plugin._add_ports_db
+        results = [db_exc.DBDuplicateEntry(['network_id', 'mac_address'])]
+
+        def _add_ports_db(*args):
+            if results:
+                raise results.pop()
+            return add_ports_db(*args)
+
+        with contextlib.nested(
+            mock.patch.object(plugin, '_add_ports_db',
+                              side_effect=_add_ports_db),
+            mock.patch.object(plugin, '_allocate_macs_for_ports',
+                              wraps=plugin._allocate_macs_for_ports)
+        ) as (add_ports, allocate_macs):
+            with self.port() as port:
+                self.assertEqual(allocate_macs.call_count, 2)
+                self.assertEqual(add_ports.call_count, 2)
+                self.assertEqual(port['port']['mac_address'],
+                                 add_ports.call_args[0][3][0])
+
+    def test_port_mac_taken_concurrently_after_retries(self):
+        cfg.CONF.set_override('mac_generation_retries', 2)
+        plugin = manager.NeutronManager.get_plugin()
+        with mock.patch.object(
+            plugin, '_add_ports_db',
+            side_effect=db_exc.DBDuplicateEntry(['network_id',
+                                                 'mac_address'])):
+            with self.network() as net:
+                res = self._create_port(self.fmt, net['network']['id'])
+                self.assertEqual(res.status_int, 503)
+
+    def test_add_ports_in_savepoint(self):
+        plugin = manager.NeutronManager.get_plugin()
+        ctx = mock.MagicMock()
+        ctx.session.get_bind.return_value.dialect.name = 'mysql'
+        with mock.patch.object(plugin, '_make_ports_db') as make_ports:
+            self.assertEqual(plugin._add_ports_db(ctx, [], [], [], []),
+                             make_ports.return_value)
+        ctx.session.begin_nested.assert_called_once_with()
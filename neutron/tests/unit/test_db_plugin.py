@@ -41,6 +41,7 @@ from neutron.db import api as db
 from neutron.db import db_base_plugin_v2
 from neutron.db import models_v2
 from neutron.manager import NeutronManager
+from neutron.openstack.common.db.sqlalchemy import session
 from neutron.openstack.common import importutils
 from neutron.openstack.common import timeutils
 from neutron.tests import base
@@ -484,6 +485,14 @@ class NeutronDbPluginV2TestCase(testlib_api.WebTestCase):
         self.assertEqual(res.status_int, webob.exc.HTTPOk.code)
         return self.deserialize(fmt, res)
 
+    def _list_statements(self, resource):
+        """Return the number of SQL statements listing a resource."""
+        dialect = session.get_engine().dialect
+        with mock.patch.object(dialect, 'do_execute',
+                               wraps=dialect.do_execute) as do_execute:
+            self._list(resource)
+        return do_execute.call_count
+
     def _do_side_effect(self, patched_plugin, orig, *args, **kwargs):
         """Invoked by test cases for injecting failures in plugin."""
         def second_call(*args, **kwargs):
@@ -890,6 +899,63 @@ class TestPortsV2(NeutronDbPluginV2TestCase):
             ports = self.deserialize(self.fmt, res)
             self.assertEqual(len(ports['ports']), 0)
 
+    def test_create_ports_bulk_duplicate_mac(self):
+        with self.network() as net:
+            overrides = {0: {'mac_address': '00:11:22:33:44:55'},
+                         1: {'mac_address': '00:11:22:33:44:55'}}
+            res = self._create_port_bulk(self.fmt, 2, net['network']['id'],
+                                         'test', True, override=overrides)
+            self._validate_behavior_on_bulk_failure(
+                res, 'ports', webob.exc.HTTPConflict.code)
+
+    def test_create_ports_bulk_duplicate_ip(self):
+        with self.subnet() as subnet:
+            fixed_ips = [{'subnet_id': subnet['subnet']['id'],
+                          'ip_address': '10.0.0.5'}]
+            overrides = {0: {'fixed_ips': fixed_ips},
+                         1: {'fixed_ips': fixed_ips}}
+            res = self._create_port_bulk(self.fmt, 2,
+                                         subnet['subnet']['network_id'],
+                                         'test', True, override=overrides)
+            self._validate_behavior_on_bulk_failure(
+                res, 'ports', webob.exc.HTTPConflict.code)
+
+    def test_create_ports_bulk_fixed_and_generated_ips(self):
+        with self.subnet() as subnet:
+            fixed_ips = [{'subnet_id': subnet['subnet']['id'],
+                          'ip_address': '10.0.0.3'}]
+            overrides = {1: {'fixed_ips': fixed_ips}}
+            res = self._create_port_bulk(self.fmt, 3,
+                                         subnet['subnet']['network_id'],
+                                         'test', True, override=overrides)
+            self.assertEqual(res.status_int, webob.exc.HTTPCreated.code)
+            ports = self.deserialize(self.fmt, res)['ports']
+            ips = [port['fixed_ips'][0]['ip_address'] for port in ports]
+            self.assertEqual(ips[1], '10.0.0.3')
+            self.assertEqual(len(set(ips)), 3)
+            for port in ports:
+                self._delete('ports', port['id'])
+
+    def test_generate_ips_spans_free_ranges(self):
+        with self.subnet(cidr='10.0.0.0/24') as subnet:
+            subnet_id = subnet['subnet']['id']
+            fixed_ips = [{'subnet_id': subnet_id, 'ip_address': '10.0.0.4'}]
+            with self.port(subnet=subnet, fixed_ips=fixed_ips):
+                ctx = context.get_admin_context()
+                with ctx.session.begin(subtransactions=True):
+                    ips = db_base_plugin_v2.NeutronDbPluginV2._generate_ips(
+                        ctx, [subnet['subnet']], 4)
+                self.assertEqual([ip['ip_address'] for ip in ips],
+                                 ['10.0.0.2', '10.0.0.3',
+                                  '10.0.0.5', '10.0.0.6'])
+                ranges = ctx.session.query(
+                    models_v2.IPAvailabilityRange).join(
+                        models_v2.IPAllocationPool).filter_by(
+                            subnet_id=subnet_id)
+                self.assertEqual([(r['first_ip'], r['last_ip'])
+                                  for r in ranges],
+                                 [('10.0.0.7', '10.0.0.254')])
+
     def test_create_ports_bulk_emulated_plugin_failure(self):
         real_has_attr = hasattr
 
@@ -948,6 +1014,13 @@ class TestPortsV2(NeutronDbPluginV2TestCase):
                                self.port()) as ports:
             self._test_list_resources('port', ports)
 
+    def test_list_ports_statements_constant(self):
+        cfg.CONF.set_default('allow_overlapping_ips', True)
+        with self.port():
+            statements = self._list_statements('ports')
+            with contextlib.nested(self.port(), self.port(), self.port()):
+                self.assertEqual(statements, self._list_statements('ports'))
+
     def test_list_ports_filtered_by_fixed_ip(self):
         # for this test we need to enable overlapping ips
         cfg.CONF.set_default('allow_overlapping_ips', True)
@@ -1287,11 +1360,11 @@ fixed_ips=ip_address%%3D%s&fixed_ips=ip_address%%3D%s&fixed_ips=subnet_id%%3D%s
         # rather than actually consuming all MAC (would take a LONG time)
         # we just raise the exception that would result.
         @staticmethod
-        def fake_gen_mac(context, net_id):
+        def fake_gen_macs(context, net_id, count, exclude=()):
             raise q_exc.MacAddressGenerationFailure(net_id=net_id)
 
         with mock.patch.object(neutron.db.db_base_plugin_v2.NeutronDbPluginV2,
-                               '_generate_mac', new=fake_gen_mac):
+                               '_generate_macs', new=fake_gen_macs):
             res = self._create_network(fmt=self.fmt, name='net1',
                                        admin_state_up=True)
             network = self.deserialize(self.fmt, res)
@@ -2040,6 +2113,15 @@ class TestNetworksV2(NeutronDbPluginV2TestCase):
                                self.network()) as networks:
             self._test_list_resources('network', networks)
 
+    def test_list_networks_statements_constant(self):
+        cfg.CONF.set_default('allow_overlapping_ips', True)
+        with self.subnet():
+            statements = self._list_statements('networks')
+            with contextlib.nested(self.subnet(), self.subnet(),
+                                   self.subnet()):
+                self.assertEqual(statements,
+                                 self._list_statements('networks'))
+
     def test_list_networks_with_sort_native(self):
         if self._skip_native_sorting:
             self.skipTest("Skip test for not implemented sorting feature")
@@ -2115,6 +2197,23 @@ class TestNetworksV2(NeutronDbPluginV2TestCase):
                                             (net1, net2, net3),
                                             ('name', 'asc'), 2, 2)
 
+    def test_list_networks_streamed(self):
+        cfg.CONF.set_override('stream_list_responses', True)
+        with contextlib.nested(self.network(),
+                               self.network(),
+                               self.network()) as networks:
+            with mock.patch.object(db_base_plugin_v2, 'LIST_CHUNK_SIZE', 2):
+                self._test_list_resources('network', networks)
+
+    def test_list_networks_with_unknown_marker_native(self):
+        if self._skip_native_pagination:
+            self.skipTest("Skip test for not implemented pagination feature")
+        with self.network():
+            req = self.new_list_request('networks',
+                                        params='limit=2&marker=unknown-id')
+            res = req.get_response(self.api)
+            self.assertEqual(res.status_int, 404)
+
     def test_list_networks_with_pagination_emulated(self):
         helper_patcher = mock.patch(
             'neutron.api.v2.base.Controller._get_pagination_helper',
@@ -3636,6 +3735,88 @@ class NeutronDbPluginV2AsMixinTestCase(base.BaseTestCase):
         net = self.plugin.create_network(self.context, self.net_data)
         self.assertEqual(net['status'], 'BUILD')
 
+    def test_eager_loads_only_listing_collections(self):
+        with mock.patch.object(self.plugin, '_apply_eager_loads',
+                               wraps=self.plugin._apply_eager_loads) as eager:
+            self.plugin._get_collection_query(self.context,
+                                              models_v2.Network)
+            self.plugin.get_networks_count(self.context)
+            self.assertFalse(eager.called)
+            self.plugin.get_networks(self.context)
+            eager.assert_called_once_with(mock.ANY, models_v2.Network)
+
+    def test_get_networks_iter(self):
+        net_ids = []
+        for i in range(5):
+            self.net_data['network']['id'] = 'fake-id-%d' % i
+            net_ids.append(self.plugin.create_network(
+                self.context, self.net_data)['id'])
+        with contextlib.nested(
+            mock.patch.object(db_base_plugin_v2, 'LIST_CHUNK_SIZE', 2),
+            mock.patch.object(self.plugin, '_make_collection_dicts',
+                              wraps=self.plugin._make_collection_dicts)
+        ) as (_chunk_size, make_dicts):
+            nets = self.plugin.get_networks_iter(
+                self.context, filters={'name': ['net1']}, fields=['id'])
+            self.assertFalse(make_dicts.called)
+            self.assertEqual(net_ids, [net['id'] for net in nets])
+        self.assertEqual(3, make_dicts.call_count)
+
+    def test_get_networks_keyset_pagination(self):
+        for i, name in enumerate(['b', 'a', 'c', 'b', 'a']):
+            self.net_data['network']['id'] = 'fake-id-%d' % i
+            self.net_data['network']['name'] = name
+            self.plugin.create_network(self.context, self.net_data)
+        sorts = [('name', False), ('id', True)]
+        nets = []
+        marker = None
+        with mock.patch.object(self.plugin, '_get_network',
+                               wraps=self.plugin._get_network) as get_network:
+            while True:
+                page = self.plugin.get_networks(self.context, sorts=sorts,
+                                                limit=2, marker=marker)
+                nets.extend((net['name'], net['id']) for net in page)
+                if len(page) < 2:
+                    break
+                marker = page[-1]['id']
+        # The marker network is only read by the query of the page
+        self.assertFalse(get_network.called)
+        self.assertEqual([('c', 'fake-id-2'),
+                          ('b', 'fake-id-0'), ('b', 'fake-id-3'),
+                          ('a', 'fake-id-1'), ('a', 'fake-id-4')], nets)
+
+    def test_get_networks_unknown_marker(self):
+        self.plugin.create_network(self.context, self.net_data)
+        self.assertRaises(q_exc.NetworkNotFound, self.plugin.get_networks,
+                          self.context, sorts=[('id', True)], limit=2,
+                          marker='unknown-id')
+
+    def test_get_ports_unknown_marker(self):
+        self.assertRaises(q_exc.PortNotFound, self.plugin.get_ports,
+                          self.context, sorts=[('id', True)], limit=2,
+                          marker='unknown-id')
+
+    def test_get_networks_dict_extend_batch_funcs(self):
+        for i in range(3):
+            self.net_data['network']['id'] = 'fake-id-%d' % i
+            self.plugin.create_network(self.context, self.net_data)
+
+        def extend_networks(plugin, context, networks, networks_db):
+            self.assertEqual([net_db.id for net_db in networks_db],
+                             [net['id'] for net in networks])
+            for network in networks:
+                network['extended'] = len(networks)
+
+        extend = mock.Mock(side_effect=extend_networks)
+        with mock.patch.dict(self.plugin._dict_extend_batch_functions,
+                             {attributes.NETWORKS: [extend]}):
+            nets = self.plugin.get_networks(self.context,
+                                            fields=['id', 'extended'])
+        self.assertEqual(1, extend.call_count)
+        self.assertEqual([{'id': 'fake-id-%d' % i, 'extended': 3}
+                          for i in range(3)],
+                         sorted(nets, key=lambda net: net['id']))
+
 
 class TestBasicGetXML(TestBasicGet):
     fmt = 'xml'
@@ -846,6 +846,47 @@ class TestDhcpAgentEventHandler(base.BaseTestCase):
         self.cache.assert_has_calls([mock.call.get_port_by_id('unknown')])
         self.assertEqual(self.call_driver.call_count, 0)
 
+    def test_port_update_end_batched(self):
+        cfg.CONF.set_override('port_notification_batch_interval', 0.5)
+        self.cache.get_network_by_id.return_value = fake_network
+        self.cache.get_port_by_id.return_value = None
+        with mock.patch('eventlet.spawn_after') as spawn_after:
+            self.dhcp.port_update_end(None, dict(port=vars(fake_port1)))
+            self.dhcp.port_update_end(None, dict(port=vars(fake_port2)))
+        spawn_after.assert_called_once_with(
+            0.5, self.dhcp._reload_pending_allocations, fake_network.id)
+        self.assertEqual(self.call_driver.call_count, 0)
+
+        self.dhcp._reload_pending_allocations(fake_network.id)
+        self.call_driver.assert_called_once_with('reload_allocations',
+                                                 fake_network)
+        self.assertEqual(self.dhcp.pending_reloads, {})
+
+    def test_port_delete_end_batched(self):
+        cfg.CONF.set_override('port_notification_batch_interval', 0.5)
+        self.cache.get_network_by_id.return_value = fake_network
+        self.cache.get_port_by_id.return_value = fake_port2
+        with mock.patch('eventlet.spawn_after'):
+            self.dhcp.port_delete_end(None, dict(port_id=fake_port2.id))
+        self.assertEqual(self.call_driver.call_count, 0)
+
+        self.dhcp._reload_pending_allocations(fake_network.id)
+        removed_ips = [fixed_ip.ip_address
+                       for fixed_ip in fake_port2.fixed_ips]
+        self.assertEqual(self.call_driver.call_args_list,
+                         [mock.call('reload_allocations', fake_network),
+                          mock.call('release_lease',
+                                    fake_network,
+                                    mac_address=fake_port2.mac_address,
+                                    removed_ips=removed_ips)])
+
+    def test_reload_pending_allocations_network_disabled(self):
+        self.dhcp.pending_reloads[fake_network.id] = []
+        self.cache.get_network_by_id.return_value = None
+        self.dhcp._reload_pending_allocations(fake_network.id)
+        self.assertEqual(self.call_driver.call_count, 0)
+        self.assertEqual(self.dhcp.pending_reloads, {})
+
 
 class TestDhcpPluginApiProxy(base.BaseTestCase):
     def setUp(self):
@@ -0,0 +1,87 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from neutron.agent.linux import ipset_manager
+from neutron.tests import base
+
+
+class IpsetManagerTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(IpsetManagerTestCase, self).setUp()
+        self.root_helper = 'sudo'
+        self.execute = mock.Mock()
+        self.ipset = ipset_manager.IpsetManager(_execute=self.execute,
+                                                root_helper=self.root_helper)
+
+    def _restore_call(self, lines):
+        return mock.call(['ipset', 'restore', '-exist'],
+                         process_input='\n'.join(lines) + '\n',
+                         root_helper=self.root_helper)
+
+    def test_get_set_name(self):
+        name = ipset_manager.get_set_name(
+            '2b9e5a4c-5d2f-4a55-9a8e-2f2c1f5f7d21', 'IPv6')
+        self.assertEqual(name, 'NIPv62b9e5a4c5d2f4a559a8e2f2c1f')
+        self.assertEqual(len(name), ipset_manager.MAX_SET_NAME_LEN)
+
+    def test_set_members_creates_set(self):
+        self.assertEqual(
+            self.ipset.set_members('NIPv4sg', 'IPv4',
+                                   ['10.0.0.3', '10.0.0.2']), 4)
+        self.assertEqual(self.execute.call_args_list,
+                         [self._restore_call(
+                             ['create NIPv4sg hash:net family inet',
+                              'flush NIPv4sg',
+                              'add NIPv4sg 10.0.0.2',
+                              'add NIPv4sg 10.0.0.3'])])
+
+    def test_set_members_only_sends_changes(self):
+        self.ipset.set_members('NIPv4sg', 'IPv4', ['10.0.0.2', '10.0.0.3'])
+        self.execute.reset_mock()
+        self.ipset.set_members('NIPv4sg', 'IPv4', ['10.0.0.3', '10.0.1.0/24'])
+        self.assertEqual(self.execute.call_args_list,
+                         [self._restore_call(['add NIPv4sg 10.0.1.0/24',
+                                              'del NIPv4sg 10.0.0.2'])])
+
+    def test_set_members_without_changes(self):
+        self.ipset.set_members('NIPv6sg', 'IPv6', ['fe80::1'])
+        self.execute.reset_mock()
+        self.assertEqual(
+            self.ipset.set_members('NIPv6sg', 'IPv6', ['fe80::1']), 0)
+        self.assertFalse(self.execute.called)
+
+    def test_namespace(self):
+        self.ipset.namespace = 'qrouter'
+        self.ipset.destroy('unknown')
+        self.ipset.set_members('NIPv4sg', 'IPv4', [])
+        self.ipset.destroy('NIPv4sg')
+        self.assertEqual(
+            self.execute.call_args_list[-1],
+            mock.call(['ip', 'netns', 'exec', 'qrouter',
+                       'ipset', 'destroy', 'NIPv4sg'],
+                      process_input=None, root_helper=self.root_helper))
+        self.assertEqual(self.execute.call_count, 2)
+        self.assertEqual(self.ipset.sets, {})
+
+    def test_destroy_failure_keeps_set(self):
+        self.ipset.set_members('NIPv4sg', 'IPv4', ['10.0.0.2'])
+        self.execute.side_effect = RuntimeError()
+        self.ipset.destroy('NIPv4sg')
+        self.assertIn('NIPv4sg', self.ipset.sets)
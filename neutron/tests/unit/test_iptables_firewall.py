@@ -1134,3 +1134,76 @@ class IptablesFirewallTestCase(base.BaseTestCase):
                  call.add_rule('ofake_dev', '-j $sg-fallback'),
                  call.add_rule('sg-chain', '-j ACCEPT')]
         self.v4filter_inst.assert_has_calls(calls)
+
+
+class IptablesFirewallIpsetTestCase(IptablesFirewallTestCase):
+    def setUp(self):
+        cfg.CONF.set_override('enable_ipset', True, 'SECURITYGROUP')
+        self.ipset_cls_p = mock.patch(
+            'neutron.agent.linux.ipset_manager.IpsetManager')
+        self.ipset_cls = self.ipset_cls_p.start()
+        self.addCleanup(self.ipset_cls_p.stop)
+        super(IptablesFirewallIpsetTestCase, self).setUp()
+        self.ipset = self.ipset_cls.return_value
+
+    def _remote_group_port(self, direction='ingress'):
+        port = self._fake_port()
+        port['security_group_rules'] = [{'ethertype': 'IPv4',
+                                         'direction': direction,
+                                         'protocol': 'tcp',
+                                         'port_range_min': 22,
+                                         'port_range_max': 22,
+                                         'remote_group_id': 'fake_sgid'}]
+        return port
+
+    def test_handles_remote_groups(self):
+        self.assertTrue(self.firewall.handles_remote_groups)
+
+    def test_filter_ipv4_ingress_remote_group(self):
+        self.firewall.update_security_group_members(
+            'fake_sgid', {'IPv4': ['10.0.0.2', '10.0.0.3'], 'IPv6': []})
+        self.firewall.prepare_port_filter(self._remote_group_port())
+        self.v4filter_inst.assert_has_calls(
+            [call.add_rule('ifake_dev',
+                           '-p tcp -m tcp --dport 22 '
+                           '-m set --match-set NIPv4fake_sgid src '
+                           '-j RETURN')])
+        self.ipset.set_members.assert_has_calls(
+            [call('NIPv4fake_sgid', 'IPv4', ['10.0.0.2', '10.0.0.3']),
+             call('NIPv6fake_sgid', 'IPv6', [])])
+
+    def test_filter_ipv4_egress_remote_group_without_members(self):
+        self.firewall.prepare_port_filter(self._remote_group_port('egress'))
+        self.v4filter_inst.assert_has_calls(
+            [call.add_rule('ofake_dev',
+                           '-p tcp -m tcp --dport 22 '
+                           '-m set --match-set NIPv4fake_sgid dst '
+                           '-j RETURN')])
+        # The sets are created empty until the members are known
+        self.ipset.set_members.assert_has_calls(
+            [call('NIPv4fake_sgid', 'IPv4', []),
+             call('NIPv6fake_sgid', 'IPv6', [])])
+
+    def test_filter_remote_group_expanded_by_server(self):
+        port = self._remote_group_port()
+        port['security_group_rules'][0]['source_ip_prefix'] = '10.0.0.2/32'
+        self.firewall.prepare_port_filter(port)
+        self.v4filter_inst.assert_has_calls(
+            [call.add_rule('ifake_dev',
+                           '-s 10.0.0.2/32 -p tcp -m tcp --dport 22 '
+                           '-j RETURN')])
+        self.assertFalse(self.ipset.set_members.called)
+
+    def test_remove_port_filter_destroys_unused_sets(self):
+        port = self._remote_group_port()
+        self.firewall.update_security_group_members(
+            'fake_sgid', {'IPv4': ['10.0.0.2']})
+        self.firewall.prepare_port_filter(port)
+        self.assertFalse(self.ipset.destroy.called)
+        with self.firewall.defer_apply():
+            self.firewall.remove_port_filter(port)
+            # The rules referring to the sets are not removed yet
+            self.assertFalse(self.ipset.destroy.called)
+        self.ipset.destroy.assert_has_calls([call('NIPv4fake_sgid'),
+                                             call('NIPv6fake_sgid')])
+        self.assertEqual(self.firewall.sg_members, {})
@@ -548,6 +548,144 @@ class IptablesManagerStateFulTestCase(base.BaseTestCase):
         tools.verify_mock_calls(self.execute, expected_calls_and_values)
 
 
+class IptablesManagerIncrementalTestCase(base.BaseTestCase):
+
+    def setUp(self):
+        super(IptablesManagerIncrementalTestCase, self).setUp()
+        self.root_helper = 'sudo'
+        self.iptables = iptables_manager.IptablesManager(
+            root_helper=self.root_helper, incremental=True)
+        self.execute = mock.patch.object(self.iptables, "execute").start()
+        self.addCleanup(mock.patch.stopall)
+
+    def _full_resync_calls(self, filter_dump=FILTER_DUMP):
+        return [
+            (mock.call(['iptables-save', '-c'],
+                       root_helper=self.root_helper),
+             ''),
+            (mock.call(['iptables-restore', '-c'],
+                       process_input=NAT_DUMP + filter_dump,
+                       root_helper=self.root_helper),
+             None),
+        ]
+
+    def _noflush_call(self, lines, result=None):
+        return (mock.call(['iptables-restore', '--noflush'],
+                          process_input=('\n'.join(lines) + '\n'
+                                         ) % IPTABLES_ARG,
+                          root_helper=self.root_helper),
+                result)
+
+    def test_disabled_by_default(self):
+        self.assertFalse(iptables_manager.IptablesManager().incremental)
+
+    def test_first_apply_is_full_resync(self):
+        expected_calls_and_values = self._full_resync_calls()
+        tools.setup_mock_calls(self.execute, expected_calls_and_values)
+
+        self.iptables.apply()
+
+        tools.verify_mock_calls(self.execute, expected_calls_and_values)
+        self.assertEqual(self.iptables.apply_stats['last_mode'], 'full')
+        self.assertEqual(self.iptables.apply_stats['full_resyncs'], 1)
+
+    def test_apply_without_changes_skips_restore(self):
+        tools.setup_mock_calls(self.execute, self._full_resync_calls())
+        self.iptables.apply()
+        self.iptables.apply()
+
+        self.assertEqual(self.execute.call_count, 2)
+        self.assertEqual(self.iptables.apply_stats['applies'], 2)
+        self.assertEqual(self.iptables.apply_stats['last_mode'],
+                         'incremental')
+        self.assertEqual(self.iptables.apply_stats['last_lines'], 0)
+
+    def test_add_and_remove_filter_rule(self):
+        expected_calls_and_values = self._full_resync_calls() + [
+            self._noflush_call(
+                ['*filter',
+                 ':%(bn)s-INPUT - [0:0]',
+                 ':%(bn)s-filter - [0:0]',
+                 '-A %(bn)s-INPUT -s 0/0 -d 192.168.0.2 -j %(bn)s-filter',
+                 '-A %(bn)s-filter -j DROP',
+                 'COMMIT']),
+            self._noflush_call(
+                ['*filter',
+                 ':%(bn)s-INPUT - [0:0]',
+                 ':%(bn)s-filter - [0:0]',
+                 '-X %(bn)s-filter',
+                 'COMMIT']),
+        ]
+        tools.setup_mock_calls(self.execute, expected_calls_and_values)
+        self.iptables.apply()
+
+        self.iptables.ipv4['filter'].add_chain('filter')
+        self.iptables.ipv4['filter'].add_rule('filter', '-j DROP')
+        self.iptables.ipv4['filter'].add_rule('INPUT',
+                                              '-s 0/0 -d 192.168.0.2 -j'
+                                              ' $filter')
+        self.iptables.apply()
+        self.assertEqual(self.iptables.apply_stats['last_lines'], 6)
+
+        self.iptables.ipv4['filter'].remove_chain('filter')
+        self.iptables.apply()
+
+        tools.verify_mock_calls(self.execute, expected_calls_and_values)
+        self.assertEqual(self.iptables.apply_stats['full_resyncs'], 1)
+
+    def test_add_and_remove_unwrapped_rules(self):
+        expected_calls_and_values = self._full_resync_calls() + [
+            self._noflush_call(
+                ['*nat',
+                 '-I POSTROUTING 1 -s 10.0.0.0/24 -j ACCEPT',
+                 '-A POSTROUTING -j MASQUERADE',
+                 'COMMIT']),
+            self._noflush_call(
+                ['*nat',
+                 '-D POSTROUTING -s 10.0.0.0/24 -j ACCEPT',
+                 'COMMIT']),
+        ]
+        tools.setup_mock_calls(self.execute, expected_calls_and_values)
+        self.iptables.apply()
+
+        nat = self.iptables.ipv4['nat']
+        nat.add_rule('POSTROUTING', '-j MASQUERADE', wrap=False)
+        nat.add_rule('POSTROUTING', '-s 10.0.0.0/24 -j ACCEPT', wrap=False,
+                     top=True)
+        self.iptables.apply()
+
+        nat.remove_rule('POSTROUTING', '-s 10.0.0.0/24 -j ACCEPT',
+                        wrap=False, top=True)
+        self.iptables.apply()
+
+        tools.verify_mock_calls(self.execute, expected_calls_and_values)
+        self.assertFalse(nat.remove_rules)
+
+    def test_stale_cache_falls_back_to_full_resync(self):
+        filter_dump_mod = FILTER_DUMP.replace(
+            ':%(bn)s-local - [0:0]\n' % IPTABLES_ARG,
+            ':%(bn)s-local - [0:0]\n:%(bn)s-filter - [0:0]\n' % IPTABLES_ARG)
+        expected_calls_and_values = (
+            self._full_resync_calls() +
+            [self._noflush_call(['*filter', ':%(bn)s-filter - [0:0]',
+                                 'COMMIT'], RuntimeError())] +
+            self._full_resync_calls(filter_dump_mod))
+        tools.setup_mock_calls(self.execute, expected_calls_and_values)
+        self.iptables.apply()
+
+        self.iptables.ipv4['filter'].add_chain('filter')
+        self.iptables.apply()
+
+        tools.verify_mock_calls(self.execute, expected_calls_and_values)
+        self.assertEqual(self.iptables.apply_stats['stale_resyncs'], 1)
+        self.assertEqual(self.iptables.apply_stats['full_resyncs'], 2)
+        self.assertEqual(self.iptables.apply_stats['last_mode'], 'full')
+
+        # The cache is valid again after the resync
+        self.iptables.apply()
+        self.assertEqual(self.execute.call_count, 5)
+
+
 class IptablesManagerStateLessTestCase(base.BaseTestCase):
 
     def setUp(self):
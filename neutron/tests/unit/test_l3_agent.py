@@ -15,8 +15,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
 import copy
 
+import eventlet
 import mock
 from oslo.config import cfg
 from testtools import matchers
@@ -26,6 +28,7 @@ from neutron.agent import l3_agent
 from neutron.agent.linux import interface
 from neutron.common import config as base_config
 from neutron.common import constants as l3_constants
+from neutron.openstack.common import timeutils
 from neutron.openstack.common import uuidutils
 from neutron.tests import base
 
@@ -35,6 +38,56 @@ HOSTNAME = 'myhost'
 FAKE_ID = _uuid()
 
 
+class TestRouterProcessingQueue(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestRouterProcessingQueue, self).setUp()
+        self.queue = l3_agent.RouterProcessingQueue()
+
+    def _add(self, router_id, priority, **kwargs):
+        update = l3_agent.RouterUpdate(router_id, priority, **kwargs)
+        self.queue.add(update)
+        return update
+
+    def test_priorities(self):
+        self._add('r1', l3_agent.PRIORITY_SYNC_ROUTERS_TASK)
+        self._add('r2', l3_agent.PRIORITY_SYNC_ROUTERS_TASK)
+        self._add('r3', l3_agent.PRIORITY_RPC)
+        self.assertEqual([self.queue.get().router_id for i in range(3)],
+                         ['r3', 'r1', 'r2'])
+
+    def test_updates_of_a_router_are_merged(self):
+        self._add('r1', l3_agent.PRIORITY_RPC)
+        self._add('r2', l3_agent.PRIORITY_RPC)
+        delete = self._add('r1', l3_agent.PRIORITY_SYNC_ROUTERS_TASK,
+                           action=l3_agent.DELETE_ROUTER)
+        self.assertEqual(len(self.queue), 2)
+        update = self.queue.get()
+        self.assertIs(update, delete)
+        self.assertEqual(update.priority, l3_agent.PRIORITY_RPC)
+        self.assertEqual(self.queue.get().router_id, 'r2')
+
+    def test_merged_update_takes_higher_priority(self):
+        self._add('r1', l3_agent.PRIORITY_SYNC_ROUTERS_TASK)
+        self._add('r2', l3_agent.PRIORITY_SYNC_ROUTERS_TASK)
+        self._add('r2', l3_agent.PRIORITY_RPC)
+        self.assertEqual(len(self.queue), 2)
+        self.assertEqual([self.queue.get().router_id for i in range(2)],
+                         ['r2', 'r1'])
+        self.assertEqual(len(self.queue), 0)
+
+    def test_updates_are_held_while_router_is_processed(self):
+        self._add('r1', l3_agent.PRIORITY_RPC)
+        self.queue.get()
+        self._add('r1', l3_agent.PRIORITY_SYNC_ROUTERS_TASK)
+        update = self._add('r1', l3_agent.PRIORITY_RPC)
+        self._add('r2', l3_agent.PRIORITY_SYNC_ROUTERS_TASK)
+        self.assertEqual(self.queue.get().router_id, 'r2')
+        self.queue.done('r1')
+        self.assertIs(self.queue.get(), update)
+        self.assertEqual(len(self.queue), 0)
+
+
 class TestBasicRouterOperations(base.BaseTestCase):
 
     def setUp(self):
@@ -689,29 +742,39 @@ class TestBasicRouterOperations(base.BaseTestCase):
         agent._process_routers(routers)
         self.assertNotIn(routers[0]['id'], agent.router_info)
 
+    def _queued_update(self, agent):
+        self.assertEqual(len(agent._queue), 1)
+        return agent._queue.get()
+
     def test_router_deleted(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         agent.router_deleted(None, FAKE_ID)
-        # verify that will set fullsync
-        self.assertIn(FAKE_ID, agent.removed_routers)
+        update = self._queued_update(agent)
+        self.assertEqual(update.router_id, FAKE_ID)
+        self.assertEqual(update.action, l3_agent.DELETE_ROUTER)
+        self.assertEqual(update.priority, l3_agent.PRIORITY_RPC)
 
     def test_routers_updated(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         agent.routers_updated(None, [FAKE_ID])
-        # verify that will set fullsync
-        self.assertIn(FAKE_ID, agent.updated_routers)
+        update = self._queued_update(agent)
+        self.assertEqual(update.router_id, FAKE_ID)
+        self.assertEqual(update.action, l3_agent.UPDATE_ROUTER)
+        self.assertIsNone(update.router)
 
     def test_removed_from_agent(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         agent.router_removed_from_agent(None, {'router_id': FAKE_ID})
-        # verify that will set fullsync
-        self.assertIn(FAKE_ID, agent.removed_routers)
+        update = self._queued_update(agent)
+        self.assertEqual(update.router_id, FAKE_ID)
+        self.assertEqual(update.action, l3_agent.DELETE_ROUTER)
 
     def test_added_to_agent(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
         agent.router_added_to_agent(None, [FAKE_ID])
-        # verify that will set fullsync
-        self.assertIn(FAKE_ID, agent.updated_routers)
+        update = self._queued_update(agent)
+        self.assertEqual(update.router_id, FAKE_ID)
+        self.assertEqual(update.action, l3_agent.UPDATE_ROUTER)
 
     def test_process_router_delete(self):
         agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
@@ -728,8 +791,150 @@ class TestBasicRouterOperations(base.BaseTestCase):
             'gw_port': ex_gw_port}
         agent._router_added(router['id'], router)
         agent.router_deleted(None, router['id'])
-        agent._process_router_delete()
-        self.assertFalse(list(agent.removed_routers))
+        agent._process_router_update(agent._queue.get())
+        self.assertNotIn(router['id'], agent.router_info)
+        self.assertEqual(len(agent._queue), 0)
+
+    def test_process_router_update_fetches_router(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        router = {'id': FAKE_ID}
+        self.plugin_api.get_routers.return_value = [router]
+        with mock.patch.object(agent, '_process_routers') as process:
+            agent.routers_updated(None, [FAKE_ID])
+            agent._process_router_update(agent._queue.get())
+        self.plugin_api.get_routers.assert_called_once_with(agent.context,
+                                                            [FAKE_ID])
+        process.assert_called_once_with([router])
+
+    def test_process_router_update_drops_stale_update(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        router = {'id': FAKE_ID}
+        self.addCleanup(timeutils.clear_time_override)
+        timeutils.set_time_override()
+        # The sync task fetched the router data before a notified change
+        update = l3_agent.RouterUpdate(
+            FAKE_ID, l3_agent.PRIORITY_SYNC_ROUTERS_TASK, router=router)
+        timeutils.advance_time_seconds(1)
+        self.plugin_api.get_routers.return_value = [router]
+        with mock.patch.object(agent, '_process_routers') as process:
+            agent.routers_updated(None, [FAKE_ID])
+            agent._process_router_update(agent._queue.get())
+            timeutils.advance_time_seconds(1)
+            agent._queue.add(update)
+            agent._process_router_update(agent._queue.get())
+        process.assert_called_once_with([router])
+
+    def test_process_router_update_failure_triggers_fullsync(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        agent.fullsync = False
+        self.plugin_api.get_routers.side_effect = Exception
+        agent.routers_updated(None, [FAKE_ID])
+        agent._process_router_update(agent._queue.get())
+        self.assertTrue(agent.fullsync)
+        # The router can be processed again
+        agent.routers_updated(None, [FAKE_ID])
+        self.assertEqual(len(agent._queue), 1)
+
+    def test_process_routers_loop(self):
+        self.conf.set_override('router_processing_workers', 2)
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        agent.routers_updated(None, ['r1', 'r2', 'r3'])
+        with mock.patch.object(agent, '_process_router_update') as process:
+            loop = eventlet.spawn(agent._process_routers_loop)
+            self.addCleanup(loop.kill)
+            for i in range(5):
+                eventlet.sleep(0)
+        self.assertEqual([call[0][0].router_id
+                          for call in process.call_args_list],
+                         ['r1', 'r2', 'r3'])
+
+    def test_process_routers_loop_batches_updates(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        agent.routers_updated(None, ['r1', 'r2'])
+
+        def process(update, processed):
+            processed.append({'id': update.router_id})
+            agent._queue.done(update.router_id)
+
+        with contextlib.nested(
+            mock.patch.object(agent, '_process_router_update',
+                              side_effect=process),
+            mock.patch.object(agent, '_routers_processed')
+        ) as (process_update, routers_processed):
+            loop = eventlet.spawn(agent._process_routers_loop)
+            self.addCleanup(loop.kill)
+            for i in range(5):
+                eventlet.sleep(0)
+            agent.routers_updated(None, ['r3'])
+            for i in range(5):
+                eventlet.sleep(0)
+        self.assertEqual(routers_processed.call_args_list,
+                         [mock.call([{'id': 'r1'}, {'id': 'r2'}]),
+                          mock.call([{'id': 'r3'}])])
+
+    def test_process_router_update_appends_processed(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        router = {'id': FAKE_ID}
+        processed = []
+        with mock.patch.object(agent, '_process_routers'):
+            agent._queue.add(l3_agent.RouterUpdate(
+                FAKE_ID, l3_agent.PRIORITY_RPC, router=router))
+            agent._process_router_update(agent._queue.get(), processed)
+        self.assertEqual(processed, [router])
+
+    def test_queue_get_without_blocking(self):
+        queue = l3_agent.RouterProcessingQueue()
+        self.assertIsNone(queue.get(block=False))
+        queue.add(l3_agent.RouterUpdate('r1', l3_agent.PRIORITY_RPC))
+        self.assertEqual(queue.get(block=False).router_id, 'r1')
+
+    def test_sync_routers_task_fetches_by_chunks(self):
+        self.conf.set_override('sync_routers_chunk_size', 2)
+        self.conf.set_override('router_id', '')
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        agent.services_sync = False
+        router_ids = ['r1', 'r2', 'r3']
+        self.plugin_api.get_router_ids.return_value = router_ids
+        self.plugin_api.get_routers.side_effect = lambda ctx, ids: [
+            {'id': router_id} for router_id in ids if router_id != 'r2']
+        agent.router_info = {'r2': None, 'gone': None}
+        agent._sync_routers_task(agent.context)
+
+        self.assertFalse(agent.fullsync)
+        self.assertEqual(self.plugin_api.get_routers.call_args_list,
+                         [mock.call(agent.context, ['r1', 'r2']),
+                          mock.call(agent.context, ['r3'])])
+        updates = [agent._queue.get() for i in range(len(agent._queue))]
+        self.assertEqual([(u.router_id, u.action) for u in updates],
+                         [('gone', l3_agent.DELETE_ROUTER),
+                          ('r1', l3_agent.UPDATE_ROUTER),
+                          ('r2', l3_agent.DELETE_ROUTER),
+                          ('r3', l3_agent.UPDATE_ROUTER)])
+        self.assertEqual(updates[1].router, {'id': 'r1'})
+
+    def test_sync_routers_task_without_get_router_ids(self):
+        self.conf.set_override('router_id', '')
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        agent.services_sync = False
+        self.plugin_api.get_router_ids.return_value = None
+        self.plugin_api.get_routers.return_value = [{'id': 'r1'}]
+        agent.router_info = {'gone': None}
+        agent._sync_routers_task(agent.context)
+
+        self.plugin_api.get_routers.assert_called_once_with(agent.context,
+                                                            None)
+        updates = [agent._queue.get() for i in range(len(agent._queue))]
+        self.assertEqual([(u.router_id, u.action) for u in updates],
+                         [('gone', l3_agent.DELETE_ROUTER),
+                          ('r1', l3_agent.UPDATE_ROUTER)])
+
+    def test_sync_routers_task_failure(self):
+        agent = l3_agent.L3NATAgent(HOSTNAME, self.conf)
+        agent.services_sync = False
+        self.plugin_api.get_router_ids.return_value = ['r1']
+        self.plugin_api.get_routers.side_effect = Exception
+        agent._sync_routers_task(agent.context)
+        self.assertTrue(agent.fullsync)
 
     def test_destroy_namespace(self):
 
@@ -40,7 +40,9 @@ from neutron.db import l3_db
 from neutron.db import model_base
 from neutron.extensions import external_net
 from neutron.extensions import l3
+from neutron.extensions import portbindings
 from neutron.manager import NeutronManager
+from neutron.openstack.common.db.sqlalchemy import session as db_session
 from neutron.openstack.common import log as logging
 from neutron.openstack.common.notifier import api as notifier_api
 from neutron.openstack.common.notifier import test_notifier
@@ -1605,6 +1607,35 @@ class L3AgentDbTestCaseBase(L3NatTestCaseMixin):
                                               None,
                                               p['port']['id'])
 
+    def test_l3_agent_routers_query_interfaces_without_core_plugin(self):
+        with self.router() as r:
+            with self.port(no_delete=True) as p:
+                self._router_interface_action('add',
+                                              r['router']['id'],
+                                              None,
+                                              p['port']['id'])
+                ctx = context.get_admin_context()
+                with mock.patch.object(self.core_plugin,
+                                       'get_ports') as get_ports:
+                    routers = self.plugin.get_sync_data(ctx, None)
+                self.assertFalse(get_ports.called)
+                interface = routers[0][l3_constants.INTERFACE_KEY][0]
+                port = self.core_plugin.get_port(ctx, p['port']['id'])
+                for key, value in interface.iteritems():
+                    if key != 'subnet':
+                        self.assertEqual(port[key], value)
+                subnet = self.core_plugin.get_subnet(
+                    ctx, port['fixed_ips'][0]['subnet_id'])
+                self.assertEqual({'id': subnet['id'],
+                                  'cidr': subnet['cidr'],
+                                  'gateway_ip': subnet['gateway_ip']},
+                                 interface['subnet'])
+                # clean-up
+                self._router_interface_action('remove',
+                                              r['router']['id'],
+                                              None,
+                                              p['port']['id'])
+
     def test_l3_agent_routers_query_ignore_interfaces_with_moreThanOneIp(self):
         with self.router() as r:
             with self.subnet(cidr='9.0.1.0/24') as subnet:
@@ -1648,6 +1679,56 @@ class L3AgentDbTestCaseBase(L3NatTestCaseMixin):
                     r['router']['id'],
                     s['subnet']['network_id'])
 
+    def _sync_data_statements(self, router_ids):
+        dialect = db_session.get_engine().dialect
+        with mock.patch.object(dialect, 'do_execute',
+                               wraps=dialect.do_execute) as execute:
+            self.plugin.get_sync_data(context.get_admin_context(),
+                                      router_ids)
+        return execute.call_count
+
+    def test_l3_agent_routers_query_gateways_with_routers(self):
+        with contextlib.nested(self.router(), self.router(),
+                               self.subnet()) as (r1, r2, s):
+            network_id = s['subnet']['network_id']
+            self._set_net_external(network_id)
+            router_ids = [r1['router']['id'], r2['router']['id']]
+            for router_id in router_ids:
+                self._add_external_gateway_to_router(router_id, network_id)
+            # The gateway ports are not loaded router by router
+            self.assertEqual(self._sync_data_statements(router_ids[:1]),
+                             self._sync_data_statements(router_ids))
+            for router_id in router_ids:
+                self._remove_external_gateway_from_router(router_id,
+                                                          network_id)
+
+    def test_l3_agent_routers_query_bindings_without_get_port_bindings(self):
+        core_plugin = mock.Mock(spec=['get_ports',
+                                      'supported_extension_aliases'])
+        core_plugin.supported_extension_aliases = ['binding']
+        core_plugin.get_ports.return_value = [
+            {'id': 'p1', 'name': 'port1', portbindings.HOST_ID: 'host1',
+             portbindings.VIF_TYPE: portbindings.VIF_TYPE_OVS}]
+        ctx = context.get_admin_context()
+        with mock.patch.object(NeutronManager, 'get_plugin',
+                               return_value=core_plugin):
+            bindings = self.plugin._get_sync_port_bindings(ctx, ['p1'])
+        core_plugin.get_ports.assert_called_once_with(
+            ctx, filters={'id': ['p1']})
+        self.assertEqual({'p1': {portbindings.HOST_ID: 'host1',
+                                 portbindings.VIF_TYPE:
+                                 portbindings.VIF_TYPE_OVS}}, bindings)
+
+    def test_l3_agent_routers_query_without_binding_extension(self):
+        core_plugin = mock.Mock(spec=['get_ports',
+                                      'supported_extension_aliases'])
+        core_plugin.supported_extension_aliases = []
+        with mock.patch.object(NeutronManager, 'get_plugin',
+                               return_value=core_plugin):
+            self.assertEqual({}, self.plugin._get_sync_port_bindings(
+                context.get_admin_context(), ['p1']))
+        self.assertFalse(core_plugin.get_ports.called)
+
     def test_l3_agent_routers_query_floatingips(self):
         with self.floatingip_with_assoc() as fip:
             routers = self.plugin.get_sync_data(
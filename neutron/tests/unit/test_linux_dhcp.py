@@ -15,6 +15,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import contextlib
 import os
 
 import mock
@@ -983,7 +984,32 @@ tag:tag1,249,%s,%s""".lstrip() % (fake_v6,
             self.safe.assert_has_calls([mock.call(exp_host_name,
                                                   exp_host_data),
                                         mock.call(exp_opt_name, exp_opt_data)])
-            mock_open.assert_called_once_with('/proc/5/cmdline', 'r')
+            mock_open.assert_any_call('/proc/5/cmdline', 'r')
+
+    def test_reload_allocations_unchanged(self):
+        dm = dhcp.Dnsmasq(self.conf, FakeDualNetwork(), version=float(2.59))
+        contents = {'pid': 5}
+        with contextlib.nested(
+            mock.patch.object(dhcp.Dnsmasq, 'active'),
+            mock.patch.object(dm, '_get_value_from_conf_file'),
+            mock.patch.object(dm, '_make_subnet_interface_ip_map',
+                              return_value={})
+        ) as (active, get_value, ip_map):
+            active.__get__ = mock.Mock(return_value=True)
+            get_value.side_effect = lambda kind, converter=None: (
+                contents.get(kind))
+            dm.reload_allocations()
+            self.execute.assert_called_once_with(['kill', '-HUP', 5], 'sudo')
+            for call in self.safe.call_args_list:
+                contents[call[0][0].rsplit('/', 1)[1]] = call[0][1]
+
+            self.safe.reset_mock()
+            self.execute.reset_mock()
+            dm.reload_allocations()
+
+        self.assertFalse(self.safe.called)
+        self.assertFalse(self.execute.called)
+        self.assertTrue(self.mock_mgr.return_value.update.called)
 
     def test_make_subnet_interface_ip_map(self):
         with mock.patch('neutron.agent.linux.ip_lib.IPDevice') as ip_dev:
@@ -38,6 +38,9 @@ class FakeConf(object):
     nova_metadata_ip = '9.9.9.9'
     nova_metadata_port = 8775
     metadata_proxy_shared_secret = 'secret'
+    metadata_cache_ttl = 5
+    metadata_cache_size = 1000
+    nova_metadata_pool_size = 16
 
 
 class TestMetadataProxyHandler(base.BaseTestCase):
@@ -190,6 +193,88 @@ class TestMetadataProxyHandler(base.BaseTestCase):
             (None, None)
         )
 
+    def _get_ids_for(self, network_id, remote_address):
+        req = mock.Mock(headers={'X-Neutron-Network-ID': network_id,
+                                 'X-Forwarded-For': remote_address})
+        return self.handler._get_instance_and_tenant_id(req)
+
+    def _set_list_ports(self, *ports):
+        self.qclient.return_value.list_ports.return_value = {
+            'ports': [{'id': port_id, 'device_id': 'device_%s' % port_id,
+                       'tenant_id': 'tenant_id'} for port_id in ports]}
+
+    def test_get_instance_id_cached(self):
+        self._set_list_ports('port1')
+        for _i in range(3):
+            self.assertEqual(self._get_ids_for('net1', '192.168.1.1'),
+                             ('device_port1', 'tenant_id'))
+        self.assertEqual(self.qclient.return_value.list_ports.call_count, 1)
+        self.assertEqual(self.handler.cache.hits, 2)
+
+    def test_get_instance_id_cached_by_network_and_address(self):
+        self._set_list_ports('port1')
+        self._get_ids_for('net1', '192.168.1.1')
+        self._get_ids_for('net2', '192.168.1.1')
+        self._get_ids_for('net1', '192.168.1.2')
+        self.assertEqual(self.qclient.return_value.list_ports.call_count, 3)
+
+    def test_get_instance_id_no_match_not_cached(self):
+        self._set_list_ports()
+        self._get_ids_for('net1', '192.168.1.1')
+        self._get_ids_for('net1', '192.168.1.1')
+        self.assertEqual(self.qclient.return_value.list_ports.call_count, 2)
+
+    def test_get_instance_id_cache_expires(self):
+        self._set_list_ports('port1')
+        with mock.patch('time.time') as time:
+            time.return_value = 100
+            self._get_ids_for('net1', '192.168.1.1')
+            time.return_value = 104
+            self._get_ids_for('net1', '192.168.1.1')
+            time.return_value = 105
+            self._get_ids_for('net1', '192.168.1.1')
+        self.assertEqual(self.qclient.return_value.list_ports.call_count, 2)
+
+    def test_get_instance_id_cache_disabled(self):
+        with mock.patch.object(FakeConf, 'metadata_cache_ttl', new=0):
+            self.handler = agent.MetadataProxyHandler(FakeConf)
+        self.assertIsNone(self.handler.cache)
+        self._set_list_ports('port1')
+        self._get_ids_for('net1', '192.168.1.1')
+        self._get_ids_for('net1', '192.168.1.1')
+        self.assertEqual(self.qclient.return_value.list_ports.call_count, 2)
+
+    def test_cache_drops_least_recently_used(self):
+        cache = agent.InstanceLookupCache(2, 5)
+        cache.set(('net1', '10.0.0.1'), {'id': 'port1'})
+        cache.set(('net1', '10.0.0.2'), {'id': 'port2'})
+        cache.get(('net1', '10.0.0.1'))
+        cache.set(('net1', '10.0.0.3'), {'id': 'port3'})
+        self.assertEqual(cache.get(('net1', '10.0.0.1')), {'id': 'port1'})
+        self.assertIsNone(cache.get(('net1', '10.0.0.2')))
+        self.assertEqual(cache.get(('net1', '10.0.0.3')), {'id': 'port3'})
+
+    def test_port_update_invalidates_cache(self):
+        cache = self.handler.cache
+        cache.set(('net1', '10.0.0.1'), {'id': 'port1'})
+        cache.set(('net1', '10.0.0.2'), {'id': 'port2'})
+        cache.set(('net2', '10.0.0.3'), {'id': 'port3'})
+        cache.set(('router1', '10.0.0.4'), {'id': 'port4'})
+        cache.set(('net3', '10.0.0.5'), {'id': 'port5'})
+        self.handler.port_update(
+            None, port={'id': 'port1', 'network_id': 'net2',
+                        'device_id': 'router1',
+                        'fixed_ips': [{'ip_address': '10.0.0.5'}]})
+        self.assertEqual(list(cache._entries),
+                         [('net1', '10.0.0.2')])
+
+    def test_port_delete_invalidates_cache(self):
+        cache = self.handler.cache
+        cache.set(('net1', '10.0.0.1'), {'id': 'port1'})
+        cache.set(('net1', '10.0.0.2'), {'id': 'port2'})
+        self.handler.port_delete(None, port_id='port1')
+        self.assertEqual(list(cache._entries), [('net1', '10.0.0.2')])
+
     def _proxy_request_test_helper(self, response_code=200, method='GET'):
         hdrs = {'X-Forwarded-For': '8.8.8.8'}
         body = 'body'
@@ -247,6 +332,18 @@ class TestMetadataProxyHandler(base.BaseTestCase):
         with testtools.ExpectedException(Exception):
             self._proxy_request_test_helper(302)
 
+    def test_proxy_request_reuses_connection(self):
+        req = mock.Mock(path_info='/the_path', query_string='',
+                        headers={'X-Forwarded-For': '8.8.8.8'},
+                        method='GET', body='')
+        resp = mock.Mock(status=200)
+        with mock.patch('httplib2.Http') as mock_http:
+            mock_http.return_value.request.return_value = (resp, 'content')
+            for _i in range(3):
+                self.handler._proxy_request('the_id', 'tenant_id', req)
+            mock_http.assert_called_once_with()
+            self.assertEqual(mock_http.return_value.request.call_count, 3)
+
     def test_sign_instance_id(self):
         self.assertEqual(
             self.handler._sign_instance_id('foo'),
@@ -366,7 +463,13 @@ class TestUnixDomainMetadataProxy(base.BaseTestCase):
                         isdir.return_value = False
 
                         p = agent.UnixDomainMetadataProxy(self.cfg.CONF)
-                        p.run()
+                        with mock.patch.object(
+                                agent.agent_rpc,
+                                'create_consumers') as consumers:
+                            p.run()
+                            consumers.assert_called_once_with(
+                                mock.ANY, 'q-agent-notifier',
+                                [['port', 'update'], ['port', 'delete']])
 
                         isdir.assert_called_once_with('/the')
                         makedirs.assert_called_once_with('/the', 0o755)
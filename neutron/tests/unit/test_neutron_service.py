@@ -0,0 +1,123 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+from oslo.config import cfg
+
+from neutron import neutron_plugin_base_v2
+from neutron import service
+from neutron.tests import base
+
+
+class FakePlugin(neutron_plugin_base_v2.NeutronPluginBaseV2):
+    pass
+
+
+class FakeRpcPlugin(FakePlugin):
+    def start_rpc_listener(self):
+        return 'listener'
+
+
+class TestRpcWorkersSupported(base.BaseTestCase):
+
+    def test_not_supported(self):
+        self.assertFalse(FakePlugin.rpc_workers_supported.im_func(
+            mock.Mock(spec=FakePlugin, __class__=FakePlugin)))
+
+    def test_supported(self):
+        self.assertTrue(FakePlugin.rpc_workers_supported.im_func(
+            mock.Mock(spec=FakeRpcPlugin, __class__=FakeRpcPlugin)))
+
+
+class TestServeRpc(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestServeRpc, self).setUp()
+        self.plugin = mock.Mock()
+        self.plugin.rpc_workers_supported.return_value = True
+        self.service_plugin = mock.Mock()
+        self.service_plugin.rpc_workers_supported.return_value = False
+        manager = mock.patch('neutron.manager.NeutronManager').start()
+        manager.get_plugin.return_value = self.plugin
+        manager.get_service_plugins.return_value = {
+            'CORE': self.plugin, 'OTHER': self.service_plugin}
+        self.get_engine = mock.patch('neutron.openstack.common.db.'
+                                     'sqlalchemy.session.get_engine').start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_not_supported(self):
+        self.plugin.rpc_workers_supported.return_value = False
+        self.assertRaises(NotImplementedError, service.serve_rpc)
+        self.assertFalse(self.plugin.start_rpc_listener.called)
+
+    def test_serve_in_process(self):
+        rpc = service.serve_rpc()
+        self.assertIsInstance(rpc, service.RpcWorker)
+        self.plugin.start_rpc_listener.assert_called_once_with()
+        self.assertFalse(self.service_plugin.start_rpc_listener.called)
+
+    def test_serve_in_workers(self):
+        cfg.CONF.set_override('rpc_workers', 3)
+        with mock.patch.object(service.common_service,
+                               'ProcessLauncher') as launcher:
+            rpc = service.serve_rpc()
+        self.assertEqual(rpc, launcher.return_value)
+        self.get_engine.return_value.pool.dispose.assert_called_once_with()
+        worker = launcher.return_value.launch_service.call_args[0][0]
+        self.assertIsInstance(worker, service.RpcWorker)
+        launcher.return_value.launch_service.assert_called_once_with(
+            worker, workers=3)
+        # The listeners are started by the workers only
+        self.assertFalse(self.plugin.start_rpc_listener.called)
+
+
+class TestRpcWorker(base.BaseTestCase):
+
+    def test_start_disposes_inherited_connections(self):
+        plugin = mock.Mock()
+        with mock.patch('neutron.openstack.common.db.sqlalchemy.session.'
+                        'get_engine') as get_engine:
+            worker = service.RpcWorker([plugin])
+            worker.start()
+        get_engine.return_value.pool.dispose.assert_called_once_with()
+        plugin.start_rpc_listener.assert_called_once_with()
+
+    def test_wait_and_stop(self):
+        thread = mock.Mock(spec=service.eventlet.greenthread.GreenThread)
+        plugin = mock.Mock()
+        plugin.start_rpc_listener.return_value = thread
+        with mock.patch('neutron.openstack.common.db.sqlalchemy.session.'
+                        'get_engine'):
+            worker = service.RpcWorker([plugin])
+            worker.start()
+        worker.wait()
+        thread.wait.assert_called_once_with()
+        worker.stop()
+        thread.kill.assert_called_once_with()
+
+    def test_start_with_listener_list(self):
+        threads = [mock.Mock(spec=service.eventlet.greenthread.GreenThread)
+                   for i in range(2)]
+        plugin = mock.Mock()
+        plugin.start_rpc_listener.return_value = threads
+        with mock.patch('neutron.openstack.common.db.sqlalchemy.session.'
+                        'get_engine'):
+            worker = service.RpcWorker([plugin])
+            worker.start()
+        worker.stop()
+        for thread in threads:
+            thread.kill.assert_called_once_with()
@@ -21,6 +21,7 @@ import urllib2
 
 import fixtures
 import mock
+from oslo.config import cfg
 
 import neutron
 from neutron.api.v2 import attributes
@@ -481,6 +482,99 @@ class NeutronPolicyTestCase(base.BaseTestCase):
     def test_enforce_tenant_id_check_invalid_parent_resource_raises(self):
         self._test_enforce_tenant_id_raises('tenant_id:%(foobaz_tenant_id)s')
 
+    def test_build_match_rule_compiled_once(self):
+        action = "create_network"
+        rule = policy._build_match_rule(action, {'tenant_id': 'a',
+                                                 'shared': True})
+        self.assertIs(rule, policy._build_match_rule(
+            action, {'tenant_id': 'b', 'shared': True}))
+        self.assertIsNot(rule, policy._build_match_rule(
+            action, {'tenant_id': 'a'}))
+
+    def test_build_match_rule_not_compiled(self):
+        cfg.CONF.set_override('policy_compile', False)
+        self.addCleanup(cfg.CONF.clear_override, 'policy_compile')
+        action = "create_network"
+        target = {'tenant_id': 'a', 'shared': True}
+        self.assertIsNot(policy._build_match_rule(action, target),
+                         policy._build_match_rule(action, target))
+
+    def test_build_match_rule_compiled_per_sub_attributes(self):
+        action = "create_something"
+        rule = policy._build_match_rule(
+            action, {'tenant_id': 'fake', 'attr': {'sub_attr_1': 'x'}})
+        self.assertIsNot(rule, policy._build_match_rule(
+            action, {'tenant_id': 'fake', 'attr': {'sub_attr_1': 'x',
+                                                   'sub_attr_2': 'y'}}))
+
+    def _is_target_independent(self, rule):
+        policy.init()
+        return policy._is_target_independent(
+            common_policy.parse_rule(rule))
+
+    def test_is_target_independent(self):
+        for rule in ("rule:admin_only", "role:user", "@", "!",
+                     "rule:admin_only or not role:user",
+                     "is_admin:True", "rule:unknown"):
+            self.assertTrue(self._is_target_independent(rule), rule)
+
+    def test_is_target_dependent(self):
+        for rule in ("rule:admin_or_owner", "rule:shared",
+                     "tenant_id:%(tenant_id)s", "user_id:%(user_id)s",
+                     "role:admin and rule:admin_or_network_owner",
+                     "http://example.com/%(tenant_id)s"):
+            self.assertFalse(self._is_target_independent(rule), rule)
+
+    def test_is_target_dependent_recursive_rule(self):
+        self.rules['loop'] = common_policy.parse_rule("rule:loop or "
+                                                      "role:admin")
+        self.assertFalse(self._is_target_independent("rule:loop"))
+
+    def test_checker_computes_credentials_once(self):
+        with mock.patch.object(self.context, 'to_dict',
+                               return_value=self.context.to_dict()) as f:
+            checker = policy.PolicyChecker(self.context)
+            for tenant_id in ('fake', 'somebody_else'):
+                checker.check("create_network", {'tenant_id': tenant_id})
+        f.assert_called_once_with()
+
+    def test_checker_caches_target_independent_results(self):
+        self.rules['get_network:secret'] = common_policy.parse_rule(
+            "rule:admin_only")
+        checker = policy.PolicyChecker(self.context)
+        with mock.patch.object(common_policy, 'check',
+                               wraps=common_policy.check) as check:
+            for tenant_id in ('fake', 'somebody_else'):
+                self.assertFalse(checker.check_if_exists(
+                    "get_network:secret", {'tenant_id': tenant_id}))
+        self.assertEqual(1, check.call_count)
+
+    def test_checker_evaluates_target_dependent_rules(self):
+        checker = policy.PolicyChecker(self.context)
+        self.assertTrue(checker.check("create_network",
+                                      {'tenant_id': 'fake'}))
+        self.assertFalse(checker.check("create_network",
+                                       {'tenant_id': 'somebody_else'}))
+
+    def test_checker_not_compiled(self):
+        cfg.CONF.set_override('policy_compile', False)
+        self.addCleanup(cfg.CONF.clear_override, 'policy_compile')
+        self.rules['get_network:secret'] = common_policy.parse_rule(
+            "rule:admin_only")
+        checker = policy.PolicyChecker(self.context)
+        with mock.patch.object(common_policy, 'check',
+                               wraps=common_policy.check) as check:
+            for tenant_id in ('fake', 'somebody_else'):
+                self.assertFalse(checker.check(
+                    "get_network:secret", {'tenant_id': tenant_id}))
+        self.assertEqual(2, check.call_count)
+
+    def test_checker_check_if_exists_non_existent_action_raises(self):
+        checker = policy.PolicyChecker(self.context)
+        self.assertRaises(exceptions.PolicyRuleNotFound,
+                          checker.check_if_exists,
+                          "get_network:unknown", {'tenant_id': 'fake'})
+
     def test_get_roles_context_is_admin_rule_missing(self):
         rules = dict((k, common_policy.parse_rule(v)) for k, v in {
             "some_other_rule": "role:admin",
@@ -15,6 +15,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import datetime
 import sys
 
 import mock
@@ -28,12 +29,15 @@ from neutron.common import config
 from neutron.common import exceptions
 from neutron import context
 from neutron.db import api as db
+from neutron.db import models_v2
 from neutron.db import quota_db
 from neutron import manager
+from neutron.openstack.common import timeutils
 from neutron.plugins.linuxbridge.db import l2network_db_v2
 from neutron import quota
 from neutron.tests import base
 from neutron.tests.unit import test_api_v2
+from neutron.tests.unit import test_db_plugin
 from neutron.tests.unit import test_extensions
 from neutron.tests.unit import testlib_api
 
@@ -439,3 +443,156 @@ class TestQuotaDriverLoad(base.BaseTestCase):
     def test_quota_conf_driver(self):
         self._test_quota_driver('neutron.quota.ConfDriver',
                                 'ConfDriver', True)
+
+    def test_quota_tracked_driver_fallback_conf_driver(self):
+        self._test_quota_driver(quota.QUOTA_TRACKED_DRIVER,
+                                'ConfDriver', False)
+
+
+class TrackedUsageQuotaTestMixin(object):
+
+    def setUp(self):
+        super(TrackedUsageQuotaTestMixin, self).setUp()
+        cfg.CONF.set_override('quota_driver', quota.QUOTA_TRACKED_DRIVER,
+                              group='QUOTAS')
+        cfg.CONF.set_override('quota_usage_reconcile_interval', 0,
+                              group='QUOTAS')
+        quota.QUOTAS._driver = None
+        self.addCleanup(setattr, quota.QUOTAS, '_driver', None)
+
+
+class TestTrackedUsageQuotaDriver(TrackedUsageQuotaTestMixin,
+                                  test_db_plugin.NeutronDbPluginV2TestCase):
+
+    def _get_usage(self, resource, tenant_id=None):
+        usage = context.get_admin_context().session.query(
+            quota_db.QuotaUsage).filter_by(
+                tenant_id=tenant_id or self._tenant_id,
+                resource=resource).first()
+        return usage and (usage.in_use, usage.reserved)
+
+    def _create_networks(self, count, tenant_id=None):
+        override = dict((i, {'tenant_id': tenant_id or self._tenant_id})
+                        for i in range(count))
+        res = self._create_network_bulk(self.fmt, count, 'net', True,
+                                        override=override)
+        self.assertEqual(res.status_int, 201)
+        return self.deserialize(self.fmt, res)['networks']
+
+    def test_usage_tracked_with_creates_and_deletes(self):
+        networks = self._create_networks(2)
+        self.assertEqual(self._get_usage('network'), (2, 0))
+        self._create_networks(1)
+        self.assertEqual(self._get_usage('network'), (3, 0))
+        self._delete('networks', networks[0]['id'])
+        self.assertEqual(self._get_usage('network'), (2, 0))
+
+    def test_usage_not_counted_once_tracked(self):
+        self._create_networks(1)
+        resource = quota.QUOTAS.resources['network']
+        with mock.patch.object(resource, 'count') as count:
+            self._create_networks(1)
+            self.assertFalse(count.called)
+        self.assertEqual(self._get_usage('network'), (2, 0))
+
+    def test_bulk_create_over_quota(self):
+        cfg.CONF.set_override('quota_network', 3, group='QUOTAS')
+        self._create_networks(2)
+        res = self._create_network_bulk(self.fmt, 2, 'net', True)
+        self.assertEqual(res.status_int, 409)
+        self.assertEqual(self._get_usage('network'), (2, 0))
+        self._create_networks(1)
+        self.assertEqual(self._get_usage('network'), (3, 0))
+
+    def test_failed_create_releases_reservation(self):
+        with mock.patch.object(manager.NeutronManager.get_plugin(),
+                               'create_network',
+                               side_effect=exceptions.NeutronException):
+            res = self._create_network(self.fmt, 'net', True)
+        self.assertEqual(res.status_int, 500)
+        self.assertEqual(self._get_usage('network'), (0, 0))
+
+    def test_reservations_count_against_quota(self):
+        cfg.CONF.set_override('quota_network', 3, group='QUOTAS')
+        ctx = context.get_admin_context()
+        reservation = quota.QUOTAS.make_reservation(ctx, self._tenant_id,
+                                                    'network', 2)
+        self.assertEqual(self._get_usage('network'), (0, 2))
+        with testtools.ExpectedException(exceptions.OverQuota):
+            quota.QUOTAS.make_reservation(ctx, self._tenant_id, 'network',
+                                          2)
+        quota.QUOTAS.release_reservation(ctx, reservation)
+        self.assertEqual(self._get_usage('network'), (0, 0))
+
+    def test_unlimited_quota_not_reserved(self):
+        cfg.CONF.set_override('quota_network', -1, group='QUOTAS')
+        self._create_networks(2)
+        self.assertIsNone(self._get_usage('network'))
+
+    def test_subnets_deleted_with_network(self):
+        with self.network(do_delete=False) as network:
+            for cidr in ('10.0.0.0/24', '10.0.1.0/24'):
+                self._make_subnet(self.fmt, network, '10.0.0.1', cidr)
+            self.assertEqual(self._get_usage('subnet'), (2, 0))
+            self._delete('networks', network['network']['id'])
+        self.assertEqual(self._get_usage('subnet'), (0, 0))
+
+    def _expire_reservations(self):
+        timeutils.set_time_override(timeutils.utcnow() +
+                                    datetime.timedelta(seconds=601))
+        self.addCleanup(timeutils.clear_time_override)
+
+    def test_reconcile_usages(self):
+        self._create_networks(2)
+        self._create_networks(1, tenant_id='tenant2')
+        ctx = context.get_admin_context()
+        table = quota_db.QuotaUsage.__table__
+        ctx.session.execute(table.update().
+                            where(table.c.tenant_id == self._tenant_id).
+                            values(in_use=5))
+        reservation = quota.QUOTAS.make_reservation(ctx, 'tenant2',
+                                                    'network', 4)
+        self._expire_reservations()
+        driver = quota.QUOTAS.get_driver()
+        self.assertEqual(driver.reconcile_usages(ctx), 2)
+        self.assertEqual(self._get_usage('network'), (2, 0))
+        self.assertEqual(self._get_usage('network', 'tenant2'), (1, 0))
+        self.assertEqual(driver.reconcile_usages(ctx), 0)
+        # The expired reservation was dropped with the usage it reserved
+        quota.QUOTAS.release_reservation(ctx, reservation)
+        self.assertEqual(self._get_usage('network', 'tenant2'), (1, 0))
+
+    def test_reconcile_usages_keeps_reservations(self):
+        ctx = context.get_admin_context()
+        quota.QUOTAS.make_reservation(ctx, self._tenant_id, 'network', 2)
+        driver = quota.QUOTAS.get_driver()
+        self.assertEqual(driver.reconcile_usages(ctx), 0)
+        self.assertEqual(self._get_usage('network'), (0, 2))
+        self.assertEqual(
+            ctx.session.query(quota_db.Reservation).count(), 1)
+
+    def test_reconcile_usages_restores_lost_reservations(self):
+        ctx = context.get_admin_context()
+        quota.QUOTAS.make_reservation(ctx, self._tenant_id, 'network', 2)
+        table = quota_db.QuotaUsage.__table__
+        ctx.session.execute(table.update().values(reserved=0))
+        driver = quota.QUOTAS.get_driver()
+        self.assertEqual(driver.reconcile_usages(ctx), 1)
+        self.assertEqual(self._get_usage('network'), (0, 2))
+
+    def test_tracked_resources(self):
+        driver = quota.QUOTAS.get_driver()
+        self.assertTrue(driver.tracks_usage('network'))
+        self.assertTrue(driver.tracks_usage('security_group_rule'))
+        self.assertFalse(driver.tracks_usage('unknown'))
+        self.assertEqual(quota_db._tracked_models[models_v2.Port], 'port')
+
+
+class TestTrackedUsageQuotaNetworksV2(TrackedUsageQuotaTestMixin,
+                                      test_db_plugin.TestNetworksV2):
+    pass
+
+
+class TestTrackedUsageQuotaPortsV2(TrackedUsageQuotaTestMixin,
+                                   test_db_plugin.TestPortsV2):
+    pass
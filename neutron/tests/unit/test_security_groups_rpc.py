@@ -16,6 +16,7 @@
 #    under the License.
 
 from contextlib import nested
+import copy
 
 import mock
 from mock import call
@@ -31,8 +32,10 @@ from neutron.common import constants as const
 from neutron import context
 from neutron.db import securitygroups_rpc_base as sg_db_rpc
 from neutron.extensions import allowedaddresspairs as addr_pair
+from neutron.extensions import portbindings
 from neutron.extensions import securitygroup as ext_sg
 from neutron.manager import NeutronManager
+from neutron.openstack.common.rpc import common as rpc_common
 from neutron.openstack.common.rpc import proxy
 from neutron.tests import base
 from neutron.tests.unit import test_extension_security_group as test_sg
@@ -50,10 +53,46 @@ class FakeSGCallback(sg_db_rpc.SecurityGroupServerRpcCallbackMixin):
         return device
 
 
+class SecurityGroupRuleCacheTestCase(base.BaseTestCase):
+    def setUp(self):
+        super(SecurityGroupRuleCacheTestCase, self).setUp()
+        cfg.CONF.set_override('cache_security_group_rules', True)
+        self.cache = sg_db_rpc.SecurityGroupRuleCache()
+
+    def test_get_and_invalidate_rules(self):
+        self.cache.set_rules({'sg1': ['rule1'], 'sg2': []},
+                             self.cache.generation)
+        self.assertEqual(self.cache.get_rules(['sg1', 'sg2', 'sg3']),
+                         ({'sg1': ['rule1'], 'sg2': []}, ['sg3']))
+        self.cache.invalidate_rules(['sg1'])
+        self.assertEqual(self.cache.get_rules(['sg1', 'sg2']),
+                         ({'sg2': []}, ['sg1']))
+
+    def test_set_after_invalidation_is_ignored(self):
+        generation = self.cache.generation
+        self.cache.invalidate_members(['sg1'])
+        self.cache.set_members({'sg1': {const.IPv4: ['10.0.0.2']}},
+                               generation)
+        self.assertEqual(self.cache.get_members(['sg1']), ({}, ['sg1']))
+
+    def test_disabled_by_default(self):
+        cfg.CONF.clear_override('cache_security_group_rules')
+        self.cache.set_rules({'sg1': ['rule1']}, self.cache.generation)
+        self.assertEqual(self.cache.get_rules(['sg1']), ({}, ['sg1']))
+
+    def test_disabled_with_workers(self):
+        cfg.CONF.set_override('rpc_workers', 2)
+        self.cache.set_rules({'sg1': ['rule1']}, self.cache.generation)
+        self.assertEqual(self.cache.get_rules(['sg1']), ({}, ['sg1']))
+
+
 class SGServerRpcCallBackMixinTestCase(test_sg.SecurityGroupDBTestCase):
     def setUp(self, plugin=None):
         super(SGServerRpcCallBackMixinTestCase, self).setUp(plugin)
         self.rpc = FakeSGCallback()
+        cfg.CONF.set_override('cache_security_group_rules', True)
+        sg_db_rpc.rule_cache.clear()
+        self.addCleanup(sg_db_rpc.rule_cache.clear)
 
     def test_security_group_rules_for_devices_ipv4_ingress(self):
         fake_prefix = test_fw.FAKE_PREFIX[const.IPv4]
@@ -285,6 +324,112 @@ class SGServerRpcCallBackMixinTestCase(test_sg.SecurityGroupDBTestCase):
                 self._delete('ports', port_id1)
                 self._delete('ports', port_id2)
 
+    def test_security_group_info_for_devices_ipv4_source_group(self):
+        with self.network() as n:
+            with nested(self.subnet(n),
+                        self.security_group(),
+                        self.security_group()) as (subnet_v4,
+                                                   sg1,
+                                                   sg2):
+                sg1_id = sg1['security_group']['id']
+                sg2_id = sg2['security_group']['id']
+                rule1 = self._build_security_group_rule(
+                    sg1_id,
+                    'ingress', const.PROTO_NAME_TCP, '24',
+                    '25', remote_group_id=sg2_id)
+                rules = {
+                    'security_group_rules': [rule1['security_group_rule']]}
+                res = self._create_security_group_rule(self.fmt, rules)
+                self.deserialize(self.fmt, res)
+                self.assertEqual(res.status_int, webob.exc.HTTPCreated.code)
+
+                res1 = self._create_port(
+                    self.fmt, n['network']['id'],
+                    security_groups=[sg1_id])
+                ports_rest1 = self.deserialize(self.fmt, res1)
+                port_id1 = ports_rest1['port']['id']
+                self.rpc.devices = {port_id1: ports_rest1['port']}
+                devices = [port_id1, 'no_exist_device']
+
+                res2 = self._create_port(
+                    self.fmt, n['network']['id'],
+                    security_groups=[sg2_id])
+                ports_rest2 = self.deserialize(self.fmt, res2)
+                port_id2 = ports_rest2['port']['id']
+                ctx = context.get_admin_context()
+                info = self.rpc.security_group_info_for_devices(
+                    ctx, devices=devices)
+                port_rpc = info['devices'][port_id1]
+                self.assertEqual(port_rpc['security_group_source_groups'],
+                                 [sg2_id])
+                self.assertEqual(port_rpc['security_group_rules'], [])
+                expected = [{'direction': 'egress', 'ethertype': const.IPv4,
+                             'security_group_id': sg1_id},
+                            {'direction': 'egress', 'ethertype': const.IPv6,
+                             'security_group_id': sg1_id},
+                            {'direction': u'ingress',
+                             'protocol': const.PROTO_NAME_TCP,
+                             'ethertype': const.IPv4,
+                             'port_range_max': 25, 'port_range_min': 24,
+                             'remote_group_id': sg2_id,
+                             'security_group_id': sg1_id},
+                            ]
+                self.assertEqual(info['security_groups'], {sg1_id: expected})
+                self.assertEqual(info['sg_member_ips'],
+                                 {sg2_id: {const.IPv4: ['10.0.0.3'],
+                                           const.IPv6: []}})
+                self._delete('ports', port_id1)
+                self._delete('ports', port_id2)
+
+    def test_security_group_info_for_devices_cached(self):
+        with self.network() as n:
+            with nested(self.subnet(n),
+                        self.security_group()) as (subnet_v4, sg1):
+                sg1_id = sg1['security_group']['id']
+                rule1 = self._build_security_group_rule(
+                    sg1_id, 'ingress', const.PROTO_NAME_TCP, '22', '22',
+                    remote_group_id=sg1_id)
+                res = self._create_security_group_rule(
+                    self.fmt,
+                    {'security_group_rules': [rule1['security_group_rule']]})
+                self.assertEqual(res.status_int, webob.exc.HTTPCreated.code)
+                res1 = self._create_port(
+                    self.fmt, n['network']['id'],
+                    security_groups=[sg1_id])
+                port1 = self.deserialize(self.fmt, res1)['port']
+                ctx = context.get_admin_context()
+
+                def get_info():
+                    self.rpc.devices = {port1['id']: copy.deepcopy(port1)}
+                    return self.rpc.security_group_info_for_devices(
+                        ctx, devices=[port1['id']])
+
+                with mock.patch.object(
+                    self.rpc, '_select_ips_for_remote_group',
+                    wraps=self.rpc._select_ips_for_remote_group
+                ) as select_ips:
+                    info1 = get_info()
+                    info2 = get_info()
+                    self.assertEqual(select_ips.call_count, 1)
+                self.assertEqual(info1['security_groups'],
+                                 info2['security_groups'])
+                self.assertEqual(info2['sg_member_ips'][sg1_id][const.IPv4],
+                                 ['10.0.0.2'])
+
+                # The rules are read again once they are invalidated, which
+                # the RPC mixin of the plugin does on rule changes
+                rule2 = self._build_security_group_rule(
+                    sg1_id, 'ingress', const.PROTO_NAME_TCP, '80', '80')
+                res = self._create_security_group_rule(
+                    self.fmt,
+                    {'security_group_rules': [rule2['security_group_rule']]})
+                self.assertEqual(res.status_int, webob.exc.HTTPCreated.code)
+                sg_db_rpc.rule_cache.invalidate_rules([sg1_id])
+                info3 = get_info()
+                self.assertEqual(len(info3['security_groups'][sg1_id]),
+                                 len(info1['security_groups'][sg1_id]) + 1)
+                self._delete('ports', port1['id'])
+
     def test_security_group_rules_for_devices_ipv6_ingress(self):
         fake_prefix = test_fw.FAKE_PREFIX[const.IPv6]
         with self.network() as n:
@@ -524,6 +669,9 @@ class SecurityGroupAgentRpcTestCase(base.BaseTestCase):
                                                       'fake_sgid2'}]}
         fake_devices = {'fake_device': self.fake_device}
         self.firewall.ports = fake_devices
+        rpc.security_group_info_for_devices.side_effect = (
+            rpc_common.UnsupportedRpcVersion(
+                version=sg_rpc.SG_INFO_RPC_VERSION))
         rpc.security_group_rules_for_devices.return_value = fake_devices
 
     def test_prepare_and_remove_devices_filter(self):
@@ -592,6 +740,218 @@ class SecurityGroupAgentRpcTestCase(base.BaseTestCase):
         self.agent.refresh_firewall([])
         self.firewall.assert_has_calls([])
 
+    def test_security_groups_updated_deferred(self):
+        self.agent.defer_refresh_firewall = True
+        rpc = self.agent.plugin_rpc
+        self.agent.security_groups_rule_updated(['fake_sgid1'])
+        self.agent.security_groups_member_updated(['fake_sgid2'])
+        self.agent.security_groups_rule_updated(['fake_sgid1'])
+        self.assertFalse(rpc.security_group_rules_for_devices.called)
+        self.assertTrue(self.agent.firewall_refresh_needed())
+        self.agent.refresh_pending_firewall()
+        rpc.security_group_rules_for_devices.assert_called_once_with(
+            None, ['fake_device'])
+        self.firewall.assert_has_calls([call.defer_apply(),
+                                        call.update_port_filter(
+                                            self.fake_device)])
+        self.assertEqual(self.firewall.update_port_filter.call_count, 1)
+        self.assertFalse(self.agent.firewall_refresh_needed())
+        self.agent.refresh_pending_firewall()
+        self.assertEqual(rpc.security_group_rules_for_devices.call_count, 1)
+
+    def test_security_groups_provider_updated_deferred(self):
+        self.agent.defer_refresh_firewall = True
+        self.agent.refresh_firewall = mock.Mock()
+        self.agent.security_groups_rule_updated(['fake_sgid1'])
+        self.agent.security_groups_provider_updated()
+        self.assertFalse(self.agent.refresh_firewall.called)
+        self.agent.refresh_pending_firewall()
+        self.agent.refresh_firewall.assert_called_once_with()
+
+    def test_refresh_pending_firewall_removed_device(self):
+        self.agent.defer_refresh_firewall = True
+        self.agent.security_groups_rule_updated(['fake_sgid1'])
+        self.firewall.ports = {}
+        self.agent.refresh_pending_firewall()
+        self.assertFalse(
+            self.agent.plugin_rpc.security_group_rules_for_devices.called)
+
+    def test_refresh_pending_firewall_prepared_device(self):
+        self.agent.defer_refresh_firewall = True
+        self.agent.security_groups_rule_updated(['fake_sgid1'])
+        self.agent.prepare_devices_filter(['fake_device'])
+        self.assertFalse(self.agent.firewall_refresh_needed())
+        self.agent.refresh_pending_firewall()
+        self.assertEqual(
+            self.agent.plugin_rpc.security_group_rules_for_devices.call_count,
+            1)
+        self.assertFalse(self.firewall.update_port_filter.called)
+
+    def test_refresh_pending_firewall_failure(self):
+        self.agent.defer_refresh_firewall = True
+        rpc = self.agent.plugin_rpc
+        rpc.security_group_rules_for_devices.side_effect = RuntimeError
+        self.agent.security_groups_rule_updated(['fake_sgid1'])
+        self.assertRaises(RuntimeError, self.agent.refresh_pending_firewall)
+        self.assertTrue(self.agent.firewall_refresh_needed())
+        self.agent.refresh_firewall = mock.Mock()
+        self.agent.refresh_pending_firewall()
+        self.agent.refresh_firewall.assert_called_once_with()
+
+
+class SecurityGroupAgentInfoRpcTestCase(base.BaseTestCase):
+    def setUp(self):
+        super(SecurityGroupAgentInfoRpcTestCase, self).setUp()
+        self.agent = sg_rpc.SecurityGroupAgentRpcMixin()
+        self.agent.context = None
+        self.firewall = mock.Mock()
+        firewall_object = firewall_base.FirewallDriver()
+        self.firewall.defer_apply.side_effect = firewall_object.defer_apply
+        self.firewall.handles_remote_groups = False
+        self.agent.firewall = self.firewall
+        self.rpc = mock.Mock()
+        self.agent.plugin_rpc = self.rpc
+        dhcp_rule = {'direction': 'ingress',
+                     'ethertype': const.IPv4,
+                     'protocol': 'udp',
+                     'source_ip_prefix': '10.0.0.2/32'}
+        self.info = {
+            'devices': {'fake_device': {
+                'device': 'fake_device',
+                'fixed_ips': ['10.0.0.3'],
+                'security_groups': ['fake_sgid1'],
+                'security_group_source_groups': ['fake_sgid2'],
+                'security_group_rules': [dhcp_rule]}},
+            'security_groups': {'fake_sgid1': [
+                {'security_group_id': 'fake_sgid1',
+                 'direction': 'egress',
+                 'ethertype': const.IPv4},
+                {'security_group_id': 'fake_sgid1',
+                 'direction': 'ingress',
+                 'ethertype': const.IPv4,
+                 'remote_group_id': 'fake_sgid2'}]},
+            'sg_member_ips': {'fake_sgid2': {
+                const.IPv4: ['10.0.0.3', '10.0.0.4', '10.0.1.0/24'],
+                const.IPv6: ['fe80::1']}}}
+        self.expected_rules = [
+            {'security_group_id': 'fake_sgid1',
+             'direction': 'egress',
+             'ethertype': const.IPv4},
+            {'security_group_id': 'fake_sgid1',
+             'direction': 'ingress',
+             'ethertype': const.IPv4,
+             'remote_group_id': 'fake_sgid2',
+             'source_ip_prefix': '10.0.0.4/32'},
+            {'security_group_id': 'fake_sgid1',
+             'direction': 'ingress',
+             'ethertype': const.IPv4,
+             'remote_group_id': 'fake_sgid2',
+             'source_ip_prefix': '10.0.1.0/24'},
+            dhcp_rule]
+
+    def test_prepare_devices_filter_expands_rules(self):
+        self.rpc.security_group_info_for_devices.return_value = self.info
+        self.agent.prepare_devices_filter(['fake_device'])
+        self.rpc.security_group_info_for_devices.assert_called_once_with(
+            None, ['fake_device'])
+        self.assertFalse(self.rpc.security_group_rules_for_devices.called)
+        device = self.firewall.prepare_port_filter.call_args[0][0]
+        self.assertEqual(device['security_group_rules'], self.expected_rules)
+        self.assertTrue(self.agent.sg_info_supported)
+
+    def test_prepare_devices_filter_with_remote_group_firewall(self):
+        self.firewall.handles_remote_groups = True
+        self.rpc.security_group_info_for_devices.return_value = self.info
+        rules = (self.info['security_groups']['fake_sgid1'] +
+                 self.info['devices']['fake_device']['security_group_rules'])
+        self.agent.prepare_devices_filter(['fake_device'])
+        self.firewall.update_security_group_members.assert_called_once_with(
+            'fake_sgid2', self.info['sg_member_ips']['fake_sgid2'])
+        device = self.firewall.prepare_port_filter.call_args[0][0]
+        self.assertEqual(device['security_group_rules'], rules)
+
+    def test_member_updated_with_remote_group_firewall(self):
+        self.firewall.handles_remote_groups = True
+        self.agent.sg_info_supported = True
+        self.firewall.ports = {'fake_device': {
+            'device': 'fake_device',
+            'security_group_source_groups': ['fake_sgid2']}}
+        self.rpc.security_group_info_for_devices.return_value = self.info
+        self.agent.security_groups_member_updated(['fake_sgid2',
+                                                   'fake_sgid3'])
+        self.rpc.security_group_info_for_devices.assert_called_once_with(
+            None, ['fake_device'])
+        self.firewall.update_security_group_members.assert_called_once_with(
+            'fake_sgid2', self.info['sg_member_ips']['fake_sgid2'])
+        self.assertFalse(self.firewall.prepare_port_filter.called)
+        self.assertFalse(self.firewall.update_port_filter.called)
+
+    def test_member_updated_deferred_with_remote_group_firewall(self):
+        self.firewall.handles_remote_groups = True
+        self.agent.sg_info_supported = True
+        self.agent.defer_refresh_firewall = True
+        self.agent.devices_to_refilter = set()
+        self.agent.sg_members_to_update = set()
+        self.agent.global_refresh_firewall = False
+        self.firewall.ports = {
+            'fake_device': {
+                'device': 'fake_device',
+                'security_groups': ['fake_sgid1'],
+                'security_group_source_groups': ['fake_sgid2']},
+            'other_device': {
+                'device': 'other_device',
+                'security_groups': ['fake_sgid3'],
+                'security_group_source_groups': []}}
+        self.rpc.security_group_info_for_devices.return_value = self.info
+        self.agent.security_groups_member_updated(['fake_sgid2'])
+        self.agent.security_groups_rule_updated(['fake_sgid1'])
+        self.agent.security_groups_member_updated(['fake_sgid2'])
+        self.assertFalse(self.rpc.security_group_info_for_devices.called)
+        self.agent.refresh_pending_firewall()
+        self.rpc.security_group_info_for_devices.assert_called_once_with(
+            None, ['fake_device'])
+        self.firewall.update_security_group_members.assert_called_once_with(
+            'fake_sgid2', self.info['sg_member_ips']['fake_sgid2'])
+        self.assertEqual(self.firewall.update_port_filter.call_count, 1)
+        self.assertEqual(self.firewall.defer_apply.call_count, 1)
+
+    def test_member_updated_without_affected_device(self):
+        self.firewall.handles_remote_groups = True
+        self.agent.sg_info_supported = True
+        self.firewall.ports = {'fake_device': {
+            'device': 'fake_device',
+            'security_group_source_groups': ['fake_sgid2']}}
+        self.agent.security_groups_member_updated(['fake_sgid3'])
+        self.assertFalse(self.rpc.security_group_info_for_devices.called)
+        self.assertFalse(self.firewall.update_security_group_members.called)
+
+    def _test_fallback_to_rules_for_devices(self, error):
+        self.rpc.security_group_info_for_devices.side_effect = error
+        self.rpc.security_group_rules_for_devices.return_value = {}
+        self.agent.prepare_devices_filter(['fake_device'])
+        self.agent.refresh_firewall([{'device': 'fake_device'}])
+        self.assertEqual(
+            self.rpc.security_group_info_for_devices.call_count, 1)
+        self.assertEqual(
+            self.rpc.security_group_rules_for_devices.call_count, 2)
+        self.assertFalse(self.agent.sg_info_supported)
+
+    def test_fallback_on_unsupported_version(self):
+        self._test_fallback_to_rules_for_devices(
+            rpc_common.UnsupportedRpcVersion(
+                version=sg_rpc.SG_INFO_RPC_VERSION))
+
+    def test_fallback_on_remote_unsupported_version(self):
+        self._test_fallback_to_rules_for_devices(
+            rpc_common.RemoteError('UnsupportedRpcVersion'))
+
+    def test_other_remote_errors_are_raised(self):
+        self.rpc.security_group_info_for_devices.side_effect = (
+            rpc_common.RemoteError('DBError'))
+        self.assertRaises(rpc_common.RemoteError,
+                          self.agent.prepare_devices_filter, ['fake_device'])
+        self.assertIsNone(self.agent.sg_info_supported)
+
 
 class FakeSGRpcApi(agent_rpc.PluginApi,
                    sg_rpc.SecurityGroupServerRpcApiMixin):
@@ -615,6 +975,17 @@ class SecurityGroupServerRpcApiTestCase(base.BaseTestCase):
              version=sg_rpc.SG_RPC_VERSION,
              topic='fake_topic')])
 
+    def test_security_group_info_for_devices(self):
+        self.rpc.security_group_info_for_devices(None, ['fake_device'])
+        self.rpc.call.assert_has_calls(
+            [call(None,
+             {'args':
+                 {'devices': ['fake_device']},
+              'method': 'security_group_info_for_devices',
+              'namespace': None},
+             version=sg_rpc.SG_INFO_RPC_VERSION,
+             topic='fake_topic')])
+
 
 class FakeSGNotifierAPI(proxy.RpcProxy,
                         sg_rpc.SecurityGroupAgentRpcApiMixin):
@@ -662,6 +1033,27 @@ class SecurityGroupAgentRpcApiTestCase(base.BaseTestCase):
             None, security_groups=[])
         self.assertEqual(False, self.notifier.fanout_cast.called)
 
+    def test_security_groups_rule_updated_hosts(self):
+        self.notifier.cast = mock.Mock()
+        self.notifier.security_groups_rule_updated(
+            None, security_groups=['fake_sgid'], hosts=['host1', 'host2'])
+        msg = {'args': {'security_groups': ['fake_sgid']},
+               'method': 'security_groups_rule_updated',
+               'namespace': None}
+        self.notifier.cast.assert_has_calls(
+            [call(None, msg, version=sg_rpc.SG_RPC_VERSION,
+                  topic='fake-security_group-update.host1'),
+             call(None, msg, version=sg_rpc.SG_RPC_VERSION,
+                  topic='fake-security_group-update.host2')])
+        self.assertEqual(False, self.notifier.fanout_cast.called)
+
+    def test_security_groups_member_updated_no_host(self):
+        self.notifier.cast = mock.Mock()
+        self.notifier.security_groups_member_updated(
+            None, security_groups=['fake_sgid'], hosts=[])
+        self.assertEqual(False, self.notifier.cast.called)
+        self.assertEqual(False, self.notifier.fanout_cast.called)
+
 #Note(nati) bn -> binary_name
 # id -> device_id
 
@@ -1253,6 +1645,9 @@ class TestSecurityGroupAgentWithIptables(base.BaseTestCase):
         self.iptables_execute.side_effect = self.iptables_execute_return_values
 
         self.rpc = mock.Mock()
+        self.rpc.security_group_info_for_devices.side_effect = (
+            rpc_common.UnsupportedRpcVersion(
+                version=sg_rpc.SG_INFO_RPC_VERSION))
         self.agent.plugin_rpc = self.rpc
         rule1 = [{'direction': 'ingress',
                   'protocol': const.PROTO_NAME_UDP,
@@ -1415,6 +1810,30 @@ class TestSecurityGroupAgentWithIptables(base.BaseTestCase):
 
 
 class SGNotificationTestMixin():
+    def test_security_group_rule_updated_invalidates_cache(self):
+        with self.security_group() as sg:
+            security_group_id = sg['security_group']['id']
+            with mock.patch.object(sg_db_rpc, 'rule_cache') as rule_cache:
+                with self.security_group_rule(security_group_id):
+                    rule_cache.invalidate_rules.assert_called_once_with(
+                        [security_group_id])
+                self.assertEqual(rule_cache.invalidate_rules.call_count, 2)
+
+    def test_security_group_member_updated_invalidates_cache(self):
+        with self.network() as n:
+            with self.subnet(n):
+                with self.security_group() as sg:
+                    security_group_id = sg['security_group']['id']
+                    with mock.patch.object(sg_db_rpc,
+                                           'rule_cache') as rule_cache:
+                        res = self._create_port(
+                            self.fmt, n['network']['id'],
+                            security_groups=[security_group_id])
+                        port = self.deserialize(self.fmt, res)
+                        rule_cache.invalidate_members.assert_called_with(
+                            [security_group_id])
+                    self._delete('ports', port['port']['id'])
+
     def test_security_group_rule_updated(self):
         name = 'webservers'
         description = 'my webservers'
@@ -1434,9 +1853,11 @@ class SGNotificationTestMixin():
                     pass
             self.notifier.assert_has_calls(
                 [call.security_groups_rule_updated(mock.ANY,
-                                                   [security_group_id]),
+                                                   [security_group_id],
+                                                   hosts=None),
                  call.security_groups_rule_updated(mock.ANY,
-                                                   [security_group_id])])
+                                                   [security_group_id],
+                                                   hosts=None)])
 
     def test_security_group_member_updated(self):
         with self.network() as n:
@@ -1460,7 +1881,64 @@ class SGNotificationTestMixin():
                     self._delete('ports', port['port']['id'])
                     self.notifier.assert_has_calls(
                         [call.security_groups_member_updated(
-                            mock.ANY, [mock.ANY])])
+                            mock.ANY, [mock.ANY], hosts=None)])
+
+    def _skip_without_port_binding_host(self):
+        plugin = NeutronManager.get_plugin()
+        if getattr(plugin, 'port_binding_model', None) is None:
+            self.skipTest("Plugin does not bind ports to hosts")
+        cfg.CONF.set_override('notify_security_groups_by_host', True)
+
+    def _create_bound_port(self, network_id, security_group_id, host):
+        res = self._create_port(
+            self.fmt, network_id,
+            arg_list=(portbindings.HOST_ID, ext_sg.SECURITYGROUPS),
+            security_groups=[security_group_id],
+            **{portbindings.HOST_ID: host})
+        return self.deserialize(self.fmt, res)
+
+    def test_security_group_rule_updated_by_host(self):
+        self._skip_without_port_binding_host()
+        with self.network() as n:
+            with self.subnet(n):
+                with nested(self.security_group(),
+                            self.security_group()) as (sg1, sg2):
+                    sg1_id = sg1['security_group']['id']
+                    sg2_id = sg2['security_group']['id']
+                    port1 = self._create_bound_port(n['network']['id'],
+                                                    sg1_id, 'host1')
+                    port2 = self._create_bound_port(n['network']['id'],
+                                                    sg2_id, 'host2')
+                    self.notifier.reset_mock()
+                    with self.security_group_rule(sg1_id):
+                        self.notifier.assert_has_calls(
+                            [call.security_groups_rule_updated(
+                                mock.ANY, [sg1_id], hosts=set(['host1']))])
+                    self._delete('ports', port1['port']['id'])
+                    self._delete('ports', port2['port']['id'])
+
+    def test_security_group_member_updated_by_host(self):
+        self._skip_without_port_binding_host()
+        with self.network() as n:
+            with self.subnet(n):
+                with nested(self.security_group(),
+                            self.security_group()) as (sg1, sg2):
+                    sg1_id = sg1['security_group']['id']
+                    sg2_id = sg2['security_group']['id']
+                    rule = self._build_security_group_rule(
+                        sg1_id, 'ingress', const.PROTO_NAME_TCP, '22', '22',
+                        remote_group_id=sg2_id)
+                    self._make_security_group_rule(self.fmt, rule)
+                    port1 = self._create_bound_port(n['network']['id'],
+                                                    sg1_id, 'host1')
+                    self.notifier.reset_mock()
+                    port2 = self._create_bound_port(n['network']['id'],
+                                                    sg2_id, 'host2')
+                    self.notifier.assert_has_calls(
+                        [call.security_groups_member_updated(
+                            mock.ANY, [sg2_id], hosts=set(['host1']))])
+                    self._delete('ports', port1['port']['id'])
+                    self._delete('ports', port2['port']['id'])
 
 
 class TestSecurityGroupAgentWithOVSIptables(
@@ -28,6 +28,7 @@ import webob.exc
 from neutron.api.v2 import attributes
 from neutron.common import constants
 from neutron.common import exceptions as exception
+from neutron.openstack.common import jsonutils
 from neutron.tests import base
 from neutron import wsgi
 
@@ -604,6 +605,28 @@ class JSONDictSerializerTest(base.BaseTestCase):
 
         self.assertEqual(result, expected_json)
 
+    def test_stream(self):
+        ports = ({'id': i, 'name': u'\u7f51'} for i in range(3))
+        input_dict = {'ports': ports,
+                      'ports_links': [{'rel': 'next', 'href': 'x'}]}
+        serializer = wsgi.JSONDictSerializer()
+        result = ''.join(serializer.stream(input_dict))
+
+        self.assertEqual(jsonutils.loads(result),
+                         {'ports': [{'id': i, 'name': u'\u7f51'}
+                                    for i in range(3)],
+                          'ports_links': [{'rel': 'next', 'href': 'x'}]})
+
+    def test_stream_by_chunks(self):
+        input_dict = {'ports': [{'id': 'x' * 10}] * 10}
+        serializer = wsgi.JSONDictSerializer()
+        with mock.patch.object(wsgi.eventlet, 'sleep') as sleep:
+            chunks = list(serializer.stream(input_dict, chunk_size=50))
+
+        self.assertTrue(len(chunks) > 1)
+        self.assertEqual(len(chunks) - 1, sleep.call_count)
+        self.assertEqual(jsonutils.loads(''.join(chunks)), input_dict)
+
 
 class TextDeserializerTest(base.BaseTestCase):
 
@@ -26,6 +26,7 @@ import socket
 import ssl
 import sys
 import time
+import types
 from xml.etree import ElementTree as etree
 from xml.parsers import expat
 
@@ -79,6 +80,9 @@ CONF.register_opts(socket_opts)
 
 LOG = logging.getLogger(__name__)
 
+# Bytes of JSON serialized between two switches to other greenthreads
+STREAM_CHUNK_SIZE = 65536
+
 
 def run_server(application, port):
     """Run a WSGI server with the given application."""
@@ -393,6 +397,46 @@ class JSONDictSerializer(DictSerializer):
             return unicode(obj)
         return jsonutils.dumps(data, default=sanitizer)
 
+    def _iterencode(self, data):
+        if not isinstance(data, dict):
+            yield self.default(data)
+            return
+        yield '{'
+        for i, (key, value) in enumerate(data.iteritems()):
+            if i:
+                yield ', '
+            yield '%s: ' % jsonutils.dumps(key)
+            if isinstance(value, (list, types.GeneratorType)):
+                yield '['
+                for j, item in enumerate(value):
+                    if j:
+                        yield ', '
+                    yield self.default(item)
+                yield ']'
+            else:
+                yield self.default(value)
+        yield '}'
+
+    def stream(self, data, chunk_size=STREAM_CHUNK_SIZE):
+        """Return an iterator over the JSON of data, by chunks.
+
+        The lists and generators of the dict are encoded one item at a time,
+        and other greenthreads are allowed to run after each chunk of about
+        chunk_size bytes.
+        """
+        chunk = []
+        size = 0
+        for part in self._iterencode(data):
+            chunk.append(part)
+            size += len(part)
+            if size >= chunk_size:
+                yield ''.join(chunk)
+                chunk = []
+                size = 0
+                eventlet.sleep(0)
+        if chunk:
+            yield ''.join(chunk)
+
 
 class XMLDictSerializer(DictSerializer):
 
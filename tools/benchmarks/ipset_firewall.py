@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Compare expanded and ipset based remote group rules.
+
+A port is filtered with a single rule allowing ssh from a remote security
+group, first with the rule expanded into one rule per member IP as done by
+the agent, then with the rule matching the ipset of the group. A member is
+then added to the group. The commands are not run: they are recorded to
+count the iptables-restore and ipset lines, and the time spent by the
+driver to build them is reported.
+
+Example:
+
+    python tools/benchmarks/ipset_firewall.py --members 50 500 5000
+"""
+
+from __future__ import print_function
+
+import argparse
+import sys
+import time
+
+import netaddr
+from oslo.config import cfg
+
+from neutron.agent.common import config as agent_config
+from neutron.agent.linux import iptables_firewall
+from neutron.agent.linux import utils as linux_utils
+from neutron.common import constants
+
+SG_ID = 'bd3b2c3e-8e1a-4b3a-9a9e-1c5b6c9f0a11'
+REMOTE_SG_ID = 'f4b9a2a1-2f0e-4d6c-8f3c-5a7d2e1b9c22'
+
+
+class FakeExecute(object):
+    """Record the commands instead of running them."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.iptables_lines = 0
+        self.ipset_lines = 0
+        self.calls = 0
+
+    def __call__(self, cmd, process_input=None, root_helper=None, **kwargs):
+        self.calls += 1
+        lines = process_input.count('\n') if process_input else 0
+        if cmd[0] == 'ipset':
+            self.ipset_lines += lines or 1
+        elif cmd[0].endswith('-restore'):
+            self.iptables_lines += lines
+        return ''
+
+
+def _member_ips(count):
+    network = netaddr.IPNetwork('10.0.0.0/8')
+    return [str(network[i + 2]) for i in range(count)]
+
+
+def _port(rules):
+    return {'device': 'tapbench0000',
+            'mac_address': 'fa:16:3e:00:00:01',
+            'fixed_ips': ['192.168.0.2'],
+            'security_groups': [SG_ID],
+            'security_group_source_groups': [REMOTE_SG_ID],
+            'security_group_rules': rules}
+
+
+def _remote_rule():
+    return {'security_group_id': SG_ID,
+            'direction': 'ingress',
+            'ethertype': constants.IPv4,
+            'protocol': 'tcp',
+            'port_range_min': 22,
+            'port_range_max': 22,
+            'remote_group_id': REMOTE_SG_ID}
+
+
+def _expanded_rules(members):
+    rules = []
+    for ip in members:
+        rule = _remote_rule()
+        rule['source_ip_prefix'] = '%s/32' % ip
+        rules.append(rule)
+    return rules
+
+
+def _timed(execute, func, *args):
+    execute.reset()
+    start = time.time()
+    func(*args)
+    return (time.time() - start, execute.iptables_lines, execute.ipset_lines)
+
+
+def run(execute, count, ipset):
+    cfg.CONF.set_override('enable_ipset', ipset, 'SECURITYGROUP')
+    driver = iptables_firewall.IptablesFirewallDriver()
+    members = _member_ips(count)
+    added = _member_ips(count + 1)
+    if ipset:
+        port = _port([_remote_rule()])
+
+        def prepare():
+            driver.update_security_group_members(
+                REMOTE_SG_ID, {constants.IPv4: members})
+            driver.prepare_port_filter(port)
+
+        def update():
+            driver.update_security_group_members(
+                REMOTE_SG_ID, {constants.IPv4: added})
+    else:
+        def prepare():
+            driver.prepare_port_filter(_port(_expanded_rules(members)))
+
+        def update():
+            driver.update_port_filter(_port(_expanded_rules(added)))
+    return _timed(execute, prepare), _timed(execute, update)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--members', type=int, nargs='+',
+                        default=[50, 500, 5000],
+                        help='Numbers of remote group members to test')
+    args = parser.parse_args(argv)
+
+    agent_config.register_root_helper(cfg.CONF)
+    execute = FakeExecute()
+    linux_utils.execute = execute
+
+    print('%8s %-8s | %10s %9s %7s | %10s %9s %7s' %
+          ('members', 'mode', 'apply (s)', 'iptables', 'ipset',
+           'update (s)', 'iptables', 'ipset'))
+    for count in args.members:
+        for ipset in (False, True):
+            prepare, update = run(execute, count, ipset)
+            print('%8d %-8s | %10.4f %9d %7d | %10.4f %9d %7d' %
+                  ((count, 'ipset' if ipset else 'expanded') +
+                   prepare + update))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
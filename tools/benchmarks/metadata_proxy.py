@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the requests per second served by the metadata proxy.
+
+The metadata agent serves its UNIX domain socket as when started, in front
+of a stub Nova metadata server listening on localhost. The port lookups go
+to a stub neutron client waiting --neutron-latency seconds per list_ports
+call, as a REST call to the server would. --instances green threads then
+issue --requests metadata requests each through the socket, as cloud-init
+does at boot time, once without and once with the lookup cache:
+
+    python tools/benchmarks/metadata_proxy.py --instances 50 --requests 20
+"""
+
+from __future__ import print_function
+
+import argparse
+import httplib
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import time
+
+import eventlet
+eventlet.monkey_patch()
+import eventlet.wsgi
+
+from oslo.config import cfg
+
+from neutron.agent.metadata import agent
+from neutron.common import config
+
+NETWORK_ID = 'benchmark-network'
+
+
+class StubNeutronClient(object):
+    """Return a port by instance address after waiting a REST call."""
+
+    def __init__(self, latency, counters):
+        self.latency = latency
+        self.counters = counters
+
+    def list_ports(self, **kwargs):
+        eventlet.sleep(self.latency)
+        self.counters['list_ports'] += 1
+        address = kwargs['fixed_ips'][0].split('=')[1]
+        return {'ports': [{'id': 'port-%s' % address,
+                           'device_id': 'instance-%s' % address,
+                           'tenant_id': 'benchmark'}]}
+
+    def get_auth_info(self):
+        return {}
+
+
+class BenchmarkHandler(agent.MetadataProxyHandler):
+
+    def __init__(self, conf, latency, counters):
+        super(BenchmarkHandler, self).__init__(conf)
+        self.latency = latency
+        self.counters = counters
+
+    def _get_neutron_client(self):
+        return StubNeutronClient(self.latency, self.counters)
+
+
+class UnixHTTPConnection(httplib.HTTPConnection):
+
+    def __init__(self, path):
+        httplib.HTTPConnection.__init__(self, 'localhost')
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.socket_path)
+
+
+def start_nova_stub(counters):
+    """Start a metadata server stub and return its port."""
+
+    def app(environ, start_response):
+        counters['nova_connections'].add(environ['REMOTE_PORT'])
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [environ['HTTP_X_INSTANCE_ID']]
+
+    sock = eventlet.listen(('127.0.0.1', 0))
+    eventlet.spawn_n(eventlet.wsgi.server, sock, app,
+                     log=open(os.devnull, 'w'))
+    return sock.getsockname()[1]
+
+
+def instance(socket_path, address, requests):
+    connection = UnixHTTPConnection(socket_path)
+    for _i in range(requests):
+        connection.request('GET', '/latest/meta-data/',
+                           headers={'X-Forwarded-For': address,
+                                    'X-Neutron-Network-ID': NETWORK_ID})
+        response = connection.getresponse()
+        assert response.read() == 'instance-%s' % address
+    connection.close()
+
+
+def run(socket_path, instances, requests):
+    pool = eventlet.GreenPool(instances)
+    start = time.time()
+    for index in range(instances):
+        address = '10.0.%d.%d' % (index // 250, index % 250 + 2)
+        pool.spawn_n(instance, socket_path, address, requests)
+    pool.waitall()
+    return time.time() - start
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--instances', type=int, default=50,
+                        help='Number of instances requesting concurrently')
+    parser.add_argument('--requests', type=int, default=20,
+                        help='Number of metadata requests by each instance')
+    parser.add_argument('--neutron-latency', type=float, default=0.005,
+                        help='Seconds waited by each list_ports call')
+    parser.add_argument('--config-file', action='append', default=[],
+                        dest='config_files',
+                        help='Metadata agent configuration, e.g. for '
+                             'metadata_cache_ttl')
+    args = parser.parse_args(argv)
+
+    cfg.CONF.register_opts(agent.MetadataProxyHandler.OPTS)
+    config_args = []
+    for config_file in args.config_files:
+        config_args += ['--config-file', config_file]
+    config.parse(args=config_args)
+    counters = {}
+    cfg.CONF.set_override('nova_metadata_port', start_nova_stub(counters))
+    cache_ttl = cfg.CONF.metadata_cache_ttl or 5
+
+    socket_dir = tempfile.mkdtemp()
+    try:
+        print('%-8s %10s %10s %12s %12s %10s' % ('cache', 'requests',
+                                                 'time (s)', 'requests/s',
+                                                 'list_ports',
+                                                 'nova conns'))
+        for index, ttl in enumerate((0, cache_ttl)):
+            cfg.CONF.set_override('metadata_cache_ttl', ttl)
+            counters.update(list_ports=0, nova_connections=set())
+            socket_path = os.path.join(socket_dir, 'proxy%d' % index)
+            server = agent.UnixDomainWSGIServer('benchmark')
+            server.start(BenchmarkHandler(cfg.CONF, args.neutron_latency,
+                                          counters), socket_path)
+            elapsed = run(socket_path, args.instances, args.requests)
+            total = args.instances * args.requests
+            print('%-8s %10d %10.3f %12.1f %12d %10d' % (
+                'on' if ttl else 'off', total, elapsed, total / elapsed,
+                counters['list_ports'], len(counters['nova_connections'])))
+    finally:
+        shutil.rmtree(socket_dir)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
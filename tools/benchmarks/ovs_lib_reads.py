@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Count the ovs-vsctl calls made to read the VIF ports of a bridge.
+
+The per port reads used before the bulk helpers of OVSBridge are compared
+with the bulk reads, for listing the VIF ports of a bridge and for an OVS
+agent resync, which lists the ports of the integration bridge and then
+needs the VifPort of each of them. ovs-vsctl is not run: a fake answers
+the calls and counts them, so the reported time only covers the parsing
+done by OVSBridge, each real call forking a rootwrap'd ovs-vsctl.
+
+Example:
+
+    python tools/benchmarks/ovs_lib_reads.py --ports 50 400
+"""
+
+from __future__ import print_function
+
+import argparse
+import sys
+import time
+
+from neutron.agent.linux import ovs_lib
+from neutron.agent.linux import utils
+from neutron.openstack.common import jsonutils
+
+BRIDGE = 'br-int'
+
+
+class FakeOVSDB(object):
+    """Answer the ovs-vsctl calls of OVSBridge for a bridge of VIF ports."""
+
+    def __init__(self, count):
+        self.calls = 0
+        self.interfaces = {}
+        for i in range(count):
+            self.interfaces['tap%05d' % i] = {
+                'iface-id': 'port-%05d' % i,
+                'attached-mac': 'fa:16:3e:%02x:%02x:%02x' % (
+                    i >> 16, (i >> 8) & 0xff, i & 0xff),
+                'ofport': i + 1}
+
+    def _json(self, names):
+        data = [[name,
+                 ['map', [['iface-id', self.interfaces[name]['iface-id']],
+                          ['attached-mac',
+                           self.interfaces[name]['attached-mac']]]],
+                 self.interfaces[name]['ofport']]
+                for name in names]
+        return jsonutils.dumps({'headings': ['name', 'external_ids',
+                                             'ofport'],
+                                'data': data})
+
+    def __call__(self, args, root_helper=None, **kwargs):
+        self.calls += 1
+        args = args[2:]
+        if args[0] == 'list-ports':
+            return '\n'.join(sorted(self.interfaces)) + '\n'
+        if args[0] == 'get':
+            interface = self.interfaces[args[2]]
+            if args[3] == 'ofport':
+                return '%d\n' % interface['ofport']
+            return ('{attached-mac="%s", iface-id="%s"}\n' %
+                    (interface['attached-mac'], interface['iface-id']))
+        if 'list' in args:
+            return self._json(sorted(self.interfaces))
+        if 'find' in args:
+            port_id = args[-1].split('"')[1]
+            return self._json([name for name, iface
+                               in self.interfaces.items()
+                               if iface['iface-id'] == port_id])
+        raise ValueError(args)
+
+
+def per_port_get_vif_ports(br):
+    """The per port reads of get_vif_ports, without the bulk helpers."""
+    edge_ports = []
+    for name in br.get_port_name_list():
+        external_ids = br.db_get_map("Interface", name, "external_ids")
+        ofport = br.db_get_val("Interface", name, "ofport")
+        if "iface-id" in external_ids and "attached-mac" in external_ids:
+            edge_ports.append(ovs_lib.VifPort(name, ofport,
+                                              external_ids["iface-id"],
+                                              external_ids["attached-mac"],
+                                              br))
+    return edge_ports
+
+
+def per_port_resync(br):
+    """List the VIF ids, then look up each port on its own."""
+    return [br.get_vif_port_by_id(vif_id)
+            for vif_id in br.get_vif_port_set()]
+
+
+def bulk_resync(br):
+    """List the VIF ports once, as OVSNeutronAgent.update_ports does."""
+    return br.get_vif_ports()
+
+
+def measure(fake, func, br):
+    fake.calls = 0
+    start = time.time()
+    ports = func(br)
+    return fake.calls, time.time() - start, len(ports)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--ports', type=int, nargs='+', default=[50, 400],
+                        help='Numbers of VIF ports on the bridge')
+    args = parser.parse_args(argv)
+
+    br = ovs_lib.OVSBridge(BRIDGE, 'sudo')
+    print('%6s %-26s %8s %10s' % ('ports', 'operation', 'calls', 'time (s)'))
+    for count in args.ports:
+        fake = FakeOVSDB(count)
+        utils.execute = fake
+        for name, func in (
+                ('get_vif_ports per port', per_port_get_vif_ports),
+                ('get_vif_ports bulk', ovs_lib.OVSBridge.get_vif_ports),
+                ('agent resync per port', per_port_resync),
+                ('agent resync bulk', bulk_resync)):
+            calls, elapsed, found = measure(fake, func, br)
+            assert found == count
+            print('%6d %-26s %8d %10.4f' % (count, name, calls, elapsed))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the latency of API list requests with and without policy_compile.
+
+The database is wiped and seeded with N ports through ML2. The ports are then
+listed through the v2 API router, as an admin and as the tenant owning them,
+with policy_compile disabled and enabled, and the time per request and per
+port is reported.
+
+Example:
+
+    python tools/benchmarks/policy_list.py --ports 2000 --repeat 10
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import time
+
+from oslo.config import cfg
+import webtest
+
+from neutron.api.v2 import attributes
+from neutron.api.v2 import router
+from neutron.common import config
+from neutron import context
+from neutron.db import api as db_api
+from neutron import manager
+# Imported for its side effect: it registers the ml2 options that main()
+# overrides before the plugin is loaded.
+from neutron.plugins.ml2 import config as ml2_config  # noqa
+from neutron import policy
+
+TENANT_ID = 'benchmark'
+POLICY_FILE = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir,
+                           'etc', 'policy.json')
+
+
+def seed(plugin, ctx, count):
+    network = plugin.create_network(
+        ctx, {'network': {'tenant_id': TENANT_ID, 'name': 'benchmark',
+                          'admin_state_up': True, 'shared': False}})
+    for i in range(count):
+        plugin.create_port(
+            ctx, {'port': {'tenant_id': TENANT_ID, 'name': 'port%d' % i,
+                           'network_id': network['id'],
+                           'admin_state_up': True,
+                           'device_id': 'vm%d' % i,
+                           'device_owner': 'compute:nova',
+                           'mac_address': attributes.ATTR_NOT_SPECIFIED,
+                           'fixed_ips': []}})
+
+
+def measure(app, ctx, count, repeat):
+    timings = []
+    for _i in range(repeat):
+        start = time.time()
+        res = app.get('/ports.json', extra_environ={'neutron.context': ctx})
+        timings.append(time.time() - start)
+        assert len(res.json['ports']) == count
+    return min(timings), sum(timings) / len(timings)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--connection', default='sqlite:///policy_bench.db',
+                        help='SQLAlchemy database URL to benchmark against')
+    parser.add_argument('--ports', type=int, default=500,
+                        help='Number of ports to seed')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Number of list requests measured')
+    parser.add_argument('--policy-file', default=POLICY_FILE,
+                        help='Policy file enforced by the API')
+    parser.add_argument('--config-file', action='append', default=[],
+                        dest='config_files',
+                        help='Neutron configuration, e.g. for rpc_backend')
+    args = parser.parse_args(argv)
+
+    config_args = []
+    for config_file in args.config_files:
+        config_args += ['--config-file', config_file]
+    config.parse(args=config_args)
+    cfg.CONF.set_override('connection', args.connection, 'database')
+    cfg.CONF.set_override('policy_file', os.path.abspath(args.policy_file))
+    cfg.CONF.set_override('core_plugin',
+                          'neutron.plugins.ml2.plugin.Ml2Plugin')
+    cfg.CONF.set_override('type_drivers', ['local'], 'ml2')
+    cfg.CONF.set_override('tenant_network_types', ['local'], 'ml2')
+    cfg.CONF.set_override('quota_port', -1, 'QUOTAS')
+
+    plugin = manager.NeutronManager.get_plugin()
+    db_api.clear_db()
+    db_api.configure_db()
+    admin_ctx = context.get_admin_context(load_admin_roles=False)
+    start = time.time()
+    seed(plugin, admin_ctx, args.ports)
+    print('seeded %d ports in %.2fs' % (args.ports, time.time() - start))
+
+    app = webtest.TestApp(router.APIRouter())
+    contexts = [('admin', context.Context('admin', 'admin',
+                                          roles=['admin'])),
+                ('tenant', context.Context('user', TENANT_ID,
+                                           roles=['member']))]
+    print('%-8s %-8s %12s %12s %12s' % ('context', 'compile', 'min (s)',
+                                        'avg (s)', 'us/port'))
+    for name, ctx in contexts:
+        for compile_policy in (False, True):
+            cfg.CONF.set_override('policy_compile', compile_policy)
+            policy.reset()
+            # Warm up the policy and plugin caches
+            measure(app, ctx, args.ports, 1)
+            best, avg = measure(app, ctx, args.ports, args.repeat)
+            print('%-8s %-8s %12.3f %12.3f %12.1f' % (
+                name, compile_policy, best, avg, avg * 1e6 / args.ports))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Compare the commands/sec run through neutron-rootwrap and its daemon.
+
+The same command is run by neutron.agent.linux.utils.execute, first with
+root_helper forking neutron-rootwrap for each call, then through the root
+helper daemon. Both run as the current user with a generated rootwrap
+configuration allowing the command, unless --config is given; prefix
+--sudo to run them as root.
+
+Example:
+
+    python tools/benchmarks/rootwrap_daemon.py --count 200 ip link show lo
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from oslo.config import cfg
+
+from neutron.agent.common import config
+from neutron.agent.linux import utils
+
+DAEMON_MAIN = ('import sys; sys.argv[0] = "neutron-rootwrap-daemon"; '
+               'from neutron.agent.linux import rootwrap_daemon; '
+               'rootwrap_daemon.main()')
+
+
+def write_config(tempdir, command):
+    filters_dir = os.path.join(tempdir, 'rootwrap.d')
+    os.mkdir(filters_dir)
+    with open(os.path.join(filters_dir, 'benchmark.filters'), 'w') as f:
+        f.write('[Filters]\n%s: CommandFilter, %s, root\n' % (command,
+                                                             command))
+    config_file = os.path.join(tempdir, 'rootwrap.conf')
+    with open(config_file, 'w') as f:
+        f.write('[DEFAULT]\nfilters_path=%s\nexec_dirs=%s\n' %
+                (filters_dir, os.environ.get('PATH', '/sbin:/bin')
+                 .replace(':', ',')))
+    return config_file
+
+
+def measure(command, count, root_helper):
+    # The first call starts the daemon
+    utils.execute(command, root_helper=root_helper)
+    start = time.time()
+    for _i in range(count):
+        utils.execute(command, root_helper=root_helper)
+    return count / (time.time() - start)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--count', type=int, default=100,
+                        help='Number of commands run by each path')
+    parser.add_argument('--config', help='rootwrap.conf allowing the command')
+    parser.add_argument('--sudo', action='store_true',
+                        help='Run neutron-rootwrap and the daemon with sudo')
+    parser.add_argument('command', nargs='+', help='Command to run')
+    args = parser.parse_args(argv)
+
+    tempdir = tempfile.mkdtemp()
+    try:
+        config_file = args.config or write_config(tempdir, args.command[0])
+        prefix = 'sudo ' if args.sudo else ''
+        root_helper = '%s%s %s %s' % (
+            prefix, sys.executable,
+            os.path.join(os.path.dirname(__file__), '..', '..', 'bin',
+                         'neutron-rootwrap'), config_file)
+        daemon_cmd = '%s%s -c \'%s\' %s' % (prefix, sys.executable,
+                                           DAEMON_MAIN, config_file)
+
+        config.register_root_helper(cfg.CONF)
+        print('%-10s %14s' % ('path', 'commands/sec'))
+        print('%-10s %14.1f' % ('rootwrap', measure(args.command, args.count,
+                                                    root_helper)))
+        cfg.CONF.set_override('root_helper_daemon', daemon_cmd, 'AGENT')
+        print('%-10s %14.1f' % ('daemon', measure(args.command, args.count,
+                                                  root_helper)))
+        utils.get_rootwrap_client()._stop_daemon()
+    finally:
+        shutil.rmtree(tempdir)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the latency of concurrent RPC calls and casts.
+
+A consumer is set up on a topic, then --concurrency green threads call and
+cast its methods --calls times each, as agents do against the plugin. The
+latency histograms recorded by neutron.common.rpc are then summarized by
+name: the calls of each method and, for neutron.common.rpc_kombu, the time
+spent waiting for a connection of the pool.
+
+The fake backend is used unless a configuration file sets another one, e.g.
+neutron.common.rpc_kombu with fake_rabbit = True to go through the AMQP
+code paths:
+
+    python tools/benchmarks/rpc_calls.py --concurrency 50 --calls 100 \\
+        --config-file /etc/neutron/neutron.conf
+"""
+
+from __future__ import print_function
+
+import argparse
+import sys
+import time
+
+import eventlet
+eventlet.monkey_patch()
+
+from oslo.config import cfg
+
+from neutron.common import config
+from neutron import context
+from neutron.common import rpc as n_rpc
+from neutron.openstack.common import rpc
+from neutron.openstack.common.rpc import dispatcher
+
+TOPIC = 'benchmark'
+
+
+class BenchmarkCallback(object):
+    RPC_API_VERSION = '1.0'
+
+    def __init__(self, service_time):
+        self.service_time = service_time
+        self.casts = 0
+
+    def get_devices(self, context, count):
+        eventlet.sleep(self.service_time)
+        return [{'device': 'tap%d' % i} for i in range(count)]
+
+    def update_device(self, context, device):
+        eventlet.sleep(self.service_time)
+        self.casts += 1
+
+
+class BenchmarkApi(n_rpc.RpcProxy):
+    BASE_RPC_API_VERSION = '1.0'
+
+    def __init__(self):
+        super(BenchmarkApi, self).__init__(
+            topic=TOPIC, default_version=self.BASE_RPC_API_VERSION)
+
+    def get_devices(self, context, count):
+        return self.call(context, self.make_msg('get_devices', count=count))
+
+    def update_device(self, context, device):
+        self.cast(context, self.make_msg('update_device', device=device))
+
+
+def client(api, ctx, calls, devices):
+    for i in range(calls):
+        assert len(api.get_devices(ctx, devices)) == devices
+        api.update_device(ctx, 'tap%d' % i)
+
+
+def milliseconds(bound):
+    # The percentiles are the bounds of the buckets, the last is unbounded
+    return '%g' % (bound * 1000) if bound is not None else 'inf'
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--concurrency', type=int, default=20,
+                        help='Number of green threads calling concurrently')
+    parser.add_argument('--calls', type=int, default=50,
+                        help='Number of calls and casts by each thread')
+    parser.add_argument('--devices', type=int, default=10,
+                        help='Number of devices returned by each call')
+    parser.add_argument('--service-time', type=float, default=0.001,
+                        help='Seconds spent by the consumer on each message')
+    parser.add_argument('--config-file', action='append', default=[],
+                        dest='config_files',
+                        help='Neutron configuration, e.g. for rpc_backend')
+    args = parser.parse_args(argv)
+
+    config_args = []
+    for config_file in args.config_files:
+        config_args += ['--config-file', config_file]
+    config.parse(args=config_args)
+    if not args.config_files:
+        cfg.CONF.set_override('rpc_backend',
+                              'neutron.openstack.common.rpc.impl_fake')
+
+    callback = BenchmarkCallback(args.service_time)
+    connection = rpc.create_connection(new=True)
+    connection.create_consumer(TOPIC, dispatcher.RpcDispatcher([callback]),
+                               fanout=False)
+    connection.consume_in_thread()
+
+    api = BenchmarkApi()
+    ctx = context.Context('benchmark', 'benchmark', is_admin=True,
+                          load_admin_roles=False)
+    # Warm up the connections before measuring
+    client(api, ctx, 1, args.devices)
+    n_rpc.reset_latencies()
+
+    pool = eventlet.GreenPool(args.concurrency)
+    start = time.time()
+    for _i in range(args.concurrency):
+        pool.spawn_n(client, api, ctx, args.calls, args.devices)
+    pool.waitall()
+    elapsed = time.time() - start
+    calls = args.concurrency * args.calls
+    print('%d calls and casts in %.3fs, %.1f calls/s' % (
+        calls, elapsed, calls / elapsed))
+
+    print('%-24s %8s %10s %10s %10s %10s' % ('histogram', 'count',
+                                             'avg (ms)', 'p50 (ms)',
+                                             'p99 (ms)', 'max (ms)'))
+    for name, histogram in sorted(n_rpc._latencies.items()):
+        print('%-24s %8d %10.2f %10s %10s %10.2f' % (
+            name, histogram.count, histogram.total * 1000 / histogram.count,
+            milliseconds(histogram.percentile(50)),
+            milliseconds(histogram.percentile(99)), histogram.max * 1000))
+    connection.close()
+    rpc.cleanup()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the RPC calls/sec served by neutron-server per rpc_workers value.
+
+For each value of --workers, the RPC listeners of the configured plugin are
+started as neutron-server does, in a child process, and a swarm of fake L2
+agents calls report_state and get_device_details on the plugin topic for
+--duration seconds.
+
+The configuration files must point to a database and to a message broker
+shared by the processes. With rpc_backend set to impl_fake, which only
+delivers messages within a process, the listeners run in the benchmark
+process and only --workers 0 can be measured.
+
+Example:
+
+    python tools/benchmarks/rpc_workers.py --workers 0 2 4 --agents 200 \\
+        --config-file /etc/neutron/neutron.conf \\
+        --config-file /etc/neutron/plugins/ml2/ml2_conf.ini
+"""
+
+from __future__ import print_function
+
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import subprocess
+import sys
+import time
+
+from oslo.config import cfg
+
+from neutron.agent import rpc as agent_rpc
+from neutron.common import config
+from neutron.common import topics
+from neutron import context
+from neutron import manager
+from neutron import service
+
+IMPL_FAKE = 'neutron.openstack.common.rpc.impl_fake'
+
+
+def load_config(config_files):
+    args = []
+    for config_file in config_files:
+        args += ['--config-file', config_file]
+    config.parse(args)
+
+
+def serve(workers):
+    cfg.CONF.set_override('rpc_workers', workers)
+    manager.NeutronManager.get_plugin()
+    return service.serve_rpc()
+
+
+def run_agent(index, deadline, counts):
+    ctx = context.get_admin_context_without_session()
+    agent_id = 'benchmark-agent-%d' % index
+    state_rpc = agent_rpc.PluginReportStateAPI(topics.PLUGIN)
+    plugin_rpc = agent_rpc.PluginApi(topics.PLUGIN)
+    agent_state = {'binary': 'neutron-benchmark-agent',
+                   'host': agent_id,
+                   'topic': 'N/A',
+                   'configurations': {},
+                   'agent_type': 'Benchmark agent',
+                   'start_flag': True}
+    while time.time() < deadline:
+        state_rpc.report_state(ctx, agent_state, use_call=True)
+        agent_state.pop('start_flag', None)
+        plugin_rpc.get_device_details(ctx, 'tap%08d' % index, agent_id)
+        counts[index] += 2
+
+
+def measure(agents, duration):
+    counts = [0] * agents
+    deadline = time.time() + duration
+    pool = eventlet.GreenPool(agents)
+    for index in range(agents):
+        pool.spawn_n(run_agent, index, deadline, counts)
+    pool.waitall()
+    return sum(counts) / float(duration)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[0],
+                        help='rpc_workers values to measure')
+    parser.add_argument('--agents', type=int, default=100,
+                        help='Number of fake agents calling the server')
+    parser.add_argument('--duration', type=int, default=30,
+                        help='Seconds of calls for each rpc_workers value')
+    parser.add_argument('--startup', type=int, default=5,
+                        help='Seconds to let the server start its workers')
+    parser.add_argument('--config-file', action='append', default=[],
+                        dest='config_files', help='Neutron configuration')
+    parser.add_argument('--serve', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    load_config(args.config_files)
+    if args.serve is not None:
+        serve(args.serve).wait()
+        return
+
+    in_process = cfg.CONF.rpc_backend == IMPL_FAKE
+    print('%-8s %12s' % ('workers', 'calls/sec'))
+    for workers in args.workers:
+        if in_process:
+            if workers:
+                print('%-8d %12s' % (workers, 'impl_fake'))
+                continue
+            rpc = serve(0)
+        else:
+            cmd = [sys.executable, __file__, '--serve', str(workers)]
+            for config_file in args.config_files:
+                cmd += ['--config-file', config_file]
+            server = subprocess.Popen(cmd)
+            time.sleep(args.startup)
+        try:
+            print('%-8d %12.1f' % (workers,
+                                   measure(args.agents, args.duration)))
+        finally:
+            if in_process:
+                rpc.stop()
+            else:
+                server.terminate()
+                server.wait()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])